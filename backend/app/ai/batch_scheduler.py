@@ -0,0 +1,232 @@
+"""
+批处理调度器
+把短时间内到达的推理请求攒成一批统一执行，再把结果分发回各自的等待协程
+
+用于本地Phi-3.5模型：并发的低复杂度对话不再逐个排队执行model.generate，
+而是合并成一次batched generate，单机CPU上的吞吐随批大小近似线性提升；
+嵌入服务(EmbeddingService)同样用它合并单条文本编码
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _PendingItem:
+    """排队中的请求"""
+    payload: Any
+    key: Hashable
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class BatchScheduler:
+    """
+    动态批处理调度器
+
+    - 第一个请求到达后最多等待max_wait_ms，或攒满max_batch_size立即执行
+    - 同一批内按key分组(如采样参数不同的请求不能合并到一次generate)
+    - 默认单个批次顺序执行，避免多个generate同时争抢模型；
+      max_concurrent_batches>1时允许多个批次并行(如配合多线程执行器)
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch_size: int = 8,
+        max_wait_ms: int = 10,
+        max_concurrent_batches: int = 1,
+        name: str = "batch"
+    ):
+        """
+        Args:
+            run_batch: 批量执行函数，输入payload列表，返回等长的结果列表
+            max_batch_size: 单批最大请求数
+            max_wait_ms: 攒批最长等待时间(毫秒)
+            max_concurrent_batches: 同时执行的最大批次数
+            name: 调度器名称(日志用)
+        """
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self.name = name
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # 并行执行中的批次 -> 其中的请求
+        self._group_tasks: Dict[asyncio.Task, List[_PendingItem]] = {}
+
+        # 统计
+        self.batch_count = 0
+        self.request_count = 0
+        self.total_queue_wait = 0.0
+        self.max_observed_batch = 0
+
+    async def submit(self, payload: Any, key: Hashable = None) -> Any:
+        """
+        提交请求并等待该请求的结果
+
+        Args:
+            payload: 请求数据
+            key: 分组键，只有key相同的请求才会合并执行
+
+        Returns:
+            run_batch为该请求返回的结果
+        """
+        self._ensure_worker()
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PendingItem(payload=payload, key=key, future=future))
+        return await future
+
+    def _ensure_worker(self) -> None:
+        """首次提交时在当前事件循环中启动worker; worker退出后重启时接管旧队列中的请求"""
+        if self._worker is None or self._worker.done():
+            old_queue = self._queue
+            self._queue = asyncio.Queue()
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_batches)
+            self._worker = asyncio.create_task(self._run_worker())
+
+            if old_queue is not None:
+                loop = asyncio.get_running_loop()
+                while not old_queue.empty():
+                    item = old_queue.get_nowait()
+                    # 其他(已结束的)事件循环上的请求已无人等待
+                    if not item.future.done() and item.future.get_loop() is loop:
+                        self._queue.put_nowait(item)
+
+    async def _collect_batch(self, batch: List[_PendingItem]) -> None:
+        """
+        阻塞等待第一个请求，然后在max_wait内尽量攒满一批
+
+        取出的请求直接追加到batch中, worker在攒批过程中被取消时也能找到它们
+        """
+        loop = asyncio.get_running_loop()
+
+        batch.append(await self._queue.get())
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            try:
+                if remaining <= 0:
+                    # 等待时间已到，只取已经在队列里的请求
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+
+    async def _run_worker(self) -> None:
+        """后台worker：循环收集批次并执行; 被取消时已取出但未完成的请求以取消结束"""
+        while True:
+            batch: List[_PendingItem] = []
+            try:
+                await self._collect_batch(batch)
+
+                # 按key分组，保持到达顺序
+                groups: Dict[Hashable, List[_PendingItem]] = {}
+                for item in batch:
+                    groups.setdefault(item.key, []).append(item)
+
+                for items in groups.values():
+                    if self.max_concurrent_batches == 1:
+                        await self._execute_group(items)
+                    else:
+                        # 占满并发额度时在此等待, 形成背压
+                        await self._semaphore.acquire()
+                        task = asyncio.create_task(self._execute_group(items))
+                        self._group_tasks[task] = items
+                        task.add_done_callback(self._group_done)
+            except asyncio.CancelledError:
+                # 已交给并行批次的请求由该批次完成(或在批次取消时取消)
+                handed_off = {id(item) for items in self._group_tasks.values() for item in items}
+                _cancel_items([item for item in batch if id(item) not in handed_off])
+                raise
+
+    def _group_done(self, task: asyncio.Task) -> None:
+        """并行批次结束: 释放并发额度; 批次被取消时(包括尚未开始执行)取消其中的请求"""
+        _cancel_items(self._group_tasks.pop(task, []))
+        self._semaphore.release()
+
+    async def _execute_group(self, items: List[_PendingItem]) -> None:
+        """执行一组可合并的请求并分发结果"""
+        # 调用方已取消的请求不再执行
+        items = [item for item in items if not item.future.done()]
+        if not items:
+            return
+
+        now = time.perf_counter()
+        self.batch_count += 1
+        self.request_count += len(items)
+        self.total_queue_wait += sum(now - item.enqueued_at for item in items)
+        self.max_observed_batch = max(self.max_observed_batch, len(items))
+
+        try:
+            results = await self.run_batch([item.payload for item in items])
+            if len(results) != len(items):
+                raise RuntimeError(
+                    f"run_batch returned {len(results)} results for {len(items)} requests"
+                )
+        except Exception as e:
+            logger.error(f"❌ [{self.name}] batch of {len(items)} failed: {e}")
+            for item in items:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+
+        for item, result in zip(items, results):
+            if not item.future.done():
+                item.future.set_result(result)
+
+        if len(items) > 1:
+            logger.debug(f"📦 [{self.name}] batched {len(items)} requests")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取批处理统计"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": round(self.max_wait * 1000),
+            "batch_count": self.batch_count,
+            "request_count": self.request_count,
+            "avg_batch_size": (
+                round(self.request_count / self.batch_count, 2)
+                if self.batch_count else 0
+            ),
+            "max_observed_batch": self.max_observed_batch,
+            "avg_queue_wait_ms": (
+                round(self.total_queue_wait / self.request_count * 1000, 2)
+                if self.request_count else 0
+            ),
+            "pending": self._queue.qsize() if self._queue else 0
+        }
+
+    async def shutdown(self) -> None:
+        """停止worker和执行中的批次，所有未完成的请求(排队/攒批中/执行中)以取消结束"""
+        tasks = list(self._group_tasks)
+        if self._worker and not self._worker.done():
+            tasks.append(self._worker)
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        if self._queue:
+            while not self._queue.empty():
+                _cancel_items([self._queue.get_nowait()])
+
+        self._worker = None
+
+
+def _cancel_items(items: List[_PendingItem]) -> None:
+    """取消尚未完成的请求"""
+    for item in items:
+        if not item.future.done():
+            item.future.cancel()
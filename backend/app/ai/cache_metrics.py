@@ -0,0 +1,181 @@
+"""
+响应缓存统计(跨worker汇总)
+计数器和延迟直方图保存在Redis hash中，所有uvicorn worker共同累加，
+部署重启不会清零
+
+Redis结构:
+- cache:stats                 计数器hash (HINCRBY / HINCRBYFLOAT)
+- cache:latency:{layer}       固定桶延迟直方图hash, field为桶上界(ms)
+"""
+
+import bisect
+from typing import Dict, List, Optional, Sequence
+
+from loguru import logger
+
+
+# 延迟直方图桶上界(毫秒), 最后一个桶为+Inf
+LATENCY_BUCKETS_MS: List[float] = [
+    1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500, 1000, 2000, 5000
+]
+INF_BUCKET = "+Inf"
+
+# 统计的缓存层: 命中层 + 未命中
+LAYERS = ("L1", "L2", "L3", "miss")
+
+STATS_KEY = "cache:stats"
+LATENCY_KEY_PREFIX = "cache:latency:"
+
+
+def bucket_label(latency_ms: float) -> str:
+    """延迟所属桶的field名(桶上界)"""
+    idx = bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)
+    if idx >= len(LATENCY_BUCKETS_MS):
+        return INF_BUCKET
+    return _format_bound(LATENCY_BUCKETS_MS[idx])
+
+
+def _format_bound(bound: float) -> str:
+    return str(int(bound)) if float(bound).is_integer() else str(bound)
+
+
+def histogram_percentile(
+    counts: Dict[str, int],
+    quantile: float,
+    buckets: Sequence[float] = LATENCY_BUCKETS_MS
+) -> Optional[float]:
+    """
+    从固定桶直方图估算分位数
+
+    在目标桶内按线性插值; 落在+Inf桶时返回最大有限上界
+
+    Args:
+        counts: {桶上界: 计数}
+        quantile: 分位 (0-1)
+        buckets: 桶上界列表
+
+    Returns:
+        估算的延迟(毫秒), 无数据返回None
+    """
+    ordered = [(float(b), int(counts.get(_format_bound(b), 0))) for b in buckets]
+    inf_count = int(counts.get(INF_BUCKET, 0))
+
+    total = sum(c for _, c in ordered) + inf_count
+    if total == 0:
+        return None
+
+    rank = quantile * total
+    cumulative = 0
+    lower = 0.0
+
+    for upper, count in ordered:
+        if count and cumulative + count >= rank:
+            fraction = (rank - cumulative) / count
+            return round(lower + (upper - lower) * fraction, 2)
+        cumulative += count
+        lower = upper
+
+    return float(buckets[-1])
+
+
+class CacheMetricsRecorder:
+    """
+    缓存统计记录器
+
+    写入: 一次pipeline内完成计数器和直方图的累加
+    读取: 一次pipeline读出全部hash并计算命中率/平均值/分位数
+    """
+
+    def __init__(self, redis_client):
+        """
+        Args:
+            redis_client: redis.asyncio客户端(decode_responses=True)
+        """
+        self.redis = redis_client
+
+    async def record_lookup(self, layer: str, latency_ms: float):
+        """
+        记录一次缓存查询
+
+        Args:
+            layer: "L1" | "L2" | "L3" | "miss"
+            latency_ms: 查询延迟
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hincrby(STATS_KEY, "total_requests", 1)
+        pipe.hincrby(STATS_KEY, f"{layer}_count", 1)
+        pipe.hincrbyfloat(STATS_KEY, f"{layer}_latency_sum_ms", latency_ms)
+        pipe.hincrby(f"{LATENCY_KEY_PREFIX}{layer}", bucket_label(latency_ms), 1)
+        await pipe.execute()
+
+    async def record_savings(self, cost_usd: float, latency_ms: float):
+        """记录缓存写入时估算的成本/延迟节省"""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hincrbyfloat(STATS_KEY, "total_cost_saved_usd", cost_usd)
+        pipe.hincrbyfloat(STATS_KEY, "total_latency_saved_ms", latency_ms)
+        await pipe.execute()
+
+    async def get_stats(self) -> dict:
+        """
+        读取全局统计
+
+        Returns:
+            与ResponseCacheManager.get_stats()相同字段, 另含latency_percentiles_ms
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hgetall(STATS_KEY)
+        for layer in LAYERS:
+            pipe.hgetall(f"{LATENCY_KEY_PREFIX}{layer}")
+        results = await pipe.execute()
+
+        raw = results[0] or {}
+        histograms = dict(zip(LAYERS, results[1:]))
+
+        def num(field: str) -> float:
+            try:
+                return float(raw.get(field, 0))
+            except (TypeError, ValueError):
+                logger.warning(f"Invalid cache stats field {field}={raw.get(field)}")
+                return 0.0
+
+        total = int(num("total_requests"))
+        hits = {layer: int(num(f"{layer}_count")) for layer in ("L1", "L2", "L3")}
+        misses = int(num("miss_count"))
+        total_hits = sum(hits.values())
+
+        def rate(count: int) -> float:
+            return round(count / total * 100, 2) if total else 0.0
+
+        def avg_latency(layers: Sequence[str]) -> float:
+            count = sum(num(f"{layer}_count") for layer in layers)
+            latency_sum = sum(num(f"{layer}_latency_sum_ms") for layer in layers)
+            return round(latency_sum / count, 2) if count else 0.0
+
+        percentiles = {}
+        for layer, counts in histograms.items():
+            counts = counts or {}
+            percentiles[layer] = {
+                "p50": histogram_percentile(counts, 0.50),
+                "p95": histogram_percentile(counts, 0.95),
+                "p99": histogram_percentile(counts, 0.99),
+                "count": sum(int(c) for c in counts.values())
+            }
+
+        return {
+            "total_requests": total,
+            "total_hits": total_hits,
+            "cache_hit_rate_percent": rate(total_hits),
+            "l1_hits": hits["L1"],
+            "l1_hit_rate_percent": rate(hits["L1"]),
+            "l2_hits": hits["L2"],
+            "l2_hit_rate_percent": rate(hits["L2"]),
+            "l3_hits": hits["L3"],
+            "l3_hit_rate_percent": rate(hits["L3"]),
+            "cache_misses": misses,
+            "cache_miss_rate_percent": rate(misses),
+            "total_cost_saved_usd": round(num("total_cost_saved_usd"), 4),
+            "total_latency_saved_ms": round(num("total_latency_saved_ms"), 2),
+            "avg_cached_response_time_ms": avg_latency(("L1", "L2", "L3")),
+            "avg_uncached_response_time_ms": avg_latency(("miss",)),
+            "latency_percentiles_ms": percentiles
+        }
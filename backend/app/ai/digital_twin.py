@@ -7,19 +7,37 @@
 2. 预测未来精力变化
 3. 识别个人精力模式
 4. 提供个性化建议
+
+完整计算需要数十次查询, GET /energy/digital-twin读取持久化的快照(app.crud.twin_snapshots),
+快照过期时由后台任务重新计算
 """
 
 import asyncio
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
-from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, List, Dict, Optional, Tuple
+from uuid import UUID
+from dataclasses import asdict, dataclass, field
 from enum import Enum
 import numpy as np
 from loguru import logger
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
-
+from sqlalchemy import select, func, and_, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+
+from app.crud.energy_profile import (
+    get_energy_baseline,
+    get_energy_patterns,
+    upsert_energy_baselines,
+    upsert_energy_patterns
+)
+from app.crud.health_features import get_feature_vector
+from app.crud.twin_snapshots import (
+    claim_twin_refresh,
+    get_twin_snapshot,
+    save_twin_snapshot,
+    snapshot_stale_since
+)
 from app.models.health_data import HealthData, HealthDataType
 from app.ai.energy_prediction import (
     EnergyPredictionModel,
@@ -37,6 +55,7 @@ class EnergyPattern:
     peak_hours: List[int]  # 高精力时段
     low_hours: List[int]   # 低精力时段
     confidence: float
+    data_points: int = 0   # 用于识别的数据点数
 
 
 @dataclass
@@ -48,6 +67,7 @@ class PersonalBaseline:
     low_threshold: float   # 低精力阈值
     optimal_sleep: float   # 最佳睡眠时长
     last_updated: datetime
+    data_points: int = 0   # 用于计算基线的数据点数
 
 
 @dataclass
@@ -79,6 +99,12 @@ class EnergyDigitalTwin:
     last_updated: datetime = field(default_factory=datetime.utcnow)
     data_completeness: float = 0.0  # 数据完整度(0-1)
 
+    # 快照状态(不保存在快照中)
+    computed_at: Optional[datetime] = None   # 快照计算时间(UTC)
+    stale_since: Optional[datetime] = None   # 快照开始过期的时间, 未过期为None
+    is_stale: bool = False
+    refreshing: bool = False                 # 是否已有后台任务在重新计算
+
 
 class DigitalTwinManager:
     """
@@ -148,11 +174,11 @@ class DigitalTwinManager:
 
             twin.daily_predictions = daily_preds
 
-        # 3. 识别精力模式
-        twin.patterns = await self._identify_patterns(user_id, db)
+        # 3. 精力模式(每晚批量计算保存)
+        twin.patterns = await self.get_patterns(user_id, db)
 
-        # 4. 计算个性化基线
-        twin.baseline = await self._calculate_baseline(user_id, db)
+        # 4. 个性化基线(每晚批量计算保存)
+        twin.baseline = await self.get_baseline(user_id, db)
 
         # 5. 统计数据
         twin.stats = await self._calculate_stats(user_id, db)
@@ -174,6 +200,322 @@ class DigitalTwinManager:
 
         return twin
 
+    async def get_cached_digital_twin(
+        self,
+        user_id: str,
+        db: AsyncSession,
+        include_predictions: bool = True,
+        prediction_hours: int = 24
+    ) -> EnergyDigitalTwin:
+        """
+        从快照读取用户的精力数字孪生
+
+        - 没有快照, 或请求的预测时长超过快照时: 同步计算并保存快照
+        - 快照已过期: 照常返回旧快照(is_stale=True), 同时提交后台重算
+
+        Args:
+            user_id: 用户ID
+            db: 数据库会话
+            include_predictions: 是否包含预测
+            prediction_hours: 预测时长(小时)
+
+        Returns:
+            EnergyDigitalTwin: 带快照状态的数字孪生
+        """
+        snapshot = await get_twin_snapshot(db, user_id)
+
+        if snapshot is None or (include_predictions and prediction_hours > snapshot.prediction_hours):
+            hours = max(prediction_hours, snapshot.prediction_hours if snapshot else 0)
+            twin = await self.refresh_snapshot(user_id, db, prediction_hours=hours)
+        else:
+            twin = twin_from_payload(snapshot.payload)
+            twin.computed_at = snapshot.computed_at
+            twin.stale_since = snapshot_stale_since(snapshot)
+            twin.is_stale = twin.stale_since is not None
+            if twin.is_stale:
+                twin.refreshing = await self._request_refresh(user_id, db)
+
+        _trim_predictions(twin, include_predictions, prediction_hours)
+        return twin
+
+    async def refresh_snapshot(
+        self,
+        user_id: str,
+        db: AsyncSession,
+        prediction_hours: int = 24
+    ) -> EnergyDigitalTwin:
+        """
+        重新计算数字孪生并保存快照(提交)
+
+        Args:
+            user_id: 用户ID
+            db: 数据库会话
+            prediction_hours: 快照包含的预测时长(小时)
+
+        Returns:
+            EnergyDigitalTwin: 新计算的数字孪生
+        """
+        # 以开始计算的时间作为快照时间, 计算期间写入的数据会让快照保持过期
+        computed_at = datetime.now(timezone.utc)
+
+        twin = await self.get_digital_twin(
+            user_id,
+            db,
+            include_predictions=True,
+            prediction_hours=prediction_hours
+        )
+        await save_twin_snapshot(
+            db,
+            user_id,
+            twin_to_payload(twin),
+            prediction_hours=prediction_hours,
+            computed_at=computed_at
+        )
+
+        twin.computed_at = computed_at
+        return twin
+
+    async def _request_refresh(self, user_id: str, db: AsyncSession) -> bool:
+        """
+        提交快照的后台重算
+
+        Returns:
+            是否有后台任务在重新计算(已由其他请求提交也算)
+        """
+        if not await claim_twin_refresh(db, user_id):
+            return True
+
+        # 延迟导入, 避免ai与tasks之间的循环导入
+        from app.tasks.energy import refresh_digital_twin_snapshot
+
+        try:
+            refresh_digital_twin_snapshot.delay(user_id)
+        except Exception as e:
+            logger.warning(f"Failed to enqueue digital twin refresh | User: {user_id[:8]}... | {e}")
+            return False
+
+        logger.info(f"🔄 Digital twin refresh queued | User: {user_id[:8]}...")
+        return True
+
+    async def get_patterns(
+        self,
+        user_id: str,
+        db: AsyncSession
+    ) -> List[EnergyPattern]:
+        """
+        读取用户的精力模式
+
+        优先读取每晚批量计算保存的结果(energy_patterns), 还没有保存过时当场识别并保存;
+        数据不足时保存NO_PATTERN_TYPE标记行, 之后的请求不再重新扫描原始数据
+        """
+        stored = await get_energy_patterns(db, user_id)
+        if stored:
+            return [
+                _pattern_from_row(row) for row in stored
+                if row.pattern_type != NO_PATTERN_TYPE
+            ]
+
+        patterns = await self._identify_patterns(user_id, db)
+        await upsert_energy_patterns(
+            db,
+            [user_id],
+            [_pattern_row(user_id, p) for p in patterns] or [_no_pattern_row(user_id)]
+        )
+        await db.commit()
+
+        return patterns
+
+    async def get_baseline(
+        self,
+        user_id: str,
+        db: AsyncSession
+    ) -> Optional[PersonalBaseline]:
+        """
+        读取用户的个性化基线
+
+        优先读取每晚批量计算保存的结果(energy_baselines), 还没有保存过时当场计算并保存;
+        数据不足时保存阈值为空的标记行, 之后的请求不再重新扫描原始数据
+        """
+        stored = await get_energy_baseline(db, user_id)
+        if stored is not None:
+            return _baseline_from_row(stored)
+
+        baseline = await self._calculate_baseline(user_id, db)
+        await upsert_energy_baselines(
+            db,
+            [user_id],
+            [_baseline_row(baseline) if baseline else _insufficient_baseline_row(user_id)]
+        )
+        await db.commit()
+
+        return baseline
+
+    async def refresh_profiles_batch(
+        self,
+        user_ids: List[UUID],
+        db: AsyncSession
+    ) -> Tuple[int, int]:
+        """
+        批量计算一批用户的个性化基线和精力模式并写入(不提交)
+
+        数据不足的用户写入标记行(覆盖旧的基线/模式), 接口读到标记行时不再当场计算
+
+        Returns:
+            (写入的基线数, 写入的模式数), 不含标记行
+        """
+        baselines, patterns = await self.compute_profiles_batch(user_ids, db)
+
+        baseline_rows = [_baseline_row(baseline) for baseline in baselines.values()]
+        pattern_rows = [
+            _pattern_row(user_id, pattern)
+            for user_id, items in patterns.items()
+            for pattern in items
+        ]
+
+        await upsert_energy_baselines(
+            db,
+            user_ids,
+            baseline_rows + [
+                _insufficient_baseline_row(user_id)
+                for user_id in user_ids if user_id not in baselines
+            ]
+        )
+        await upsert_energy_patterns(
+            db,
+            user_ids,
+            pattern_rows + [
+                _no_pattern_row(user_id)
+                for user_id in user_ids if user_id not in patterns
+            ]
+        )
+
+        return len(baseline_rows), len(pattern_rows)
+
+    async def compute_profiles_batch(
+        self,
+        user_ids: List[UUID],
+        db: AsyncSession
+    ) -> Tuple[Dict[UUID, PersonalBaseline], Dict[UUID, List[EnergyPattern]]]:
+        """
+        批量计算一批用户的个性化基线和精力模式
+
+        与逐个用户计算的结果相同, 固定4次分组查询(与用户数无关)
+
+        Args:
+            user_ids: 用户ID列表
+            db: 数据库会话
+
+        Returns:
+            ({user_id: 基线}, {user_id: 精力模式列表}), 数据不足的用户不在结果中
+        """
+        if not user_ids:
+            return {}, {}
+
+        ids = _user_ids_array(user_ids)
+        now = datetime.utcnow()
+
+        # 1. 日周期: 过去30天按(用户, 小时)的平均精力
+        hourly_result = await db.execute(
+            select(
+                HealthData.user_id,
+                func.extract('hour', HealthData.recorded_at).label('hour'),
+                func.avg(HealthData.value),
+                func.count()
+            ).where(
+                HealthData.user_id == any_(ids),
+                HealthData.data_type == HealthDataType.ENERGY_LEVEL,
+                HealthData.recorded_at >= now - timedelta(days=30)
+            ).group_by(HealthData.user_id, 'hour')
+        )
+        hourly: Dict[UUID, Dict[int, float]] = {}
+        hourly_samples: Dict[UUID, int] = {}
+        for user_id, hour, avg_energy, count in hourly_result.all():
+            hourly.setdefault(user_id, {})[int(hour)] = avg_energy
+            hourly_samples[user_id] = hourly_samples.get(user_id, 0) + count
+
+        # 2. 周周期: 过去8周按(用户, 星期)的平均精力
+        weekly_result = await db.execute(
+            select(
+                HealthData.user_id,
+                func.extract('dow', HealthData.recorded_at).label('day_of_week'),
+                func.avg(HealthData.value),
+                func.count()
+            ).where(
+                HealthData.user_id == any_(ids),
+                HealthData.data_type == HealthDataType.ENERGY_LEVEL,
+                HealthData.recorded_at >= now - timedelta(weeks=8)
+            ).group_by(HealthData.user_id, 'day_of_week')
+        )
+        weekly: Dict[UUID, Dict[int, float]] = {}
+        weekly_samples: Dict[UUID, int] = {}
+        for user_id, dow, avg_energy, count in weekly_result.all():
+            weekly.setdefault(user_id, {})[int(dow)] = avg_energy
+            weekly_samples[user_id] = weekly_samples.get(user_id, 0) + count
+
+        patterns: Dict[UUID, List[EnergyPattern]] = {}
+        for user_id in user_ids:
+            user_patterns = [
+                pattern for pattern in (
+                    _daily_pattern(hourly.get(user_id, {}), hourly_samples.get(user_id, 0)),
+                    _weekly_pattern(weekly.get(user_id, {}), weekly_samples.get(user_id, 0))
+                )
+                if pattern is not None
+            ]
+            if user_patterns:
+                patterns[user_id] = user_patterns
+
+        # 3. 基线: 过去30天精力的均值/标准差/条数
+        stats_result = await db.execute(
+            select(
+                HealthData.user_id,
+                func.avg(HealthData.value),
+                func.stddev_pop(HealthData.value),
+                func.count()
+            ).where(
+                HealthData.user_id == any_(ids),
+                HealthData.data_type == HealthDataType.ENERGY_LEVEL,
+                HealthData.recorded_at >= now - timedelta(days=30)
+            ).group_by(HealthData.user_id)
+        )
+        energy_stats = {
+            user_id: (avg_energy, std_energy, count)
+            for user_id, avg_energy, std_energy, count in stats_result.all()
+            if count >= MIN_BASELINE_POINTS
+        }
+
+        baselines: Dict[UUID, PersonalBaseline] = {}
+        if energy_stats:
+            # 4. 最佳睡眠: 只为数据足够计算基线的用户读取睡眠/精力数据
+            sleep_result = await db.execute(
+                select(
+                    HealthData.user_id,
+                    HealthData.recorded_at,
+                    HealthData.data_type,
+                    HealthData.value
+                ).where(
+                    HealthData.user_id == any_(_user_ids_array(list(energy_stats))),
+                    HealthData.data_type.in_([
+                        HealthDataType.SLEEP_DURATION,
+                        HealthDataType.ENERGY_LEVEL
+                    ]),
+                    HealthData.recorded_at >= now - timedelta(days=30)
+                ).order_by(HealthData.user_id, HealthData.recorded_at)
+            )
+            sleep_rows: Dict[UUID, List[Tuple[datetime, str, float]]] = {}
+            for user_id, recorded_at, data_type, value in sleep_result.all():
+                sleep_rows.setdefault(user_id, []).append((recorded_at, data_type, value))
+
+            for user_id, (avg_energy, std_energy, count) in energy_stats.items():
+                baselines[user_id] = _build_baseline(
+                    str(user_id),
+                    avg_energy,
+                    std_energy,
+                    count,
+                    _optimal_sleep(sleep_rows.get(user_id, []))
+                )
+
+        return baselines, patterns
+
     async def _identify_patterns(
         self,
         user_id: str,
@@ -210,7 +552,8 @@ class DigitalTwinManager:
         # 查询过去30天的精力数据
         query = select(
             func.extract('hour', HealthData.recorded_at).label('hour'),
-            func.avg(HealthData.value).label('avg_energy')
+            func.avg(HealthData.value).label('avg_energy'),
+            func.count().label('samples')
         ).where(
             and_(
                 HealthData.user_id == user_id,
@@ -220,42 +563,11 @@ class DigitalTwinManager:
         ).group_by('hour').order_by('hour')
 
         result = await db.execute(query)
-        hourly_avg = result.all()
-
-        if len(hourly_avg) < 6:  # 数据不足
-            return None
-
-        # 分析高峰和低谷
-        hourly_dict = {int(row.hour): row.avg_energy for row in hourly_avg}
-        all_hours = list(hourly_dict.keys())
-        all_energies = list(hourly_dict.values())
-
-        if not all_energies:
-            return None
+        rows = result.all()
 
-        mean_energy = np.mean(all_energies)
-        std_energy = np.std(all_energies)
-
-        # 高精力时段 (高于平均值+0.5个标准差)
-        peak_hours = [h for h in all_hours if hourly_dict[h] > mean_energy + 0.5 * std_energy]
-
-        # 低精力时段 (低于平均值-0.5个标准差)
-        low_hours = [h for h in all_hours if hourly_dict[h] < mean_energy - 0.5 * std_energy]
-
-        # 生成描述
-        if peak_hours:
-            peak_range = f"{min(peak_hours)}:00-{max(peak_hours)}:00"
-        else:
-            peak_range = "暂无明显规律"
-
-        description = f"你的精力高峰通常在 {peak_range}"
-
-        return EnergyPattern(
-            pattern_type="daily",
-            description=description,
-            peak_hours=sorted(peak_hours),
-            low_hours=sorted(low_hours),
-            confidence=min(1.0, len(hourly_avg) / 24)  # 数据覆盖度
+        return _daily_pattern(
+            {int(row.hour): row.avg_energy for row in rows},
+            sum(row.samples for row in rows)
         )
 
     async def _identify_weekly_pattern(
@@ -267,7 +579,8 @@ class DigitalTwinManager:
         # 查询过去8周的精力数据
         query = select(
             func.extract('dow', HealthData.recorded_at).label('day_of_week'),
-            func.avg(HealthData.value).label('avg_energy')
+            func.avg(HealthData.value).label('avg_energy'),
+            func.count().label('samples')
         ).where(
             and_(
                 HealthData.user_id == user_id,
@@ -277,48 +590,11 @@ class DigitalTwinManager:
         ).group_by('day_of_week').order_by('day_of_week')
 
         result = await db.execute(query)
-        weekly_avg = result.all()
-
-        if len(weekly_avg) < 5:  # 数据不足
-            return None
-
-        # 分析工作日vs周末
-        weekday_energy = []
-        weekend_energy = []
-
-        for row in weekly_avg:
-            dow = int(row.day_of_week)  # 0=周日, 6=周六
-            if dow in [0, 6]:  # 周末
-                weekend_energy.append(row.avg_energy)
-            else:  # 工作日
-                weekday_energy.append(row.avg_energy)
-
-        if not weekday_energy or not weekend_energy:
-            return None
+        rows = result.all()
 
-        avg_weekday = np.mean(weekday_energy)
-        avg_weekend = np.mean(weekend_energy)
-
-        # 生成描述
-        if avg_weekend > avg_weekday + 0.5:
-            description = f"周末精力明显高于工作日 ({avg_weekend:.1f} vs {avg_weekday:.1f})"
-            peak_days = [0, 6]  # 周末
-            low_days = [1, 2, 3, 4, 5]  # 工作日
-        elif avg_weekday > avg_weekend + 0.5:
-            description = f"工作日精力更高 ({avg_weekday:.1f} vs {avg_weekend:.1f})"
-            peak_days = [1, 2, 3, 4, 5]
-            low_days = [0, 6]
-        else:
-            description = "工作日和周末精力差异不大"
-            peak_days = []
-            low_days = []
-
-        return EnergyPattern(
-            pattern_type="weekly",
-            description=description,
-            peak_hours=peak_days,  # 这里用day_of_week代替hour
-            low_hours=low_days,
-            confidence=min(1.0, len(weekly_avg) / 7)
+        return _weekly_pattern(
+            {int(row.day_of_week): row.avg_energy for row in rows},
+            sum(row.samples for row in rows)
         )
 
     async def _calculate_baseline(
@@ -331,8 +607,12 @@ class DigitalTwinManager:
 
         每个用户的"高精力"标准不同，需要建立个性化基线
         """
-        # 查询过去30天的精力数据
-        query = select(HealthData.value).where(
+        # 过去30天精力数据的统计量
+        query = select(
+            func.avg(HealthData.value),
+            func.stddev_pop(HealthData.value),
+            func.count()
+        ).where(
             and_(
                 HealthData.user_id == user_id,
                 HealthData.data_type == HealthDataType.ENERGY_LEVEL,
@@ -341,32 +621,15 @@ class DigitalTwinManager:
         )
 
         result = await db.execute(query)
-        energy_values = [row.value for row in result.all()]
+        avg_energy, std_energy, count = result.one()
 
-        if len(energy_values) < 10:  # 数据不足
+        if count < MIN_BASELINE_POINTS:  # 数据不足
             return None
 
-        # 计算统计量
-        avg_energy = float(np.mean(energy_values))
-        std_energy = float(np.std(energy_values))
-
-        # 高精力阈值 (平均值 + 0.5个标准差)
-        high_threshold = min(10.0, avg_energy + 0.5 * std_energy)
-
-        # 低精力阈值 (平均值 - 0.5个标准差)
-        low_threshold = max(1.0, avg_energy - 0.5 * std_energy)
-
         # 计算最佳睡眠时长 (基于睡眠数据和精力的相关性)
         optimal_sleep = await self._calculate_optimal_sleep(user_id, db)
 
-        return PersonalBaseline(
-            user_id=user_id,
-            avg_energy=avg_energy,
-            high_threshold=high_threshold,
-            low_threshold=low_threshold,
-            optimal_sleep=optimal_sleep,
-            last_updated=datetime.utcnow()
-        )
+        return _build_baseline(user_id, avg_energy, std_energy, count, optimal_sleep)
 
     async def _calculate_optimal_sleep(
         self,
@@ -391,38 +654,7 @@ class DigitalTwinManager:
         ).order_by(HealthData.recorded_at)
 
         result = await db.execute(query)
-        data = result.all()
-
-        # 构建睡眠-精力对
-        sleep_energy_pairs = []
-        sleep_dict = {}
-        energy_dict = {}
-
-        for row in data:
-            date_key = row.recorded_at.date()
-            if row.data_type == HealthDataType.SLEEP_DURATION:
-                sleep_dict[date_key] = row.value
-            elif row.data_type == HealthDataType.ENERGY_LEVEL:
-                if date_key not in energy_dict:
-                    energy_dict[date_key] = []
-                energy_dict[date_key].append(row.value)
-
-        # 匹配睡眠和次日精力
-        for date_key in sleep_dict:
-            next_day = date_key + timedelta(days=1)
-            if next_day in energy_dict:
-                sleep = sleep_dict[date_key]
-                avg_energy_next_day = np.mean(energy_dict[next_day])
-                sleep_energy_pairs.append((sleep, avg_energy_next_day))
-
-        if len(sleep_energy_pairs) < 5:
-            return 8.0  # 默认8小时
-
-        # 找出精力最高时对应的睡眠时长
-        sorted_pairs = sorted(sleep_energy_pairs, key=lambda x: x[1], reverse=True)
-        top_3_sleep = [pair[0] for pair in sorted_pairs[:3]]
-
-        return float(np.mean(top_3_sleep))
+        return _optimal_sleep(result.all())
 
     async def _calculate_stats(
         self,
@@ -432,38 +664,11 @@ class DigitalTwinManager:
         """计算统计数据"""
         stats = {}
 
-        # 过去7天平均精力
-        query_7d = select(func.avg(HealthData.value)).where(
-            and_(
-                HealthData.user_id == user_id,
-                HealthData.data_type == HealthDataType.ENERGY_LEVEL,
-                HealthData.recorded_at >= datetime.utcnow() - timedelta(days=7)
-            )
-        )
-        result = await db.execute(query_7d)
-        stats['avg_energy_7d'] = float(result.scalar() or 5.0)
-
-        # 过去30天平均精力
-        query_30d = select(func.avg(HealthData.value)).where(
-            and_(
-                HealthData.user_id == user_id,
-                HealthData.data_type == HealthDataType.ENERGY_LEVEL,
-                HealthData.recorded_at >= datetime.utcnow() - timedelta(days=30)
-            )
-        )
-        result = await db.execute(query_30d)
-        stats['avg_energy_30d'] = float(result.scalar() or 5.0)
-
-        # 过去7天平均睡眠
-        query_sleep = select(func.avg(HealthData.value)).where(
-            and_(
-                HealthData.user_id == user_id,
-                HealthData.data_type == HealthDataType.SLEEP_DURATION,
-                HealthData.recorded_at >= datetime.utcnow() - timedelta(days=7)
-            )
-        )
-        result = await db.execute(query_sleep)
-        stats['avg_sleep_7d'] = float(result.scalar() or 7.0)
+        # 过去7/30天平均精力、7天平均睡眠来自特征向量
+        vector = await get_feature_vector(db, user_id)
+        stats['avg_energy_7d'] = float((vector and vector.avg_energy_7d) or 5.0)
+        stats['avg_energy_30d'] = float((vector and vector.avg_energy_30d) or 5.0)
+        stats['avg_sleep_7d'] = float((vector and vector.avg_sleep_7d) or 7.0)
 
         # 精力变异系数 (越小越稳定)
         query_std = select(func.stddev(HealthData.value)).where(
@@ -561,6 +766,362 @@ class DigitalTwinManager:
         return available_count / len(data_types)
 
 
+# 计算基线所需的最少精力数据条数
+MIN_BASELINE_POINTS = 10
+
+# 基线的计算周期(天)
+BASELINE_PERIOD_DAYS = 30
+
+# 数据不足、没有识别出任何模式时保存的模式类型(标记已计算过)
+NO_PATTERN_TYPE = "none"
+
+
+def _daily_pattern(hourly_avg: Dict[int, float], data_points: int) -> Optional[EnergyPattern]:
+    """
+    由各小时的平均精力识别日周期模式
+
+    Args:
+        hourly_avg: {小时: 平均精力}
+        data_points: 数据条数
+    """
+    if len(hourly_avg) < 6:  # 数据不足
+        return None
+
+    # 分析高峰和低谷
+    all_hours = list(hourly_avg.keys())
+    all_energies = list(hourly_avg.values())
+
+    mean_energy = np.mean(all_energies)
+    std_energy = np.std(all_energies)
+
+    # 高精力时段 (高于平均值+0.5个标准差)
+    peak_hours = [h for h in all_hours if hourly_avg[h] > mean_energy + 0.5 * std_energy]
+
+    # 低精力时段 (低于平均值-0.5个标准差)
+    low_hours = [h for h in all_hours if hourly_avg[h] < mean_energy - 0.5 * std_energy]
+
+    # 生成描述
+    if peak_hours:
+        peak_range = f"{min(peak_hours)}:00-{max(peak_hours)}:00"
+    else:
+        peak_range = "暂无明显规律"
+
+    description = f"你的精力高峰通常在 {peak_range}"
+
+    return EnergyPattern(
+        pattern_type="daily",
+        description=description,
+        peak_hours=sorted(peak_hours),
+        low_hours=sorted(low_hours),
+        confidence=min(1.0, len(hourly_avg) / 24),  # 数据覆盖度
+        data_points=data_points
+    )
+
+
+def _weekly_pattern(weekly_avg: Dict[int, float], data_points: int) -> Optional[EnergyPattern]:
+    """
+    由星期几的平均精力识别周周期模式
+
+    Args:
+        weekly_avg: {星期(0=周日, 6=周六): 平均精力}
+        data_points: 数据条数
+    """
+    if len(weekly_avg) < 5:  # 数据不足
+        return None
+
+    # 分析工作日vs周末
+    weekday_energy = []
+    weekend_energy = []
+
+    for dow, avg_energy in weekly_avg.items():
+        if dow in [0, 6]:  # 周末
+            weekend_energy.append(avg_energy)
+        else:  # 工作日
+            weekday_energy.append(avg_energy)
+
+    if not weekday_energy or not weekend_energy:
+        return None
+
+    avg_weekday = np.mean(weekday_energy)
+    avg_weekend = np.mean(weekend_energy)
+
+    # 生成描述
+    if avg_weekend > avg_weekday + 0.5:
+        description = f"周末精力明显高于工作日 ({avg_weekend:.1f} vs {avg_weekday:.1f})"
+        peak_days = [0, 6]  # 周末
+        low_days = [1, 2, 3, 4, 5]  # 工作日
+    elif avg_weekday > avg_weekend + 0.5:
+        description = f"工作日精力更高 ({avg_weekday:.1f} vs {avg_weekend:.1f})"
+        peak_days = [1, 2, 3, 4, 5]
+        low_days = [0, 6]
+    else:
+        description = "工作日和周末精力差异不大"
+        peak_days = []
+        low_days = []
+
+    return EnergyPattern(
+        pattern_type="weekly",
+        description=description,
+        peak_hours=peak_days,  # 这里用day_of_week代替hour
+        low_hours=low_days,
+        confidence=min(1.0, len(weekly_avg) / 7),
+        data_points=data_points
+    )
+
+
+def _build_baseline(
+    user_id: str,
+    avg_energy: float,
+    std_energy: float,
+    data_points: int,
+    optimal_sleep: float
+) -> PersonalBaseline:
+    """由过去30天精力的均值和(总体)标准差计算个性化基线"""
+    avg_energy = float(avg_energy)
+    std_energy = float(std_energy or 0.0)
+
+    return PersonalBaseline(
+        user_id=user_id,
+        avg_energy=avg_energy,
+        # 高精力阈值 (平均值 + 0.5个标准差)
+        high_threshold=min(10.0, avg_energy + 0.5 * std_energy),
+        # 低精力阈值 (平均值 - 0.5个标准差)
+        low_threshold=max(1.0, avg_energy - 0.5 * std_energy),
+        optimal_sleep=optimal_sleep,
+        last_updated=datetime.utcnow(),
+        data_points=data_points
+    )
+
+
+def _optimal_sleep(rows: Iterable[Tuple[datetime, str, float]]) -> float:
+    """
+    由睡眠和精力数据计算最佳睡眠时长
+
+    Args:
+        rows: 按采集时间排序的(recorded_at, data_type, value)
+    """
+    # 构建睡眠-精力对
+    sleep_energy_pairs = []
+    sleep_dict = {}
+    energy_dict = {}
+
+    for recorded_at, data_type, value in rows:
+        date_key = recorded_at.date()
+        if data_type == HealthDataType.SLEEP_DURATION:
+            sleep_dict[date_key] = value
+        elif data_type == HealthDataType.ENERGY_LEVEL:
+            energy_dict.setdefault(date_key, []).append(value)
+
+    # 匹配睡眠和次日精力
+    for date_key, sleep in sleep_dict.items():
+        next_day = date_key + timedelta(days=1)
+        if next_day in energy_dict:
+            sleep_energy_pairs.append((sleep, np.mean(energy_dict[next_day])))
+
+    if len(sleep_energy_pairs) < 5:
+        return 8.0  # 默认8小时
+
+    # 找出精力最高时对应的睡眠时长
+    sorted_pairs = sorted(sleep_energy_pairs, key=lambda x: x[1], reverse=True)
+    top_3_sleep = [pair[0] for pair in sorted_pairs[:3]]
+
+    return float(np.mean(top_3_sleep))
+
+
+def _pattern_row(user_id, pattern: EnergyPattern) -> Dict[str, Any]:
+    """精力模式 -> energy_patterns行"""
+    return {
+        "user_id": user_id if isinstance(user_id, UUID) else UUID(str(user_id)),
+        "pattern_type": pattern.pattern_type,
+        "description": pattern.description,
+        "peak_hours": [int(h) for h in pattern.peak_hours],
+        "low_hours": [int(h) for h in pattern.low_hours],
+        "confidence": float(pattern.confidence),
+        "data_points": int(pattern.data_points)
+    }
+
+
+def _pattern_from_row(row) -> EnergyPattern:
+    """energy_patterns行 -> 精力模式"""
+    return EnergyPattern(
+        pattern_type=row.pattern_type,
+        description=row.description,
+        peak_hours=list(row.peak_hours or []),
+        low_hours=list(row.low_hours or []),
+        confidence=row.confidence,
+        data_points=row.data_points
+    )
+
+
+def _baseline_row(baseline: PersonalBaseline) -> Dict[str, Any]:
+    """个性化基线 -> energy_baselines行"""
+    return {
+        "user_id": UUID(str(baseline.user_id)),
+        "avg_energy": baseline.avg_energy,
+        "high_threshold": baseline.high_threshold,
+        "low_threshold": baseline.low_threshold,
+        "optimal_sleep": baseline.optimal_sleep,
+        "data_points": baseline.data_points,
+        "calculation_period_days": BASELINE_PERIOD_DAYS
+    }
+
+
+def _no_pattern_row(user_id) -> Dict[str, Any]:
+    """数据不足的用户 -> energy_patterns标记行"""
+    return {
+        "user_id": user_id if isinstance(user_id, UUID) else UUID(str(user_id)),
+        "pattern_type": NO_PATTERN_TYPE,
+        "description": "数据不足, 暂未识别出精力模式",
+        "peak_hours": [],
+        "low_hours": [],
+        "confidence": 0.0,
+        "data_points": 0
+    }
+
+
+def _insufficient_baseline_row(user_id) -> Dict[str, Any]:
+    """数据不足的用户 -> energy_baselines标记行(阈值为空)"""
+    return {
+        "user_id": user_id if isinstance(user_id, UUID) else UUID(str(user_id)),
+        "avg_energy": None,
+        "high_threshold": None,
+        "low_threshold": None,
+        "optimal_sleep": None,
+        "data_points": 0,
+        "calculation_period_days": BASELINE_PERIOD_DAYS
+    }
+
+
+def _baseline_from_row(row) -> Optional[PersonalBaseline]:
+    """energy_baselines行 -> 个性化基线(数据不足的标记行返回None)"""
+    if row.avg_energy is None:
+        return None
+
+    return PersonalBaseline(
+        user_id=str(row.user_id),
+        avg_energy=row.avg_energy,
+        high_threshold=row.high_threshold,
+        low_threshold=row.low_threshold,
+        optimal_sleep=row.optimal_sleep,
+        last_updated=row.calculated_at,
+        data_points=row.data_points
+    )
+
+
+def _user_ids_array(user_ids: List) -> Any:
+    """user_id = ANY(:user_ids)的数组参数(参数个数与用户数无关)"""
+    return bindparam(
+        "user_ids",
+        [user_id if isinstance(user_id, UUID) else UUID(str(user_id)) for user_id in user_ids],
+        type_=ARRAY(PG_UUID(as_uuid=True))
+    )
+
+
+def _prediction_to_payload(prediction: EnergyPrediction) -> Dict[str, Any]:
+    return {
+        "id": prediction.id,
+        "timestamp": prediction.timestamp.isoformat(),
+        "energy_level": prediction.energy_level.value,
+        "score": float(prediction.score),
+        "confidence": float(prediction.confidence),
+        "factors": {name: float(value) for name, value in prediction.factors.items()},
+        "recommendations": list(prediction.recommendations)
+    }
+
+
+def _prediction_from_payload(data: Dict[str, Any]) -> EnergyPrediction:
+    return EnergyPrediction(
+        id=data.get("id"),
+        timestamp=datetime.fromisoformat(data["timestamp"]),
+        energy_level=EnergyLevel(data["energy_level"]),
+        score=data["score"],
+        confidence=data["confidence"],
+        factors=data["factors"],
+        recommendations=data["recommendations"]
+    )
+
+
+def twin_to_payload(twin: EnergyDigitalTwin) -> Dict[str, Any]:
+    """数字孪生 -> 快照JSON(不含快照状态字段)"""
+    baseline = None
+    if twin.baseline:
+        baseline = asdict(twin.baseline)
+        baseline["last_updated"] = twin.baseline.last_updated.isoformat()
+
+    return {
+        "user_id": twin.user_id,
+        "current_energy": _prediction_to_payload(twin.current_energy) if twin.current_energy else None,
+        "real_time_score": float(twin.real_time_score),
+        "hourly_predictions": [_prediction_to_payload(p) for p in twin.hourly_predictions],
+        "daily_predictions": [_prediction_to_payload(p) for p in twin.daily_predictions],
+        "patterns": [
+            {
+                **asdict(p),
+                "peak_hours": [int(h) for h in p.peak_hours],
+                "low_hours": [int(h) for h in p.low_hours],
+                "confidence": float(p.confidence)
+            }
+            for p in twin.patterns
+        ],
+        "baseline": baseline,
+        "stats": {name: float(value) for name, value in twin.stats.items()},
+        "recommendations": list(twin.recommendations),
+        "last_updated": twin.last_updated.isoformat(),
+        "data_completeness": float(twin.data_completeness)
+    }
+
+
+def twin_from_payload(data: Dict[str, Any]) -> EnergyDigitalTwin:
+    """快照JSON -> 数字孪生"""
+    baseline = None
+    if data.get("baseline"):
+        baseline = PersonalBaseline(**{
+            **data["baseline"],
+            "last_updated": datetime.fromisoformat(data["baseline"]["last_updated"])
+        })
+
+    current = data.get("current_energy")
+
+    return EnergyDigitalTwin(
+        user_id=data["user_id"],
+        current_energy=_prediction_from_payload(current) if current else None,
+        real_time_score=data["real_time_score"],
+        hourly_predictions=[_prediction_from_payload(p) for p in data["hourly_predictions"]],
+        daily_predictions=[_prediction_from_payload(p) for p in data["daily_predictions"]],
+        patterns=[EnergyPattern(**p) for p in data["patterns"]],
+        baseline=baseline,
+        stats=data["stats"],
+        recommendations=data["recommendations"],
+        last_updated=datetime.fromisoformat(data["last_updated"]),
+        data_completeness=data["data_completeness"]
+    )
+
+
+def _trim_predictions(
+    twin: EnergyDigitalTwin,
+    include_predictions: bool,
+    prediction_hours: int
+) -> None:
+    """按请求参数截取快照中的预测曲线"""
+    if not include_predictions:
+        twin.hourly_predictions = []
+        twin.daily_predictions = []
+        return
+
+    if len(twin.hourly_predictions) <= prediction_hours:
+        return
+
+    twin.hourly_predictions = twin.hourly_predictions[:max(0, prediction_hours)]
+    if not twin.hourly_predictions:
+        twin.daily_predictions = []
+        return
+
+    last_timestamp = twin.hourly_predictions[-1].timestamp
+    twin.daily_predictions = [
+        p for p in twin.daily_predictions if p.timestamp <= last_timestamp
+    ]
+
+
 # 全局单例
 _digital_twin_manager: Optional[DigitalTwinManager] = None
 
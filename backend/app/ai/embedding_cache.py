@@ -0,0 +1,150 @@
+"""
+文本嵌入共享缓存
+同一条用户消息在一次对话请求中会被意图分类、L2/L3缓存查询和缓存写入反复使用，
+这里按归一化文本哈希做小型LRU，保证每条消息只编码一次
+
+并发请求同一文本时共享同一个编码任务，不会重复计算
+"""
+
+import asyncio
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+import numpy as np
+from loguru import logger
+
+
+def normalize_text(text: str) -> str:
+    """
+    嵌入缓存的文本归一化
+
+    只去除首尾空白并合并连续空白；不改变大小写，
+    避免对区分大小写的模型返回不同文本的向量
+    """
+    return re.sub(r"\s+", " ", text.strip())
+
+
+def text_hash(text: str) -> str:
+    """归一化文本的哈希(作为缓存键)"""
+    return hashlib.md5(normalize_text(text).encode()).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    嵌入向量LRU缓存
+
+    - 键: 归一化文本MD5
+    - 值: numpy向量(只读, 调用方不应原地修改)
+    - 同一文本的并发编码合并为一次
+    """
+
+    def __init__(self, max_size: int = 1024):
+        """
+        Args:
+            max_size: 最多缓存的向量数
+        """
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """读取已缓存的向量, 不存在返回None"""
+        key = text_hash(text)
+        vector = self._entries.get(key)
+        if vector is not None:
+            self._entries.move_to_end(key)
+        return vector
+
+    def put(self, text: str, vector: np.ndarray) -> None:
+        """写入向量, 超出容量时淘汰最久未使用的条目"""
+        key = text_hash(text)
+        vector.setflags(write=False)
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get_or_compute(
+        self,
+        text: str,
+        compute: Callable[[str], Awaitable[np.ndarray]]
+    ) -> np.ndarray:
+        """
+        获取文本向量, 未命中时调用compute编码并缓存
+
+        Args:
+            text: 原始文本
+            compute: 编码函数(接收归一化后的文本)
+
+        Returns:
+            嵌入向量
+        """
+        key = text_hash(text)
+
+        vector = self._entries.get(key)
+        if vector is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+        # 已有同一文本的编码任务在进行中, 直接等待其结果
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.hits += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+
+        try:
+            vector = np.asarray(await compute(normalize_text(text)), dtype=np.float32)
+            self.put(text, vector)
+            future.set_result(vector)
+            return vector
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免"exception never retrieved"警告
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._entries.clear()
+
+    def get_stats(self) -> dict:
+        """获取缓存统计"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate_percent": round(self.hits / total * 100, 2) if total else 0.0
+        }
+
+
+# 全局单例
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """获取全局EmbeddingCache单例"""
+    global _embedding_cache
+
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache()
+        logger.info("🧮 EmbeddingCache initialized")
+
+    return _embedding_cache
@@ -0,0 +1,193 @@
+"""
+嵌入编码服务
+Sentence-Transformers编码请求的微批处理
+
+并发的单条encode请求先进入队列，按批大小/最长等待合并成一次encode，
+在专用的有界线程池中执行，不再与默认线程池里的其他任务争抢
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from app.core.config import settings
+from app.ai.batch_scheduler import BatchScheduler
+
+
+class EmbeddingService:
+    """
+    微批处理嵌入服务
+
+    - encode(): 单条文本, 与并发请求合并成批
+    - encode_many(): 已经成批的文本(如意图模板), 直接执行
+    - 返回numpy向量(float32)
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = 32,
+        max_wait_ms: int = 5,
+        max_workers: int = 2
+    ):
+        """
+        Args:
+            max_batch_size: 单批最大文本数
+            max_wait_ms: 攒批最长等待时间(毫秒)
+            max_workers: 专用编码线程数
+        """
+        self.model = None
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="embedding"
+        )
+        self.scheduler = BatchScheduler(
+            run_batch=self._run_batch,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            max_concurrent_batches=max_workers,
+            name="embedding"
+        )
+
+        # 性能指标
+        self.text_count = 0
+        self.encode_calls = 0
+        self.total_encode_time = 0.0  # 编码耗时(秒, 不含攒批等待)
+        self.request_count = 0
+        self.total_request_latency = 0.0  # 调用方视角的延迟, 含排队(秒)
+        self.max_request_latency = 0.0
+
+        logger.info(
+            f"🧮 EmbeddingService initialized "
+            f"(batch={max_batch_size}, wait={max_wait_ms}ms, workers={max_workers})"
+        )
+
+    def bind_model(self, model: Any) -> None:
+        """绑定SentenceTransformer模型(由意图分类器加载后注入)"""
+        self.model = model
+
+    @property
+    def is_ready(self) -> bool:
+        """模型是否已绑定"""
+        return self.model is not None
+
+    async def encode(self, text: str) -> np.ndarray:
+        """
+        编码单条文本
+
+        Args:
+            text: 待编码文本
+
+        Returns:
+            嵌入向量
+        """
+        self._check_ready()
+
+        start = time.perf_counter()
+        vector = await self.scheduler.submit(text)
+
+        latency = time.perf_counter() - start
+        self.request_count += 1
+        self.total_request_latency += latency
+        self.max_request_latency = max(self.max_request_latency, latency)
+
+        return vector
+
+    async def encode_many(self, texts: List[str]) -> np.ndarray:
+        """
+        直接编码一批文本(不经过攒批队列)
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            (len(texts), dim) 的向量矩阵
+        """
+        self._check_ready()
+        return await self._encode(texts)
+
+    def _check_ready(self) -> None:
+        if self.model is None:
+            raise RuntimeError("EmbeddingService has no model bound")
+
+    async def _run_batch(self, texts: List[str]) -> List[np.ndarray]:
+        """批处理调度器回调: 编码一批文本并按行拆分"""
+        matrix = await self._encode(texts)
+        return list(matrix)
+
+    async def _encode(self, texts: List[str]) -> np.ndarray:
+        """在专用线程池中编码, 并记录编码耗时"""
+        loop = asyncio.get_running_loop()
+
+        start = time.perf_counter()
+        matrix = await loop.run_in_executor(self.executor, self._encode_sync, texts)
+
+        self.encode_calls += 1
+        self.text_count += len(texts)
+        self.total_encode_time += time.perf_counter() - start
+
+        return matrix
+
+    def _encode_sync(self, texts: List[str]) -> np.ndarray:
+        """同步编码（在专用线程池中执行）"""
+        return self.model.encode(
+            texts,
+            batch_size=len(texts),
+            convert_to_numpy=True,
+            show_progress_bar=False
+        ).astype(np.float32, copy=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取吞吐和延迟统计(用于调整批大小和线程数)"""
+        return {
+            "model_bound": self.is_ready,
+            "executor_workers": self.max_workers,
+            "encode_calls": self.encode_calls,
+            "texts_encoded": self.text_count,
+            "avg_texts_per_encode": (
+                round(self.text_count / self.encode_calls, 2)
+                if self.encode_calls else 0
+            ),
+            "throughput_texts_per_sec": (
+                round(self.text_count / self.total_encode_time, 1)
+                if self.total_encode_time else 0
+            ),
+            "avg_encode_time_ms": (
+                round(self.total_encode_time / self.encode_calls * 1000, 2)
+                if self.encode_calls else 0
+            ),
+            "requests": self.request_count,
+            "avg_request_latency_ms": (
+                round(self.total_request_latency / self.request_count * 1000, 2)
+                if self.request_count else 0
+            ),
+            "max_request_latency_ms": round(self.max_request_latency * 1000, 2),
+            "batching": self.scheduler.get_stats()
+        }
+
+    async def shutdown(self) -> None:
+        """停止调度器并关闭线程池"""
+        await self.scheduler.shutdown()
+        self.executor.shutdown(wait=False)
+
+
+# 全局单例
+_embedding_service: Optional[EmbeddingService] = None
+
+
+def get_embedding_service() -> EmbeddingService:
+    """获取全局EmbeddingService单例"""
+    global _embedding_service
+
+    if _embedding_service is None:
+        _embedding_service = EmbeddingService(
+            max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS,
+            max_workers=settings.EMBEDDING_EXECUTOR_WORKERS
+        )
+
+    return _embedding_service
@@ -7,17 +7,22 @@ MVP阶段: 使用基于规则的启发式模型
 """
 
 import asyncio
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
-from dataclasses import dataclass
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, Sequence, Tuple, Union
+from dataclasses import dataclass, fields, replace
 from enum import Enum
 import numpy as np
 from loguru import logger
 
 from app.core.database import get_db
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from app.models.health_data import HealthData, HealthDataType
+from sqlalchemy import select, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+from app.core.config import settings
+from app.crud.health_features import FEATURE_FIELDS, get_feature_vector, get_feature_vectors
+from app.models.health_data import HealthFeatureVector
 
 
 class EnergyLevel(str, Enum):
@@ -168,6 +173,9 @@ class EnergyPredictionModel:
         """
         预测未来精力曲线
 
+        只在当前时间提取一次特征快照(固定2次查询, 与hours_ahead无关),
+        各时间点仅替换时间特征, 再一次性向量化评分
+
         Args:
             user_id: 用户ID
             db: 数据库会话
@@ -176,43 +184,286 @@ class EnergyPredictionModel:
         Returns:
             List[EnergyPrediction]: 未来各时间点精力预测
         """
-        predictions = []
         current_time = datetime.utcnow()
+        snapshot = await self._extract_features(user_id, db, current_time)
+
+        timestamps = [current_time + timedelta(hours=hour) for hour in range(hours_ahead)]
+        features_list = [
+            replace(
+                snapshot,
+                hour_of_day=future_time.hour,
+                day_of_week=future_time.weekday(),
+                is_weekend=future_time.weekday() >= 5
+            )
+            for future_time in timestamps
+        ]
 
-        for hour in range(hours_ahead):
-            future_time = current_time + timedelta(hours=hour)
-
-            # 提取该时间点的特征
-            features = await self._extract_features(user_id, db, future_time)
+        scores, factor_arrays = self._calculate_energy_scores(features_list, is_future=True)
 
-            # 预测精力
-            score, factors = self._calculate_energy_score(features, is_future=True)
-            energy_level = self._classify_energy_level(score)
-            confidence = self._calculate_confidence(features, is_future=True)
+        # 置信度只取决于时间无关的特征, 各时间点相同
+        confidence = self._calculate_confidence(snapshot, is_future=True)
 
-            predictions.append(EnergyPrediction(
+        predictions = [
+            EnergyPrediction(
                 timestamp=future_time,
-                energy_level=energy_level,
-                score=score,
+                energy_level=self._classify_energy_level(float(scores[i])),
+                score=float(scores[i]),
                 confidence=confidence,
-                factors=factors,
+                factors={name: float(values[i]) for name, values in factor_arrays.items()},
                 recommendations=[]
-            ))
+            )
+            for i, future_time in enumerate(timestamps)
+        ]
 
         logger.info(
             f"📈 Future energy predicted | User: {user_id[:8]}... | "
-            f"Hours: {hours_ahead} | Avg score: {np.mean([p.score for p in predictions]):.1f}"
+            f"Hours: {hours_ahead} | Avg score: {float(scores.mean()) if hours_ahead else 0.0:.1f}"
         )
 
         return predictions
 
+    async def predict_batch(
+        self,
+        user_ids: Sequence[Union[str, uuid.UUID]],
+        times: Sequence[datetime],
+        db: AsyncSession,
+        save_to_db: bool = True,
+        chunk_size: Optional[int] = None,
+        return_predictions: bool = True
+    ) -> Dict[str, List[EnergyPrediction]]:
+        """
+        批量预测多个用户在多个时间点的精力
+
+        按批处理用户: 每批用2条集合查询(user_id = ANY(...))读取特征向量和环境数据,
+        以(用户数 × 时间点数)的矩阵一次评分, 再直接从分数/因素矩阵生成记录, 用一次COPY写入energy_predictions;
+        建议只为每个用户的第一个(当前)时间点生成, 其余时间点与predict_future_energy一致为空
+
+        Args:
+            user_ids: 用户ID列表
+            times: 预测目标时间(UTC, 所有用户相同)
+            db: 数据库会话
+            save_to_db: 是否保存预测结果(每批提交一次)
+            chunk_size: 每批用户数(默认取配置)
+            return_predictions: 是否构造并返回预测对象(只需写库时传False, 返回空字典)
+
+        Returns:
+            {user_id: 按times顺序的预测列表}
+        """
+        chunk_size = chunk_size or settings.ENERGY_BATCH_CHUNK_SIZE
+        user_uuids = [uuid.UUID(str(user_id)) for user_id in user_ids]
+        times = [_naive_utc(t) for t in times]
+        predictions: Dict[str, List[EnergyPrediction]] = {}
+
+        if not user_uuids or not times:
+            return predictions
+
+        for start in range(0, len(user_uuids), chunk_size):
+            chunk = user_uuids[start:start + chunk_size]
+            predictions.update(
+                await self._predict_chunk(chunk, times, db, save_to_db, return_predictions)
+            )
+
+        logger.info(
+            f"📊 Batch energy predicted | Users: {len(user_uuids)} | "
+            f"Times: {len(times)} | Saved: {save_to_db}"
+        )
+
+        return predictions
+
+    async def _predict_chunk(
+        self,
+        user_ids: List[uuid.UUID],
+        times: List[datetime],
+        db: AsyncSession,
+        save_to_db: bool,
+        return_predictions: bool = True
+    ) -> Dict[str, List[EnergyPrediction]]:
+        """预测一批用户(见predict_batch)"""
+        as_of = datetime.utcnow()
+        snapshots = await self._extract_features_batch(user_ids, db, as_of)
+
+        n_users, n_times = len(user_ids), len(times)
+
+        # 时间无关特征按用户重复, 时间特征按时间点平铺 -> 展开的(用户 × 时间点)列
+        user_columns = _feature_arrays(snapshots)
+        columns = {name: np.repeat(values, n_times) for name, values in user_columns.items()}
+        columns["hour_of_day"] = np.tile(
+            np.array([t.hour for t in times], dtype=np.float64), n_users
+        )
+        columns["day_of_week"] = np.tile(
+            np.array([t.weekday() for t in times], dtype=np.float64), n_users
+        )
+        columns["is_weekend"] = (columns["day_of_week"] >= 5).astype(np.float64)
+        weather_scores = np.repeat(
+            np.array([_weather_score(f.weather) for f in snapshots], dtype=np.float64),
+            n_times
+        )
+
+        scores, factor_arrays = self._score_feature_arrays(columns, weather_scores)
+        scores = scores.reshape(n_users, n_times)
+        factor_matrix = {name: values.reshape(n_users, n_times) for name, values in factor_arrays.items()}
+
+        # 置信度只取决于时间无关的特征和是否未来时间点
+        is_future = np.array([t > as_of for t in times])
+        confidence = np.array([
+            np.where(
+                is_future,
+                self._calculate_confidence(features, is_future=True),
+                self._calculate_confidence(features, is_future=False)
+            )
+            for features in snapshots
+        ]).reshape(n_users, n_times)
+
+        # 建议按用户生成一次(第一个时间点)
+        recommendations = [
+            self._generate_recommendations(
+                float(scores[i, 0]), self._classify_energy_level(float(scores[i, 0])), features
+            )
+            for i, features in enumerate(snapshots)
+        ]
+
+        ids = None
+        if save_to_db:
+            ids = await self._save_prediction_matrix(
+                db, user_ids, times, scores, factor_matrix, confidence, recommendations, as_of
+            )
+
+        if not return_predictions:
+            return {}
+
+        factor_names = list(factor_matrix)
+        factor_values = np.stack([factor_matrix[name] for name in factor_names], axis=-1).tolist()
+        score_values = scores.tolist()
+        confidence_values = confidence.tolist()
+
+        predictions: Dict[str, List[EnergyPrediction]] = {}
+        for i, user_id in enumerate(user_ids):
+            predictions[str(user_id)] = [
+                EnergyPrediction(
+                    timestamp=target_time,
+                    energy_level=self._classify_energy_level(score_values[i][j]),
+                    score=score_values[i][j],
+                    confidence=confidence_values[i][j],
+                    factors=dict(zip(factor_names, factor_values[i][j])),
+                    recommendations=recommendations[i] if j == 0 else [],
+                    id=str(ids[i][j]) if ids is not None else None
+                )
+                for j, target_time in enumerate(times)
+            ]
+
+        return predictions
+
+    async def _extract_features_batch(
+        self,
+        user_ids: List[uuid.UUID],
+        db: AsyncSession,
+        as_of: datetime
+    ) -> List[HealthFeatures]:
+        """
+        用集合查询为一批用户提取特征快照(与_extract_features相同的口径)
+
+        Returns:
+            与user_ids顺序一致的特征(时间特征为as_of)
+        """
+        from app.models.energy import EnvironmentData
+
+        ids_param = bindparam("user_ids", user_ids, type_=ARRAY(PG_UUID(as_uuid=True)))
+
+        # 1. 特征向量(最新健康数据和历史均值)
+        vectors = await get_feature_vectors(db, user_ids)
+
+        # 2. 每个用户最新的环境数据
+        env_query = (
+            select(EnvironmentData)
+            .where(
+                EnvironmentData.user_id == any_(ids_param),
+                EnvironmentData.recorded_at <= as_of
+            )
+            .distinct(EnvironmentData.user_id)
+            .order_by(EnvironmentData.user_id, EnvironmentData.recorded_at.desc())
+        )
+
+        environments = {
+            env.user_id: env
+            for env in (await db.execute(env_query)).scalars().all()
+        }
+
+        snapshots = []
+        for user_id in user_ids:
+            features = HealthFeatures(
+                hour_of_day=as_of.hour,
+                day_of_week=as_of.weekday(),
+                is_weekend=as_of.weekday() >= 5
+            )
+            _apply_feature_vector(features, vectors.get(user_id), as_of)
+
+            env_data = environments.get(user_id)
+            if env_data:
+                features.temperature = env_data.temperature or 0.0
+                features.humidity = env_data.humidity or 0
+                features.air_quality = env_data.air_quality or 0
+                features.weather = env_data.weather or ""
+
+            snapshots.append(features)
+
+        return snapshots
+
+    async def _save_prediction_matrix(
+        self,
+        db: AsyncSession,
+        user_ids: List[uuid.UUID],
+        times: List[datetime],
+        scores: np.ndarray,
+        factor_matrix: Dict[str, np.ndarray],
+        confidence: np.ndarray,
+        recommendations: List[List[str]],
+        predicted_at: datetime
+    ) -> List[List[uuid.UUID]]:
+        """
+        直接从(用户 × 时间点)矩阵生成COPY记录, 一次写入一批预测并提交
+
+        Args:
+            db: 数据库会话
+            user_ids: 用户ID(矩阵的行)
+            times: 预测目标时间(矩阵的列)
+            scores: 分数矩阵
+            factor_matrix: {因素名: 得分矩阵}
+            confidence: 置信度矩阵
+            recommendations: 各用户第一个时间点的建议
+            predicted_at: 预测生成时间
+
+        Returns:
+            与矩阵形状一致的预测记录ID
+        """
+        records = prediction_copy_records(
+            user_ids, times, scores, factor_matrix, confidence,
+            recommendations, predicted_at, self.model_version
+        )
+        if not records:
+            return []
+
+        connection = await db.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            "energy_predictions",
+            records=records,
+            columns=list(PREDICTION_COPY_COLUMNS)
+        )
+        await db.commit()
+
+        n_times = len(times)
+        return [
+            [record[0] for record in records[i * n_times:(i + 1) * n_times]]
+            for i in range(len(user_ids))
+        ]
+
     async def _extract_features(
         self,
         user_id: str,
         db: AsyncSession,
         target_time: datetime
     ) -> HealthFeatures:
-        """提取健康特征"""
+        """提取健康特征(特征向量 + 最新环境数据, 共2次查询)"""
         features = HealthFeatures()
 
         # 时间特征
@@ -220,45 +471,9 @@ class EnergyPredictionModel:
         features.day_of_week = target_time.weekday()
         features.is_weekend = target_time.weekday() >= 5
 
-        # 查询最近的健康数据
-        query = select(HealthData).where(
-            HealthData.user_id == user_id,
-            HealthData.recorded_at >= target_time - timedelta(days=1),
-            HealthData.recorded_at <= target_time
-        ).order_by(HealthData.recorded_at.desc())
-
-        result = await db.execute(query)
-        health_data_list = result.scalars().all()
-
-        # 提取各类特征
-        for data in health_data_list:
-            if data.data_type == HealthDataType.SLEEP_DURATION:
-                features.sleep_duration = data.value
-            elif data.data_type == HealthDataType.SLEEP_QUALITY:
-                features.sleep_quality = data.value
-            elif data.data_type == HealthDataType.HRV:
-                features.hrv = data.value
-            elif data.data_type == HealthDataType.HEART_RATE_RESTING:
-                features.resting_heart_rate = data.value
-            elif data.data_type == HealthDataType.STEPS:
-                features.steps = int(data.value)
-            elif data.data_type == HealthDataType.EXERCISE_MINUTES:
-                features.exercise_minutes = int(data.value)
-            elif data.data_type == HealthDataType.ACTIVE_ENERGY:
-                features.active_energy = data.value
-            elif data.data_type == HealthDataType.ENERGY_LEVEL:
-                features.subjective_energy = data.value
-            elif data.data_type == HealthDataType.STRESS_LEVEL:
-                features.stress_level = data.value
-            elif data.data_type == HealthDataType.MOOD:
-                features.mood = data.value
-
-        # 计算睡眠负债 (理想睡眠8小时)
-        features.sleep_debt = max(0, 8.0 - features.sleep_duration)
-
-        # 计算历史平均精力
-        features.avg_energy_7d = await self._get_avg_energy(user_id, db, days=7)
-        features.avg_energy_30d = await self._get_avg_energy(user_id, db, days=30)
+        # 健康特征和历史均值来自特征向量(一行), 不再扫描原始数据
+        vector = await get_feature_vector(db, user_id)
+        _apply_feature_vector(features, vector, target_time)
 
         # 提取环境数据
         from app.models.energy import EnvironmentData
@@ -278,31 +493,30 @@ class EnergyPredictionModel:
 
         return features
 
-    async def _get_avg_energy(
-        self,
-        user_id: str,
-        db: AsyncSession,
-        days: int
-    ) -> float:
-        """获取过去N天的平均精力"""
-        query = select(func.avg(HealthData.value)).where(
-            HealthData.user_id == user_id,
-            HealthData.data_type == HealthDataType.ENERGY_LEVEL,
-            HealthData.recorded_at >= datetime.utcnow() - timedelta(days=days)
-        )
-
-        result = await db.execute(query)
-        avg = result.scalar()
-
-        return float(avg) if avg else 5.0  # 默认中等精力
-
     def _calculate_energy_score(
         self,
         features: HealthFeatures,
         is_future: bool = False
     ) -> Tuple[float, Dict[str, float]]:
         """
-        计算精力分数（1-10分）
+        计算单个时间点的精力分数（1-10分）
+
+        Returns:
+            (分数, 各因素得分)
+        """
+        scores, factor_arrays = self._calculate_energy_scores([features], is_future)
+        return (
+            float(scores[0]),
+            {name: float(values[0]) for name, values in factor_arrays.items()}
+        )
+
+    def _calculate_energy_scores(
+        self,
+        features_list: Sequence[HealthFeatures],
+        is_future: bool = False
+    ) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        向量化计算多个时间点的精力分数（1-10分）
 
         基于规则的评分算法:
         1. 基础分数: 5分
@@ -311,155 +525,142 @@ class EnergyPredictionModel:
         4. 活动因素: ±1分
         5. 时间因素: ±2分
         6. 主观因素: ±1分
+
+        Args:
+            features_list: 各时间点的特征
+            is_future: 是否未来预测
+
+        Returns:
+            (分数数组, {因素名: 得分数组}), 数组顺序与features_list一致
         """
-        base_score = 5.0
-        factors = {}
+        weather_scores = np.array(
+            [_weather_score(features.weather) for features in features_list],
+            dtype=np.float64
+        )
+        return self._score_feature_arrays(_feature_arrays(features_list), weather_scores)
 
-        # 1. 睡眠因素 (权重最大: ±3分)
-        sleep_score = 0.0
-        if features.sleep_duration > 0:
-            # 理想睡眠7-9小时
-            if 7 <= features.sleep_duration <= 9:
-                sleep_score = 2.0
-            elif 6 <= features.sleep_duration < 7 or 9 < features.sleep_duration <= 10:
-                sleep_score = 1.0
-            elif features.sleep_duration < 6:
-                sleep_score = -2.0 - (6 - features.sleep_duration) * 0.5
-            else:  # >10小时
-                sleep_score = -1.0
-
-            # 睡眠质量加成
-            if features.sleep_quality > 0:
-                quality_bonus = (features.sleep_quality - 50) / 50  # -1到+1
-                sleep_score += quality_bonus
-
-        sleep_score = max(-3, min(3, sleep_score))
-        factors['sleep'] = sleep_score
+    def _score_feature_arrays(
+        self,
+        f: Dict[str, np.ndarray],
+        weather_scores: np.ndarray
+    ) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        按特征列数组评分
 
-        # 2. 生理因素 (±1分)
-        physio_score = 0.0
-        if features.hrv > 0:
-            # HRV越高越好 (假设正常范围20-100ms)
-            hrv_normalized = (features.hrv - 60) / 40  # -1到+1
-            physio_score += hrv_normalized * 0.5
+        Args:
+            f: {特征名: 数组}, 各数组长度相同
+            weather_scores: 天气因素得分数组
 
-        if features.resting_heart_rate > 0:
-            # 静息心率越低越好 (正常范围50-100)
-            hr_normalized = (75 - features.resting_heart_rate) / 25
-            physio_score += hr_normalized * 0.5
+        Returns:
+            (分数数组, {因素名: 得分数组})
+        """
+        factors: Dict[str, np.ndarray] = {}
+
+        # 1. 睡眠因素 (权重最大: ±3分), 理想睡眠7-9小时
+        sleep = f["sleep_duration"]
+        sleep_score = np.select(
+            [
+                (sleep >= 7) & (sleep <= 9),
+                ((sleep >= 6) & (sleep < 7)) | ((sleep > 9) & (sleep <= 10)),
+                sleep < 6
+            ],
+            [2.0, 1.0, -2.0 - (6 - sleep) * 0.5],
+            default=-1.0  # >10小时
+        )
+        # 睡眠质量加成 (-1到+1)
+        quality = f["sleep_quality"]
+        sleep_score += np.where(quality > 0, (quality - 50) / 50, 0.0)
+        sleep_score = np.where(sleep > 0, sleep_score, 0.0)
+        factors['sleep'] = np.clip(sleep_score, -3, 3)
 
-        physio_score = max(-1, min(1, physio_score))
-        factors['physiology'] = physio_score
+        # 2. 生理因素 (±1分)
+        # HRV越高越好 (假设正常范围20-100ms), 静息心率越低越好 (正常范围50-100)
+        hrv = f["hrv"]
+        resting_hr = f["resting_heart_rate"]
+        physio_score = (
+            np.where(hrv > 0, (hrv - 60) / 40 * 0.5, 0.0)
+            + np.where(resting_hr > 0, (75 - resting_hr) / 25 * 0.5, 0.0)
+        )
+        factors['physiology'] = np.clip(physio_score, -1, 1)
 
         # 3. 活动因素 (±1分)
-        activity_score = 0.0
-        if features.exercise_minutes > 0:
-            # 适度运动是好的
-            if 20 <= features.exercise_minutes <= 60:
-                activity_score = 0.5
-            elif features.exercise_minutes > 60:
-                # 过度运动可能疲劳
-                activity_score = 0.5 - (features.exercise_minutes - 60) / 120
-
-        if features.steps > 0:
-            # 步数目标8000-12000
-            if 8000 <= features.steps <= 12000:
-                activity_score += 0.5
-            elif features.steps < 8000:
-                activity_score += (features.steps / 8000) * 0.3
-
-        activity_score = max(-1, min(1, activity_score))
-        factors['activity'] = activity_score
+        # 适度运动是好的, 过度运动可能疲劳; 步数目标8000-12000
+        exercise = f["exercise_minutes"]
+        steps = f["steps"]
+        activity_score = np.select(
+            [(exercise >= 20) & (exercise <= 60), exercise > 60],
+            [0.5, 0.5 - (exercise - 60) / 120],
+            default=0.0
+        )
+        activity_score += np.select(
+            [(steps >= 8000) & (steps <= 12000), (steps > 0) & (steps < 8000)],
+            [0.5, steps / 8000 * 0.3],
+            default=0.0
+        )
+        factors['activity'] = np.clip(activity_score, -1, 1)
 
         # 4. 时间因素 (±2分) - 自然昼夜节律
-        time_score = 0.0
-        hour = features.hour_of_day
-
-        if 6 <= hour <= 11:  # 早晨精力上升
-            time_score = 1.5
-        elif 12 <= hour <= 14:  # 午后微降
-            time_score = 0.5
-        elif 15 <= hour <= 18:  # 下午恢复
-            time_score = 1.0
-        elif 19 <= hour <= 22:  # 晚上下降
-            time_score = -0.5
-        else:  # 深夜/凌晨
-            time_score = -2.0
-
+        hour = f["hour_of_day"]
+        time_score = np.select(
+            [
+                (hour >= 6) & (hour <= 11),   # 早晨精力上升
+                (hour >= 12) & (hour <= 14),  # 午后微降
+                (hour >= 15) & (hour <= 18),  # 下午恢复
+                (hour >= 19) & (hour <= 22)   # 晚上下降
+            ],
+            [1.5, 0.5, 1.0, -0.5],
+            default=-2.0  # 深夜/凌晨
+        )
         # 周末精力可能更高
-        if features.is_weekend:
-            time_score += 0.5
-
-        time_score = max(-2, min(2, time_score))
-        factors['time_of_day'] = time_score
+        time_score += np.where(f["is_weekend"], 0.5, 0.0)
+        factors['time_of_day'] = np.clip(time_score, -2, 2)
 
         # 5. 主观因素 (±1分)
-        subjective_score = 0.0
-        if features.subjective_energy > 0:
-            # 将1-10的主观评分转换为-1到+1
-            subjective_score = (features.subjective_energy - 5.5) / 4.5
-
-        if features.stress_level > 0:
-            # 压力越高，精力越低
-            stress_impact = -(features.stress_level - 50) / 50 * 0.5
-            subjective_score += stress_impact
-
-        subjective_score = max(-1, min(1, subjective_score))
-        factors['subjective'] = subjective_score
-
-        # 6. 历史趋势 (±0.5分)
-        trend_score = 0.0
-        if features.avg_energy_7d > 0:
-            # 相对于历史平均的偏差
-            trend_score = (features.avg_energy_7d - 5) / 10
+        # 将1-10的主观评分转换为-1到+1; 压力越高，精力越低
+        subjective = f["subjective_energy"]
+        stress = f["stress_level"]
+        subjective_score = (
+            np.where(subjective > 0, (subjective - 5.5) / 4.5, 0.0)
+            + np.where(stress > 0, -(stress - 50) / 50 * 0.5, 0.0)
+        )
+        factors['subjective'] = np.clip(subjective_score, -1, 1)
 
-        trend_score = max(-0.5, min(0.5, trend_score))
-        factors['trend'] = trend_score
+        # 6. 历史趋势 (±0.5分): 相对于历史平均的偏差
+        avg_7d = f["avg_energy_7d"]
+        factors['trend'] = np.clip(np.where(avg_7d > 0, (avg_7d - 5) / 10, 0.0), -0.5, 0.5)
 
         # 7. 环境因素 (±1分)
-        environment_score = 0.0
-
-        # 温度影响 (舒适温度18-25°C)
-        if features.temperature > 0:
-            if 18 <= features.temperature <= 25:
-                environment_score += 0.3
-            elif features.temperature < 10 or features.temperature > 32:
-                environment_score -= 0.3
-            elif features.temperature < 18 or features.temperature > 25:
-                environment_score -= 0.1
-
-        # 湿度影响 (舒适湿度40-70%)
-        if features.humidity > 0:
-            if 40 <= features.humidity <= 70:
-                environment_score += 0.2
-            elif features.humidity < 30 or features.humidity > 80:
-                environment_score -= 0.2
-
-        # 空气质量影响 (AQI < 50优秀, >150不健康)
-        if features.air_quality > 0:
-            if features.air_quality < 50:
-                environment_score += 0.3
-            elif features.air_quality > 150:
-                environment_score -= 0.4
-            elif features.air_quality > 100:
-                environment_score -= 0.2
-
-        # 天气状况影响
-        if features.weather:
-            weather_lower = features.weather.lower()
-            if any(w in weather_lower for w in ['晴', 'clear', 'sunny']):
-                environment_score += 0.2
-            elif any(w in weather_lower for w in ['雨', 'rain', 'storm']):
-                environment_score -= 0.1
-
-        environment_score = max(-1, min(1, environment_score))
-        factors['environment'] = environment_score
-
-        # 计算最终分数
-        total_score = base_score + sum(factors.values())
-
-        # 限制在1-10范围
-        total_score = max(1, min(10, total_score))
+        # 温度(舒适18-25°C)、湿度(舒适40-70%)、空气质量(AQI < 50优秀, >150不健康)
+        temperature = f["temperature"]
+        humidity = f["humidity"]
+        air_quality = f["air_quality"]
+        environment_score = np.select(
+            [
+                (temperature >= 18) & (temperature <= 25),
+                (temperature > 0) & ((temperature < 10) | (temperature > 32)),
+                (temperature > 0) & ((temperature < 18) | (temperature > 25))
+            ],
+            [0.3, -0.3, -0.1],
+            default=0.0
+        )
+        environment_score += np.select(
+            [
+                (humidity >= 40) & (humidity <= 70),
+                (humidity > 0) & ((humidity < 30) | (humidity > 80))
+            ],
+            [0.2, -0.2],
+            default=0.0
+        )
+        environment_score += np.select(
+            [(air_quality > 0) & (air_quality < 50), air_quality > 150, air_quality > 100],
+            [0.3, -0.4, -0.2],
+            default=0.0
+        )
+        environment_score += weather_scores
+        factors['environment'] = np.clip(environment_score, -1, 1)
+
+        # 计算最终分数, 限制在1-10范围
+        total_score = np.clip(5.0 + sum(factors.values()), 1, 10)
 
         return total_score, factors
 
@@ -606,6 +807,134 @@ class EnergyPredictionModel:
         return str(prediction_record.id)
 
 
+# 特征向量中的最新值只在该时间范围内有效(与原先查询最近1天数据的口径一致)
+FEATURE_MAX_AGE = timedelta(days=1)
+_INT_FEATURES = {"steps", "exercise_minutes"}
+
+# 批量写入energy_predictions的列(顺序即COPY记录字段顺序)
+PREDICTION_COPY_COLUMNS = (
+    "id", "user_id", "predicted_at", "target_time", "energy_level",
+    "energy_score", "confidence", "factors", "recommendations", "model_version"
+)
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """统一为不带时区的UTC时间(与datetime.utcnow()一致)"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def energy_level_values(scores: np.ndarray) -> np.ndarray:
+    """按分数数组分类精力等级(与_classify_energy_level一致), 返回等级值数组"""
+    return np.select(
+        [scores >= 7, scores >= 4],
+        [EnergyLevel.HIGH.value, EnergyLevel.MEDIUM.value],
+        default=EnergyLevel.LOW.value
+    )
+
+
+def prediction_copy_records(
+    user_ids: List[uuid.UUID],
+    times: List[datetime],
+    scores: np.ndarray,
+    factor_matrix: Dict[str, np.ndarray],
+    confidence: np.ndarray,
+    recommendations: List[List[str]],
+    predicted_at: datetime,
+    model_version: str
+) -> List[Tuple]:
+    """
+    (用户 × 时间点)矩阵 -> energy_predictions的COPY记录(字段顺序见PREDICTION_COPY_COLUMNS)
+
+    按用户逐行展开, 只有每个用户的第一个时间点带建议
+    """
+    predicted_at = predicted_at.replace(tzinfo=timezone.utc)
+    target_times = [t.replace(tzinfo=timezone.utc) for t in times]
+    empty = json.dumps([])
+
+    factor_names = list(factor_matrix)
+    factor_values = np.stack([factor_matrix[name] for name in factor_names], axis=-1).tolist()
+    levels = energy_level_values(scores).tolist()
+    score_values = scores.tolist()
+    confidence_values = confidence.tolist()
+
+    records = []
+    for i, user_id in enumerate(user_ids):
+        first = json.dumps(recommendations[i], ensure_ascii=False)
+        for j, target_time in enumerate(target_times):
+            records.append((
+                uuid.uuid4(),
+                user_id,
+                predicted_at,
+                target_time,
+                levels[i][j],
+                score_values[i][j],
+                confidence_values[i][j],
+                json.dumps(dict(zip(factor_names, factor_values[i][j]))),
+                first if j == 0 else empty,
+                model_version
+            ))
+    return records
+
+
+def _apply_feature_vector(
+    features: HealthFeatures,
+    vector: Optional[HealthFeatureVector],
+    as_of: datetime
+) -> None:
+    """
+    把特征向量填入特征, 并计算睡眠负债
+
+    最新值的采集时间须在[as_of - FEATURE_MAX_AGE, as_of]内; 没有均值时按中等精力(5.0)处理
+    """
+    if vector is not None:
+        as_of = as_of if as_of.tzinfo else as_of.replace(tzinfo=timezone.utc)
+        for name in FEATURE_FIELDS.values():
+            value = getattr(vector, name)
+            recorded_at = getattr(vector, f"{name}_at")
+            if value is None or recorded_at is None:
+                continue
+            if as_of - FEATURE_MAX_AGE <= recorded_at <= as_of:
+                setattr(features, name, int(value) if name in _INT_FEATURES else value)
+
+    avg_7d = vector.avg_energy_7d if vector is not None else None
+    avg_30d = vector.avg_energy_30d if vector is not None else None
+    features.avg_energy_7d = float(avg_7d) if avg_7d else 5.0  # 默认中等精力
+    features.avg_energy_30d = float(avg_30d) if avg_30d else 5.0
+
+    # 计算睡眠负债 (理想睡眠8小时)
+    features.sleep_debt = max(0, 8.0 - features.sleep_duration)
+
+
+# 参与评分的数值特征(weather为字符串, 单独处理)
+_NUMERIC_FEATURES = tuple(f.name for f in fields(HealthFeatures) if f.name != "weather")
+
+
+def _feature_arrays(features_list: Sequence[HealthFeatures]) -> Dict[str, np.ndarray]:
+    """把特征列表转换为按特征名的列数组"""
+    return {
+        name: np.fromiter(
+            (getattr(features, name) for features in features_list),
+            dtype=np.float64,
+            count=len(features_list)
+        )
+        for name in _NUMERIC_FEATURES
+    }
+
+
+def _weather_score(weather: str) -> float:
+    """天气状况对精力的影响"""
+    if not weather:
+        return 0.0
+    weather_lower = weather.lower()
+    if any(w in weather_lower for w in ['晴', 'clear', 'sunny']):
+        return 0.2
+    if any(w in weather_lower for w in ['雨', 'rain', 'storm']):
+        return -0.1
+    return 0.0
+
+
 # 全局单例
 _energy_prediction_model: Optional[EnergyPredictionModel] = None
 
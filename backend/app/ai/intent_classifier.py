@@ -14,11 +14,14 @@ from typing import Optional, Dict, List
 from datetime import datetime
 from dataclasses import dataclass, field
 
+import numpy as np
 from sentence_transformers import SentenceTransformer, util
 import torch
 
 # Import IntentType and IntentClassification from orchestrator
 from app.ai.orchestrator import IntentType, IntentClassification
+from app.ai.embedding_cache import get_embedding_cache
+from app.ai.embedding_service import get_embedding_service
 
 logger = logging.getLogger(__name__)
 
@@ -163,6 +166,7 @@ class IntentClassifier:
                     None,
                     self._load_model_sync
                 )
+                get_embedding_service().bind_model(self.model)
 
                 # 预计算所有模板的嵌入
                 await self._precompute_template_embeddings()
@@ -184,16 +188,12 @@ class IntentClassifier:
         """预计算所有意图模板的嵌入向量"""
         logger.info("🔄 Precomputing template embeddings...")
 
-        loop = asyncio.get_event_loop()
+        embedding_service = get_embedding_service()
 
         for intent_type, template in self.intent_templates.items():
-            # 在线程池中编码
-            embeddings = await loop.run_in_executor(
-                None,
-                lambda examples=template.examples: self.model.encode(
-                    examples,
-                    convert_to_tensor=True
-                )
+            # 在嵌入服务的专用线程池中整批编码
+            embeddings = torch.from_numpy(
+                await embedding_service.encode_many(template.examples)
             )
 
             self.template_embeddings[intent_type] = embeddings
@@ -201,6 +201,28 @@ class IntentClassifier:
 
         logger.info(f"✅ Precomputed {len(self.template_embeddings)} intent embeddings")
 
+    async def embed(self, text: str) -> np.ndarray:
+        """
+        获取文本嵌入向量
+
+        通过共享的EmbeddingCache编码, 同一条消息在意图分类、
+        响应缓存查询和写入之间只编码一次
+
+        Args:
+            text: 待编码文本
+
+        Returns:
+            嵌入向量(numpy, 只读)
+        """
+        if not self.is_loaded:
+            await self._load_model()
+
+        return await get_embedding_cache().get_or_compute(text, self._encode)
+
+    async def _encode(self, text: str) -> np.ndarray:
+        """经嵌入服务编码单条文本(与并发请求合并成批)"""
+        return await get_embedding_service().encode(text)
+
     def _classify_simple_intents(self, message: str) -> Optional[IntentClassification]:
         """
         快速规则匹配 (适用于简单意图)
@@ -267,12 +289,9 @@ class IntentClassifier:
         if not self.is_loaded:
             await self._load_model()
 
-        # 编码用户消息
-        loop = asyncio.get_event_loop()
-        message_embedding = await loop.run_in_executor(
-            None,
-            lambda: self.model.encode(message, convert_to_tensor=True)
-        )
+        # 编码用户消息(与响应缓存共享同一次编码)
+        message_vector = await self.embed(message)
+        message_embedding = torch.from_numpy(message_vector.copy())
 
         # 计算与每个意图模板的相似度
         best_intent = None
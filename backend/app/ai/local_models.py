@@ -5,17 +5,100 @@
 
 import asyncio
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterator, List
 from datetime import datetime
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
-from threading import Thread
+from transformers import (
+    AutoTokenizer,
+    AutoModelForCausalLM,
+    DynamicCache,
+    StoppingCriteria,
+    StoppingCriteriaList,
+    TextStreamer,
+)
+from threading import Thread, Event
+from dataclasses import dataclass
 
 from app.core.config import settings
+from app.ai.batch_scheduler import BatchScheduler
 
 logger = logging.getLogger(__name__)
 
 
+def _patch_dynamic_cache() -> None:
+    """
+    DynamicCache兼容性补丁
+
+    Phi-3.5的remote code(trust_remote_code=True)仍在调用旧版transformers的
+    DynamicCache接口(seen_tokens / get_max_length / get_usable_length),
+    新版transformers已移除这些接口, 开启use_cache时会抛AttributeError。
+    这里按新接口补齐缺失的方法, 已存在的方法保持不动。
+    """
+    if not hasattr(DynamicCache, "seen_tokens"):
+        DynamicCache.seen_tokens = property(lambda self: self.get_seq_length())
+
+    if not hasattr(DynamicCache, "get_max_length"):
+        def get_max_length(self) -> Optional[int]:
+            # DynamicCache不限长度
+            if hasattr(self, "get_max_cache_shape"):
+                max_shape = self.get_max_cache_shape()
+                return max_shape if max_shape and max_shape > 0 else None
+            return None
+
+        DynamicCache.get_max_length = get_max_length
+
+    if not hasattr(DynamicCache, "get_usable_length"):
+        def get_usable_length(self, new_seq_length: int, layer_idx: int = 0) -> int:
+            max_length = self.get_max_length()
+            previous_seq_length = self.get_seq_length(layer_idx)
+            if max_length is not None and previous_seq_length + new_seq_length > max_length:
+                return max_length - new_seq_length
+            return previous_seq_length
+
+        DynamicCache.get_usable_length = get_usable_length
+
+
+class _AsyncTextStreamer(TextStreamer):
+    """
+    把generate线程解码出的文本片段投递到事件循环中的asyncio.Queue
+
+    流结束时投递None, 生成线程异常时投递异常对象
+    """
+
+    def __init__(self, tokenizer, loop: asyncio.AbstractEventLoop, **decode_kwargs):
+        super().__init__(tokenizer, skip_prompt=True, **decode_kwargs)
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    def put_item(self, item: Any) -> None:
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+
+    def on_finalized_text(self, text: str, stream_end: bool = False) -> None:
+        if text:
+            self.put_item(text)
+        if stream_end:
+            self.put_item(None)
+
+
+@dataclass
+class _GenerationRequest:
+    """批处理中的单个生成请求"""
+    prompt: str
+    max_new_tokens: int
+    temperature: float
+    top_p: float
+
+
+class _CancelCriteria(StoppingCriteria):
+    """调用方取消(如客户端断开)时提前结束生成"""
+
+    def __init__(self, cancel_event: Event):
+        self.cancel_event = cancel_event
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.cancel_event.is_set()
+
+
 class LocalModelManager:
     """
     本地Phi-3.5模型管理器
@@ -39,6 +122,14 @@ class LocalModelManager:
         self.inference_count = 0
         self.total_inference_time = 0.0
 
+        # 动态批处理: 并发请求合并成一次batched generate
+        self.batch_scheduler = BatchScheduler(
+            run_batch=self._run_batch,
+            max_batch_size=settings.LOCAL_MODEL_BATCH_MAX_SIZE,
+            max_wait_ms=settings.LOCAL_MODEL_BATCH_MAX_WAIT_MS,
+            name="phi-3.5"
+        )
+
         logger.info(f"🧠 LocalModelManager initialized (device: {self.device})")
 
     def _detect_device(self) -> str:
@@ -93,6 +184,9 @@ class LocalModelManager:
 
     def _load_model_sync(self) -> None:
         """同步加载模型（在线程池中执行）"""
+        # 开启KV cache前先补齐DynamicCache旧接口
+        _patch_dynamic_cache()
+
         # 加载tokenizer
         self.tokenizer = AutoTokenizer.from_pretrained(
             self.model_name,
@@ -108,6 +202,11 @@ class LocalModelManager:
             low_cpu_mem_usage=True  # 优化CPU内存使用
         )
 
+        # 批量生成时使用左填充, 保证各序列的新token对齐在末尾
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
         # 设置为评估模式
         self.model.eval()
 
@@ -141,17 +240,29 @@ class LocalModelManager:
             # 构建Phi-3.5的对话格式
             formatted_prompt = self._format_phi3_prompt(prompt)
 
-            # 在线程池中执行推理
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                self._generate_sync,
-                formatted_prompt,
-                max_new_tokens,
-                temperature,
-                top_p,
-                kwargs
-            )
+            if kwargs:
+                # 带额外generate参数的请求无法与其他请求合并, 单独执行
+                loop = asyncio.get_event_loop()
+                response = await loop.run_in_executor(
+                    None,
+                    self._generate_sync,
+                    formatted_prompt,
+                    max_new_tokens,
+                    temperature,
+                    top_p,
+                    kwargs
+                )
+            else:
+                # 交给批处理调度器, 采样参数相同的请求合并执行
+                response = await self.batch_scheduler.submit(
+                    _GenerationRequest(
+                        prompt=formatted_prompt,
+                        max_new_tokens=max_new_tokens,
+                        temperature=temperature,
+                        top_p=top_p
+                    ),
+                    key=(temperature, top_p)
+                )
 
             # 更新性能指标
             inference_time = (datetime.now() - start_time).total_seconds()
@@ -187,25 +298,12 @@ class LocalModelManager:
     ) -> str:
         """同步生成（在线程池中执行）"""
         # Tokenize
-        inputs = self.tokenizer(
-            prompt,
-            return_tensors="pt",
-            truncation=True,
-            max_length=2048  # Phi-3.5上下文长度
-        ).to(self.device)
+        inputs = self._tokenize(prompt)
 
         # Generate
         with torch.no_grad():
             outputs = self.model.generate(
-                **inputs,
-                max_new_tokens=max_new_tokens,
-                temperature=temperature,
-                top_p=top_p,
-                do_sample=True,
-                pad_token_id=self.tokenizer.eos_token_id,
-                eos_token_id=self.tokenizer.eos_token_id,
-                use_cache=False,  # 禁用cache以避免DynamicCache兼容性问题
-                **kwargs
+                **self._build_generate_kwargs(inputs, max_new_tokens, temperature, top_p, kwargs)
             )
 
         # Decode
@@ -216,19 +314,166 @@ class LocalModelManager:
 
         return generated_text
 
+    async def _run_batch(self, requests: List[_GenerationRequest]) -> List[str]:
+        """批处理调度器回调: 在线程池中执行一次batched generate"""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self._generate_batch_sync, requests)
+
+    def _generate_batch_sync(self, requests: List[_GenerationRequest]) -> List[str]:
+        """
+        同步批量生成（在线程池中执行）
+
+        同一批请求的temperature/top_p相同; max_new_tokens取批内最大值,
+        解码时再按各请求自己的上限截断
+        """
+        inputs = self.tokenizer(
+            [request.prompt for request in requests],
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=2048  # Phi-3.5上下文长度
+        ).to(self.device)
+
+        max_new_tokens = max(request.max_new_tokens for request in requests)
+
+        with torch.no_grad():
+            outputs = self.model.generate(
+                **self._build_generate_kwargs(
+                    inputs,
+                    max_new_tokens,
+                    requests[0].temperature,
+                    requests[0].top_p,
+                    {}
+                )
+            )
+
+        # 左填充后所有序列的prompt长度一致
+        prompt_length = inputs["input_ids"].shape[1]
+        return [
+            self.tokenizer.decode(
+                outputs[i][prompt_length:prompt_length + request.max_new_tokens],
+                skip_special_tokens=True
+            )
+            for i, request in enumerate(requests)
+        ]
+
+    def _tokenize(self, prompt: str):
+        """Tokenize并移动到推理设备"""
+        return self.tokenizer(
+            prompt,
+            return_tensors="pt",
+            truncation=True,
+            max_length=2048  # Phi-3.5上下文长度
+        ).to(self.device)
+
+    def _build_generate_kwargs(
+        self,
+        inputs,
+        max_new_tokens: int,
+        temperature: float,
+        top_p: float,
+        kwargs: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """构建model.generate参数(同步生成和流式生成共用)"""
+        return {
+            **inputs,
+            "max_new_tokens": max_new_tokens,
+            "temperature": temperature,
+            "top_p": top_p,
+            "do_sample": True,
+            "pad_token_id": self.tokenizer.eos_token_id,
+            "eos_token_id": self.tokenizer.eos_token_id,
+            # 开启KV cache, 避免每步重算全部前缀(解码从O(n²)降到O(n))
+            "use_cache": True,
+            **kwargs
+        }
+
+    def _generate_stream_sync(
+        self,
+        generate_kwargs: Dict[str, Any],
+        streamer: _AsyncTextStreamer
+    ) -> None:
+        """流式生成线程入口, 文本片段通过streamer投递"""
+        try:
+            with torch.no_grad():
+                self.model.generate(**generate_kwargs, streamer=streamer)
+        except Exception as e:
+            streamer.put_item(e)
+
     async def generate_stream(
         self,
         prompt: str,
         max_new_tokens: int = 512,
         temperature: float = 0.7,
         top_p: float = 0.9,
-    ):
+    ) -> AsyncIterator[str]:
         """
-        流式生成（暂未实现）
-        用于未来支持流式响应
+        流式生成
+
+        model.generate在后台线程中运行(开启KV cache), 通过TextStreamer
+        回调把解码出的文本片段送回事件循环, 逐段产出
+
+        Args:
+            prompt: 输入提示词
+            max_new_tokens: 最大生成token数
+            temperature: 温度参数
+            top_p: nucleus sampling参数
+
+        Yields:
+            生成的文本片段
         """
-        # TODO: 实现流式生成
-        raise NotImplementedError("Streaming not implemented yet")
+        if not self.is_loaded:
+            await self.load_model()
+
+        start_time = datetime.now()
+        loop = asyncio.get_running_loop()
+
+        formatted_prompt = self._format_phi3_prompt(prompt)
+        inputs = await loop.run_in_executor(None, self._tokenize, formatted_prompt)
+
+        streamer = _AsyncTextStreamer(self.tokenizer, loop, skip_special_tokens=True)
+        cancel_event = Event()
+        generate_kwargs = self._build_generate_kwargs(
+            inputs,
+            max_new_tokens,
+            temperature,
+            top_p,
+            {"stopping_criteria": StoppingCriteriaList([_CancelCriteria(cancel_event)])}
+        )
+
+        thread = Thread(
+            target=self._generate_stream_sync,
+            args=(generate_kwargs, streamer),
+            daemon=True
+        )
+        thread.start()
+
+        first_token_time = None
+        try:
+            while True:
+                item = await streamer.queue.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    logger.error(f"❌ Streaming inference failed: {item}")
+                    raise RuntimeError(f"Inference failed: {item}")
+
+                if first_token_time is None:
+                    first_token_time = datetime.now()
+                yield item
+        finally:
+            # 调用方提前退出时通知生成线程停止
+            cancel_event.set()
+
+        inference_time = (datetime.now() - start_time).total_seconds()
+        self.inference_count += 1
+        self.total_inference_time += inference_time
+
+        ttft_ms = (first_token_time - start_time).total_seconds() * 1000 if first_token_time else 0
+        logger.info(
+            f"⚡ Streaming inference #{self.inference_count}: {inference_time*1000:.0f}ms "
+            f"(first token: {ttft_ms:.0f}ms)"
+        )
 
     def get_stats(self) -> Dict[str, Any]:
         """获取性能统计"""
@@ -246,6 +491,7 @@ class LocalModelManager:
             "inference_count": self.inference_count,
             "total_time": round(self.total_inference_time, 2),
             "avg_inference_time_ms": round(avg_time * 1000, 0),
+            "batching": self.batch_scheduler.get_stats(),
             "memory_allocated_gb": (
                 round(torch.cuda.memory_allocated() / 1024**3, 2)
                 if self.device == "cuda" else None
@@ -259,6 +505,8 @@ class LocalModelManager:
 
         logger.info("🗑️  Unloading Phi-3.5 model")
 
+        await self.batch_scheduler.shutdown()
+
         self.model = None
         self.tokenizer = None
         self.is_loaded = False
@@ -5,7 +5,7 @@ AI Orchestrator - 智能路由核心
 """
 
 from enum import Enum
-from typing import Optional, Tuple, List, Dict, Any
+from typing import Optional, Tuple, List, Dict, Any, AsyncIterator
 from dataclasses import dataclass
 import asyncio
 from loguru import logger
@@ -61,6 +61,14 @@ class AIResponse:
     finish_reason: Optional[str] = None  # 完成原因
 
 
+@dataclass
+class AIStreamChunk:
+    """AI流式响应片段"""
+    content: str = ""  # 增量文本
+    tokens_used: Optional[int] = None  # 使用的token数(仅最后一个片段)
+    finish_reason: Optional[str] = None  # 完成原因(仅最后一个片段)
+
+
 class AIOrchestrator:
     """
     AI编排器
@@ -306,13 +314,7 @@ class AIOrchestrator:
         """
         await self._lazy_load_clients()
 
-        # 构建消息列表
-        if messages is None:
-            messages = []
-            if conversation_history:
-                messages.extend(conversation_history)
-            if user_message:
-                messages.append({"role": "user", "content": user_message})
+        messages = self._build_messages(messages, user_message, conversation_history)
 
         if provider == AIProvider.LOCAL_PHI:
             content = await self._generate_local(messages, system_prompt, max_tokens)
@@ -331,18 +333,72 @@ class AIOrchestrator:
         else:
             raise ValueError(f"Unsupported provider: {provider}")
 
-    async def _generate_local(
+    async def generate_response_stream(
         self,
-        messages: List[Dict],
-        system_prompt: Optional[str],
-        max_tokens: int
-    ) -> str:
-        """使用本地Phi-3.5模型生成"""
-        from app.ai.local_models import get_local_model_manager
+        provider: AIProvider,
+        messages: List[Dict[str, str]] = None,
+        system_prompt: Optional[str] = None,
+        user_message: Optional[str] = None,
+        conversation_history: Optional[List[Dict]] = None,
+        max_tokens: int = 2000,
+        temperature: float = 0.7,
+        tools: Optional[List[Dict]] = None,
+        user_id: Optional["UUID"] = None,
+        db: Optional["AsyncSession"] = None
+    ) -> AsyncIterator[AIStreamChunk]:
+        """
+        流式生成AI响应
+        参数与generate_response一致,逐段产出增量文本
 
-        local_manager = get_local_model_manager()
+        最后一个片段的content为空,携带tokens_used和finish_reason
+
+        Yields:
+            AIStreamChunk: 响应片段
+        """
+        await self._lazy_load_clients()
+
+        messages = self._build_messages(messages, user_message, conversation_history)
+
+        if provider == AIProvider.LOCAL_PHI:
+            stream = self._stream_local(messages, system_prompt, max_tokens)
+
+        elif provider in [AIProvider.OPENAI_GPT5, AIProvider.OPENAI_GPT5_NANO]:
+            stream = self._stream_openai(provider, messages, system_prompt, max_tokens, temperature)
 
-        # 构建完整提示词
+        elif provider == AIProvider.CLAUDE_SONNET_4:
+            stream = self._stream_claude(
+                messages, system_prompt, max_tokens, temperature, tools, user_id, db
+            )
+
+        else:
+            raise ValueError(f"Unsupported provider: {provider}")
+
+        async for chunk in stream:
+            yield chunk
+
+    def _build_messages(
+        self,
+        messages: Optional[List[Dict[str, str]]],
+        user_message: Optional[str],
+        conversation_history: Optional[List[Dict]]
+    ) -> List[Dict]:
+        """构建消息列表(messages优先,否则由历史和当前消息拼接)"""
+        if messages is not None:
+            return messages
+
+        messages = []
+        if conversation_history:
+            messages.extend(conversation_history)
+        if user_message:
+            messages.append({"role": "user", "content": user_message})
+        return messages
+
+    def _build_local_prompt(
+        self,
+        messages: List[Dict],
+        system_prompt: Optional[str]
+    ) -> str:
+        """构建本地模型的完整提示词"""
         prompt_parts = []
 
         # 添加系统提示
@@ -359,7 +415,20 @@ class AIOrchestrator:
             elif role == "assistant":
                 prompt_parts.append(f"助手: {content}")
 
-        full_prompt = "\n\n".join(prompt_parts)
+        return "\n\n".join(prompt_parts)
+
+    async def _generate_local(
+        self,
+        messages: List[Dict],
+        system_prompt: Optional[str],
+        max_tokens: int
+    ) -> str:
+        """使用本地Phi-3.5模型生成"""
+        from app.ai.local_models import get_local_model_manager
+
+        local_manager = get_local_model_manager()
+
+        full_prompt = self._build_local_prompt(messages, system_prompt)
 
         # 使用本地模型生成
         response = await local_manager.generate(
@@ -371,18 +440,39 @@ class AIOrchestrator:
 
         return response
 
-    async def _generate_openai(
+    async def _stream_local(
+        self,
+        messages: List[Dict],
+        system_prompt: Optional[str],
+        max_tokens: int
+    ) -> AsyncIterator[AIStreamChunk]:
+        """使用本地Phi-3.5模型流式生成"""
+        from app.ai.local_models import get_local_model_manager
+
+        local_manager = get_local_model_manager()
+
+        full_prompt = self._build_local_prompt(messages, system_prompt)
+
+        async for text in local_manager.generate_stream(
+            prompt=full_prompt,
+            max_new_tokens=max_tokens,
+            temperature=0.7,
+            top_p=0.9
+        ):
+            if text:
+                yield AIStreamChunk(content=text)
+
+        yield AIStreamChunk(finish_reason="stop")
+
+    def _build_openai_params(
         self,
         provider: AIProvider,
         messages: List[Dict],
         system_prompt: Optional[str],
         max_tokens: int,
         temperature: float
-    ) -> Tuple[str, int]:
-        """使用OpenAI生成,返回(content, tokens)"""
-        if not self.openai_client:
-            raise RuntimeError("OpenAI client not initialized")
-
+    ) -> Dict[str, Any]:
+        """构建OpenAI chat.completions请求参数"""
         model = settings.OPENAI_MODEL_MAIN if provider == AIProvider.OPENAI_GPT5 else settings.OPENAI_MODEL_MINI
 
         # 添加系统提示
@@ -391,16 +481,34 @@ class AIOrchestrator:
             full_messages.append({"role": "system", "content": system_prompt})
         full_messages.extend(messages)
 
+        # GPT-5系列使用max_completion_tokens，其他模型使用max_tokens
+        token_param = "max_completion_tokens" if model.startswith("gpt-5") else "max_tokens"
+
+        return {
+            "model": model,
+            "messages": full_messages,
+            token_param: max_tokens,
+            "temperature": temperature
+        }
+
+    async def _generate_openai(
+        self,
+        provider: AIProvider,
+        messages: List[Dict],
+        system_prompt: Optional[str],
+        max_tokens: int,
+        temperature: float
+    ) -> Tuple[str, int]:
+        """使用OpenAI生成,返回(content, tokens)"""
+        if not self.openai_client:
+            raise RuntimeError("OpenAI client not initialized")
+
+        params = self._build_openai_params(
+            provider, messages, system_prompt, max_tokens, temperature
+        )
+
         try:
-            # GPT-5系列使用max_completion_tokens，其他模型使用max_tokens
-            token_param = "max_completion_tokens" if model.startswith("gpt-5") else "max_tokens"
-
-            response = await self.openai_client.chat.completions.create(
-                model=model,
-                messages=full_messages,
-                **{token_param: max_tokens},
-                temperature=temperature
-            )
+            response = await self.openai_client.chat.completions.create(**params)
 
             content = response.choices[0].message.content
             tokens_used = response.usage.total_tokens if response.usage else None
@@ -411,6 +519,51 @@ class AIOrchestrator:
             logger.error(f"OpenAI API error: {e}")
             raise
 
+    async def _stream_openai(
+        self,
+        provider: AIProvider,
+        messages: List[Dict],
+        system_prompt: Optional[str],
+        max_tokens: int,
+        temperature: float
+    ) -> AsyncIterator[AIStreamChunk]:
+        """使用OpenAI流式生成,最后一个片段携带token用量"""
+        if not self.openai_client:
+            raise RuntimeError("OpenAI client not initialized")
+
+        params = self._build_openai_params(
+            provider, messages, system_prompt, max_tokens, temperature
+        )
+
+        tokens_used = None
+        finish_reason = None
+
+        try:
+            stream = await self.openai_client.chat.completions.create(
+                **params,
+                stream=True,
+                stream_options={"include_usage": True}  # 最后一个chunk返回usage
+            )
+
+            async for chunk in stream:
+                if chunk.usage:
+                    tokens_used = chunk.usage.total_tokens
+
+                if not chunk.choices:
+                    continue
+
+                choice = chunk.choices[0]
+                if choice.delta and choice.delta.content:
+                    yield AIStreamChunk(content=choice.delta.content)
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+
+        except Exception as e:
+            logger.error(f"OpenAI streaming error: {e}")
+            raise
+
+        yield AIStreamChunk(tokens_used=tokens_used, finish_reason=finish_reason)
+
     async def _generate_claude(
         self,
         messages: List[Dict],
@@ -448,53 +601,7 @@ class AIOrchestrator:
             if response.stop_reason == "tool_use":
                 logger.info("🔧 Tool use detected, processing...")
 
-                # 导入MCP工具执行器
-                from app.mcp import execute_tool
-                import json
-
-                # 收集所有工具调用结果
-                tool_results = []
-
-                for content_block in response.content:
-                    if content_block.type == "tool_use":
-                        tool_name = content_block.name
-                        tool_input = content_block.input
-                        tool_use_id = content_block.id
-
-                        logger.info(f"   Executing tool: {tool_name}")
-                        logger.debug(f"   Input: {tool_input}")
-
-                        try:
-                            # 执行工具
-                            result = await execute_tool(
-                                tool_name=tool_name,
-                                tool_input=tool_input,
-                                user_id=user_id,
-                                db=db
-                            )
-
-                            logger.info(f"   ✅ Tool executed: {tool_name}")
-
-                            # 添加工具结果
-                            tool_results.append({
-                                "type": "tool_result",
-                                "tool_use_id": tool_use_id,
-                                "content": json.dumps(result, ensure_ascii=False)
-                            })
-
-                        except Exception as e:
-                            logger.error(f"   ❌ Tool execution failed: {tool_name} - {e}")
-
-                            # 返回错误信息给Claude
-                            tool_results.append({
-                                "type": "tool_result",
-                                "tool_use_id": tool_use_id,
-                                "content": json.dumps({
-                                    "error": str(e),
-                                    "tool": tool_name
-                                }, ensure_ascii=False),
-                                "is_error": True
-                            })
+                tool_results = await self._execute_tool_calls(response, user_id, db)
 
                 # 将工具调用和结果添加到消息历史
                 messages.append({
@@ -533,6 +640,138 @@ class AIOrchestrator:
             logger.error(f"Anthropic API error: {e}")
             raise
 
+    async def _stream_claude(
+        self,
+        messages: List[Dict],
+        system_prompt: Optional[str],
+        max_tokens: int,
+        temperature: float,
+        tools: Optional[List[Dict]],
+        user_id: Optional["UUID"] = None,
+        db: Optional["AsyncSession"] = None
+    ) -> AsyncIterator[AIStreamChunk]:
+        """
+        使用Claude流式生成,支持MCP工具调用
+
+        文本增量实时产出;如果本轮以tool_use结束,
+        执行工具后带着结果继续流式生成,token用量逐轮累加
+        """
+        if not self.anthropic_client:
+            raise RuntimeError("Anthropic client not initialized")
+
+        try:
+            async with self.anthropic_client.messages.stream(
+                model=settings.ANTHROPIC_MODEL,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                system=system_prompt or "",
+                messages=messages,
+                tools=tools or []
+            ) as stream:
+                async for text in stream.text_stream:
+                    yield AIStreamChunk(content=text)
+
+                response = await stream.get_final_message()
+
+        except Exception as e:
+            logger.error(f"Anthropic streaming error: {e}")
+            raise
+
+        tokens_used = response.usage.input_tokens + response.usage.output_tokens if response.usage else None
+
+        if response.stop_reason == "tool_use":
+            logger.info("🔧 Tool use detected in stream, processing...")
+
+            tool_results = await self._execute_tool_calls(response, user_id, db)
+
+            messages.append({
+                "role": "assistant",
+                "content": response.content
+            })
+            messages.append({
+                "role": "user",
+                "content": tool_results
+            })
+
+            logger.info("🔄 Streaming Claude with tool results...")
+            async for chunk in self._stream_claude(
+                messages=messages,
+                system_prompt=system_prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                tools=tools,
+                user_id=user_id,
+                db=db
+            ):
+                if chunk.tokens_used is not None and tokens_used is not None:
+                    chunk.tokens_used += tokens_used
+                yield chunk
+            return
+
+        yield AIStreamChunk(tokens_used=tokens_used, finish_reason=response.stop_reason)
+
+    async def _execute_tool_calls(
+        self,
+        response: Any,
+        user_id: Optional["UUID"] = None,
+        db: Optional["AsyncSession"] = None
+    ) -> List[Dict]:
+        """
+        执行Claude响应中的所有tool_use块
+
+        Returns:
+            List[Dict]: tool_result内容块列表
+        """
+        # 导入MCP工具执行器
+        from app.mcp import execute_tool
+        import json
+
+        # 收集所有工具调用结果
+        tool_results = []
+
+        for content_block in response.content:
+            if content_block.type == "tool_use":
+                tool_name = content_block.name
+                tool_input = content_block.input
+                tool_use_id = content_block.id
+
+                logger.info(f"   Executing tool: {tool_name}")
+                logger.debug(f"   Input: {tool_input}")
+
+                try:
+                    # 执行工具
+                    result = await execute_tool(
+                        tool_name=tool_name,
+                        tool_input=tool_input,
+                        user_id=user_id,
+                        db=db
+                    )
+
+                    logger.info(f"   ✅ Tool executed: {tool_name}")
+
+                    # 添加工具结果
+                    tool_results.append({
+                        "type": "tool_result",
+                        "tool_use_id": tool_use_id,
+                        "content": json.dumps(result, ensure_ascii=False)
+                    })
+
+                except Exception as e:
+                    logger.error(f"   ❌ Tool execution failed: {tool_name} - {e}")
+
+                    # 返回错误信息给Claude
+                    tool_results.append({
+                        "type": "tool_result",
+                        "tool_use_id": tool_use_id,
+                        "content": json.dumps({
+                            "error": str(e),
+                            "tool": tool_name
+                        }, ensure_ascii=False),
+                        "is_error": True
+                    })
+
+        return tool_results
+
 
 # 全局单例
 orchestrator = AIOrchestrator()
@@ -11,15 +11,32 @@ AI响应缓存管理器
 import hashlib
 import json
 import asyncio
+import time
 from datetime import datetime
 from typing import Optional, Dict, List, Tuple
 from dataclasses import dataclass, asdict
 from loguru import logger
 
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import (
+    Distance,
+    VectorParams,
+    PointStruct,
+    PayloadSchemaType,
+    Filter,
+    FieldCondition,
+    MatchValue,
+    FilterSelector,
+    PointIdsList,
+    Range,
+    OrderBy,
+    Direction,
+)
 
 from app.core.config import settings
+from app.ai.embedding_cache import get_embedding_cache
+from app.ai.embedding_service import get_embedding_service
+from app.ai.cache_metrics import CacheMetricsRecorder
 
 
 @dataclass
@@ -34,6 +51,7 @@ class CacheEntry:
     cached_at: str  # 缓存时间 (ISO格式)
     hit_count: int = 0  # 命中次数
     user_id: Optional[str] = None  # 用户ID
+    expires_at: Optional[float] = None  # L2过期时间 (Unix时间戳, None表示不过期)
 
     def to_dict(self) -> dict:
         """转换为字典"""
@@ -59,6 +77,27 @@ class CacheStats:
     avg_response_time_uncached_ms: float = 0.0  # 未缓存平均响应时间
 
 
+@dataclass
+class WriteBehindStats:
+    """后台缓存写入统计"""
+    enqueued: int = 0  # 入队条数
+    written: int = 0  # 已写入条数
+    dropped: int = 0  # 队列满被丢弃的条数
+    failed: int = 0  # 写入失败条数
+    batches: int = 0  # 合并写入批次数
+
+
+@dataclass
+class _PendingCacheWrite:
+    """待写入的缓存条目"""
+    query: str
+    cache_entry: CacheEntry
+    user_id: str
+    conversation_history: Optional[List[Dict]]
+    ttl: int
+    write_l2: bool
+
+
 class ResponseCacheManager:
     """
     AI响应缓存管理器
@@ -66,11 +105,21 @@ class ResponseCacheManager:
     三层缓存策略:
     - L1 (Redis): 精确匹配，最快 (<5ms)，命中率15-20%
     - L2 (Qdrant): 语义相似，快 (~30ms)，命中率8-12%
+      所有用户共用一个collection，按payload中的user_id过滤
     - L3 (Qdrant): 知识库预答案，快 (~30ms)，命中率2-5%
 
     总体预期命中率: 25-35%
     """
 
+    # L2语义缓存collection(所有用户共用, user_id/intent建keyword索引)
+    SEMANTIC_CACHE_COLLECTION = "semantic_response_cache"
+
+    # 每用户L2条目数的估计上界(Redis hash, field为user_id): 上次精确计数 + 此后的写入数
+    L2_USER_ENTRIES_KEY = "cache:l2_user_entries"
+
+    # 旧版按用户划分的collection前缀(仅迁移脚本使用)
+    LEGACY_USER_COLLECTION_PREFIX = "cache_user_"
+
     # 成本估算（每1K tokens美元）
     COST_PER_1K_TOKENS = {
         "gpt-5": 0.03,
@@ -90,12 +139,27 @@ class ResponseCacheManager:
     def __init__(self):
         """初始化缓存管理器"""
         self.redis_manager = None
-        self.qdrant_client: Optional[QdrantClient] = None
+        self.qdrant_client: Optional[AsyncQdrantClient] = None
         self.sentence_transformer = None
+        self.intent_classifier = None
+
+        # 已确认存在的collection(避免每次写入都查询)
+        self._known_collections: set = set()
+
+        # 后台任务引用(L2命中计数回写等), 防止被GC回收
+        self._background_tasks: set = set()
+
+        # 后台写入队列(write-behind), 缓存写入不占用请求延迟
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._write_worker: Optional[asyncio.Task] = None
+        self.write_stats = WriteBehindStats()
 
-        # 统计数据
+        # 统计数据(本进程)
         self.stats = CacheStats()
 
+        # 全局统计(Redis hash, 跨worker汇总)
+        self.metrics: Optional[CacheMetricsRecorder] = None
+
         # 初始化标志
         self._initialized = False
         self._init_lock = asyncio.Lock()
@@ -119,13 +183,10 @@ class ResponseCacheManager:
                 # 1. Redis客户端
                 from app.core.redis_client import get_redis_manager
                 self.redis_manager = await get_redis_manager()
+                self.metrics = CacheMetricsRecorder(self.redis_manager.client)
 
                 # 2. Qdrant客户端
-                self.qdrant_client = QdrantClient(
-                    url=settings.QDRANT_URL,
-                    api_key=settings.QDRANT_API_KEY,
-                    timeout=10
-                )
+                self._connect_qdrant()
 
                 # 3. 复用意图分类器的Sentence-Transformer
                 from app.ai.intent_classifier import get_intent_classifier
@@ -138,9 +199,11 @@ class ResponseCacheManager:
                             await classifier._load_model()
 
                 self.sentence_transformer = classifier.model
+                self.intent_classifier = classifier
 
-                # 4. 确保知识库collection存在
+                # 4. 确保知识库和语义缓存collection存在
                 await self._ensure_knowledge_base_collection()
+                await self._ensure_semantic_cache_collection()
 
                 self._initialized = True
                 logger.info("✅ ResponseCacheManager initialized")
@@ -149,17 +212,70 @@ class ResponseCacheManager:
                 logger.error(f"❌ ResponseCacheManager initialization failed: {e}")
                 raise
 
+    def _connect_qdrant(self):
+        """创建Qdrant客户端(清理任务只需要Qdrant, 不加载嵌入模型)"""
+        if self.qdrant_client is None:
+            self.qdrant_client = AsyncQdrantClient(
+                url=settings.QDRANT_URL,
+                api_key=settings.QDRANT_API_KEY,
+                timeout=10
+            )
+
     async def _ensure_knowledge_base_collection(self):
         """确保知识库collection存在"""
         collection_name = "knowledge_base_qa"
 
-        try:
-            # 检查collection是否存在
-            self.qdrant_client.get_collection(collection_name)
+        await self._ensure_collection(collection_name)
+
+    async def _ensure_semantic_cache_collection(self):
+        """确保L2语义缓存collection及其payload索引存在"""
+        collection_name = self.SEMANTIC_CACHE_COLLECTION
+
+        await self._ensure_collection(collection_name)
+
+        # keyword索引: 按用户过滤检索/删除, 按意图统计
+        # expires_at: 过期过滤和清理; hit_count: LFU淘汰排序
+        # create_payload_index是幂等的, 已存在时不会重建
+        payload_indexes = {
+            "user_id": PayloadSchemaType.KEYWORD,
+            "intent": PayloadSchemaType.KEYWORD,
+            "expires_at": PayloadSchemaType.FLOAT,
+            "hit_count": PayloadSchemaType.INTEGER,
+        }
+        for field_name, field_schema in payload_indexes.items():
+            await self.qdrant_client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=field_schema
+            )
+
+    @staticmethod
+    def _user_filter(user_id: str, exclude_expired: bool = False) -> Filter:
+        """
+        按用户过滤的payload条件
+
+        Args:
+            user_id: 用户ID
+            exclude_expired: 是否排除已过期的点(没有expires_at的点视为不过期)
+        """
+        return Filter(
+            must=[
+                FieldCondition(key="user_id", match=MatchValue(value=user_id))
+            ],
+            must_not=[
+                FieldCondition(key="expires_at", range=Range(lte=time.time()))
+            ] if exclude_expired else None
+        )
+
+    async def _ensure_collection(self, collection_name: str):
+        """确保collection存在, 不存在则创建"""
+        if collection_name in self._known_collections:
+            return
+
+        if await self.qdrant_client.collection_exists(collection_name):
             logger.debug(f"✓ Qdrant collection '{collection_name}' exists")
-        except:
-            # 不存在则创建
-            self.qdrant_client.create_collection(
+        else:
+            await self.qdrant_client.create_collection(
                 collection_name=collection_name,
                 vectors_config=VectorParams(
                     size=384,  # MiniLM维度
@@ -168,6 +284,18 @@ class ResponseCacheManager:
             )
             logger.info(f"✅ Created Qdrant collection '{collection_name}'")
 
+        self._known_collections.add(collection_name)
+
+    async def _embed(self, query: str) -> List[float]:
+        """
+        获取查询向量
+
+        经由意图分类器的共享嵌入缓存, 一次请求内L2/L3查询、
+        意图分类和缓存写入只编码一次
+        """
+        vector = await self.intent_classifier.embed(query)
+        return vector.tolist()
+
     def _generate_cache_key(
         self,
         query: str,
@@ -239,7 +367,7 @@ class ResponseCacheManager:
         """
         获取缓存响应
 
-        按L1 → L2 → L3顺序检查
+        先查L1；未命中时并发检查L2和L3，取相似度最高的命中
 
         Args:
             query: 用户问题
@@ -264,6 +392,7 @@ class ResponseCacheManager:
             self.stats.l1_hits += 1
             latency_ms = (datetime.now() - start_time).total_seconds() * 1000
             self._update_cache_latency_stats(latency_ms, cached=True)
+            self._record_lookup("L1", latency_ms)
 
             logger.debug(
                 f"✅ L1 HIT | "
@@ -272,40 +401,34 @@ class ResponseCacheManager:
             )
             return (l1_result, "L1")
 
-        # L2: Qdrant语义相似匹配
-        l2_result = await self._check_l2_cache(
+        # L2/L3: 查询向量只编码一次, 用户缓存和知识库并发检索
+        semantic_result = await self._check_semantic_cache(
             query,
             user_id,
             similarity_threshold
         )
-        if l2_result:
-            self.stats.l2_hits += 1
+        if semantic_result:
+            cache_entry, cache_layer = semantic_result
+            if cache_layer == "L2":
+                self.stats.l2_hits += 1
+            else:
+                self.stats.l3_hits += 1
             latency_ms = (datetime.now() - start_time).total_seconds() * 1000
             self._update_cache_latency_stats(latency_ms, cached=True)
+            self._record_lookup(cache_layer, latency_ms)
 
             logger.debug(
-                f"✅ L2 HIT | "
+                f"✅ {cache_layer} HIT | "
                 f"Query: {query[:30]}... | "
                 f"Latency: {latency_ms:.1f}ms"
             )
-            return (l2_result, "L2")
-
-        # L3: 知识库预答案
-        l3_result = await self._check_l3_cache(query)
-        if l3_result:
-            self.stats.l3_hits += 1
-            latency_ms = (datetime.now() - start_time).total_seconds() * 1000
-            self._update_cache_latency_stats(latency_ms, cached=True)
-
-            logger.debug(
-                f"✅ L3 HIT | "
-                f"Query: {query[:30]}... | "
-                f"Latency: {latency_ms:.1f}ms"
-            )
-            return (l3_result, "L3")
+            return (cache_entry, cache_layer)
 
         # 全部未命中
         self.stats.cache_misses += 1
+        latency_ms = (datetime.now() - start_time).total_seconds() * 1000
+        self._update_cache_latency_stats(latency_ms, cached=False)
+        self._record_lookup("miss", latency_ms)
         logger.debug(f"❌ CACHE MISS | Query: {query[:30]}...")
 
         return None
@@ -351,42 +474,61 @@ class ResponseCacheManager:
             logger.error(f"L1 cache check error: {e}")
             return None
 
-    async def _check_l2_cache(
+    async def _check_semantic_cache(
         self,
         query: str,
         user_id: str,
         threshold: float
-    ) -> Optional[CacheEntry]:
+    ) -> Optional[Tuple[CacheEntry, str]]:
         """
-        L2: Qdrant语义相似检查
+        L2 + L3 语义检查
 
-        较快，~30ms
+        编码一次查询向量后并发检索用户缓存和知识库,
+        两层都达到各自阈值时取相似度更高的一条
         """
         try:
-            # 编码查询向量
-            loop = asyncio.get_event_loop()
-            query_vector = await loop.run_in_executor(
-                None,
-                lambda: self.sentence_transformer.encode(
-                    query,
-                    convert_to_tensor=False
-                ).tolist()
-            )
+            # 编码查询向量(与意图分类共享)
+            query_vector = await self._embed(query)
+        except Exception as e:
+            logger.error(f"Query embedding error: {e}")
+            return None
 
-            # 用户专属collection名称
-            collection_name = f"cache_user_{user_id}"
+        l2_hit, l3_hit = await asyncio.gather(
+            self._check_l2_cache(query_vector, user_id, threshold),
+            self._check_l3_cache(query_vector)
+        )
 
-            # 检查collection是否存在
-            try:
-                self.qdrant_client.get_collection(collection_name)
-            except:
-                # collection不存在，未命中
-                return None
+        candidates = [
+            (hit, layer)
+            for hit, layer in ((l2_hit, "L2"), (l3_hit, "L3"))
+            if hit is not None
+        ]
+        if not candidates:
+            return None
 
-            # Qdrant向量搜索
-            search_results = self.qdrant_client.search(
-                collection_name=collection_name,
+        (cache_entry, _score), cache_layer = max(candidates, key=lambda c: c[0][1])
+        return (cache_entry, cache_layer)
+
+    async def _check_l2_cache(
+        self,
+        query_vector: List[float],
+        user_id: str,
+        threshold: float
+    ) -> Optional[Tuple[CacheEntry, float]]:
+        """
+        L2: Qdrant语义相似检查
+
+        较快，~30ms
+
+        Returns:
+            (CacheEntry, 相似度) 或 None
+        """
+        try:
+            # 共享collection中按user_id过滤的向量搜索
+            search_results = await self.qdrant_client.search(
+                collection_name=self.SEMANTIC_CACHE_COLLECTION,
                 query_vector=query_vector,
+                query_filter=self._user_filter(user_id, exclude_expired=True),
                 limit=1,
                 score_threshold=threshold
             )
@@ -395,7 +537,17 @@ class ResponseCacheManager:
                 result = search_results[0]
                 if result.score >= threshold:
                     cache_entry = CacheEntry.from_dict(result.payload)
-                    return cache_entry
+                    cache_entry.hit_count += 1
+
+                    # 命中次数回写(LFU淘汰依据), 不阻塞响应
+                    self._run_in_background(
+                        self.qdrant_client.set_payload(
+                            collection_name=self.SEMANTIC_CACHE_COLLECTION,
+                            payload={"hit_count": cache_entry.hit_count},
+                            points=[result.id]
+                        )
+                    )
+                    return (cache_entry, result.score)
 
             return None
 
@@ -403,25 +555,21 @@ class ResponseCacheManager:
             logger.error(f"L2 cache check error: {e}")
             return None
 
-    async def _check_l3_cache(self, query: str) -> Optional[CacheEntry]:
+    async def _check_l3_cache(
+        self,
+        query_vector: List[float]
+    ) -> Optional[Tuple[CacheEntry, float]]:
         """
         L3: 知识库预答案检查
 
         快，~30ms
+
+        Returns:
+            (CacheEntry, 相似度) 或 None
         """
         try:
-            # 编码查询向量
-            loop = asyncio.get_event_loop()
-            query_vector = await loop.run_in_executor(
-                None,
-                lambda: self.sentence_transformer.encode(
-                    query,
-                    convert_to_tensor=False
-                ).tolist()
-            )
-
             # 从知识库搜索
-            search_results = self.qdrant_client.search(
+            search_results = await self.qdrant_client.search(
                 collection_name="knowledge_base_qa",
                 query_vector=query_vector,
                 limit=1,
@@ -432,7 +580,7 @@ class ResponseCacheManager:
                 result = search_results[0]
                 if result.score >= 0.88:
                     cache_entry = CacheEntry.from_dict(result.payload)
-                    return cache_entry
+                    return (cache_entry, result.score)
 
             return None
 
@@ -455,7 +603,9 @@ class ResponseCacheManager:
         """
         设置缓存
 
-        同时写入L1(Redis)和L2(Qdrant)
+        写入L1(Redis)和L2(Qdrant)。条目进入有界后台队列后立即返回,
+        由后台任务合并成Redis pipeline和批量Qdrant upsert;
+        队列已满时丢弃本次写入(只影响缓存命中率, 不影响响应)
 
         Args:
             query: 用户问题
@@ -495,21 +645,27 @@ class ResponseCacheManager:
             latency_saved = self.LATENCY_ESTIMATE_MS.get(provider, 2000)
             self.stats.total_latency_saved_ms += latency_saved
 
-            # 写入L1 (Redis)
-            await self._write_to_redis(
-                query,
-                cache_entry,
-                user_id,
-                conversation_history,
-                ttl
-            )
+            if self.metrics:
+                self._run_in_background(
+                    self.metrics.record_savings(cost_saved, latency_saved)
+                )
 
-            # 写入L2 (Qdrant) - 仅对复杂度>=3的问题
-            if complexity >= 3:
-                await self._write_to_qdrant(query, cache_entry, user_id)
+            # 交给后台队列写入L1 (Redis) 和 L2 (Qdrant, 仅复杂度>=3的问题)
+            queued = self._enqueue_write(
+                _PendingCacheWrite(
+                    query=query,
+                    cache_entry=cache_entry,
+                    user_id=user_id,
+                    conversation_history=conversation_history,
+                    ttl=ttl,
+                    write_l2=complexity >= 3
+                )
+            )
+            if not queued:
+                return
 
             logger.debug(
-                f"💾 Cache SET | "
+                f"💾 Cache SET (queued) | "
                 f"Query: {query[:30]}... | "
                 f"Provider: {provider} | "
                 f"Complexity: {complexity}"
@@ -518,80 +674,287 @@ class ResponseCacheManager:
         except Exception as e:
             logger.error(f"Cache set error: {e}")
 
-    async def _write_to_redis(
-        self,
-        query: str,
-        cache_entry: CacheEntry,
-        user_id: str,
-        conversation_history: Optional[List[Dict]],
-        ttl: int
-    ):
-        """写入Redis (L1)"""
-        try:
-            context_hash = self._calculate_context_hash(conversation_history)
-            cache_key = self._generate_cache_key(query, user_id, context_hash)
+    def _enqueue_write(self, write: _PendingCacheWrite) -> bool:
+        """
+        缓存写入入队(不阻塞)
 
-            await self.redis_manager.set(
-                cache_key,
-                json.dumps(cache_entry.to_dict()),
-                ttl=ttl
-            )
-        except Exception as e:
-            logger.error(f"Redis write error: {e}")
+        Returns:
+            是否入队成功, 队列已满时返回False并计入丢弃数
+        """
+        if self._write_worker is None or self._write_worker.done():
+            self._write_queue = asyncio.Queue(maxsize=settings.CACHE_WRITE_QUEUE_SIZE)
+            self._write_worker = asyncio.create_task(self._run_write_worker())
 
-    async def _write_to_qdrant(
-        self,
-        query: str,
-        cache_entry: CacheEntry,
-        user_id: str
-    ):
-        """写入Qdrant (L2)"""
         try:
-            # 编码查询向量
-            loop = asyncio.get_event_loop()
-            query_vector = await loop.run_in_executor(
-                None,
-                lambda: self.sentence_transformer.encode(
-                    query,
-                    convert_to_tensor=False
-                ).tolist()
+            self._write_queue.put_nowait(write)
+        except asyncio.QueueFull:
+            self.write_stats.dropped += 1
+            logger.warning(
+                f"Cache write queue full, dropped | "
+                f"Query: {write.query[:30]}... | Dropped total: {self.write_stats.dropped}"
             )
+            return False
+
+        self.write_stats.enqueued += 1
+        return True
+
+    async def _collect_writes(self) -> List[_PendingCacheWrite]:
+        """等待第一条写入, 然后在最长等待时间内攒批"""
+        loop = asyncio.get_running_loop()
+        batch_size = settings.CACHE_WRITE_BATCH_SIZE
 
-            # 用户专属collection
-            collection_name = f"cache_user_{user_id}"
+        batch = [await self._write_queue.get()]
+        deadline = loop.time() + settings.CACHE_WRITE_MAX_WAIT_MS / 1000
 
-            # 确保collection存在
+        while len(batch) < batch_size:
+            remaining = deadline - loop.time()
             try:
-                self.qdrant_client.get_collection(collection_name)
-            except:
-                self.qdrant_client.create_collection(
-                    collection_name=collection_name,
-                    vectors_config=VectorParams(
-                        size=384,
-                        distance=Distance.COSINE
-                    )
+                if remaining <= 0:
+                    batch.append(self._write_queue.get_nowait())
+                else:
+                    batch.append(await asyncio.wait_for(self._write_queue.get(), remaining))
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+
+        return batch
+
+    async def _run_write_worker(self):
+        """后台写入worker: 循环攒批并合并写入"""
+        while True:
+            batch = await self._collect_writes()
+            try:
+                await self._flush_writes(batch)
+            except Exception as e:
+                self.write_stats.failed += len(batch)
+                logger.error(f"Cache write batch error: {e}")
+            finally:
+                for _ in batch:
+                    self._write_queue.task_done()
+
+    async def _flush_writes(self, batch: List[_PendingCacheWrite]):
+        """合并写入一批缓存条目: Redis一次pipeline, Qdrant一次upsert"""
+        self.write_stats.batches += 1
+
+        await self._write_batch_to_redis(batch)
+
+        l2_writes = [write for write in batch if write.write_l2]
+        if l2_writes:
+            await self._write_batch_to_qdrant(l2_writes)
+
+        self.write_stats.written += len(batch)
+
+    async def _write_batch_to_redis(self, batch: List[_PendingCacheWrite]):
+        """批量写入Redis (L1), 使用非事务pipeline"""
+        pipe = self.redis_manager.client.pipeline(transaction=False)
+
+        for write in batch:
+            context_hash = self._calculate_context_hash(write.conversation_history)
+            cache_key = self._generate_cache_key(write.query, write.user_id, context_hash)
+            pipe.set(cache_key, json.dumps(write.cache_entry.to_dict()), ex=write.ttl)
+
+        await pipe.execute()
+
+    async def _write_batch_to_qdrant(self, batch: List[_PendingCacheWrite]):
+        """批量写入Qdrant (L2)"""
+        # 编码查询向量(与意图分类共享, 通常已在查询阶段编码过)
+        vectors = await asyncio.gather(*(self._embed(write.query) for write in batch))
+
+        expires_at = time.time() + settings.CACHE_L2_TTL
+        points = []
+        for write, query_vector in zip(batch, vectors):
+            # 过期时间写入payload, 由定时任务清理
+            payload = write.cache_entry.to_dict()
+            payload["expires_at"] = expires_at
+
+            points.append(
+                PointStruct(
+                    id=hashlib.md5(f"{write.user_id}:{write.query}".encode()).hexdigest(),
+                    vector=query_vector,
+                    payload=payload
                 )
-                logger.info(f"✅ Created Qdrant collection '{collection_name}'")
+            )
 
-            # 生成点ID
-            point_id = hashlib.md5(
-                f"{user_id}:{query}".encode()
-            ).hexdigest()
+        await self.qdrant_client.upsert(
+            collection_name=self.SEMANTIC_CACHE_COLLECTION,
+            points=points
+        )
 
-            # 插入向量
-            self.qdrant_client.upsert(
-                collection_name=collection_name,
-                points=[
-                    PointStruct(
-                        id=point_id,
-                        vector=query_vector,
-                        payload=cache_entry.to_dict()
-                    )
-                ]
+        # 超出每用户上限时按LFU淘汰
+        written: Dict[str, int] = {}
+        for write in batch:
+            written[write.user_id] = written.get(write.user_id, 0) + 1
+        await self._enforce_user_limits(written)
+
+    async def _enforce_user_limits(self, written: Dict[str, int]) -> int:
+        """
+        写入后检查每用户上限: 只对可能超限的用户做精确计数
+
+        估计值(上次精确计数 + 此后所有worker的写入数)是条目数的上界(覆盖写入同一个点也计数),
+        估计值不超过上限时不需要count; 没有估计值的用户(首次写入/已失效)精确计数一次
+
+        Args:
+            written: {user_id: 本批写入的点数}
+
+        Returns:
+            淘汰的点数
+        """
+        limit = settings.CACHE_L2_MAX_ENTRIES_PER_USER
+        try:
+            pipe = self.redis_manager.client.pipeline(transaction=False)
+            for user_id, count in written.items():
+                pipe.hincrby(self.L2_USER_ENTRIES_KEY, user_id, count)
+            estimates = dict(zip(written, await pipe.execute()))
+        except Exception as e:
+            logger.warning(f"L2 entry estimate update failed, counting exactly: {e}")
+            estimates = {user_id: None for user_id in written}
+
+        evicted = 0
+        for user_id, estimate in estimates.items():
+            if estimate is None or estimate == written[user_id] or estimate > limit:
+                evicted += await self._enforce_user_limit(user_id)
+        return evicted
+
+    async def flush_pending_writes(self, timeout: float = 10.0):
+        """等待后台队列中的缓存写入完成(关闭服务前调用)"""
+        if self._write_queue is None or self._write_worker is None:
+            return
+
+        try:
+            await asyncio.wait_for(self._write_queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Cache write flush timed out, {self._write_queue.qsize()} writes pending"
             )
 
+        self._write_worker.cancel()
+        try:
+            await self._write_worker
+        except asyncio.CancelledError:
+            pass
+        self._write_worker = None
+
+    async def _enforce_user_limit(self, user_id: str) -> int:
+        """
+        每用户L2条目上限, 超出部分按hit_count从低到高淘汰(LFU)
+
+        精确计数后把结果(淘汰后的条目数)记为该用户的估计值
+
+        Returns:
+            淘汰的点数
+        """
+        limit = settings.CACHE_L2_MAX_ENTRIES_PER_USER
+
+        count_result = await self.qdrant_client.count(
+            collection_name=self.SEMANTIC_CACHE_COLLECTION,
+            count_filter=self._user_filter(user_id),
+            exact=True
+        )
+        await self._set_user_entry_estimate(user_id, min(count_result.count, limit))
+
+        excess = count_result.count - limit
+        if excess <= 0:
+            return 0
+
+        points, _ = await self.qdrant_client.scroll(
+            collection_name=self.SEMANTIC_CACHE_COLLECTION,
+            scroll_filter=self._user_filter(user_id),
+            limit=excess,
+            order_by=OrderBy(key="hit_count", direction=Direction.ASC),
+            with_payload=False,
+            with_vectors=False
+        )
+        if not points:
+            return 0
+
+        await self.qdrant_client.delete(
+            collection_name=self.SEMANTIC_CACHE_COLLECTION,
+            points_selector=PointIdsList(points=[point.id for point in points])
+        )
+
+        logger.info(f"🧹 L2 LFU eviction | User: {user_id} | Evicted: {len(points)}")
+        return len(points)
+
+    async def _set_user_entry_estimate(self, user_id: str, count: Optional[int]):
+        """记录用户L2条目数的估计值(None为删除, 下次写入时重新精确计数)"""
+        if self.redis_manager is None:
+            return
+        try:
+            if count is None:
+                await self.redis_manager.client.hdel(self.L2_USER_ENTRIES_KEY, user_id)
+            else:
+                await self.redis_manager.client.hset(self.L2_USER_ENTRIES_KEY, user_id, count)
         except Exception as e:
-            logger.error(f"Qdrant write error: {e}")
+            logger.warning(f"L2 entry estimate update failed: {e}")
+
+    async def sweep_expired_l2(self, batch_size: Optional[int] = None) -> dict:
+        """
+        分批删除L2中已过期的点
+
+        由Celery定时任务调用; 只需要Qdrant连接, 不加载嵌入模型
+
+        Args:
+            batch_size: 每批删除的点数
+
+        Returns:
+            {"deleted": 删除点数, "batches": 批次数, "duration_ms": 耗时}
+        """
+        batch_size = batch_size or settings.CACHE_L2_SWEEP_BATCH_SIZE
+        self._connect_qdrant()
+
+        start = time.perf_counter()
+        cutoff = time.time()
+        expired_filter = Filter(
+            must=[FieldCondition(key="expires_at", range=Range(lte=cutoff))]
+        )
+
+        deleted = 0
+        batches = 0
+
+        while True:
+            points, _ = await self.qdrant_client.scroll(
+                collection_name=self.SEMANTIC_CACHE_COLLECTION,
+                scroll_filter=expired_filter,
+                limit=batch_size,
+                with_payload=False,
+                with_vectors=False
+            )
+            if not points:
+                break
+
+            await self.qdrant_client.delete(
+                collection_name=self.SEMANTIC_CACHE_COLLECTION,
+                points_selector=PointIdsList(points=[point.id for point in points]),
+                wait=True
+            )
+            deleted += len(points)
+            batches += 1
+
+            if len(points) < batch_size:
+                break
+
+        duration_ms = (time.perf_counter() - start) * 1000
+        logger.info(
+            f"🧹 L2 sweep completed | Deleted: {deleted} | "
+            f"Batches: {batches} | Duration: {duration_ms:.0f}ms"
+        )
+
+        return {
+            "deleted": deleted,
+            "batches": batches,
+            "duration_ms": round(duration_ms, 1)
+        }
+
+    def _run_in_background(self, coro):
+        """在后台执行协程, 异常只记录日志"""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+
+        def _done(t: asyncio.Task):
+            self._background_tasks.discard(t)
+            if not t.cancelled() and t.exception():
+                logger.warning(f"Background cache task failed: {t.exception()}")
+
+        task.add_done_callback(_done)
 
     async def invalidate_user_cache(self, user_id: str):
         """
@@ -601,16 +964,20 @@ class ResponseCacheManager:
             user_id: 用户ID
         """
         try:
+            # 确保已初始化
+            if not self._initialized:
+                await self.initialize()
+
             # 清空Redis
             pattern = f"response:{user_id}:*"
             deleted_count = await self.redis_manager.delete_pattern(pattern)
 
-            # 清空Qdrant collection
-            collection_name = f"cache_user_{user_id}"
-            try:
-                self.qdrant_client.delete_collection(collection_name)
-            except:
-                pass
+            # 删除Qdrant中该用户的语义缓存点(按user_id过滤删除)
+            await self.qdrant_client.delete(
+                collection_name=self.SEMANTIC_CACHE_COLLECTION,
+                points_selector=FilterSelector(filter=self._user_filter(user_id))
+            )
+            await self._set_user_entry_estimate(user_id, None)
 
             logger.info(
                 f"🗑️  Cache invalidated for user {user_id} | "
@@ -620,6 +987,11 @@ class ResponseCacheManager:
         except Exception as e:
             logger.error(f"Cache invalidation error: {e}")
 
+    def _record_lookup(self, layer: str, latency_ms: float):
+        """把一次查询结果累加到Redis全局统计(后台执行, 不增加查询延迟)"""
+        if self.metrics:
+            self._run_in_background(self.metrics.record_lookup(layer, latency_ms))
+
     def _update_cache_latency_stats(self, latency_ms: float, cached: bool):
         """更新延迟统计"""
         if cached:
@@ -640,9 +1012,37 @@ class ResponseCacheManager:
                     / self.stats.cache_misses
                 )
 
+    async def get_global_stats(self) -> dict:
+        """
+        获取所有worker汇总的缓存统计(来自Redis)
+
+        包含各层p50/p95/p99延迟; 本进程的嵌入、后台写入统计附在结果中
+
+        Returns:
+            统计信息字典
+        """
+        if not self._initialized:
+            await self.initialize()
+
+        stats = await self.metrics.get_stats()
+        stats.update({
+            "embedding_cache": get_embedding_cache().get_stats(),
+            "embedding_service": get_embedding_service().get_stats(),
+            "write_behind": self._get_write_behind_stats()
+        })
+        return stats
+
+    def _get_write_behind_stats(self) -> dict:
+        """后台写入队列统计(本进程)"""
+        return {
+            **asdict(self.write_stats),
+            "queue_depth": self._write_queue.qsize() if self._write_queue else 0,
+            "queue_capacity": settings.CACHE_WRITE_QUEUE_SIZE
+        }
+
     def get_stats(self) -> dict:
         """
-        获取缓存统计
+        获取缓存统计(仅本进程)
 
         Returns:
             统计信息字典
@@ -675,7 +1075,10 @@ class ResponseCacheManager:
             "total_cost_saved_usd": round(self.stats.total_cost_saved_usd, 4),
             "total_latency_saved_ms": round(self.stats.total_latency_saved_ms, 2),
             "avg_cached_response_time_ms": round(self.stats.avg_response_time_cached_ms, 2),
-            "avg_uncached_response_time_ms": round(self.stats.avg_response_time_uncached_ms, 2)
+            "avg_uncached_response_time_ms": round(self.stats.avg_response_time_uncached_ms, 2),
+            "embedding_cache": get_embedding_cache().get_stats(),
+            "embedding_service": get_embedding_service().get_stats(),
+            "write_behind": self._get_write_behind_stats()
         }
 
 
@@ -697,3 +1100,9 @@ async def get_response_cache_manager() -> ResponseCacheManager:
         # 注意：不在这里初始化，懒加载到首次使用时
 
     return _cache_manager
+
+
+async def shutdown_response_cache_manager():
+    """关闭时写完后台队列中的缓存条目"""
+    if _cache_manager is not None:
+        await _cache_manager.flush_pending_writes()
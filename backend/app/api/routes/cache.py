@@ -3,7 +3,7 @@
 提供缓存统计、监控和管理接口
 """
 
-from typing import Annotated
+from typing import Annotated, Dict, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 
@@ -11,6 +11,7 @@ from app.api.deps import get_current_user
 from app.models.user import User
 from app.ai.response_cache import get_response_cache_manager
 from app.core.redis_client import get_redis_manager
+from app.services.health_summary_cache import get_health_summary_cache
 
 
 router = APIRouter(prefix="/cache", tags=["缓存管理"])
@@ -39,6 +40,7 @@ class CacheStatsResponse(BaseModel):
     total_latency_saved_ms: float
     avg_cached_response_time_ms: float
     avg_uncached_response_time_ms: float
+    latency_percentiles_ms: Dict[str, Dict[str, Optional[float]]] = {}
 
 
 class RedisStatsResponse(BaseModel):
@@ -54,6 +56,16 @@ class RedisStatsResponse(BaseModel):
     evicted_keys: int
 
 
+class HealthSummaryCacheStatsResponse(BaseModel):
+    """健康摘要缓存统计响应"""
+    total_requests: int
+    hits: int
+    misses: int
+    hit_rate_percent: float
+    invalidations: int
+    ttl_seconds: int
+
+
 class SuccessResponse(BaseModel):
     """成功响应"""
     message: str
@@ -72,18 +84,19 @@ async def get_cache_stats(
     current_user: CurrentUser
 ):
     """
-    获取缓存统计信息
+    获取缓存统计信息(所有worker汇总)
 
     返回:
     - 总请求数
     - L1/L2/L3各层命中率
     - 总成本节省
     - 平均响应时间
+    - 各层延迟p50/p95/p99
     """
     try:
         cache_manager = await get_response_cache_manager()
 
-        stats = cache_manager.get_stats()
+        stats = await cache_manager.get_global_stats()
 
         # 如果还没有请求，返回默认值
         if "message" in stats:
@@ -155,11 +168,41 @@ async def get_redis_stats(
         )
 
 
+@router.get(
+    "/health-summary/stats",
+    response_model=HealthSummaryCacheStatsResponse,
+    summary="获取健康摘要缓存统计",
+    description="获取对话上下文中健康摘要缓存的命中率(所有worker汇总)"
+)
+async def get_health_summary_cache_stats(
+    current_user: CurrentUser
+):
+    """
+    获取健康摘要缓存统计
+
+    返回:
+    - 命中/未命中次数和命中率
+    - 因健康数据写入而失效的次数
+    """
+    try:
+        summary_cache = await get_health_summary_cache()
+
+        stats = await summary_cache.get_stats()
+
+        return HealthSummaryCacheStatsResponse(**stats)
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get health summary cache stats: {str(e)}"
+        )
+
+
 @router.post(
     "/invalidate/me",
     response_model=SuccessResponse,
     summary="清空当前用户缓存",
-    description="清空当前登录用户的所有缓存数据（Redis + Qdrant）"
+    description="清空当前登录用户的所有缓存数据（Redis + Qdrant + 健康摘要）"
 )
 async def invalidate_my_cache(
     current_user: CurrentUser
@@ -170,17 +213,21 @@ async def invalidate_my_cache(
     包括:
     - Redis L1缓存
     - Qdrant L2缓存
+    - 健康摘要缓存
     """
     try:
         cache_manager = await get_response_cache_manager()
 
         await cache_manager.invalidate_user_cache(str(current_user.id))
 
+        summary_cache = await get_health_summary_cache()
+        await summary_cache.invalidate([current_user.id])
+
         return SuccessResponse(
             message="Cache invalidated successfully",
             details={
                 "user_id": str(current_user.id),
-                "layers_cleared": ["L1_Redis", "L2_Qdrant"]
+                "layers_cleared": ["L1_Redis", "L2_Qdrant", "health_summary"]
             }
         )
 
@@ -229,7 +276,7 @@ async def cache_health_check(
             await cache_manager.initialize()
 
             # 测试Qdrant连接
-            cache_manager.qdrant_client.get_collections()
+            await cache_manager.qdrant_client.get_collections()
             health_status["qdrant"] = "healthy"
         except Exception as e:
             health_status["qdrant"] = f"unhealthy: {str(e)}"
@@ -3,16 +3,22 @@
 处理用户与AI教练的对话交互
 """
 
+import asyncio
+import json
 import time
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Annotated, List
+from typing import Annotated, List, Dict, Any, Optional, Tuple, AsyncIterator, Awaitable, TypeVar
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from loguru import logger
 
-from app.core.database import get_db
+from app.core.database import get_db, async_session_maker
 from app.api.deps import get_current_user
 from app.models.user import User
+from app.models.conversation import Conversation
 from app.schemas.chat import (
     ChatRequest,
     ChatResponse,
@@ -21,9 +27,11 @@ from app.schemas.chat import (
     ConversationListItem,
 )
 from app.crud import conversation as conversation_crud
-from app.ai.orchestrator import AIOrchestrator
+from app.ai.orchestrator import AIOrchestrator, AIProvider, RoutingDecision
 from app.ai.prompts import build_system_prompt
+from app.ai.response_cache import CacheEntry, get_response_cache_manager
 from app.services.health_analytics import get_user_health_summary
+from app.services.health_summary_cache import get_cached_user_health_summary
 
 
 router = APIRouter(prefix="/chat", tags=["AI对话"])
@@ -38,33 +46,77 @@ CurrentUser = Annotated[User, Depends(get_current_user)]
 # 初始化AI Orchestrator(单例)
 ai_orchestrator = AIOrchestrator()
 
+T = TypeVar("T")
 
-# ============ 聊天端点 ============
 
-@router.post("/send", response_model=ChatResponse, status_code=status.HTTP_200_OK)
-async def send_message(
+# ============ 内部辅助函数 ============
+
+@dataclass
+class _PreparedTurn:
+    """一轮对话的预处理结果"""
+    conversation: Conversation
+    conversation_history: List[Dict[str, Any]]
+    user_profile: Dict[str, Any]
+    system_prompt: str
+    cache_result: Optional[Tuple[CacheEntry, str]]
+    timings: Dict[str, float] = field(default_factory=dict)  # 各阶段耗时(毫秒)
+
+
+async def _timed(timings: Dict[str, float], stage: str, awaitable: Awaitable[T]) -> T:
+    """等待awaitable并把耗时(毫秒)记录到timings[stage]"""
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[stage] = round((time.perf_counter() - start) * 1000, 1)
+
+
+async def _gather_or_cancel(*coros: Awaitable[Any]) -> List[Any]:
+    """
+    并发执行多个协程, 返回按参数顺序的结果
+
+    任一分支失败时取消其余分支并等待它们结束(不会在请求结束后继续使用数据库会话),
+    再原样抛出第一个异常(如HTTPException, 不包装为ExceptionGroup)
+    """
+    try:
+        async with asyncio.TaskGroup() as group:
+            tasks = [group.create_task(coro) for coro in coros]
+    except BaseExceptionGroup as e:
+        raise e.exceptions[0] from None
+    return [task.result() for task in tasks]
+
+
+def _server_timing_header(timings: Dict[str, float]) -> str:
+    """格式化Server-Timing响应头, 如: context;dur=3.2, health;dur=41.0"""
+    return ", ".join(f"{stage};dur={duration}" for stage, duration in timings.items())
+
+
+async def _prepare_chat_turn(
     request: ChatRequest,
-    db: DatabaseSession,
-    current_user: CurrentUser
-) -> ChatResponse:
+    db: AsyncSession,
+    current_user: User
+) -> _PreparedTurn:
     """
-    发送消息给AI教练
+    准备一轮对话的上下文(/send 与 /stream 共用)
 
-    Args:
-        request: 聊天请求(包含消息内容、会话ID等)
-        db: 数据库会话
-        current_user: 当前登录用户
+    包括: 权限检查、获取或创建会话、读取历史上下文、查询响应缓存、
+    聚合健康数据并构建系统提示词
+
+    互不依赖的三条分支并发执行, 总耗时取决于最慢的分支, 任一分支失败时取消其余分支:
+    - 会话: 获取或创建会话(请求级会话)
+    - 上下文 -> 缓存: 缓存键依赖历史消息, 两步串行(独立数据库会话)
+    - 健康数据 -> 提示词(独立数据库会话)
+
+    本函数不提交事务: 新会话只flush, 用户消息与AI回复在拿到回复后
+    由append_chat_turn一次写入并提交
 
     Returns:
-        AI回复响应
+        预处理结果(含各阶段耗时)
 
     Raises:
         HTTPException 403: 用户订阅已过期,无访问权限
         HTTPException 404: 会话不存在
-        HTTPException 500: AI服务错误
     """
-    start_time = time.time()
-
     # 检查用户访问权限(订阅或试用状态)
     if not current_user.has_access:
         raise HTTPException(
@@ -72,46 +124,10 @@ async def send_message(
             detail="Subscription expired. Please renew to continue using AI coach."
         )
 
-    # 1. 获取或创建会话
-    if request.conversation_id:
-        # 验证会话存在且属于当前用户
-        conversation = await conversation_crud.get_conversation_by_id(
-            db, request.conversation_id, current_user.id
-        )
-        if not conversation:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Conversation {request.conversation_id} not found"
-            )
-    else:
-        # 创建新会话
-        conversation = await conversation_crud.create_conversation(
-            db=db,
-            user_id=current_user.id,
-            initial_message=request.message,
-            coach_type=current_user.coach_selection
-        )
-
-    # 2. 添加用户消息到会话
-    await conversation_crud.add_message_to_conversation(
-        db=db,
-        conversation_id=conversation.id,
-        user_id=current_user.id,
-        role="user",
-        content=request.message
-    )
-
-    # 3. 获取会话上下文(历史消息)
-    conversation_history = []
-    if request.include_history:
-        conversation_history = await conversation_crud.get_conversation_context(
-            db=db,
-            conversation_id=conversation.id,
-            user_id=current_user.id,
-            max_messages=10  # 最多包含最近10条消息
-        )
+    timings: Dict[str, float] = {}
+    user_id = current_user.id
 
-    # 4. 构建用户画像 (从User模型获取真实数据)
+    # 构建用户画像 (从User模型获取真实数据)
     days_active = (datetime.utcnow() - current_user.created_at).days
     user_profile = {
         "age": current_user.age or "未提供",
@@ -122,28 +138,190 @@ async def send_message(
         "days_active": days_active
     }
 
-    # 5. 聚合健康数据 (从HealthData表统计最近7天)
-    health_data = await get_user_health_summary(db, current_user.id, days=7)
+    async def load_conversation() -> Conversation:
+        if request.conversation_id:
+            # 验证会话存在且属于当前用户
+            conversation = await conversation_crud.get_conversation_by_id(
+                db, request.conversation_id, user_id
+            )
+            if not conversation:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Conversation {request.conversation_id} not found"
+                )
+            return conversation
+
+        # 创建新会话(暂不提交)
+        return await conversation_crud.create_conversation(
+            db=db,
+            user_id=user_id,
+            coach_type=current_user.coach_selection,
+            commit=False
+        )
+
+    async def load_context() -> List[Dict[str, Any]]:
+        # 新会话没有历史; 上下文查询带user_id条件, 与会话归属校验并发执行是安全的
+        if not (request.include_history and request.conversation_id):
+            return []
+        async with async_session_maker() as context_db:
+            return await conversation_crud.get_conversation_context(
+                db=context_db,
+                conversation_id=request.conversation_id,
+                user_id=user_id,
+                max_messages=10  # 最多包含最近10条消息
+            )
+
+    async def compute_health_summary() -> Dict[str, Any]:
+        async with async_session_maker() as health_db:
+            return await get_user_health_summary(health_db, user_id, days=7)
+
+    async def load_health_summary() -> Dict[str, Any]:
+        # 聚合健康数据 (最近7天, 命中Redis缓存时不访问数据库)
+        return await get_cached_user_health_summary(user_id, 7, compute_health_summary)
+
+    async def context_and_cache() -> Tuple[List[Dict[str, Any]], Optional[Tuple[CacheEntry, str]]]:
+        conversation_history = await _timed(timings, "context", load_context())
 
-    # 6. 构建系统提示词
-    system_prompt = build_system_prompt(
-        coach_type=current_user.coach_selection,
-        scenario="general",
+        # 检查缓存 (三层缓存架构)
+        cache_manager = await get_response_cache_manager()
+        cache_result = await _timed(timings, "cache", cache_manager.get_cached_response(
+            query=request.message,
+            user_id=str(user_id),
+            conversation_history=conversation_history,
+            similarity_threshold=0.92
+        ))
+        return conversation_history, cache_result
+
+    async def health_and_prompt() -> str:
+        health_data = await _timed(timings, "health", load_health_summary())
+
+        # 构建系统提示词
+        prompt_start = time.perf_counter()
+        system_prompt = build_system_prompt(
+            coach_type=current_user.coach_selection,
+            scenario="general",
+            user_profile=user_profile,
+            health_data=health_data
+        )
+        timings["prompt"] = round((time.perf_counter() - prompt_start) * 1000, 1)
+        return system_prompt
+
+    conversation, (conversation_history, cache_result), system_prompt = await _timed(
+        timings,
+        "preprocess",
+        _gather_or_cancel(
+            _timed(timings, "conversation", load_conversation()),
+            context_and_cache(),
+            health_and_prompt()
+        )
+    )
+
+    return _PreparedTurn(
+        conversation=conversation,
+        conversation_history=conversation_history,
         user_profile=user_profile,
-        health_data=health_data
+        system_prompt=system_prompt,
+        cache_result=cache_result,
+        timings=timings
     )
 
-    # 6.5 检查缓存 (三层缓存架构)
-    from app.ai.response_cache import get_response_cache_manager
 
-    cache_manager = await get_response_cache_manager()
-    cache_result = await cache_manager.get_cached_response(
-        query=request.message,
-        user_id=str(current_user.id),
+async def _route_chat_request(
+    request: ChatRequest,
+    current_user: User,
+    conversation_history: List[Dict[str, Any]],
+    user_profile: Dict[str, Any]
+) -> Tuple[RoutingDecision, Optional[List[Dict]]]:
+    """
+    AI路由决策,并为Claude准备MCP工具
+
+    Returns:
+        (路由决策, MCP工具列表或None)
+    """
+    routing_decision = await ai_orchestrator.route_request(
+        user_message=request.message,
         conversation_history=conversation_history,
-        similarity_threshold=0.92
+        user_profile=user_profile,
+        user_id=str(current_user.id)
+    )
+
+    # 获取MCP工具 (仅Claude使用)
+    tools = None
+    if routing_decision.provider == AIProvider.CLAUDE_SONNET_4:
+        from app.mcp import get_health_tools_schema
+        tools = get_health_tools_schema()
+        logger.info(f"🔧 MCP tools enabled: {len(tools)} tools")
+
+    return routing_decision, tools
+
+
+async def _save_chat_turn(
+    db: AsyncSession,
+    conversation_id: UUID,
+    user_id: UUID,
+    user_message: str,
+    assistant_message: str,
+    metadata: Dict[str, Any],
+    ai_provider: str,
+    tokens_used: Optional[int]
+) -> None:
+    """保存一轮对话: 用户消息、AI回复和会话计数器在同一事务中提交"""
+    await conversation_crud.append_chat_turn(
+        db=db,
+        conversation_id=conversation_id,
+        user_id=user_id,
+        messages=[
+            {"role": "user", "content": user_message},
+            {"role": "assistant", "content": assistant_message, "metadata": metadata}
+        ],
+        ai_provider=ai_provider,
+        tokens_used=tokens_used
     )
 
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """格式化一条Server-Sent Events消息"""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+# ============ 聊天端点 ============
+
+@router.post("/send", response_model=ChatResponse, status_code=status.HTTP_200_OK)
+async def send_message(
+    request: ChatRequest,
+    response: Response,
+    db: DatabaseSession,
+    current_user: CurrentUser
+) -> ChatResponse:
+    """
+    发送消息给AI教练
+
+    各阶段耗时通过Server-Timing响应头返回
+
+    Args:
+        request: 聊天请求(包含消息内容、会话ID等)
+        response: 响应对象(用于设置Server-Timing头)
+        db: 数据库会话
+        current_user: 当前登录用户
+
+    Returns:
+        AI回复响应
+
+    Raises:
+        HTTPException 403: 用户订阅已过期,无访问权限
+        HTTPException 404: 会话不存在
+        HTTPException 500: AI服务错误
+    """
+    start_time = time.time()
+
+    # 1-6. 会话、历史上下文、缓存查询、用户画像、系统提示词(并发预处理)
+    prepared = await _prepare_chat_turn(request, db, current_user)
+    conversation = prepared.conversation
+    conversation_history = prepared.conversation_history
+    timings = prepared.timings
+
+    cache_result = prepared.cache_result
     if cache_result:
         # 缓存命中！
         cache_entry, cache_layer = cache_result
@@ -155,22 +333,13 @@ async def send_message(
             f"Provider: {cache_entry.provider}"
         )
 
-        # 保存用户消息到会话
-        await conversation_crud.add_message_to_conversation(
-            db=db,
-            conversation_id=conversation.id,
-            user_id=current_user.id,
-            role="user",
-            content=request.message
-        )
-
-        # 保存AI回复到会话
-        await conversation_crud.add_message_to_conversation(
+        # 保存本轮对话并更新会话信息(单事务)
+        await _save_chat_turn(
             db=db,
             conversation_id=conversation.id,
             user_id=current_user.id,
-            role="assistant",
-            content=cache_entry.response,
+            user_message=request.message,
+            assistant_message=cache_entry.response,
             metadata={
                 "provider": cache_entry.provider,
                 "complexity": cache_entry.complexity,
@@ -178,19 +347,14 @@ async def send_message(
                 "tokens": cache_entry.tokens_used,
                 "from_cache": True,
                 "cache_layer": cache_layer
-            }
-        )
-
-        # 更新会话信息
-        await conversation_crud.update_conversation_ai_provider(
-            db=db,
-            conversation_id=conversation.id,
+            },
             ai_provider=cache_entry.provider,
             tokens_used=cache_entry.tokens_used
         )
 
         # 计算响应时间（极快）
         response_time_ms = int((time.time() - start_time) * 1000)
+        response.headers["Server-Timing"] = _server_timing_header(timings)
 
         # 返回缓存响应
         return ChatResponse(
@@ -211,32 +375,23 @@ async def send_message(
 
     # 7. AI路由决策和生成回复
     try:
-        routing_decision = await ai_orchestrator.route_request(
-            user_message=request.message,
-            conversation_history=conversation_history,
-            user_profile=user_profile,
-            user_id=str(current_user.id)
-        )
-
-        # 8. 获取MCP工具 (仅Claude使用)
-        tools = None
-        if routing_decision.provider == ai_orchestrator.AIProvider.CLAUDE_SONNET_4:
-            from app.mcp import get_health_tools_schema
-            tools = get_health_tools_schema()
-            logger.info(f"🔧 MCP tools enabled: {len(tools)} tools")
+        # 8. 路由决策 + 获取MCP工具 (仅Claude使用)
+        routing_decision, tools = await _timed(timings, "route", _route_chat_request(
+            request, current_user, conversation_history, prepared.user_profile
+        ))
 
         # 调用选定的AI提供商生成回复
-        ai_response = await ai_orchestrator.generate_response(
+        ai_response = await _timed(timings, "generate", ai_orchestrator.generate_response(
             provider=routing_decision.provider,
-            system_prompt=system_prompt,
+            system_prompt=prepared.system_prompt,
             user_message=request.message,
             conversation_history=conversation_history,
             tools=tools,  # 传递MCP工具
             user_id=current_user.id,  # 传递用户ID
-            db=db  # 传递数据库会话
+            db=db,  # 传递数据库会话
             max_tokens=2000,
             temperature=0.7
-        )
+        ))
 
     except Exception as e:
         # AI服务错误处理
@@ -245,30 +400,25 @@ async def send_message(
             detail=f"AI service error: {str(e)}"
         )
 
-    # 8. 保存AI回复到会话
-    await conversation_crud.add_message_to_conversation(
+    # 8-9. 保存本轮对话并更新会话AI提供商信息(单事务)
+    await _save_chat_turn(
         db=db,
         conversation_id=conversation.id,
         user_id=current_user.id,
-        role="assistant",
-        content=ai_response.content,
+        user_message=request.message,
+        assistant_message=ai_response.content,
         metadata={
             "provider": routing_decision.provider.value,
             "complexity": routing_decision.complexity,
             "intent": routing_decision.intent.intent.value,
             "tokens": ai_response.tokens_used
-        }
-    )
-
-    # 9. 更新会话AI提供商信息
-    await conversation_crud.update_conversation_ai_provider(
-        db=db,
-        conversation_id=conversation.id,
+        },
         ai_provider=routing_decision.provider.value,
         tokens_used=ai_response.tokens_used
     )
 
     # 9.5 写入缓存 (异步，不阻塞响应)
+    cache_manager = await get_response_cache_manager()
     await cache_manager.set_cache(
         query=request.message,
         response=ai_response.content,
@@ -283,6 +433,7 @@ async def send_message(
 
     # 计算响应时间
     response_time_ms = int((time.time() - start_time) * 1000)
+    response.headers["Server-Timing"] = _server_timing_header(timings)
 
     # 10. 返回响应
     return ChatResponse(
@@ -296,6 +447,225 @@ async def send_message(
     )
 
 
+@router.post("/stream", status_code=status.HTTP_200_OK)
+async def stream_message(
+    request: ChatRequest,
+    db: DatabaseSession,
+    current_user: CurrentUser
+) -> StreamingResponse:
+    """
+    发送消息给AI教练(流式响应, Server-Sent Events)
+
+    事件序列:
+    - meta: 会话ID、AI提供商、意图、复杂度、是否命中缓存
+    - delta: 增量文本 {"content": "..."}
+    - done: 完整的ChatResponse(含time_to_first_token_ms)
+    - error: 流式生成过程中的错误 {"detail": "..."}
+
+    本轮用户消息和AI回复在流结束后一次写入会话, 随后写入响应缓存;
+    预处理和路由各阶段耗时通过Server-Timing响应头返回
+
+    Args:
+        request: 聊天请求(包含消息内容、会话ID等)
+        db: 数据库会话
+        current_user: 当前登录用户
+
+    Returns:
+        text/event-stream 流式响应
+
+    Raises:
+        HTTPException 403: 用户订阅已过期,无访问权限
+        HTTPException 404: 会话不存在
+        HTTPException 500: AI路由错误
+    """
+    start_time = time.time()
+
+    # 1-6. 会话、历史上下文、缓存查询、用户画像、系统提示词(并发预处理)
+    prepared = await _prepare_chat_turn(request, db, current_user)
+    conversation_id = prepared.conversation.id
+    conversation_history = prepared.conversation_history
+    system_prompt = prepared.system_prompt
+    cache_result = prepared.cache_result
+    timings = prepared.timings
+    user_id = current_user.id
+    cache_manager = await get_response_cache_manager()
+
+    routing_decision = None
+    tools = None
+    if not cache_result:
+        # 路由错误在开始推流之前以HTTP错误返回
+        try:
+            routing_decision, tools = await _timed(timings, "route", _route_chat_request(
+                request, current_user, conversation_history, prepared.user_profile
+            ))
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"AI service error: {str(e)}"
+            )
+
+    async def event_stream() -> AsyncIterator[str]:
+        # 请求级会话在响应开始推流时已经关闭, 流内使用独立会话
+        async with async_session_maker() as stream_db:
+            if cache_result:
+                cache_entry, cache_layer = cache_result
+
+                logger.info(
+                    f"✅ CACHE HIT ({cache_layer}) | "
+                    f"Query: {request.message[:30]}... | "
+                    f"Provider: {cache_entry.provider}"
+                )
+
+                yield _sse_event("meta", {
+                    "conversation_id": conversation_id,
+                    "ai_provider": cache_entry.provider,
+                    "intent": cache_entry.intent,
+                    "complexity_score": cache_entry.complexity,
+                    "from_cache": True,
+                    "cache_layer": cache_layer
+                })
+                time_to_first_token_ms = int((time.time() - start_time) * 1000)
+                yield _sse_event("delta", {"content": cache_entry.response})
+
+                await _save_chat_turn(
+                    db=stream_db,
+                    conversation_id=conversation_id,
+                    user_id=user_id,
+                    user_message=request.message,
+                    assistant_message=cache_entry.response,
+                    metadata={
+                        "provider": cache_entry.provider,
+                        "complexity": cache_entry.complexity,
+                        "intent": cache_entry.intent,
+                        "tokens": cache_entry.tokens_used,
+                        "from_cache": True,
+                        "cache_layer": cache_layer
+                    },
+                    ai_provider=cache_entry.provider,
+                    tokens_used=cache_entry.tokens_used
+                )
+
+                yield _sse_event("done", ChatResponse(
+                    conversation_id=conversation_id,
+                    message=cache_entry.response,
+                    intent=cache_entry.intent,
+                    complexity_score=cache_entry.complexity,
+                    ai_provider=cache_entry.provider,
+                    tokens_used=cache_entry.tokens_used,
+                    response_time_ms=int((time.time() - start_time) * 1000),
+                    from_cache=True,
+                    cache_layer=cache_layer,
+                    time_to_first_token_ms=time_to_first_token_ms
+                ).model_dump(mode="json"))
+                return
+
+            provider = routing_decision.provider.value
+            intent = routing_decision.intent.intent.value
+
+            yield _sse_event("meta", {
+                "conversation_id": conversation_id,
+                "ai_provider": provider,
+                "intent": intent,
+                "complexity_score": routing_decision.complexity,
+                "from_cache": False,
+                "cache_layer": None
+            })
+
+            content_parts: List[str] = []
+            tokens_used = None
+            time_to_first_token_ms = None
+
+            try:
+                async for chunk in ai_orchestrator.generate_response_stream(
+                    provider=routing_decision.provider,
+                    system_prompt=system_prompt,
+                    user_message=request.message,
+                    conversation_history=conversation_history,
+                    tools=tools,
+                    user_id=user_id,
+                    db=stream_db,
+                    max_tokens=2000,
+                    temperature=0.7
+                ):
+                    if chunk.content:
+                        if time_to_first_token_ms is None:
+                            time_to_first_token_ms = int((time.time() - start_time) * 1000)
+                        content_parts.append(chunk.content)
+                        yield _sse_event("delta", {"content": chunk.content})
+                    if chunk.tokens_used is not None:
+                        tokens_used = chunk.tokens_used
+
+            except Exception as e:
+                logger.error(f"AI streaming error: {e}")
+                yield _sse_event("error", {"detail": f"AI service error: {str(e)}"})
+                return
+
+            content = "".join(content_parts)
+
+            # 流结束后保存本轮对话、更新会话信息(单事务)
+            await _save_chat_turn(
+                db=stream_db,
+                conversation_id=conversation_id,
+                user_id=user_id,
+                user_message=request.message,
+                assistant_message=content,
+                metadata={
+                    "provider": provider,
+                    "complexity": routing_decision.complexity,
+                    "intent": intent,
+                    "tokens": tokens_used
+                },
+                ai_provider=provider,
+                tokens_used=tokens_used
+            )
+
+            # 写入缓存
+            await cache_manager.set_cache(
+                query=request.message,
+                response=content,
+                user_id=str(user_id),
+                provider=provider,
+                intent=intent,
+                complexity=routing_decision.complexity,
+                tokens_used=tokens_used,
+                conversation_history=conversation_history,
+                ttl=86400  # 24小时
+            )
+
+            response_time_ms = int((time.time() - start_time) * 1000)
+
+            logger.info(
+                f"📡 Stream completed | Provider: {provider} | "
+                f"TTFT: {time_to_first_token_ms}ms | Total: {response_time_ms}ms"
+            )
+
+            yield _sse_event("done", ChatResponse(
+                conversation_id=conversation_id,
+                message=content,
+                ai_provider=provider,
+                complexity_score=routing_decision.complexity,
+                intent=intent,
+                tokens_used=tokens_used,
+                response_time_ms=response_time_ms,
+                time_to_first_token_ms=time_to_first_token_ms
+            ).model_dump(mode="json"))
+
+    # 流内使用独立会话写入本轮对话, 新建的会话需先提交才对其可见
+    if not request.conversation_id:
+        await db.commit()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # 禁用Nginx缓冲
+            "Content-Encoding": "identity",  # 跳过GZipMiddleware, 避免事件被压缩缓冲
+            "Server-Timing": _server_timing_header(timings)
+        }
+    )
+
+
 @router.get("/history/{conversation_id}", response_model=ConversationHistory)
 async def get_conversation_history(
     conversation_id: UUID,
@@ -328,14 +698,17 @@ async def get_conversation_history(
 
     # 转换消息格式
     from app.schemas.chat import ChatMessage
+    conversation_messages = await conversation_crud.get_conversation_messages(
+        db, conversation.id
+    )
     messages = [
         ChatMessage(
-            role=msg.get("role", ""),
-            content=msg.get("content", ""),
-            metadata=msg.get("metadata"),
-            timestamp=msg.get("timestamp")
+            role=msg.role,
+            content=msg.content,
+            metadata=msg.message_metadata,
+            timestamp=msg.created_at
         )
-        for msg in conversation.messages
+        for msg in conversation_messages
     ]
 
     return ConversationHistory(
@@ -17,7 +17,7 @@ from loguru import logger
 
 from app.core.database import get_db
 from app.models.user import User
-from app.api.dependencies import get_current_active_user
+from app.api.deps import get_current_active_user
 from app.ai.energy_prediction import (
     EnergyPredictionModel,
     get_energy_prediction_model,
@@ -123,6 +123,10 @@ class DigitalTwinResponse(BaseModel):
     recommendations: List[str]
     data_completeness: float
     last_updated: datetime
+    computed_at: Optional[datetime] = Field(None, description="快照计算时间")
+    is_stale: bool = Field(False, description="快照是否已过期(数据有更新或超过有效期)")
+    stale_since: Optional[datetime] = Field(None, description="快照开始过期的时间")
+    refreshing: bool = Field(False, description="是否已在后台重新计算")
 
     class Config:
         json_schema_extra = {
@@ -141,7 +145,11 @@ class DigitalTwinResponse(BaseModel):
                 },
                 "recommendations": [],
                 "data_completeness": 0.75,
-                "last_updated": "2025-10-08T10:00:00Z"
+                "last_updated": "2025-10-08T10:00:00Z",
+                "computed_at": "2025-10-08T10:00:00Z",
+                "is_stale": True,
+                "stale_since": "2025-10-08T10:20:00Z",
+                "refreshing": True
             }
         }
 
@@ -284,12 +292,21 @@ async def get_digital_twin(
     - 个人精力模式 (日周期、周周期)
     - 个性化基线校准
     - 统计数据和建议
+
+    返回持久化的快照; 健康/环境数据更新或超过有效期后快照标记为过期(is_stale),
+    此时仍返回旧快照并在后台重新计算, 稍后再次请求即可拿到新结果
     """
+    if prediction_hours < 1 or prediction_hours > 168:  # 最多预测7天
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Prediction hours must be between 1 and 168"
+        )
+
     try:
         twin_manager = await get_digital_twin_manager()
 
-        # 获取数字孪生
-        twin = await twin_manager.get_digital_twin(
+        # 获取数字孪生(快照)
+        twin = await twin_manager.get_cached_digital_twin(
             str(current_user.id),
             db,
             include_predictions=include_predictions,
@@ -350,14 +367,19 @@ async def get_digital_twin(
             stats=twin.stats,
             recommendations=twin.recommendations,
             data_completeness=twin.data_completeness,
-            last_updated=twin.last_updated
+            last_updated=twin.last_updated,
+            computed_at=twin.computed_at,
+            is_stale=twin.is_stale,
+            stale_since=twin.stale_since,
+            refreshing=twin.refreshing
         )
 
         logger.info(
             f"✅ Digital twin retrieved | User: {current_user.id} | "
             f"Energy: {twin.real_time_score:.1f}/10 | "
             f"Patterns: {len(twin.patterns)} | "
-            f"Completeness: {twin.data_completeness:.0%}"
+            f"Completeness: {twin.data_completeness:.0%} | "
+            f"Stale: {twin.is_stale}"
         )
 
         return response
@@ -386,12 +408,14 @@ async def get_energy_patterns(
     识别:
     - 日周期模式 (哪些时段精力最好)
     - 周周期模式 (工作日vs周末差异)
+
+    读取每晚批量识别保存的结果, 还没有保存过时当场识别
     """
     try:
         twin_manager = await get_digital_twin_manager()
 
         # 获取模式
-        patterns = await twin_manager._identify_patterns(
+        patterns = await twin_manager.get_patterns(
             str(current_user.id),
             db
         )
@@ -433,12 +457,14 @@ async def get_personal_baseline(
     - 高精力阈值
     - 低精力阈值
     - 最佳睡眠时长
+
+    读取每晚批量计算保存的基线, 还没有保存过时当场计算
     """
     try:
         twin_manager = await get_digital_twin_manager()
 
-        # 计算基线
-        baseline = await twin_manager._calculate_baseline(
+        # 获取基线
+        baseline = await twin_manager.get_baseline(
             str(current_user.id),
             db
         )
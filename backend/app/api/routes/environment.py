@@ -13,7 +13,8 @@ from pydantic import BaseModel, Field
 from app.core.database import get_db
 from app.models.user import User
 from app.models.energy import EnvironmentData
-from app.api.dependencies import get_current_active_user
+from app.api.deps import get_current_active_user
+from app.crud.twin_snapshots import mark_twin_snapshots_stale
 from app.services.weather import get_weather_service
 from sqlalchemy import select
 
@@ -119,6 +120,7 @@ async def report_environment_data(
         )
 
         db.add(env_data)
+        await mark_twin_snapshots_stale(db, [current_user.id])
         await db.commit()
         await db.refresh(env_data)
 
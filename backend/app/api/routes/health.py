@@ -6,20 +6,29 @@
 from datetime import datetime
 from typing import List, Optional, Annotated
 from uuid import UUID
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import CurrentUser, DatabaseSession
+from app.core.config import settings
 from app.crud import health_data as health_crud
-from app.models.health_data import HealthData, HealthDataType, HealthDataSource
+from app.crud.health_partitions import ensure_health_data_partitions
+from app.services.feature_store_metrics import get_feature_store_metrics
+from app.services.health_sync import SyncJobStatus, get_health_sync_job_store, ingest_ndjson_stream
+from app.models.health_data import HealthDataType, HealthDataSource
 from app.schemas.health import (
     HealthDataCreate,
     HealthDataResponse,
     HealthDataBatchCreate,
+    HealthDataBulkCreate,
+    HealthBulkIngestResponse,
     HealthSummaryResponse,
     HealthDataListResponse,
     HealthSyncRequest,
-    HealthSyncResponse
+    HealthSyncJobResponse,
+    HealthSyncJobStatusResponse,
+    HealthStreamSyncResponse,
+    HealthFeatureStoreStatsResponse
 )
 
 
@@ -51,6 +60,10 @@ async def create_health_data(
             detail=f"Invalid data type: {data.data_type}"
         )
 
+    # 缺少的月度分区须在本事务读取health_data(查重)之前创建
+    recorded_at = data.recorded_at or datetime.utcnow()
+    await ensure_health_data_partitions([recorded_at])
+
     # 如果有external_id,检查是否重复
     if data.external_id:
         is_duplicate = await health_crud.check_duplicate_sync(
@@ -69,7 +82,7 @@ async def create_health_data(
         value=data.value,
         source=data.source or HealthDataSource.MANUAL,
         unit=data.unit,
-        recorded_at=data.recorded_at,
+        recorded_at=recorded_at,
         extra_data=data.extra_data,
         external_id=data.external_id
     )
@@ -92,38 +105,74 @@ async def create_health_data_batch(
         current_user: 当前用户
 
     Returns:
-        创建的健康数据列表
+        创建的健康数据列表(已同步过的external_id被跳过)
     """
-    health_data_list = []
+    now = datetime.utcnow()
+    rows = [
+        {
+            "user_id": current_user.id,
+            "data_type": data.data_type,
+            "value": data.value,
+            "source": data.source or HealthDataSource.MANUAL,
+            "unit": data.unit,
+            "recorded_at": data.recorded_at or now,
+            "extra_data": data.extra_data,
+            "external_id": data.external_id,
+            "synced_at": now
+        }
+        for data in batch_data.data
+    ]
+
+    # 重复数据由唯一索引在同一条INSERT中跳过
+    created_data = await health_crud.insert_health_data_batch(db, rows)
 
-    for data in batch_data.data:
-        # 跳过重复数据
-        if data.external_id:
-            is_duplicate = await health_crud.check_duplicate_sync(
-                db, current_user.id, data.external_id
-            )
-            if is_duplicate:
-                continue
-
-        health_data_obj = HealthData(
-            user_id=current_user.id,
-            data_type=data.data_type,
-            value=data.value,
-            source=data.source or HealthDataSource.MANUAL,
-            unit=data.unit,
-            recorded_at=data.recorded_at or datetime.utcnow(),
-            extra_data=data.extra_data,
-            external_id=data.external_id,
-            synced_at=datetime.utcnow()
-        )
-        health_data_list.append(health_data_obj)
+    return [HealthDataResponse.model_validate(d) for d in created_data]
 
-    if not health_data_list:
-        return []
 
-    created_data = await health_crud.create_health_data_batch(db, health_data_list)
+@router.post("/data/bulk", response_model=HealthBulkIngestResponse, status_code=status.HTTP_201_CREATED)
+async def bulk_ingest_health_data(
+    bulk_data: HealthDataBulkCreate,
+    db: DatabaseSession,
+    current_user: CurrentUser,
+    return_ids: bool = Query(False, description="是否返回新写入数据的ID")
+) -> HealthBulkIngestResponse:
+    """
+    大批量导入健康数据(COPY)
 
-    return [HealthDataResponse.model_validate(d) for d in created_data]
+    用于新用户首次同步的历史回填, 只返回写入/跳过条数
+
+    Args:
+        bulk_data: 批量健康数据
+        db: 数据库会话
+        current_user: 当前用户
+        return_ids: 是否返回新写入数据的ID
+
+    Returns:
+        导入结果
+    """
+    now = datetime.utcnow()
+    rows = [
+        {
+            "user_id": current_user.id,
+            "data_type": data.data_type,
+            "value": data.value,
+            "source": data.source or HealthDataSource.MANUAL,
+            "unit": data.unit,
+            "recorded_at": data.recorded_at or now,
+            "extra_data": data.extra_data,
+            "external_id": data.external_id,
+            "synced_at": now
+        }
+        for data in bulk_data.data
+    ]
+
+    result = await health_crud.bulk_ingest_health_data(db, rows, return_ids=return_ids)
+
+    return HealthBulkIngestResponse(
+        inserted=result.inserted,
+        skipped=result.skipped,
+        ids=result.ids
+    )
 
 
 @router.get("/data/{data_type}", response_model=HealthDataListResponse)
@@ -228,6 +277,31 @@ async def get_health_summary(
     )
 
 
+@router.get("/features/stats", response_model=HealthFeatureStoreStatsResponse)
+async def get_feature_store_stats(
+    current_user: CurrentUser
+) -> HealthFeatureStoreStatsResponse:
+    """
+    获取特征存储统计
+
+    Args:
+        current_user: 当前用户
+
+    Returns:
+        增量更新成本(次数/耗时/数据量)和新鲜度(写入延迟/读取时数据年龄/均值过期)
+    """
+    try:
+        metrics = await get_feature_store_metrics()
+        stats = await metrics.get_stats()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get feature store stats: {str(e)}"
+        )
+
+    return HealthFeatureStoreStatsResponse(**stats)
+
+
 @router.delete("/data/{data_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_health_data(
     data_id: UUID,
@@ -257,129 +331,121 @@ async def delete_health_data(
     return None
 
 
-@router.post("/sync", response_model=HealthSyncResponse)
+@router.post("/sync", response_model=HealthSyncJobResponse, status_code=status.HTTP_202_ACCEPTED)
 async def sync_health_data(
     sync_request: HealthSyncRequest,
-    db: DatabaseSession,
     current_user: CurrentUser
-) -> HealthSyncResponse:
+) -> HealthSyncJobResponse:
     """
     同步健康数据（从HealthKit/Google Fit）
 
-    批量导入来自移动设备健康平台的数据，自动去重，支持多种数据类型。
+    只接收数据并创建后台任务, 由Celery worker分批写入(自动去重),
+    客户端通过 GET /health/sync/{job_id} 查询进度
 
     Args:
         sync_request: 同步请求数据
-        db: 数据库会话
         current_user: 当前用户
 
     Returns:
-        同步结果，包含成功数量和错误信息
+        同步任务ID和状态
+
+    Raises:
+        HTTPException 503: 任务队列不可用
     """
-    synced_count = 0
-    errors = []
-
-    # 数据类型映射（从前端类型到数据库类型）
-    type_mapping = {
-        "sleep": HealthDataType.SLEEP_DURATION,
-        "steps": HealthDataType.STEPS,
-        "heart_rate": HealthDataType.HEART_RATE,
-        "activity": HealthDataType.ACTIVE_CALORIES,
-        "calories": HealthDataType.ACTIVE_CALORIES,
-        "distance": HealthDataType.DISTANCE,
-    }
-
-    # 确定数据来源
-    source = (
-        HealthDataSource.APPLE_HEALTH
-        if sync_request.data_source == "apple_health"
-        else HealthDataSource.GOOGLE_FIT
+    from app.tasks.health import process_health_sync_job
+
+    try:
+        store = await get_health_sync_job_store()
+        job_id = await store.create_job(current_user.id, sync_request)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Sync job store unavailable: {str(e)}"
+        )
+
+    try:
+        process_health_sync_job.delay(job_id)
+    except Exception as e:
+        await store.update(job_id, status=SyncJobStatus.FAILED)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Failed to enqueue sync job: {str(e)}"
+        )
+
+    return HealthSyncJobResponse(
+        job_id=job_id,
+        status=SyncJobStatus.QUEUED,
+        total_records=len(sync_request.records),
+        status_url=f"{settings.api_prefix}/health/sync/{job_id}"
     )
 
-    health_data_list = []
 
-    for record in sync_request.records:
-        try:
-            # 映射数据类型
-            data_type = type_mapping.get(record.type, record.type)
+@router.post("/sync/stream", response_model=HealthStreamSyncResponse)
+async def stream_sync_health_data(
+    request: Request,
+    current_user: CurrentUser,
+    data_source: str = Query(..., pattern="^(apple_health|google_fit)$", description="数据来源")
+) -> HealthStreamSyncResponse:
+    """
+    流式同步健康数据(NDJSON, 可gzip压缩)
 
-            # 生成外部ID用于去重
-            external_id = f"{sync_request.data_source}_{record.type}_{record.date}_{current_user.id}"
+    请求体每行一条同步记录 {"type", "date", "value", "metadata"},
+    Content-Encoding: gzip 时边解压边解析; 按批写入, 解析与写入重叠进行,
+    单请求内存只与批大小有关, 与上传体积无关
 
-            # 检查是否已同步
-            is_duplicate = await health_crud.check_duplicate_sync(
-                db, current_user.id, external_id
-            )
-            if is_duplicate:
-                continue
-
-            # 解析日期
-            try:
-                recorded_at = datetime.fromisoformat(record.date)
-            except ValueError:
-                recorded_at = datetime.strptime(record.date, "%Y-%m-%d")
-
-            # 处理value（可能是对象或数值）
-            if isinstance(record.value, dict):
-                # 对于activity类型，value是一个包含多个指标的对象
-                # 为每个指标创建单独的记录
-                for key, val in record.value.items():
-                    sub_type = type_mapping.get(key, key)
-                    sub_external_id = f"{external_id}_{key}"
-
-                    # 检查子记录是否已同步
-                    is_sub_duplicate = await health_crud.check_duplicate_sync(
-                        db, current_user.id, sub_external_id
-                    )
-                    if is_sub_duplicate:
-                        continue
-
-                    health_data_obj = HealthData(
-                        user_id=current_user.id,
-                        data_type=sub_type,
-                        value=float(val),
-                        source=source,
-                        unit=None,
-                        recorded_at=recorded_at,
-                        extra_data=record.metadata or {},
-                        external_id=sub_external_id,
-                        synced_at=datetime.utcnow()
-                    )
-                    health_data_list.append(health_data_obj)
-            else:
-                # 普通数值类型
-                health_data_obj = HealthData(
-                    user_id=current_user.id,
-                    data_type=data_type,
-                    value=float(record.value),
-                    source=source,
-                    unit=None,
-                    recorded_at=recorded_at,
-                    extra_data=record.metadata or {},
-                    external_id=external_id,
-                    synced_at=datetime.utcnow()
-                )
-                health_data_list.append(health_data_obj)
-
-        except Exception as e:
-            errors.append(f"处理记录 {record.type}@{record.date} 失败: {str(e)}")
-            continue
-
-    # 批量插入数据
-    if health_data_list:
-        try:
-            created_data = await health_crud.create_health_data_batch(db, health_data_list)
-            synced_count = len(created_data)
-        except Exception as e:
-            errors.append(f"批量插入失败: {str(e)}")
-            return HealthSyncResponse(
-                success=False,
-                synced=0,
-                errors=errors
-            )
+    Args:
+        request: 原始请求(读取请求体流)
+        current_user: 当前用户
+        data_source: 数据来源(apple_health或google_fit)
+
+    Returns:
+        同步结果(写入/重复/错误条数)
+
+    Raises:
+        HTTPException 415: 不支持的Content-Encoding
+    """
+    content_encoding = request.headers.get("content-encoding", "identity").lower()
+    if content_encoding not in ("identity", "gzip"):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported Content-Encoding: {content_encoding}"
+        )
 
-    return HealthSyncResponse(
-        success=len(errors) == 0 or synced_count > 0,
-        synced=synced_count,
-        errors=errors
+    result = await ingest_ndjson_stream(
+        request.stream(),
+        user_id=current_user.id,
+        data_source=data_source,
+        gzipped=content_encoding == "gzip"
     )
+
+    return HealthStreamSyncResponse(**result)
+
+
+@router.get("/sync/{job_id}", response_model=HealthSyncJobStatusResponse)
+async def get_health_sync_job(
+    job_id: str,
+    current_user: CurrentUser
+) -> HealthSyncJobStatusResponse:
+    """
+    查询健康数据同步任务进度
+
+    Args:
+        job_id: 同步任务ID
+        current_user: 当前用户
+
+    Returns:
+        任务状态和已处理/新写入/重复/错误条数
+
+    Raises:
+        HTTPException 404: 任务不存在、已过期或不属于当前用户
+    """
+    store = await get_health_sync_job_store()
+    job = await store.get_job(job_id)
+
+    if not job or job.get("user_id") != str(current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Sync job {job_id} not found"
+        )
+
+    return HealthSyncJobStatusResponse(**job)
@@ -10,7 +10,7 @@ from pydantic import BaseModel, Field
 
 from app.core.database import get_db
 from app.models.user import User
-from app.api.dependencies import get_current_active_user
+from app.api.deps import get_current_active_user
 from app.services.weather import get_weather_service, WeatherService
 
 logger = logging.getLogger(__name__)
@@ -16,7 +16,10 @@ celery_app = Celery(
     backend=settings.CELERY_RESULT_BACKEND,
     include=[
         "app.tasks.environment",
-        "app.tasks.briefing"
+        "app.tasks.briefing",
+        "app.tasks.cache",
+        "app.tasks.health",
+        "app.tasks.energy"
     ]
 )
 
@@ -66,6 +69,38 @@ celery_app.conf.beat_schedule = {
             "expires": 7200,  # 2小时内有效
         }
     },
+    # 清理过期的L2语义缓存（每小时）
+    "sweep-expired-semantic-cache": {
+        "task": "app.tasks.cache.sweep_expired_semantic_cache",
+        "schedule": crontab(minute=30),  # 每小时30分执行, 与环境数据采集错开
+        "options": {
+            "expires": 3300,  # 55分钟内有效
+        }
+    },
+    # 刷新特征向量近N天均值（UTC零点后, 即北京时间8:05）
+    "refresh-health-feature-means": {
+        "task": "app.tasks.health.refresh_health_feature_means",
+        "schedule": crontab(hour=8, minute=5),
+        "options": {
+            "expires": 3600,  # 1小时内有效
+        }
+    },
+    # health_data分区维护与降采样（每天3:15, 避开早晚高峰任务）
+    "maintain-health-data-partitions": {
+        "task": "app.tasks.health.maintain_health_data_partitions",
+        "schedule": crontab(hour=3, minute=15),
+        "options": {
+            "expires": 7200,  # 2小时内有效
+        }
+    },
+    # 计算个性化基线和精力模式（每天4:00, 在分区维护之后）
+    "refresh-energy-profiles": {
+        "task": "app.tasks.energy.refresh_energy_profiles",
+        "schedule": crontab(hour=4, minute=0),
+        "options": {
+            "expires": 7200,  # 2小时内有效
+        }
+    },
 }
 
 
@@ -59,6 +59,11 @@ class Settings(BaseSettings):
     QDRANT_COLLECTION_NAME: str = "health_knowledge"
     QDRANT_EMBEDDING_DIM: int = 384  # MiniLM模型维度
 
+    # 嵌入服务(Sentence-Transformers微批处理)
+    EMBEDDING_BATCH_MAX_SIZE: int = Field(default=32, ge=1, le=256)  # 单批最大文本数
+    EMBEDDING_BATCH_MAX_WAIT_MS: int = Field(default=5, ge=0, le=1000)  # 攒批最长等待(毫秒)
+    EMBEDDING_EXECUTOR_WORKERS: int = Field(default=2, ge=1, le=16)  # 专用编码线程数
+
     # ============ AI模型配置 ============
     # OpenAI - 使用最新GPT-5系列
     OPENAI_API_KEY: str = Field(default="", description="OpenAI API密钥")
@@ -77,6 +82,8 @@ class Settings(BaseSettings):
     LOCAL_MODEL_NAME: str = "microsoft/Phi-3.5-mini-instruct"
     USE_LOCAL_MODEL: bool = True
     LOCAL_MODEL_DEVICE: str = Field(default="cpu", pattern="^(cpu|cuda|mps)$")
+    LOCAL_MODEL_BATCH_MAX_SIZE: int = Field(default=8, ge=1, le=64)  # 单批最大请求数
+    LOCAL_MODEL_BATCH_MAX_WAIT_MS: int = Field(default=10, ge=0, le=1000)  # 攒批最长等待(毫秒)
 
     # AI路由策略
     AI_ROUTE_LOCAL_THRESHOLD: int = Field(default=3, ge=0, le=10)
@@ -90,6 +97,12 @@ class Settings(BaseSettings):
     CACHE_L3_TTL: int = 0  # L3 知识库永久缓存
     CACHE_SIMILARITY_THRESHOLD: float = Field(default=0.92, ge=0.0, le=1.0)  # L2语义相似度阈值
     CACHE_MIN_COMPLEXITY: int = Field(default=3, ge=1, le=10)  # 最低缓存复杂度
+    CACHE_L2_MAX_ENTRIES_PER_USER: int = Field(default=500, ge=1)  # L2每用户最多条目(超出按LFU淘汰)
+    CACHE_L2_SWEEP_BATCH_SIZE: int = Field(default=1000, ge=1, le=10000)  # 过期清理每批删除数
+    CACHE_WRITE_QUEUE_SIZE: int = Field(default=1000, ge=1)  # 缓存后台写入队列容量(满时丢弃)
+    CACHE_WRITE_BATCH_SIZE: int = Field(default=64, ge=1, le=1000)  # 单批合并写入条数
+    CACHE_WRITE_MAX_WAIT_MS: int = Field(default=50, ge=0, le=5000)  # 攒批最长等待(毫秒)
+    CACHE_HEALTH_SUMMARY_TTL: int = Field(default=3600, ge=1)  # 健康摘要缓存最长有效期(秒, 另在UTC零点失效)
 
     # ============ 安全配置 ============
     JWT_SECRET_KEY: str = Field(
@@ -148,9 +161,21 @@ class Settings(BaseSettings):
     MORNING_BRIEFING_TIME: str = "07:00"
     EVENING_REVIEW_TIME: str = "22:00"
     TIMEZONE: str = "Asia/Shanghai"
+    BRIEFING_FORECAST_HOURS: int = Field(default=16, ge=1, le=48)  # 早间简报预测的小时数(07:00-22:00)
+    ENERGY_BATCH_CHUNK_SIZE: int = Field(default=2000, ge=1)  # 批量精力预测每批用户数
+    ENERGY_PROFILE_BATCH_SIZE: int = Field(default=500, ge=1)  # 每晚计算基线/精力模式时每批用户数
+    DIGITAL_TWIN_SNAPSHOT_MAX_AGE_MINUTES: int = Field(default=60, ge=1)  # 数字孪生快照最长有效期(当前精力和预测曲线随时间推移)
+    DIGITAL_TWIN_REFRESH_RETRY_SECONDS: int = Field(default=300, ge=10)  # 同一快照重复提交后台重算的最短间隔
 
     HEALTH_DATA_RETENTION_DAYS: int = 180
+    HEALTH_DATA_RAW_RETENTION_DAYS: int = Field(default=90, ge=60)  # 原始数据保留天数, 更早的降采样为小时汇总(需覆盖数字孪生最长8周的查询窗口)
+    HEALTH_DATA_PARTITION_PREMAKE_MONTHS: int = Field(default=3, ge=1)  # 提前创建的未来月度分区数
+    HEALTH_DATA_PARTITION_LOCK_TIMEOUT_MS: int = Field(default=5000, ge=100)  # 按需建分区等待health_data锁的上限(毫秒), 超时后由调用方重试
     SYNC_INTERVAL_MINUTES: int = 30
+    HEALTH_BULK_INGEST_THRESHOLD: int = Field(default=500, ge=1)  # 单次写入超过该条数时改用COPY批量导入
+    HEALTH_BULK_INGEST_MAX_RECORDS: int = Field(default=50000, ge=1)  # 单次批量导入最大条数
+    HEALTH_SYNC_CHUNK_SIZE: int = Field(default=2000, ge=1)  # 异步同步任务每批写入条数
+    HEALTH_SYNC_JOB_TTL: int = 86400  # 同步任务状态和数据在Redis中的保留时间(秒)
 
     # ============ MCP服务器配置 ============
     MCP_HEALTH_SERVER_PORT: int = 8001
@@ -222,6 +247,11 @@ class Settings(BaseSettings):
 settings = Settings()
 
 
+def get_settings() -> Settings:
+    """获取全局配置实例"""
+    return settings
+
+
 # 开发环境下打印配置(敏感信息脱敏)
 if settings.is_development:
     import json
@@ -5,10 +5,10 @@ Conversation CRUD操作
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 from uuid import UUID
-from sqlalchemy import select, desc, func
+from sqlalchemy import select, update, desc, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.conversation import Conversation
+from app.models.conversation import Conversation, ConversationMessage
 from app.models.user import User
 
 
@@ -18,7 +18,8 @@ async def create_conversation(
     db: AsyncSession,
     user_id: UUID,
     initial_message: Optional[str] = None,
-    coach_type: Optional[str] = None
+    coach_type: Optional[str] = None,
+    commit: bool = True
 ) -> Conversation:
     """
     创建新会话
@@ -28,25 +29,37 @@ async def create_conversation(
         user_id: 用户ID
         initial_message: 初始消息(可选)
         coach_type: 教练类型(可选,用于会话标记)
+        commit: 是否立即提交; False时只flush拿到ID,
+            由调用方在同一事务中继续写入(如append_chat_turn)
 
     Returns:
         创建的会话对象
     """
     conversation = Conversation(
         user_id=user_id,
-        messages=[],
         message_count=0
     )
+    db.add(conversation)
 
-    # 如果有初始消息,添加到会话
+    # 如果有初始消息,作为seq=1写入消息表
     if initial_message:
-        conversation.add_message(
-            role="user",
-            content=initial_message,
-            metadata={"coach_type": coach_type} if coach_type else None
+        await db.flush()
+        conversation.message_count = 1
+        conversation.last_message_at = datetime.utcnow()
+        db.add(
+            ConversationMessage(
+                conversation_id=conversation.id,
+                seq=1,
+                role="user",
+                content=initial_message,
+                message_metadata={"coach_type": coach_type} if coach_type else None
+            )
         )
 
-    db.add(conversation)
+    if not commit:
+        await db.flush()
+        return conversation
+
     await db.commit()
     await db.refresh(conversation)
 
@@ -161,6 +174,30 @@ async def get_latest_conversation(
     return result.scalar_one_or_none()
 
 
+async def get_conversation_messages(
+    db: AsyncSession,
+    conversation_id: UUID
+) -> List[ConversationMessage]:
+    """
+    获取会话的全部消息(按seq正序)
+
+    调用方需先校验会话归属
+
+    Args:
+        db: 数据库会话
+        conversation_id: 会话ID
+
+    Returns:
+        消息列表
+    """
+    result = await db.execute(
+        select(ConversationMessage)
+        .where(ConversationMessage.conversation_id == conversation_id)
+        .order_by(ConversationMessage.seq)
+    )
+    return list(result.scalars().all())
+
+
 # ============ 更新操作 ============
 
 async def add_message_to_conversation(
@@ -170,9 +207,12 @@ async def add_message_to_conversation(
     role: str,
     content: str,
     metadata: Optional[Dict[str, Any]] = None
-) -> Conversation:
+) -> ConversationMessage:
     """
-    向会话添加消息
+    向会话添加消息(追加一行到conversation_messages)
+
+    message_count原子自增并通过RETURNING拿到新消息的seq,
+    行锁保证并发追加时seq不冲突; 不读取、不改写历史消息
 
     Args:
         db: 数据库会话
@@ -183,26 +223,121 @@ async def add_message_to_conversation(
         metadata: 消息元数据
 
     Returns:
-        更新后的会话对象
+        新增的消息
 
     Raises:
         ValueError: 如果会话不存在或无权限
     """
-    conversation = await get_conversation_by_id(db, conversation_id, user_id)
+    now = datetime.utcnow()
 
-    if not conversation:
+    result = await db.execute(
+        update(Conversation)
+        .where(
+            Conversation.id == conversation_id,
+            Conversation.user_id == user_id
+        )
+        .values(
+            message_count=Conversation.message_count + 1,
+            last_message_at=now,
+            updated_at=now
+        )
+        .returning(Conversation.message_count)
+        .execution_options(synchronize_session=False)
+    )
+    seq = result.scalar_one_or_none()
+
+    if seq is None:
         raise ValueError(f"Conversation {conversation_id} not found or access denied")
 
-    # 使用模型方法添加消息
-    conversation.add_message(role=role, content=content, metadata=metadata)
+    message = ConversationMessage(
+        conversation_id=conversation_id,
+        seq=seq,
+        role=role,
+        content=content,
+        message_metadata=metadata,
+        created_at=now
+    )
+    db.add(message)
+
+    await db.commit()
 
-    # 更新updated_at时间戳
-    conversation.updated_at = datetime.utcnow()
+    return message
+
+
+async def append_chat_turn(
+    db: AsyncSession,
+    conversation_id: UUID,
+    user_id: UUID,
+    messages: List[Dict[str, Any]],
+    ai_provider: Optional[str] = None,
+    tokens_used: Optional[int] = None
+) -> List[ConversationMessage]:
+    """
+    写入一轮对话(单事务)
+
+    一条UPDATE ... RETURNING同时为本轮消息分配seq、更新AI提供商和token计数,
+    随后插入全部消息行, 整轮只提交一次; 不加载、不refresh会话对象
+
+    Args:
+        db: 数据库会话
+        conversation_id: 会话ID
+        user_id: 用户ID
+        messages: 本轮消息, 每项含role、content和可选的metadata
+        ai_provider: AI提供商名称(可选)
+        tokens_used: 本轮使用的token数(可选)
+
+    Returns:
+        新增的消息列表
+
+    Raises:
+        ValueError: 如果会话不存在或无权限
+    """
+    now = datetime.utcnow()
+
+    values: Dict[str, Any] = {
+        "message_count": Conversation.message_count + len(messages),
+        "last_message_at": now,
+        "updated_at": now
+    }
+    if ai_provider is not None:
+        values["ai_provider_used"] = ai_provider
+    if tokens_used is not None:
+        values["total_tokens_used"] = (
+            func.coalesce(Conversation.total_tokens_used, 0) + tokens_used
+        )
+
+    result = await db.execute(
+        update(Conversation)
+        .where(
+            Conversation.id == conversation_id,
+            Conversation.user_id == user_id
+        )
+        .values(**values)
+        .returning(Conversation.message_count)
+        .execution_options(synchronize_session=False)
+    )
+    last_seq = result.scalar_one_or_none()
+
+    if last_seq is None:
+        raise ValueError(f"Conversation {conversation_id} not found or access denied")
+
+    first_seq = last_seq - len(messages) + 1
+    rows = [
+        ConversationMessage(
+            conversation_id=conversation_id,
+            seq=first_seq + offset,
+            role=message["role"],
+            content=message["content"],
+            message_metadata=message.get("metadata"),
+            created_at=now
+        )
+        for offset, message in enumerate(messages)
+    ]
+    db.add_all(rows)
 
     await db.commit()
-    await db.refresh(conversation)
 
-    return conversation
+    return rows
 
 
 async def update_conversation_ai_provider(
@@ -349,17 +484,30 @@ async def get_conversation_summary(
     title = None
     last_message = None
 
-    if conversation.messages:
-        # 找到第一条用户消息
-        for msg in conversation.messages:
-            if msg.get("role") == "user":
-                title = msg.get("content", "")[:30] + "..." if len(msg.get("content", "")) > 30 else msg.get("content", "")
-                break
+    # 找到第一条用户消息
+    first_user_content = (await db.execute(
+        select(ConversationMessage.content)
+        .where(
+            ConversationMessage.conversation_id == conversation_id,
+            ConversationMessage.role == "user"
+        )
+        .order_by(ConversationMessage.seq)
+        .limit(1)
+    )).scalar_one_or_none()
 
-        # 获取最后一条消息
-        if conversation.messages:
-            last_msg = conversation.messages[-1]
-            last_message = last_msg.get("content", "")[:50] + "..." if len(last_msg.get("content", "")) > 50 else last_msg.get("content", "")
+    if first_user_content is not None:
+        title = first_user_content[:30] + "..." if len(first_user_content) > 30 else first_user_content
+
+    # 获取最后一条消息
+    last_content = (await db.execute(
+        select(ConversationMessage.content)
+        .where(ConversationMessage.conversation_id == conversation_id)
+        .order_by(desc(ConversationMessage.seq))
+        .limit(1)
+    )).scalar_one_or_none()
+
+    if last_content is not None:
+        last_message = last_content[:50] + "..." if len(last_content) > 50 else last_content
 
     return {
         "conversation_id": conversation.id,
@@ -382,6 +530,8 @@ async def get_conversation_context(
     """
     获取会话上下文(最近N条消息)
 
+    只读取最近N行(主键(conversation_id, seq)倒序扫描), 不加载整段历史
+
     Args:
         db: 数据库会话
         conversation_id: 会话ID
@@ -389,12 +539,18 @@ async def get_conversation_context(
         max_messages: 返回最多消息数
 
     Returns:
-        消息列表
+        消息列表(按时间正序)
     """
-    conversation = await get_conversation_by_id(db, conversation_id, user_id)
-
-    if not conversation or not conversation.messages:
-        return []
+    result = await db.execute(
+        select(ConversationMessage)
+        .join(Conversation, Conversation.id == ConversationMessage.conversation_id)
+        .where(
+            ConversationMessage.conversation_id == conversation_id,
+            Conversation.user_id == user_id
+        )
+        .order_by(desc(ConversationMessage.seq))
+        .limit(max_messages)
+    )
+    recent = list(result.scalars().all())
 
-    # 返回最近的N条消息
-    return conversation.messages[-max_messages:] if len(conversation.messages) > max_messages else conversation.messages
+    return [message.to_dict() for message in reversed(recent)]
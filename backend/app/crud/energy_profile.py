@@ -0,0 +1,171 @@
+"""
+个性化基线与精力模式
+energy_baselines(每个用户一行)和energy_patterns(每个用户每种模式一行)由每晚的批量任务计算后写入,
+接口直接读取; 还没有保存过的用户在第一次请求时计算并写入.
+数据不足的用户也写入一行标记(基线阈值为空 / 模式类型为none), 接口读到后不再重新计算
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+from uuid import UUID
+
+from sqlalchemy import delete, select, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.energy import EnergyBaseline, EnergyPattern
+
+
+# 单条UPSERT的最大行数(每行不超过9个参数)
+UPSERT_CHUNK_SIZE = 2000
+
+
+def _as_uuid(user_id) -> UUID:
+    return user_id if isinstance(user_id, UUID) else UUID(str(user_id))
+
+
+def _user_ids_param(user_ids: Iterable):
+    """user_id = ANY(:user_ids)的数组参数(参数个数与用户数无关)"""
+    return bindparam(
+        "user_ids",
+        [_as_uuid(user_id) for user_id in user_ids],
+        type_=ARRAY(PG_UUID(as_uuid=True))
+    )
+
+
+async def get_energy_baseline(
+    db: AsyncSession,
+    user_id: UUID
+) -> Optional[EnergyBaseline]:
+    """读取用户保存的个性化基线"""
+    result = await db.execute(
+        select(EnergyBaseline).where(EnergyBaseline.user_id == _as_uuid(user_id))
+    )
+    return result.scalar_one_or_none()
+
+
+async def get_energy_patterns(
+    db: AsyncSession,
+    user_id: UUID
+) -> List[EnergyPattern]:
+    """读取用户保存的精力模式(按模式类型排序)"""
+    result = await db.execute(
+        select(EnergyPattern)
+        .where(EnergyPattern.user_id == _as_uuid(user_id))
+        .order_by(EnergyPattern.pattern_type)
+    )
+    return list(result.scalars().all())
+
+
+async def upsert_energy_baselines(
+    db: AsyncSession,
+    user_ids: Iterable[UUID],
+    rows: List[Dict[str, Any]],
+    computed_at: Optional[datetime] = None
+) -> int:
+    """
+    写入一批用户的个性化基线(不提交)
+
+    user_ids中本次没有写入的用户删除旧基线, 与当场计算的结果保持一致
+
+    Args:
+        db: 数据库会话
+        user_ids: 本次计算的用户
+        rows: 基线字段字典(user_id, avg_energy, high_threshold, low_threshold,
+              optimal_sleep, data_points, calculation_period_days)
+        computed_at: 计算时间(默认现在)
+
+    Returns:
+        写入的基线数
+    """
+    computed_at = computed_at or datetime.now(timezone.utc)
+
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        chunk = [
+            {**row, "calculated_at": computed_at}
+            for row in rows[start:start + UPSERT_CHUNK_SIZE]
+        ]
+        stmt = pg_insert(EnergyBaseline).values(chunk)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["user_id"],
+                set_={
+                    "avg_energy": stmt.excluded.avg_energy,
+                    "high_threshold": stmt.excluded.high_threshold,
+                    "low_threshold": stmt.excluded.low_threshold,
+                    "optimal_sleep": stmt.excluded.optimal_sleep,
+                    "data_points": stmt.excluded.data_points,
+                    "calculation_period_days": stmt.excluded.calculation_period_days,
+                    "calculated_at": stmt.excluded.calculated_at,
+                    "updated_at": computed_at
+                }
+            )
+        )
+
+    # 本次写入的行calculated_at等于computed_at, 更早的就是没有重新算出基线的
+    await db.execute(
+        delete(EnergyBaseline)
+        .where(
+            EnergyBaseline.user_id == any_(_user_ids_param(user_ids)),
+            EnergyBaseline.calculated_at < computed_at
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    return len(rows)
+
+
+async def upsert_energy_patterns(
+    db: AsyncSession,
+    user_ids: Iterable[UUID],
+    rows: List[Dict[str, Any]],
+    computed_at: Optional[datetime] = None
+) -> int:
+    """
+    写入一批用户的精力模式(不提交)
+
+    按(user_id, pattern_type)覆盖; user_ids中本次没有识别出的模式删除
+
+    Args:
+        db: 数据库会话
+        user_ids: 本次计算的用户
+        rows: 模式字段字典(user_id, pattern_type, description, peak_hours,
+              low_hours, confidence, data_points)
+        computed_at: 识别时间(默认现在)
+
+    Returns:
+        写入的模式数
+    """
+    computed_at = computed_at or datetime.now(timezone.utc)
+
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        chunk = [
+            {**row, "identified_at": computed_at}
+            for row in rows[start:start + UPSERT_CHUNK_SIZE]
+        ]
+        stmt = pg_insert(EnergyPattern).values(chunk)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["user_id", "pattern_type"],
+                set_={
+                    "description": stmt.excluded.description,
+                    "peak_hours": stmt.excluded.peak_hours,
+                    "low_hours": stmt.excluded.low_hours,
+                    "confidence": stmt.excluded.confidence,
+                    "data_points": stmt.excluded.data_points,
+                    "identified_at": stmt.excluded.identified_at,
+                    "updated_at": computed_at
+                }
+            )
+        )
+
+    await db.execute(
+        delete(EnergyPattern)
+        .where(
+            EnergyPattern.user_id == any_(_user_ids_param(user_ids)),
+            EnergyPattern.identified_at < computed_at
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    return len(rows)
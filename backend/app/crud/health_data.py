@@ -3,13 +3,36 @@
 提供健康数据的增删改查功能
 """
 
-from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+import json
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Dict, Any, Tuple
 from uuid import UUID
-from sqlalchemy import select, func, and_, desc
+from sqlalchemy import select, delete, func, and_, desc, case, cast, literal, literal_column, text, tuple_, union_all, Date
+from sqlalchemy.dialects.postgresql import insert as pg_insert, array_agg, aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.health_data import HealthData, HealthDataType, HealthDataSource
+from app.crud.health_features import rebuild_feature_vector, update_feature_vectors
+from app.crud.twin_snapshots import mark_twin_snapshots_stale
+from app.crud.health_partitions import ensure_health_data_partitions, filter_downsampled_rows
+from app.models.health_data import (
+    HealthData, HealthDailyRollup, HealthDataHourly, HealthDataType, HealthDataSource
+)
+
+
+# 单条INSERT语句的最大行数(asyncpg单条语句最多32767个参数)
+INSERT_CHUNK_SIZE = 1000
+
+# 健康摘要使用的主要数据类型
+SUMMARY_DATA_TYPES = [
+    HealthDataType.SLEEP_DURATION,
+    HealthDataType.HRV,
+    HealthDataType.HEART_RATE_RESTING,
+    HealthDataType.STEPS,
+    HealthDataType.ENERGY_LEVEL,
+    HealthDataType.STRESS_LEVEL
+]
 
 
 async def create_health_data(
@@ -52,10 +75,16 @@ async def create_health_data(
         synced_at=datetime.utcnow()
     )
 
+    await ensure_health_data_partitions([health_data.recorded_at])
     db.add(health_data)
+    await upsert_daily_rollups(db, [health_data])
+    await update_feature_vectors(db, _feature_samples([health_data]))
+    await mark_twin_snapshots_stale(db, [user_id])
     await db.commit()
     await db.refresh(health_data)
 
+    await _invalidate_summary_cache(user_id)
+
     return health_data
 
 
@@ -73,9 +102,15 @@ async def create_health_data_batch(
     Returns:
         创建的健康数据列表
     """
+    await ensure_health_data_partitions([data.recorded_at for data in health_data_list])
     db.add_all(health_data_list)
+    await upsert_daily_rollups(db, health_data_list)
+    await update_feature_vectors(db, _feature_samples(health_data_list))
+    await mark_twin_snapshots_stale(db, {data.user_id for data in health_data_list})
     await db.commit()
 
+    await _invalidate_summary_cache(*{data.user_id for data in health_data_list})
+
     # 刷新所有对象
     for data in health_data_list:
         await db.refresh(data)
@@ -83,6 +118,218 @@ async def create_health_data_batch(
     return health_data_list
 
 
+async def insert_health_data_batch(
+    db: AsyncSession,
+    rows: List[Dict[str, Any]]
+) -> List[HealthData]:
+    """
+    批量写入健康数据, 跳过已同步的数据
+
+    去重依赖(user_id, external_id, recorded_at)唯一索引: INSERT ... ON CONFLICT DO NOTHING RETURNING
+    只返回真正写入的行, 不再逐条查询check_duplicate_sync; external_id为空的数据不参与去重;
+    落在已降采样小时内的数据同样跳过
+
+    Args:
+        db: 数据库会话
+        rows: 健康数据字段字典列表(user_id, data_type, value, source, recorded_at等)
+
+    Returns:
+        新写入的健康数据列表(重复数据不在其中)
+    """
+    unique_rows = await filter_downsampled_rows(db, _prepare_insert_rows(rows))
+    await ensure_health_data_partitions([row["recorded_at"] for row in unique_rows])
+
+    created: List[HealthData] = []
+
+    # 分块写入, 避免超出单条语句的参数个数上限
+    for start in range(0, len(unique_rows), INSERT_CHUNK_SIZE):
+        chunk = unique_rows[start:start + INSERT_CHUNK_SIZE]
+        stmt = (
+            pg_insert(HealthData)
+            .values(chunk)
+            .on_conflict_do_nothing(index_elements=["user_id", "external_id", "recorded_at"])
+            .returning(HealthData)
+        )
+        result = await db.scalars(stmt)
+        created.extend(result.all())
+
+    if created:
+        await upsert_daily_rollups(db, created)
+        await update_feature_vectors(db, _feature_samples(created))
+        await mark_twin_snapshots_stale(db, {data.user_id for data in created})
+
+    await db.commit()
+
+    if created:
+        await _invalidate_summary_cache(*{data.user_id for data in created})
+
+    return created
+
+
+@dataclass
+class BulkIngestResult:
+    """COPY批量导入结果"""
+    inserted: int
+    skipped: int
+    ids: List[UUID] = field(default_factory=list)
+
+
+# COPY到暂存表的列(顺序即copy_records_to_table的记录字段顺序)
+BULK_COPY_COLUMNS = (
+    "id", "user_id", "data_type", "source", "value", "unit", "extra_data",
+    "recorded_at", "synced_at", "external_id", "is_anomaly"
+)
+
+# 暂存表 -> health_data 合并, 同一条语句内累加日汇总
+_BULK_MERGE_SQL = """
+WITH inserted AS (
+    INSERT INTO health_data (
+        id, user_id, data_type, source, value, unit, extra_data,
+        recorded_at, synced_at, external_id, is_anomaly
+    )
+    SELECT
+        id, user_id, data_type, source, value, unit, extra_data,
+        recorded_at, synced_at, external_id, is_anomaly
+    FROM health_data_staging
+    ON CONFLICT (user_id, external_id, recorded_at) DO NOTHING
+    RETURNING id, user_id, data_type, value, recorded_at
+),
+rollup AS (
+    INSERT INTO health_daily_rollup (
+        user_id, data_type, day, sample_count, value_sum,
+        value_min, value_max, last_value, last_recorded_at
+    )
+    SELECT
+        user_id,
+        data_type,
+        (recorded_at AT TIME ZONE 'UTC')::date,
+        COUNT(*),
+        SUM(value),
+        MIN(value),
+        MAX(value),
+        (ARRAY_AGG(value ORDER BY recorded_at DESC))[1],
+        MAX(recorded_at)
+    FROM inserted
+    GROUP BY user_id, data_type, (recorded_at AT TIME ZONE 'UTC')::date
+    ON CONFLICT (user_id, data_type, day) DO UPDATE SET
+        sample_count = health_daily_rollup.sample_count + EXCLUDED.sample_count,
+        value_sum = health_daily_rollup.value_sum + EXCLUDED.value_sum,
+        value_min = LEAST(health_daily_rollup.value_min, EXCLUDED.value_min),
+        value_max = GREATEST(health_daily_rollup.value_max, EXCLUDED.value_max),
+        last_value = CASE
+            WHEN EXCLUDED.last_recorded_at >= health_daily_rollup.last_recorded_at
+            THEN EXCLUDED.last_value
+            ELSE health_daily_rollup.last_value
+        END,
+        last_recorded_at = GREATEST(health_daily_rollup.last_recorded_at, EXCLUDED.last_recorded_at),
+        updated_at = now()
+)
+"""
+
+
+async def bulk_ingest_health_data(
+    db: AsyncSession,
+    rows: List[Dict[str, Any]],
+    return_ids: bool = False
+) -> BulkIngestResult:
+    """
+    大批量导入健康数据(首次同步的历史回填)
+
+    asyncpg copy_records_to_table把数据流式写入事务内的临时暂存表,
+    再用一条INSERT ... SELECT ... ON CONFLICT DO NOTHING合并到health_data,
+    同一条语句中累加日汇总; 不把ORM对象加载回会话
+
+    Args:
+        db: 数据库会话
+        rows: 健康数据字段字典列表(同insert_health_data_batch)
+        return_ids: 是否返回新写入数据的ID
+
+    Returns:
+        写入/跳过条数(和新ID)
+    """
+    unique_rows = await filter_downsampled_rows(db, _prepare_insert_rows(rows))
+    if not unique_rows:
+        return BulkIngestResult(inserted=0, skipped=len(rows))
+
+    await ensure_health_data_partitions([row["recorded_at"] for row in unique_rows])
+
+    # 暂存表随事务提交删除; 先经由SQLAlchemy执行, 保证COPY处于同一事务中
+    await db.execute(text("DROP TABLE IF EXISTS health_data_staging"))
+    await db.execute(text(
+        "CREATE TEMP TABLE health_data_staging "
+        "(LIKE health_data INCLUDING DEFAULTS) ON COMMIT DROP"
+    ))
+
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        "health_data_staging",
+        records=[_copy_record(row) for row in unique_rows],
+        columns=list(BULK_COPY_COLUMNS)
+    )
+
+    # 特征向量只使用真正写入的行(ON CONFLICT跳过的重复数据不参与)
+    result = await db.execute(text(
+        _BULK_MERGE_SQL + "SELECT id, user_id, data_type, value, recorded_at FROM inserted"
+    ))
+    inserted_rows = result.all()
+    inserted = len(inserted_rows)
+    ids = [row.id for row in inserted_rows] if return_ids else []
+
+    if inserted_rows:
+        await update_feature_vectors(db, [
+            (row.user_id, row.data_type, row.value, row.recorded_at)
+            for row in inserted_rows
+        ])
+        await mark_twin_snapshots_stale(db, {row.user_id for row in inserted_rows})
+
+    await db.commit()
+
+    if inserted_rows:
+        await _invalidate_summary_cache(*{row.user_id for row in inserted_rows})
+
+    return BulkIngestResult(inserted=inserted, skipped=len(rows) - inserted, ids=ids)
+
+
+def _prepare_insert_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """补全id等默认值; 同一批内重复的(user_id, external_id, recorded_at)只保留第一条"""
+    seen = set()
+    unique_rows = []
+    for row in rows:
+        external_id = row.get("external_id")
+        if external_id is not None:
+            key = (row["user_id"], external_id, _as_utc(row["recorded_at"]))
+            if key in seen:
+                continue
+            seen.add(key)
+        unique_rows.append({"id": uuid.uuid4(), "is_anomaly": False, **row})
+    return unique_rows
+
+
+def _feature_samples(records: Iterable[HealthData]) -> List[Tuple]:
+    """特征向量增量更新的输入"""
+    return [(r.user_id, r.data_type, r.value, r.recorded_at) for r in records]
+
+
+def _copy_record(row: Dict[str, Any]) -> Tuple:
+    """转换为COPY记录(时间统一为UTC, JSONB以文本传入)"""
+    extra_data = row.get("extra_data")
+    synced_at = row.get("synced_at")
+    return (
+        row["id"],
+        row["user_id"],
+        row["data_type"],
+        row["source"],
+        float(row["value"]),
+        row.get("unit"),
+        json.dumps(extra_data, ensure_ascii=False) if extra_data is not None else None,
+        _as_utc(row["recorded_at"]).astimezone(timezone.utc),
+        _as_utc(synced_at).astimezone(timezone.utc) if synced_at is not None else None,
+        row.get("external_id"),
+        row["is_anomaly"]
+    )
+
+
 async def get_health_data_by_id(
     db: AsyncSession,
     data_id: UUID,
@@ -229,18 +476,10 @@ async def get_health_summary(
     """
     summary = {}
 
-    # 主要数据类型
-    key_types = [
-        HealthDataType.SLEEP_DURATION,
-        HealthDataType.HRV,
-        HealthDataType.HEART_RATE_RESTING,
-        HealthDataType.STEPS,
-        HealthDataType.ENERGY_LEVEL,
-        HealthDataType.STRESS_LEVEL
-    ]
-
-    for data_type in key_types:
-        avg_value = await get_health_data_average(db, user_id, data_type, days)
+    averages = await get_health_data_averages(db, user_id, SUMMARY_DATA_TYPES, days)
+
+    for data_type in SUMMARY_DATA_TYPES:
+        avg_value = averages.get(data_type)
         if avg_value is not None:
             summary[data_type] = {
                 "average": round(avg_value, 2),
@@ -268,19 +507,35 @@ async def update_health_data(
     Returns:
         更新后的健康数据或None
     """
+    # 修改采集时间可能把数据移到另一个月的分区; 须在本事务读取health_data之前创建
+    if update_fields.get("recorded_at") is not None:
+        await ensure_health_data_partitions([update_fields["recorded_at"]])
+
     health_data = await get_health_data_by_id(db, data_id, user_id)
 
     if not health_data:
         return None
 
+    old_key = (health_data.data_type, rollup_day(health_data.recorded_at))
+
     # 更新字段
     for field, value in update_fields.items():
         if hasattr(health_data, field):
             setattr(health_data, field, value)
 
+    # 数值、类型或时间变化时重建受影响的日汇总
+    if update_fields.keys() & {"value", "data_type", "recorded_at"}:
+        await db.flush()
+        new_key = (health_data.data_type, rollup_day(health_data.recorded_at))
+        await rebuild_daily_rollups(db, user_id, {old_key, new_key})
+        await rebuild_feature_vector(db, user_id)
+        await mark_twin_snapshots_stale(db, [user_id])
+
     await db.commit()
     await db.refresh(health_data)
 
+    await _invalidate_summary_cache(user_id)
+
     return health_data
 
 
@@ -305,9 +560,17 @@ async def delete_health_data(
     if not health_data:
         return False
 
+    key = (health_data.data_type, rollup_day(health_data.recorded_at))
+
     await db.delete(health_data)
+    await db.flush()
+    await rebuild_daily_rollups(db, user_id, [key])
+    await rebuild_feature_vector(db, user_id)
+    await mark_twin_snapshots_stale(db, [user_id])
     await db.commit()
 
+    await _invalidate_summary_cache(user_id)
+
     return True
 
 
@@ -336,3 +599,251 @@ async def check_duplicate_sync(
 
     result = await db.execute(query)
     return result.scalar_one_or_none() is not None
+
+
+# ============ 日汇总(health_daily_rollup) ============
+
+RollupKey = Tuple[UUID, str, date]
+
+
+def rollup_day(recorded_at: datetime) -> date:
+    """数据所属的汇总日期(UTC); 不带时区的时间按UTC处理"""
+    if recorded_at.tzinfo is not None:
+        recorded_at = recorded_at.astimezone(timezone.utc)
+    return recorded_at.date()
+
+
+def aggregate_daily_rollups(records: Iterable[HealthData]) -> Dict[RollupKey, Dict[str, Any]]:
+    """
+    在内存中把一批健康数据聚合为日汇总增量
+
+    Args:
+        records: 健康数据(需有user_id、data_type、value、recorded_at)
+
+    Returns:
+        {(user_id, data_type, day): 汇总行字段}
+    """
+    rollups: Dict[RollupKey, Dict[str, Any]] = {}
+
+    for record in records:
+        key = (record.user_id, record.data_type, rollup_day(record.recorded_at))
+        value = float(record.value)
+        row = rollups.get(key)
+
+        if row is None:
+            rollups[key] = {
+                "user_id": key[0],
+                "data_type": key[1],
+                "day": key[2],
+                "sample_count": 1,
+                "value_sum": value,
+                "value_min": value,
+                "value_max": value,
+                "last_value": value,
+                "last_recorded_at": record.recorded_at
+            }
+            continue
+
+        row["sample_count"] += 1
+        row["value_sum"] += value
+        row["value_min"] = min(row["value_min"], value)
+        row["value_max"] = max(row["value_max"], value)
+        if _as_utc(record.recorded_at) >= _as_utc(row["last_recorded_at"]):
+            row["last_value"] = value
+            row["last_recorded_at"] = record.recorded_at
+
+    return rollups
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+async def upsert_daily_rollups(
+    db: AsyncSession,
+    records: Iterable[HealthData]
+) -> int:
+    """
+    把新写入的健康数据累加到日汇总(不提交, 与数据写入同一事务)
+
+    Args:
+        db: 数据库会话
+        records: 本次新增的健康数据
+
+    Returns:
+        受影响的汇总行数
+    """
+    rows = list(aggregate_daily_rollups(records).values())
+    if not rows:
+        return 0
+
+    for row in rows:
+        row["last_recorded_at"] = _as_utc(row["last_recorded_at"])
+
+    stmt = pg_insert(HealthDailyRollup).values(rows)
+    table = HealthDailyRollup.__table__
+    newer = stmt.excluded.last_recorded_at >= table.c.last_recorded_at
+
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "data_type", "day"],
+        set_={
+            "sample_count": table.c.sample_count + stmt.excluded.sample_count,
+            "value_sum": table.c.value_sum + stmt.excluded.value_sum,
+            "value_min": func.least(table.c.value_min, stmt.excluded.value_min),
+            "value_max": func.greatest(table.c.value_max, stmt.excluded.value_max),
+            "last_value": case(
+                (newer, stmt.excluded.last_value),
+                else_=table.c.last_value
+            ),
+            "last_recorded_at": func.greatest(
+                table.c.last_recorded_at, stmt.excluded.last_recorded_at
+            ),
+            "updated_at": func.now()
+        }
+    )
+    await db.execute(stmt)
+
+    return len(rows)
+
+
+def _rollup_day_column():
+    """SQL侧的汇总日期表达式, 与rollup_day一致"""
+    # 时区用字面量, 使SELECT与GROUP BY中的表达式完全相同
+    return cast(func.timezone(literal_column("'UTC'"), HealthData.recorded_at), Date)
+
+
+async def rebuild_daily_rollups(
+    db: AsyncSession,
+    user_id: UUID,
+    keys: Iterable[Tuple[str, date]]
+) -> None:
+    """
+    从health_data和health_data_hourly重新计算指定日期的汇总(不提交)
+
+    删除/修改数据后min/max无法增量回退, 对受影响的(类型, 日期)整体重算;
+    已降采样的数据以小时汇总参与计算
+
+    Args:
+        db: 数据库会话
+        user_id: 用户ID
+        keys: [(data_type, day)]
+    """
+    keys = list(set(keys))
+    if not keys:
+        return
+
+    await db.execute(
+        delete(HealthDailyRollup).where(
+            HealthDailyRollup.user_id == user_id,
+            tuple_(HealthDailyRollup.data_type, HealthDailyRollup.day).in_(keys)
+        )
+    )
+
+    # 原始数据每行视为count=1的汇总, 与小时汇总合并后按日聚合
+    day_column = _rollup_day_column()
+    hourly_day_column = cast(
+        func.timezone(literal_column("'UTC'"), HealthDataHourly.hour), Date
+    )
+    parts = union_all(
+        select(
+            HealthData.data_type.label("data_type"),
+            day_column.label("day"),
+            literal_column("1").label("sample_count"),
+            HealthData.value.label("value_sum"),
+            HealthData.value.label("value_min"),
+            HealthData.value.label("value_max"),
+            HealthData.value.label("last_value"),
+            HealthData.recorded_at.label("last_recorded_at")
+        ).where(
+            HealthData.user_id == user_id,
+            tuple_(HealthData.data_type, day_column).in_(keys)
+        ),
+        select(
+            HealthDataHourly.data_type,
+            hourly_day_column,
+            HealthDataHourly.sample_count,
+            HealthDataHourly.value_sum,
+            HealthDataHourly.value_min,
+            HealthDataHourly.value_max,
+            HealthDataHourly.last_value,
+            HealthDataHourly.last_recorded_at
+        ).where(
+            HealthDataHourly.user_id == user_id,
+            tuple_(HealthDataHourly.data_type, hourly_day_column).in_(keys)
+        )
+    ).subquery()
+
+    source = (
+        select(
+            literal(user_id, HealthDailyRollup.user_id.type),
+            parts.c.data_type,
+            parts.c.day,
+            func.sum(parts.c.sample_count),
+            func.sum(parts.c.value_sum),
+            func.min(parts.c.value_min),
+            func.max(parts.c.value_max),
+            array_agg(aggregate_order_by(parts.c.last_value, parts.c.last_recorded_at.desc()))[1],
+            func.max(parts.c.last_recorded_at)
+        )
+        .group_by(parts.c.data_type, parts.c.day)
+    )
+
+    await db.execute(
+        pg_insert(HealthDailyRollup).from_select(
+            [
+                "user_id", "data_type", "day", "sample_count", "value_sum",
+                "value_min", "value_max", "last_value", "last_recorded_at"
+            ],
+            source
+        )
+    )
+
+
+async def get_health_data_averages(
+    db: AsyncSession,
+    user_id: UUID,
+    data_types: List[str],
+    days: int = 7
+) -> Dict[str, float]:
+    """
+    一次分组查询计算多个数据类型的近N天均值(基于日汇总)
+
+    统计窗口为包含今天在内的最近N个UTC自然日
+
+    Args:
+        db: 数据库会话
+        user_id: 用户ID
+        data_types: 数据类型列表
+        days: 天数(默认7天)
+
+    Returns:
+        {data_type: 平均值}, 无数据的类型不出现在结果中
+    """
+    start_day = datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+
+    result = await db.execute(
+        select(
+            HealthDailyRollup.data_type,
+            func.sum(HealthDailyRollup.value_sum) / func.sum(HealthDailyRollup.sample_count)
+        )
+        .where(
+            HealthDailyRollup.user_id == user_id,
+            HealthDailyRollup.data_type.in_(data_types),
+            HealthDailyRollup.day >= start_day
+        )
+        .group_by(HealthDailyRollup.data_type)
+    )
+
+    return {
+        data_type: float(avg_value)
+        for data_type, avg_value in result.all()
+        if avg_value is not None
+    }
+
+
+async def _invalidate_summary_cache(*user_ids: UUID) -> None:
+    """健康数据提交后使摘要缓存失效"""
+    # 延迟导入, 避免crud与services之间的循环导入
+    from app.services.health_summary_cache import invalidate_health_summary
+
+    await invalidate_health_summary(*user_ids)
@@ -0,0 +1,297 @@
+"""
+健康特征向量(特征存储)
+每个用户一行, 写入健康数据时在同一事务中增量更新:
+- 各特征类型最新的值和采集时间(按采集时间比较, 迟到的旧数据不覆盖新值)
+- 近7/30天均值: 由health_daily_rollup计算, 相关类型有新数据时刷新, 跨天由定时任务刷新
+"""
+
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import and_, case, delete, func, or_, select, update, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.health_data import (
+    HealthData, HealthDailyRollup, HealthDataType, HealthFeatureVector
+)
+
+
+# 健康数据类型 -> 特征字段(同时是HealthFeatureVector的列名)
+FEATURE_FIELDS: Dict[str, str] = {
+    HealthDataType.SLEEP_DURATION: "sleep_duration",
+    HealthDataType.SLEEP_QUALITY: "sleep_quality",
+    HealthDataType.HRV: "hrv",
+    HealthDataType.HEART_RATE_RESTING: "resting_heart_rate",
+    HealthDataType.STEPS: "steps",
+    HealthDataType.EXERCISE_MINUTES: "exercise_minutes",
+    HealthDataType.ACTIVE_ENERGY: "active_energy",
+    HealthDataType.ENERGY_LEVEL: "subjective_energy",
+    HealthDataType.STRESS_LEVEL: "stress_level",
+    HealthDataType.MOOD: "mood",
+}
+
+# 均值列 -> (数据类型, 天数)
+MEAN_COLUMNS: Dict[str, Tuple[str, int]] = {
+    "avg_energy_7d": (HealthDataType.ENERGY_LEVEL, 7),
+    "avg_energy_30d": (HealthDataType.ENERGY_LEVEL, 30),
+    "avg_sleep_7d": (HealthDataType.SLEEP_DURATION, 7),
+    "avg_stress_7d": (HealthDataType.STRESS_LEVEL, 7),
+}
+MEAN_DATA_TYPES = {data_type for data_type, _ in MEAN_COLUMNS.values()}
+
+# 单条UPSERT的最大用户数(每个用户22个参数)
+UPSERT_CHUNK_SIZE = 1000
+
+# (user_id, data_type, value, recorded_at)
+FeatureSample = Tuple[UUID, str, float, datetime]
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def latest_feature_values(
+    samples: Iterable[FeatureSample]
+) -> Dict[UUID, Dict[str, Tuple[float, datetime]]]:
+    """
+    按用户取每个特征最新的一条数据
+
+    Args:
+        samples: (user_id, data_type, value, recorded_at)
+
+    Returns:
+        {user_id: {特征字段: (值, 采集时间UTC)}}, 不参与特征的类型被忽略
+    """
+    latest: Dict[UUID, Dict[str, Tuple[float, datetime]]] = {}
+    for user_id, data_type, value, recorded_at in samples:
+        name = FEATURE_FIELDS.get(data_type)
+        if name is None:
+            continue
+        recorded_at = _as_utc(recorded_at)
+        current = latest.setdefault(user_id, {}).get(name)
+        if current is None or recorded_at >= current[1]:
+            latest[user_id][name] = (float(value), recorded_at)
+    return latest
+
+
+async def update_feature_vectors(
+    db: AsyncSession,
+    samples: Iterable[FeatureSample]
+) -> int:
+    """
+    用新写入的数据增量更新特征向量(不提交)
+
+    必须在同一事务的日汇总更新之后调用, 均值从日汇总计算
+
+    Args:
+        db: 数据库会话
+        samples: (user_id, data_type, value, recorded_at)
+
+    Returns:
+        更新的用户数
+    """
+    start = time.perf_counter()
+    samples = list(samples)
+    latest = latest_feature_values(samples)
+    if not latest:
+        return 0
+
+    rows = []
+    for user_id, values in latest.items():
+        row = {"user_id": user_id, "last_recorded_at": max(at for _, at in values.values())}
+        for name in FEATURE_FIELDS.values():
+            value, recorded_at = values.get(name, (None, None))
+            row[name] = value
+            row[f"{name}_at"] = recorded_at
+        rows.append(row)
+
+    for chunk_start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        chunk = rows[chunk_start:chunk_start + UPSERT_CHUNK_SIZE]
+        stmt = pg_insert(HealthFeatureVector).values(chunk)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["user_id"],
+                set_=_newer_values(stmt)
+            )
+        )
+
+    mean_users = {
+        user_id for user_id, data_type, _, _ in samples
+        if data_type in MEAN_DATA_TYPES
+    }
+    if mean_users:
+        await refresh_feature_means(db, list(mean_users))
+
+    now = datetime.now(timezone.utc)
+    _record_update(
+        users=len(rows),
+        samples=len(samples),
+        duration_ms=round((time.perf_counter() - start) * 1000, 2),
+        ingest_lag_seconds=sum(
+            max(0.0, (now - row["last_recorded_at"]).total_seconds()) for row in rows
+        )
+    )
+
+    return len(rows)
+
+
+def _newer_values(stmt) -> Dict[str, object]:
+    """ON CONFLICT更新: 只有采集时间不早于已有值时才覆盖"""
+    table = HealthFeatureVector.__table__
+    excluded = stmt.excluded
+
+    set_ = {}
+    for name in FEATURE_FIELDS.values():
+        at = f"{name}_at"
+        newer = and_(
+            excluded[at].is_not(None),
+            or_(table.c[at].is_(None), excluded[at] >= table.c[at])
+        )
+        set_[name] = case((newer, excluded[name]), else_=table.c[name])
+        # GREATEST忽略NULL
+        set_[at] = func.greatest(table.c[at], excluded[at])
+
+    set_["last_recorded_at"] = func.greatest(table.c.last_recorded_at, excluded.last_recorded_at)
+    set_["updated_at"] = func.now()
+    return set_
+
+
+async def refresh_feature_means(
+    db: AsyncSession,
+    user_ids: Optional[List[UUID]] = None,
+    today: Optional[date] = None
+) -> int:
+    """
+    从日汇总重新计算近N天均值(不提交)
+
+    窗口为包含今天在内的最近N个UTC自然日(与get_health_data_averages一致)
+
+    Args:
+        db: 数据库会话
+        user_ids: 要刷新的用户(None为全部)
+        today: 计算日期(默认今天UTC)
+
+    Returns:
+        刷新的向量数
+    """
+    today = today or datetime.now(timezone.utc).date()
+
+    values = {"means_day": today}
+    for column, (data_type, days) in MEAN_COLUMNS.items():
+        values[column] = (
+            select(
+                func.sum(HealthDailyRollup.value_sum)
+                / func.nullif(func.sum(HealthDailyRollup.sample_count), 0)
+            )
+            .where(
+                HealthDailyRollup.user_id == HealthFeatureVector.user_id,
+                HealthDailyRollup.data_type == data_type,
+                HealthDailyRollup.day >= today - timedelta(days=days - 1)
+            )
+            .scalar_subquery()
+        )
+
+    stmt = update(HealthFeatureVector).values(**values)
+    if user_ids is not None:
+        stmt = stmt.where(HealthFeatureVector.user_id == any_(_user_ids_param(user_ids)))
+
+    result = await db.execute(stmt.execution_options(synchronize_session=False))
+    return result.rowcount
+
+
+async def rebuild_feature_vector(db: AsyncSession, user_id: UUID) -> None:
+    """
+    从原始数据重建用户的特征向量(不提交)
+
+    修改/删除数据后最新值可能需要回退到更早的数据, 无法增量处理
+    """
+    await db.execute(delete(HealthFeatureVector).where(HealthFeatureVector.user_id == user_id))
+
+    result = await db.execute(
+        select(HealthData.user_id, HealthData.data_type, HealthData.value, HealthData.recorded_at)
+        .where(
+            HealthData.user_id == user_id,
+            HealthData.data_type.in_(list(FEATURE_FIELDS))
+        )
+        .distinct(HealthData.data_type)
+        .order_by(HealthData.data_type, HealthData.recorded_at.desc())
+    )
+    samples = [tuple(row) for row in result.all()]
+
+    if await update_feature_vectors(db, samples):
+        await refresh_feature_means(db, [user_id])
+
+
+async def get_feature_vectors(
+    db: AsyncSession,
+    user_ids: List[UUID]
+) -> Dict[UUID, HealthFeatureVector]:
+    """
+    批量读取特征向量
+
+    Args:
+        db: 数据库会话
+        user_ids: 用户ID列表
+
+    Returns:
+        {user_id: 特征向量}, 没有数据的用户不在结果中
+    """
+    if not user_ids:
+        return {}
+
+    result = await db.execute(
+        select(HealthFeatureVector).where(
+            HealthFeatureVector.user_id == any_(_user_ids_param(user_ids))
+        )
+    )
+    vectors = {vector.user_id: vector for vector in result.scalars().all()}
+
+    now = datetime.now(timezone.utc)
+    today = now.date()
+    _record_read(
+        requested=len(user_ids),
+        found=len(vectors),
+        age_seconds=sum(
+            max(0.0, (now - _as_utc(vector.last_recorded_at)).total_seconds())
+            for vector in vectors.values()
+            if vector.last_recorded_at is not None
+        ),
+        stale_means=sum(1 for vector in vectors.values() if vector.means_day != today)
+    )
+
+    return vectors
+
+
+async def get_feature_vector(
+    db: AsyncSession,
+    user_id: UUID
+) -> Optional[HealthFeatureVector]:
+    """读取单个用户的特征向量"""
+    user_id = user_id if isinstance(user_id, UUID) else UUID(str(user_id))
+    vectors = await get_feature_vectors(db, [user_id])
+    return vectors.get(user_id)
+
+
+def _user_ids_param(user_ids: List[UUID]):
+    """user_id = ANY(:user_ids)的数组参数(参数个数与用户数无关)"""
+    return bindparam(
+        "user_ids",
+        [user_id if isinstance(user_id, UUID) else UUID(str(user_id)) for user_id in user_ids],
+        type_=ARRAY(PG_UUID(as_uuid=True))
+    )
+
+
+def _record_update(**kwargs) -> None:
+    # 只累加进程内计数, 事务中不访问Redis; 延迟导入, 避免crud与services之间的循环导入
+    from app.services.feature_store_metrics import record_feature_update
+
+    record_feature_update(**kwargs)
+
+
+def _record_read(**kwargs) -> None:
+    from app.services.feature_store_metrics import record_feature_read
+
+    record_feature_read(**kwargs)
@@ -0,0 +1,387 @@
+"""
+health_data分区与降采样
+health_data按recorded_at做月度RANGE分区:
+- 写入前按数据所在月份按需创建分区(ensure_health_data_partitions, 独立的短事务)
+- 定时任务提前创建未来几个月的分区
+- 超过原始数据保留期的数据按(用户, 类型, UTC小时)汇总到health_data_hourly,
+  整月过期的分区汇总后直接删除分区
+"""
+
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+from loguru import logger
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.models.health_data import HealthData, HealthDataHourly
+
+
+PARTITION_PREFIX = "health_data_p"
+
+# 已确认存在(已提交)的分区月份(进程内缓存, 避免每次写入都查询系统表)
+_known_partitions: Set[date] = set()
+
+
+def month_start(value: datetime) -> date:
+    """数据所在的UTC月份(月初日期)"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return date(value.year, value.month, 1)
+
+
+def next_month(month: date) -> date:
+    """下一个月的月初"""
+    if month.month == 12:
+        return date(month.year + 1, 1, 1)
+    return date(month.year, month.month + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """月份对应的分区表名, 如health_data_p2025_01"""
+    return f"{PARTITION_PREFIX}{month.year:04d}_{month.month:02d}"
+
+
+def parse_partition_name(name: str) -> Optional[date]:
+    """分区表名 -> 月份, 不是月度分区返回None"""
+    if not name.startswith(PARTITION_PREFIX):
+        return None
+    try:
+        year, month = name[len(PARTITION_PREFIX):].split("_")
+        return date(int(year), int(month), 1)
+    except ValueError:
+        return None
+
+
+def partition_ddl(month: date) -> str:
+    """创建月度分区的DDL(上下界为UTC月初)"""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} "
+        f"PARTITION OF health_data FOR VALUES "
+        f"FROM ('{month.isoformat()} 00:00:00+00') "
+        f"TO ('{next_month(month).isoformat()} 00:00:00+00')"
+    )
+
+
+def raw_retention_cutoff(
+    now: Optional[datetime] = None,
+    retention_days: Optional[int] = None
+) -> datetime:
+    """
+    原始数据保留期的起点(UTC零点)
+
+    早于该时间的原始数据会被降采样, 对齐到零点使日汇总的每一天要么完全是原始数据,
+    要么完全来自小时汇总
+    """
+    now = now or datetime.now(timezone.utc)
+    days = retention_days if retention_days is not None else settings.HEALTH_DATA_RAW_RETENTION_DAYS
+    cutoff_day = now.astimezone(timezone.utc).date() - timedelta(days=days)
+    return datetime(cutoff_day.year, cutoff_day.month, cutoff_day.day, tzinfo=timezone.utc)
+
+
+async def list_health_data_partitions(db: AsyncSession) -> List[date]:
+    """查询系统表中已存在的月度分区"""
+    result = await db.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'health_data'"
+    ))
+    months = [parse_partition_name(name) for name in result.scalars().all()]
+    return sorted(month for month in months if month is not None)
+
+
+async def ensure_health_data_partitions(recorded_ats: Iterable[datetime]) -> List[date]:
+    """
+    确保数据所在月份的分区存在
+
+    缺少的分区在独立的会话中逐个创建并提交, 提交后才写入进程内缓存:
+    - 写入事务回滚不会让缓存中留下实际不存在的分区
+    - CREATE TABLE ... PARTITION OF需要health_data上的ACCESS EXCLUSIVE锁, 只在很短的事务中持有,
+      并设置lock_timeout, 拿不到锁时报错(由调用方重试), 不会排在长时间的写入后面阻塞所有读取
+
+    必须在调用方的事务访问health_data之前调用, 否则调用方自己持有的锁会让建分区等到超时;
+    命中进程内缓存时不访问数据库(整月早于保留期的月份除外, 它们的分区可能已被降采样删除)
+
+    Args:
+        recorded_ats: 待写入数据的采集时间
+
+    Returns:
+        本次新创建的分区月份
+    """
+    months = {month_start(value) for value in recorded_ats}
+    # 整月过期的分区可能已被其他进程的降采样删除, 不信任缓存
+    expired = set(expired_partition_months(months, raw_retention_cutoff()))
+    missing = (months - _known_partitions) | expired
+    if not missing:
+        return []
+
+    created = []
+    async with async_session_maker() as ddl_db:
+        # 其他进程可能已经创建过, 先刷新缓存
+        existing = await list_health_data_partitions(ddl_db)
+        await ddl_db.commit()
+        _known_partitions.difference_update(expired)
+        _known_partitions.update(existing)
+
+        for month in sorted(missing - _known_partitions):
+            await ddl_db.execute(text(
+                f"SET LOCAL lock_timeout = {int(settings.HEALTH_DATA_PARTITION_LOCK_TIMEOUT_MS)}"
+            ))
+            await ddl_db.execute(text(partition_ddl(month)))
+            await ddl_db.commit()
+
+            _known_partitions.add(month)
+            created.append(month)
+            logger.info(f"🗂️ Created health_data partition {partition_name(month)}")
+
+    return created
+
+
+async def create_upcoming_partitions(
+    months_ahead: Optional[int] = None,
+    now: Optional[datetime] = None
+) -> List[date]:
+    """
+    提前创建当前月及未来几个月的分区(各自提交)
+
+    Returns:
+        本次新创建的分区月份
+    """
+    months_ahead = months_ahead or settings.HEALTH_DATA_PARTITION_PREMAKE_MONTHS
+    current = month_start(now or datetime.now(timezone.utc))
+
+    months = [current]
+    for _ in range(months_ahead):
+        months.append(next_month(months[-1]))
+
+    return await ensure_health_data_partitions(
+        [datetime(m.year, m.month, 1, tzinfo=timezone.utc) for m in months]
+    )
+
+
+# ============ 降采样(health_data -> health_data_hourly) ============
+
+# 把{source}中的原始数据按(用户, 类型, UTC小时)汇总并累加到已有的小时
+_ROLLUP_CTES = """
+agg AS (
+    SELECT
+        user_id,
+        data_type,
+        date_trunc('hour', recorded_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' AS hour,
+        COUNT(*) AS sample_count,
+        SUM(value) AS value_sum,
+        MIN(value) AS value_min,
+        MAX(value) AS value_max,
+        (ARRAY_AGG(value ORDER BY recorded_at DESC))[1] AS last_value,
+        MAX(recorded_at) AS last_recorded_at
+    FROM {source}
+    GROUP BY user_id, data_type, date_trunc('hour', recorded_at AT TIME ZONE 'UTC')
+),
+hourly AS (
+    INSERT INTO health_data_hourly (
+        user_id, data_type, hour, sample_count, value_sum,
+        value_min, value_max, last_value, last_recorded_at
+    )
+    SELECT
+        user_id, data_type, hour, sample_count, value_sum,
+        value_min, value_max, last_value, last_recorded_at
+    FROM agg
+    ON CONFLICT (user_id, data_type, hour) DO UPDATE SET
+        sample_count = health_data_hourly.sample_count + EXCLUDED.sample_count,
+        value_sum = health_data_hourly.value_sum + EXCLUDED.value_sum,
+        value_min = LEAST(health_data_hourly.value_min, EXCLUDED.value_min),
+        value_max = GREATEST(health_data_hourly.value_max, EXCLUDED.value_max),
+        last_value = CASE
+            WHEN EXCLUDED.last_recorded_at >= health_data_hourly.last_recorded_at
+            THEN EXCLUDED.last_value
+            ELSE health_data_hourly.last_value
+        END,
+        last_recorded_at = GREATEST(health_data_hourly.last_recorded_at, EXCLUDED.last_recorded_at)
+    RETURNING 1
+)
+SELECT
+    CAST(COALESCE((SELECT SUM(sample_count) FROM agg), 0) AS BIGINT),
+    (SELECT COUNT(*) FROM hourly)
+"""
+
+# 保留期边界所在月份: 按天删除一个时间窗口内的原始数据并汇总
+_DOWNSAMPLE_SQL = text("""
+WITH moved AS (
+    DELETE FROM health_data
+    WHERE recorded_at >= :window_start AND recorded_at < :window_end
+    RETURNING user_id, data_type, value, recorded_at
+),""" + _ROLLUP_CTES.format(source="moved"))
+
+
+def partition_rollup_sql(month: date) -> str:
+    """汇总整个月度分区的SQL(不删除原始数据, 之后整表DETACH/DROP)"""
+    return "WITH" + _ROLLUP_CTES.format(source=partition_name(month))
+
+
+def expired_partition_months(partitions: Iterable[date], cutoff: datetime) -> List[date]:
+    """整个月都早于保留期起点的分区(可以汇总后直接删除分区)"""
+    return sorted(month for month in partitions if next_month(month) <= cutoff.date())
+
+
+async def _downsample_partition(db: AsyncSession, month: date) -> Tuple[int, int]:
+    """
+    汇总一个过期的月度分区后把它从health_data上摘下并删除(同一事务)
+
+    先以SHARE模式锁住分区, 汇总期间迟到的写入会等待而不会在DETACH时丢失;
+    DETACH需要health_data上的ACCESS EXCLUSIVE锁, 设置lock_timeout避免长时间阻塞读取
+    """
+    name = partition_name(month)
+    await db.execute(text(
+        f"SET LOCAL lock_timeout = {int(settings.HEALTH_DATA_PARTITION_LOCK_TIMEOUT_MS)}"
+    ))
+    await db.execute(text(f"LOCK TABLE {name} IN SHARE MODE"))
+    moved, hourly = (await db.execute(text(partition_rollup_sql(month)))).one()
+    await db.execute(text(f"ALTER TABLE health_data DETACH PARTITION {name}"))
+    await db.execute(text(f"DROP TABLE {name}"))
+    await db.commit()
+
+    _known_partitions.discard(month)
+    logger.info(f"🗂️ Dropped health_data partition {name} after rolling up {moved} rows")
+    return moved, hourly
+
+
+async def downsample_health_data(
+    db: AsyncSession,
+    retention_days: Optional[int] = None,
+    window: timedelta = timedelta(days=1),
+    max_windows: Optional[int] = None,
+    now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    把超过保留期的原始数据降采样为小时汇总
+
+    - 整个月都早于保留期的分区: 整表汇总后DETACH/DROP, 不产生逐行DELETE的WAL和表膨胀
+    - 保留期起点所在的月份: 从最早的数据开始按时间窗口删除并汇总, 每个窗口单独提交
+
+    每个分区/窗口单独提交, 锁和WAL都限制在一个分区或窗口内;
+    只访问保留期之前的数据, 日汇总不受影响(同一天的数据总量不变)
+
+    Args:
+        db: 数据库会话
+        retention_days: 原始数据保留天数(默认取配置)
+        window: 边界月份中单个事务处理的时间跨度
+        max_windows: 本次最多处理的分区+窗口数(None为不限)
+        now: 当前时间(默认取当前UTC时间)
+
+    Returns:
+        {"cutoff", "dropped_partitions", "windows", "moved_rows", "hourly_rows", "duration_ms"}
+    """
+    start = time.perf_counter()
+    cutoff = raw_retention_cutoff(now=now, retention_days=retention_days)
+
+    windows = 0
+    moved_rows = 0
+    hourly_rows = 0
+    dropped: List[str] = []
+
+    partitions = await list_health_data_partitions(db)
+    await db.commit()
+
+    for month in expired_partition_months(partitions, cutoff):
+        if max_windows is not None and windows >= max_windows:
+            break
+        moved, hourly = await _downsample_partition(db, month)
+        windows += 1
+        moved_rows += moved
+        hourly_rows += hourly
+        dropped.append(partition_name(month))
+
+    # 逐行删除只发生在保留期起点所在的月份
+    boundary = datetime.combine(month_start(cutoff), datetime.min.time(), tzinfo=timezone.utc)
+
+    while max_windows is None or windows < max_windows:
+        oldest = await db.scalar(
+            select(func.min(HealthData.recorded_at)).where(
+                HealthData.recorded_at >= boundary,
+                HealthData.recorded_at < cutoff
+            )
+        )
+        if oldest is None:
+            break
+
+        oldest = oldest.astimezone(timezone.utc)
+        window_start = datetime(oldest.year, oldest.month, oldest.day, tzinfo=timezone.utc)
+        window_end = min(window_start + window, cutoff)
+
+        result = await db.execute(
+            _DOWNSAMPLE_SQL,
+            {"window_start": window_start, "window_end": window_end}
+        )
+        moved, hourly = result.one()
+        await db.commit()
+
+        windows += 1
+        moved_rows += moved
+        hourly_rows += hourly
+
+    return {
+        "cutoff": cutoff.isoformat(),
+        "dropped_partitions": dropped,
+        "windows": windows,
+        "moved_rows": moved_rows,
+        "hourly_rows": hourly_rows,
+        "duration_ms": round((time.perf_counter() - start) * 1000, 2)
+    }
+
+
+async def filter_downsampled_rows(
+    db: AsyncSession,
+    rows: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    去掉落在已降采样小时内的数据
+
+    已汇总的小时不再接收原始数据(否则下次降采样会重复累加同步过的数据);
+    只有早于保留期的数据需要检查
+
+    Args:
+        db: 数据库会话
+        rows: 健康数据字段字典列表
+
+    Returns:
+        可以写入health_data的数据
+    """
+    cutoff = raw_retention_cutoff()
+    old_rows = [row for row in rows if _hour_of(row["recorded_at"]) < cutoff]
+    if not old_rows:
+        return rows
+
+    # 按用户/类型/小时范围查询, 参数个数与数据条数无关
+    hours = [_hour_of(row["recorded_at"]) for row in old_rows]
+    result = await db.execute(
+        select(HealthDataHourly.user_id, HealthDataHourly.data_type, HealthDataHourly.hour)
+        .where(
+            HealthDataHourly.user_id.in_({row["user_id"] for row in old_rows}),
+            HealthDataHourly.data_type.in_({row["data_type"] for row in old_rows}),
+            HealthDataHourly.hour >= min(hours),
+            HealthDataHourly.hour <= max(hours)
+        )
+    )
+    closed: Set[Tuple[UUID, str, datetime]] = {
+        (user_id, data_type, hour.astimezone(timezone.utc))
+        for user_id, data_type, hour in result.all()
+    }
+    if not closed:
+        return rows
+
+    return [
+        row for row in rows
+        if (row["user_id"], row["data_type"], _hour_of(row["recorded_at"])) not in closed
+    ]
+
+
+def _hour_of(value: datetime) -> datetime:
+    """所在的UTC整点(naive时间按UTC处理)"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
@@ -0,0 +1,179 @@
+"""
+数字孪生快照
+每个用户一行, 保存最近一次计算的数字孪生:
+- 健康/环境数据写入时在同一事务中标记过期(stale_since)并记录最近一次变更时间(data_changed_at)
+- 超过最长有效期的快照同样视为过期(当前精力和预测曲线随时间推移)
+- 读取到过期快照时先返回旧快照, 由后台任务重新计算
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import case, func, or_, select, update, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.energy import DigitalTwinSnapshot
+
+
+def _as_uuid(user_id) -> UUID:
+    return user_id if isinstance(user_id, UUID) else UUID(str(user_id))
+
+
+def snapshot_stale_since(
+    snapshot: DigitalTwinSnapshot,
+    now: Optional[datetime] = None,
+    max_age: Optional[timedelta] = None
+) -> Optional[datetime]:
+    """
+    快照开始过期的时间, 未过期返回None
+
+    取数据变更标记和超过最长有效期两者中较早的一个
+
+    Args:
+        snapshot: 快照
+        now: 当前时间(默认UTC现在)
+        max_age: 最长有效期(默认取配置)
+    """
+    now = now or datetime.now(timezone.utc)
+    max_age = max_age or timedelta(minutes=settings.DIGITAL_TWIN_SNAPSHOT_MAX_AGE_MINUTES)
+
+    expires_at = snapshot.computed_at + max_age
+    candidates = [at for at in (snapshot.stale_since, expires_at) if at is not None and at <= now]
+    return min(candidates) if candidates else None
+
+
+async def get_twin_snapshot(
+    db: AsyncSession,
+    user_id: UUID
+) -> Optional[DigitalTwinSnapshot]:
+    """读取用户的数字孪生快照"""
+    result = await db.execute(
+        select(DigitalTwinSnapshot).where(DigitalTwinSnapshot.user_id == _as_uuid(user_id))
+    )
+    return result.scalar_one_or_none()
+
+
+async def save_twin_snapshot(
+    db: AsyncSession,
+    user_id: UUID,
+    payload: Dict[str, Any],
+    prediction_hours: int,
+    computed_at: datetime
+) -> None:
+    """
+    保存重新计算的快照并提交
+
+    computed_at为开始计算的时间: 最近一次数据变更(data_changed_at)晚于computed_at时,
+    新快照没有包含这次变更, 保持过期(无论重算开始前快照是否已过期), 下次读取时再重算
+
+    Args:
+        db: 数据库会话
+        user_id: 用户ID
+        payload: 数字孪生(JSON)
+        prediction_hours: 快照包含的预测小时数
+        computed_at: 开始计算的时间(UTC)
+    """
+    table = DigitalTwinSnapshot.__table__
+    stmt = pg_insert(DigitalTwinSnapshot).values(
+        user_id=_as_uuid(user_id),
+        payload=payload,
+        prediction_hours=prediction_hours,
+        computed_at=computed_at,
+        stale_since=None,
+        refresh_requested_at=None
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={
+                "payload": stmt.excluded.payload,
+                "prediction_hours": stmt.excluded.prediction_hours,
+                "computed_at": stmt.excluded.computed_at,
+                "stale_since": stale_since_after_save(
+                    table.c.data_changed_at, stmt.excluded.computed_at
+                ),
+                "refresh_requested_at": None,
+                "updated_at": func.now()
+            },
+            # 并发重算时较早开始的结果不覆盖较新的
+            where=table.c.computed_at <= stmt.excluded.computed_at
+        )
+    )
+    await db.commit()
+
+
+def stale_since_after_save(data_changed_at, computed_at):
+    """
+    保存重算结果时的stale_since(SQL表达式)
+
+    计算开始后数据又有变更时以该变更时间作为过期起点, 否则清除过期标记
+    """
+    return case((data_changed_at > computed_at, data_changed_at), else_=None)
+
+
+async def mark_twin_snapshots_stale(
+    db: AsyncSession,
+    user_ids: Iterable[UUID]
+) -> None:
+    """
+    数据写入后把用户的快照标记为过期(不提交)
+
+    每次写入都更新data_changed_at(重算据此判断结果是否包含最新数据);
+    已过期的快照保留最早的stale_since; 没有快照的用户不受影响
+    """
+    user_ids = list({_as_uuid(user_id) for user_id in user_ids})
+    if not user_ids:
+        return
+
+    now = datetime.now(timezone.utc)
+    await db.execute(
+        update(DigitalTwinSnapshot)
+        .where(
+            DigitalTwinSnapshot.user_id == any_(
+                bindparam("user_ids", user_ids, type_=ARRAY(PG_UUID(as_uuid=True)))
+            )
+        )
+        .values(
+            stale_since=func.coalesce(DigitalTwinSnapshot.stale_since, now),
+            data_changed_at=now
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def claim_twin_refresh(
+    db: AsyncSession,
+    user_id: UUID,
+    retry_after: Optional[timedelta] = None
+) -> bool:
+    """
+    登记一次后台重算并提交
+
+    同一快照在retry_after内只会登记一次(多个请求同时读到过期快照时只提交一个任务);
+    任务失败时超过retry_after后可以再次登记
+
+    Returns:
+        是否登记成功(调用方据此决定是否提交任务)
+    """
+    retry_after = retry_after or timedelta(seconds=settings.DIGITAL_TWIN_REFRESH_RETRY_SECONDS)
+    now = datetime.now(timezone.utc)
+
+    result = await db.execute(
+        update(DigitalTwinSnapshot)
+        .where(
+            DigitalTwinSnapshot.user_id == _as_uuid(user_id),
+            or_(
+                DigitalTwinSnapshot.refresh_requested_at.is_(None),
+                DigitalTwinSnapshot.refresh_requested_at < now - retry_after
+            )
+        )
+        .values(refresh_requested_at=now)
+        .returning(DigitalTwinSnapshot.user_id)
+        .execution_options(synchronize_session=False)
+    )
+    claimed = result.scalar_one_or_none() is not None
+    await db.commit()
+    return claimed
@@ -13,6 +13,7 @@ import time
 
 from app.core.config import settings
 from app.core.database import init_db, close_db
+from app.ai.response_cache import shutdown_response_cache_manager
 
 # 导入路由
 from app.api import api_router
@@ -43,6 +44,7 @@ async def lifespan(app: FastAPI):
 
     # 关闭时执行
     print("🛑 Shutting down PeakState Backend...")
+    await shutdown_response_cache_manager()
     await close_db()
     print("✅ Database connections closed")
 
@@ -14,13 +14,15 @@ from app.crud.health_data import (
     get_health_data_average,
     get_latest_health_data
 )
+from app.crud.health_features import FEATURE_FIELDS, get_feature_vector
 from app.models.health_data import HealthDataType
 from app.mcp.base import get_global_registry
 from app.mcp.schemas import (
     READ_SLEEP_DATA_SCHEMA,
     READ_HRV_DATA_SCHEMA,
     READ_ACTIVITY_SUMMARY_SCHEMA,
-    ANALYZE_ENERGY_TREND_SCHEMA
+    ANALYZE_ENERGY_TREND_SCHEMA,
+    READ_HEALTH_SNAPSHOT_SCHEMA
 )
 
 logger = logging.getLogger(__name__)
@@ -372,13 +374,18 @@ async def analyze_energy_trend(
         peak_hours = [f"{h:02d}:00-{h+1:02d}:00" for h, _ in sorted_hours[:2]]
         low_hours = [f"{h:02d}:00-{h+1:02d}:00" for h, _ in sorted_hours[-2:]]
 
-        # 分析影响因素
-        sleep_avg = await get_health_data_average(
-            db, user_id, HealthDataType.SLEEP_DURATION, days
-        )
-        stress_avg = await get_health_data_average(
-            db, user_id, HealthDataType.STRESS_LEVEL, days
-        )
+        # 分析影响因素(默认7天窗口直接读取特征向量中的均值)
+        vector = await get_feature_vector(db, user_id) if days == 7 else None
+        if vector is not None:
+            sleep_avg = vector.avg_sleep_7d
+            stress_avg = vector.avg_stress_7d
+        else:
+            sleep_avg = await get_health_data_average(
+                db, user_id, HealthDataType.SLEEP_DURATION, days
+            )
+            stress_avg = await get_health_data_average(
+                db, user_id, HealthDataType.STRESS_LEVEL, days
+            )
 
         factors = {}
         if sleep_avg:
@@ -410,6 +417,78 @@ async def analyze_energy_trend(
         return {"error": str(e)}
 
 
+async def read_health_snapshot(
+    user_id: Optional[UUID] = None,
+    db: Optional[AsyncSession] = None
+) -> Dict[str, Any]:
+    """
+    读取用户当前的健康快照(特征向量, 一次查询)
+
+    Returns:
+        {
+            "latest": {
+                "sleep_duration": {"value": 7.5, "recorded_at": "2025-10-07T08:30:00+00:00"},
+                "hrv": {...},
+                ...
+            },
+            "averages": {
+                "energy_7d": 6.8,
+                "energy_30d": 6.5,
+                "sleep_7d": 7.1,
+                "stress_7d": 42.0
+            },
+            "last_recorded_at": "2025-10-07T08:30:00+00:00",
+            "has_data": true
+        }
+    """
+    if not user_id or not db:
+        return {"error": "Missing user_id or db context"}
+
+    try:
+        vector = await get_feature_vector(db, user_id)
+
+        if vector is None:
+            return {
+                "message": "No health data found",
+                "latest": {},
+                "averages": {},
+                "last_recorded_at": None,
+                "has_data": False
+            }
+
+        latest = {}
+        for name in FEATURE_FIELDS.values():
+            value = getattr(vector, name)
+            recorded_at = getattr(vector, f"{name}_at")
+            if value is not None and recorded_at is not None:
+                latest[name] = {
+                    "value": round(value, 2),
+                    "recorded_at": recorded_at.isoformat()
+                }
+
+        averages = {
+            "energy_7d": vector.avg_energy_7d,
+            "energy_30d": vector.avg_energy_30d,
+            "sleep_7d": vector.avg_sleep_7d,
+            "stress_7d": vector.avg_stress_7d
+        }
+
+        return {
+            "latest": latest,
+            "averages": {
+                key: round(value, 2) for key, value in averages.items() if value is not None
+            },
+            "last_recorded_at": (
+                vector.last_recorded_at.isoformat() if vector.last_recorded_at else None
+            ),
+            "has_data": True
+        }
+
+    except Exception as e:
+        logger.error(f"Error reading health snapshot: {e}", exc_info=True)
+        return {"error": str(e)}
+
+
 # ============ 辅助函数 ============
 
 def _calculate_trend(data_list: List) -> str:
@@ -495,6 +574,14 @@ def register_health_tools():
         handler=analyze_energy_trend
     )
 
+    # 工具5: 读取健康快照
+    registry.register_function(
+        name="read_health_snapshot",
+        description="读取用户当前的健康快照，包括最近一次的睡眠、HRV、静息心率、步数、压力等数据和近7/30天平均精力。用于快速了解用户当前状态，不需要历史数据点时优先使用。",
+        input_schema=READ_HEALTH_SNAPSHOT_SCHEMA,
+        handler=read_health_snapshot
+    )
+
     logger.info(f"✅ Registered {len(registry)} health tools")
 
 
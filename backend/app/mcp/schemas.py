@@ -63,6 +63,12 @@ ANALYZE_ENERGY_TREND_SCHEMA: Dict[str, Any] = {
     "required": []
 }
 
+READ_HEALTH_SNAPSHOT_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {},
+    "required": []
+}
+
 
 # ============ 日历工具Schema (Week 1 Day 5) ============
 
@@ -3,15 +3,19 @@
 """
 
 from app.models.user import User, CoachType
-from app.models.conversation import Conversation
-from app.models.health_data import HealthData, HealthDataType, HealthDataSource
+from app.models.conversation import Conversation, ConversationMessage
+from app.models.health_data import HealthData, HealthDailyRollup, HealthDataHourly, HealthFeatureVector, HealthDataType, HealthDataSource
 from app.models.ai_metrics import AIRequestMetrics
 
 __all__ = [
     "User",
     "CoachType",
     "Conversation",
+    "ConversationMessage",
     "HealthData",
+    "HealthDailyRollup",
+    "HealthDataHourly",
+    "HealthFeatureVector",
     "HealthDataType",
     "HealthDataSource",
     "AIRequestMetrics",
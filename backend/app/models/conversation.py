@@ -6,7 +6,7 @@
 import uuid
 from datetime import datetime
 from typing import TYPE_CHECKING, List
-from sqlalchemy import String, DateTime, ForeignKey, Text
+from sqlalchemy import String, DateTime, ForeignKey, Text, Integer
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
@@ -47,14 +47,6 @@ class Conversation(Base):
         comment="对话标题(自动生成或用户设置)"
     )
 
-    # 对话内容
-    messages: Mapped[dict] = mapped_column(
-        JSONB,
-        nullable=False,
-        default=list,
-        comment="对话消息数组 [{role: 'user'|'assistant', content: str, timestamp: str}]"
-    )
-
     # AI提供商信息
     ai_provider_used: Mapped[str | None] = mapped_column(
         String(50),
@@ -66,7 +58,7 @@ class Conversation(Base):
     message_count: Mapped[int] = mapped_column(
         default=0,
         nullable=False,
-        comment="消息总数"
+        comment="消息总数(同时作为下一条消息seq的分配计数器)"
     )
     total_tokens_used: Mapped[int | None] = mapped_column(
         nullable=True,
@@ -132,36 +124,84 @@ class Conversation(Base):
         cascade="all, delete-orphan",
         lazy="noload"
     )
+    messages: Mapped[List["ConversationMessage"]] = relationship(
+        "ConversationMessage",
+        back_populates="conversation",
+        cascade="all, delete-orphan",
+        passive_deletes=True,  # 依赖数据库ON DELETE CASCADE, 删除会话时不加载消息
+        order_by="ConversationMessage.seq",
+        lazy="noload"
+    )
 
     def __repr__(self) -> str:
         return f"<Conversation(id={self.id}, user_id={self.user_id}, messages={self.message_count})>"
 
-    def add_message(self, role: str, content: str, metadata: dict = None) -> None:
-        """添加消息到对话"""
+
+class ConversationMessage(Base):
+    """
+    对话消息(只追加)
+
+    主键(conversation_id, seq): 追加不改写会话行, 读取最近N条走主键索引倒序扫描
+    """
+
+    __tablename__ = "conversation_messages"
+
+    conversation_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("conversations.id", ondelete="CASCADE"),
+        primary_key=True,
+        comment="会话ID"
+    )
+    seq: Mapped[int] = mapped_column(
+        Integer,
+        primary_key=True,
+        comment="会话内消息序号(从1开始递增)"
+    )
+
+    role: Mapped[str] = mapped_column(
+        String(20),
+        nullable=False,
+        comment="消息角色: user | assistant | system"
+    )
+    content: Mapped[str] = mapped_column(
+        Text,
+        nullable=False,
+        comment="消息内容"
+    )
+    # metadata是Declarative保留属性名, 属性名用message_metadata, 列名仍为metadata
+    message_metadata: Mapped[dict | None] = mapped_column(
+        "metadata",
+        JSONB,
+        nullable=True,
+        comment="消息元数据(AI提供商、意图、token等)"
+    )
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+        comment="消息时间"
+    )
+
+    # 关系
+    conversation: Mapped["Conversation"] = relationship(
+        "Conversation",
+        back_populates="messages"
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<ConversationMessage(conversation_id={self.conversation_id}, "
+            f"seq={self.seq}, role={self.role})>"
+        )
+
+    def to_dict(self) -> dict:
+        """转换为原JSONB消息格式 {role, content, timestamp, metadata?}"""
         message = {
-            "role": role,
-            "content": content,
-            "timestamp": datetime.utcnow().isoformat(),
+            "role": self.role,
+            "content": self.content,
+            "timestamp": self.created_at.isoformat() if self.created_at else None,
         }
-        if metadata:
-            message["metadata"] = metadata
-
-        if not isinstance(self.messages, list):
-            self.messages = []
-
-        self.messages.append(message)
-        self.message_count = len(self.messages)
-        self.last_message_at = datetime.utcnow()
-
-    def get_recent_messages(self, limit: int = 10) -> list:
-        """获取最近的消息"""
-        if not isinstance(self.messages, list):
-            return []
-        return self.messages[-limit:]
-
-    @property
-    def latest_message(self) -> dict | None:
-        """获取最新消息"""
-        if not isinstance(self.messages, list) or not self.messages:
-            return None
-        return self.messages[-1]
+        if self.message_metadata:
+            message["metadata"] = self.message_metadata
+        return message
@@ -154,25 +154,25 @@ class EnergyBaseline(Base):
         comment="用户ID"
     )
 
-    # 基线数据
-    avg_energy: Mapped[float] = mapped_column(
+    # 基线数据(数据不足时为空, 该行只标记已计算过)
+    avg_energy: Mapped[float | None] = mapped_column(
         Float,
-        nullable=False,
+        nullable=True,
         comment="平均精力(1-10)"
     )
-    high_threshold: Mapped[float] = mapped_column(
+    high_threshold: Mapped[float | None] = mapped_column(
         Float,
-        nullable=False,
+        nullable=True,
         comment="高精力阈值"
     )
-    low_threshold: Mapped[float] = mapped_column(
+    low_threshold: Mapped[float | None] = mapped_column(
         Float,
-        nullable=False,
+        nullable=True,
         comment="低精力阈值"
     )
-    optimal_sleep: Mapped[float] = mapped_column(
+    optimal_sleep: Mapped[float | None] = mapped_column(
         Float,
-        nullable=False,
+        nullable=True,
         default=8.0,
         comment="最佳睡眠时长(小时)"
     )
@@ -221,7 +221,7 @@ class EnergyBaseline(Base):
     def __repr__(self) -> str:
         return (
             f"<EnergyBaseline(id={self.id}, user_id={self.user_id}, "
-            f"avg={self.avg_energy:.1f}, optimal_sleep={self.optimal_sleep:.1f})>"
+            f"avg={self.avg_energy}, optimal_sleep={self.optimal_sleep})>"
         )
 
 
@@ -251,7 +251,7 @@ class EnergyPattern(Base):
     pattern_type: Mapped[str] = mapped_column(
         String(50),
         nullable=False,
-        comment="模式类型: daily/weekly/monthly"
+        comment="模式类型: daily/weekly/monthly, none表示数据不足"
     )
     description: Mapped[str] = mapped_column(
         Text,
@@ -316,9 +316,9 @@ class EnergyPattern(Base):
         back_populates="energy_patterns"
     )
 
-    # 索引
+    # 索引(每个用户每种模式一行, 同时作为批量写入的冲突目标)
     __table_args__ = (
-        Index('ix_energy_patterns_user_type', 'user_id', 'pattern_type'),
+        Index('ix_energy_patterns_user_type', 'user_id', 'pattern_type', unique=True),
     )
 
     def __repr__(self) -> str:
@@ -435,3 +435,66 @@ class EnvironmentData(Base):
             f"<EnvironmentData(id={self.id}, user_id={self.user_id}, location={self.location}, "
             f"temp={self.temperature}℃, weather={self.weather})>"
         )
+
+
+class DigitalTwinSnapshot(Base):
+    """
+    数字孪生快照
+
+    每个用户一行, 保存最近一次计算的完整数字孪生;
+    健康/环境数据写入时标记为过期, 读取到过期快照时由后台任务重新计算
+    """
+
+    __tablename__ = "digital_twin_snapshots"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+        comment="用户ID"
+    )
+
+    payload: Mapped[dict] = mapped_column(
+        JSONB,
+        nullable=False,
+        comment="数字孪生(JSON)"
+    )
+    prediction_hours: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        comment="快照包含的预测小时数"
+    )
+
+    computed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        comment="计算时间(开始计算的时间)"
+    )
+    stale_since: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        comment="数据变更后首次标记过期的时间(未过期为NULL)"
+    )
+    data_changed_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        comment="最近一次数据变更的时间(每次写入都更新)"
+    )
+    refresh_requested_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        comment="最近一次提交后台重算的时间(用于去重)"
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+        comment="更新时间"
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<DigitalTwinSnapshot(user_id={self.user_id}, "
+            f"computed_at={self.computed_at}, stale_since={self.stale_since})>"
+        )
@@ -5,9 +5,9 @@
 """
 
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 from typing import TYPE_CHECKING
-from sqlalchemy import String, DateTime, ForeignKey, Float, Text, Index
+from sqlalchemy import String, Date, DateTime, ForeignKey, Float, Integer, Text, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
@@ -72,7 +72,13 @@ class HealthDataSource(str):
 
 
 class HealthData(Base):
-    """健康数据模型"""
+    """
+    健康数据模型
+
+    按recorded_at做月度RANGE分区(health_data_pYYYY_MM), 分区由
+    app.crud.health_partitions按需创建; 超过原始数据保留期的数据
+    由降采样任务汇总到HealthDataHourly后删除
+    """
 
     __tablename__ = "health_data"
 
@@ -132,9 +138,10 @@ class HealthData(Base):
         comment="额外元数据(JSON格式)"
     )
 
-    # 数据采集时间
+    # 数据采集时间(分区键, 分区表的主键和唯一索引必须包含它)
     recorded_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
+        primary_key=True,
         nullable=False,
         index=True,
         comment="数据采集时间"
@@ -149,7 +156,7 @@ class HealthData(Base):
     external_id: Mapped[str | None] = mapped_column(
         String(255),
         nullable=True,
-        comment="外部系统ID(用于防止重复同步)"
+        comment="外部系统ID(与user_id、recorded_at唯一, 用于防止重复同步)"
     )
 
     # 数据质量
@@ -189,7 +196,9 @@ class HealthData(Base):
     __table_args__ = (
         Index('ix_health_data_user_type_recorded', 'user_id', 'data_type', 'recorded_at'),
         Index('ix_health_data_user_recorded', 'user_id', 'recorded_at'),
-        Index('ix_health_data_external_id', 'external_id'),
+        # 同步去重: INSERT ... ON CONFLICT (user_id, external_id, recorded_at) DO NOTHING
+        Index('uq_health_data_user_external_id', 'user_id', 'external_id', 'recorded_at', unique=True),
+        {"postgresql_partition_by": "RANGE (recorded_at)"},
     )
 
     def __repr__(self) -> str:
@@ -269,3 +278,320 @@ class HealthData(Base):
             ))
 
         return data_list
+
+
+class HealthDailyRollup(Base):
+    """
+    健康数据日汇总
+
+    每个(用户, 数据类型, UTC日期)一行, 在写入health_data的同一事务中维护;
+    近N天均值 = sum(value_sum) / sum(sample_count), 一次分组查询即可得到所有类型
+    """
+
+    __tablename__ = "health_daily_rollup"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+        comment="用户ID"
+    )
+    data_type: Mapped[str] = mapped_column(
+        String(50),
+        primary_key=True,
+        comment="数据类型"
+    )
+    day: Mapped[date] = mapped_column(
+        Date,
+        primary_key=True,
+        comment="数据采集日期(UTC)"
+    )
+
+    # 聚合值
+    sample_count: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        comment="当日数据条数"
+    )
+    value_sum: Mapped[float] = mapped_column(
+        Float,
+        nullable=False,
+        comment="当日数值之和"
+    )
+    value_min: Mapped[float] = mapped_column(
+        Float,
+        nullable=False,
+        comment="当日最小值"
+    )
+    value_max: Mapped[float] = mapped_column(
+        Float,
+        nullable=False,
+        comment="当日最大值"
+    )
+    last_value: Mapped[float] = mapped_column(
+        Float,
+        nullable=False,
+        comment="当日最后一条数据的值"
+    )
+    last_recorded_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        comment="当日最后一条数据的采集时间"
+    )
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+        comment="更新时间"
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<HealthDailyRollup(user_id={self.user_id}, type={self.data_type}, "
+            f"day={self.day}, count={self.sample_count})>"
+        )
+
+    @property
+    def average(self) -> float:
+        """当日均值"""
+        return self.value_sum / self.sample_count if self.sample_count else 0.0
+
+
+class HealthDataHourly(Base):
+    """
+    健康数据小时汇总(降采样后的长期数据)
+
+    超过原始数据保留期的health_data按(用户, 类型, UTC小时)汇总到这里后删除;
+    已汇总的小时视为关闭, 之后再同步到该小时的原始数据会被跳过
+    """
+
+    __tablename__ = "health_data_hourly"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+        comment="用户ID"
+    )
+    data_type: Mapped[str] = mapped_column(
+        String(50),
+        primary_key=True,
+        comment="数据类型"
+    )
+    hour: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        primary_key=True,
+        comment="汇总小时(UTC整点)"
+    )
+
+    # 聚合值
+    sample_count: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        comment="该小时原始数据条数"
+    )
+    value_sum: Mapped[float] = mapped_column(
+        Float,
+        nullable=False,
+        comment="数值之和"
+    )
+    value_min: Mapped[float] = mapped_column(
+        Float,
+        nullable=False,
+        comment="最小值"
+    )
+    value_max: Mapped[float] = mapped_column(
+        Float,
+        nullable=False,
+        comment="最大值"
+    )
+    last_value: Mapped[float] = mapped_column(
+        Float,
+        nullable=False,
+        comment="该小时最后一条数据的值"
+    )
+    last_recorded_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        comment="该小时最后一条数据的采集时间"
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<HealthDataHourly(user_id={self.user_id}, type={self.data_type}, "
+            f"hour={self.hour}, count={self.sample_count})>"
+        )
+
+    @property
+    def average(self) -> float:
+        """小时均值"""
+        return self.value_sum / self.sample_count if self.sample_count else 0.0
+
+
+class HealthFeatureVector(Base):
+    """
+    用户健康特征向量(精力预测的特征存储)
+
+    每个用户一行: 各特征类型最新的值及其采集时间, 以及基于日汇总的近7/30天均值;
+    写入健康数据时在同一事务中增量更新(app.crud.health_features),
+    预测/数字孪生/MCP工具读取这一行, 不再扫描原始数据
+    """
+
+    __tablename__ = "health_feature_vectors"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+        comment="用户ID"
+    )
+
+    # 最新值(按采集时间, 迟到的旧数据不会覆盖)
+    sleep_duration: Mapped[float | None] = mapped_column(
+        Float,
+        nullable=True,
+        comment="最近一次睡眠时长(小时)"
+    )
+    sleep_duration_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        comment="sleep_duration的采集时间"
+    )
+    sleep_quality: Mapped[float | None] = mapped_column(
+        Float,
+        nullable=True,
+        comment="最近一次睡眠质量(1-100)"
+    )
+    sleep_quality_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        comment="sleep_quality的采集时间"
+    )
+    hrv: Mapped[float | None] = mapped_column(
+        Float,
+        nullable=True,
+        comment="最近一次心率变异性(ms)"
+    )
+    hrv_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        comment="hrv的采集时间"
+    )
+    resting_heart_rate: Mapped[float | None] = mapped_column(
+        Float,
+        nullable=True,
+        comment="最近一次静息心率(bpm)"
+    )
+    resting_heart_rate_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        comment="resting_heart_rate的采集时间"
+    )
+    steps: Mapped[float | None] = mapped_column(
+        Float,
+        nullable=True,
+        comment="最近一次步数"
+    )
+    steps_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        comment="steps的采集时间"
+    )
+    exercise_minutes: Mapped[float | None] = mapped_column(
+        Float,
+        nullable=True,
+        comment="最近一次运动时长(分钟)"
+    )
+    exercise_minutes_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        comment="exercise_minutes的采集时间"
+    )
+    active_energy: Mapped[float | None] = mapped_column(
+        Float,
+        nullable=True,
+        comment="最近一次活动能量(kcal)"
+    )
+    active_energy_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        comment="active_energy的采集时间"
+    )
+    subjective_energy: Mapped[float | None] = mapped_column(
+        Float,
+        nullable=True,
+        comment="最近一次主观精力评分(1-10)"
+    )
+    subjective_energy_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        comment="subjective_energy的采集时间"
+    )
+    stress_level: Mapped[float | None] = mapped_column(
+        Float,
+        nullable=True,
+        comment="最近一次压力水平(1-100)"
+    )
+    stress_level_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        comment="stress_level的采集时间"
+    )
+    mood: Mapped[float | None] = mapped_column(
+        Float,
+        nullable=True,
+        comment="最近一次心情(1-10)"
+    )
+    mood_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        comment="mood的采集时间"
+    )
+
+    # 近N天均值(按UTC自然日, 来自health_daily_rollup)
+    avg_energy_7d: Mapped[float | None] = mapped_column(
+        Float,
+        nullable=True,
+        comment="近7天平均精力"
+    )
+    avg_energy_30d: Mapped[float | None] = mapped_column(
+        Float,
+        nullable=True,
+        comment="近30天平均精力"
+    )
+    avg_sleep_7d: Mapped[float | None] = mapped_column(
+        Float,
+        nullable=True,
+        comment="近7天平均睡眠时长"
+    )
+    avg_stress_7d: Mapped[float | None] = mapped_column(
+        Float,
+        nullable=True,
+        comment="近7天平均压力水平"
+    )
+    means_day: Mapped[date | None] = mapped_column(
+        Date,
+        nullable=True,
+        comment="均值的计算日期(UTC), 跨天后由定时任务刷新"
+    )
+
+    last_recorded_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        comment="向量中最新数据的采集时间"
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+        comment="更新时间"
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<HealthFeatureVector(user_id={self.user_id}, "
+            f"last_recorded_at={self.last_recorded_at}, means_day={self.means_day})>"
+        )
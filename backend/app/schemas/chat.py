@@ -53,6 +53,7 @@ class ChatResponse(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.utcnow, description="响应时间戳")
     from_cache: bool = Field(False, description="是否来自缓存")
     cache_layer: Optional[str] = Field(None, description="缓存层级: L1 | L2 | L3")
+    time_to_first_token_ms: Optional[int] = Field(None, description="首个token延迟(毫秒,仅流式接口)")
 
     class Config:
         from_attributes = True
@@ -7,6 +7,8 @@ from typing import Optional, List, Dict, Any
 from uuid import UUID
 from pydantic import BaseModel, Field, field_validator
 
+from app.core.config import settings
+
 
 class HealthDataCreate(BaseModel):
     """创建健康数据请求"""
@@ -42,6 +44,30 @@ class HealthDataBatchCreate(BaseModel):
         return v
 
 
+class HealthDataBulkCreate(BaseModel):
+    """大批量导入健康数据请求(首次同步的历史回填)"""
+    data: List[HealthDataCreate] = Field(..., description="健康数据列表")
+
+    @field_validator("data")
+    @classmethod
+    def validate_data(cls, v: List[HealthDataCreate]) -> List[HealthDataCreate]:
+        """验证数据列表"""
+        if len(v) == 0:
+            raise ValueError("Data list cannot be empty")
+        if len(v) > settings.HEALTH_BULK_INGEST_MAX_RECORDS:
+            raise ValueError(
+                f"Maximum {settings.HEALTH_BULK_INGEST_MAX_RECORDS} items per bulk import"
+            )
+        return v
+
+
+class HealthBulkIngestResponse(BaseModel):
+    """大批量导入结果"""
+    inserted: int = Field(..., description="新写入的条数")
+    skipped: int = Field(..., description="因已同步而跳过的条数")
+    ids: List[UUID] = Field(default_factory=list, description="新写入数据的ID(return_ids=true时返回)")
+
+
 class HealthDataResponse(BaseModel):
     """健康数据响应"""
     id: UUID
@@ -103,13 +129,60 @@ class HealthSyncRequest(BaseModel):
         """验证记录列表"""
         if len(v) == 0:
             raise ValueError("Records list cannot be empty")
-        if len(v) > 1000:
-            raise ValueError("Maximum 1000 records per sync")
+        if len(v) > settings.HEALTH_BULK_INGEST_MAX_RECORDS:
+            raise ValueError(
+                f"Maximum {settings.HEALTH_BULK_INGEST_MAX_RECORDS} records per sync"
+            )
         return v
 
 
-class HealthSyncResponse(BaseModel):
-    """健康数据同步响应"""
-    success: bool
-    synced: int = Field(..., description="成功同步的记录数")
-    errors: List[str] = Field(default_factory=list, description="错误信息列表")
+class HealthSyncJobResponse(BaseModel):
+    """健康数据同步任务已受理响应"""
+    job_id: str = Field(..., description="同步任务ID")
+    status: str = Field(..., description="任务状态(queued | running | completed | failed)")
+    total_records: int = Field(..., description="收到的同步记录数")
+    status_url: str = Field(..., description="任务进度查询地址")
+
+
+class HealthSyncJobStatusResponse(BaseModel):
+    """健康数据同步任务进度"""
+    job_id: str
+    status: str = Field(..., description="任务状态(queued | running | completed | failed)")
+    data_source: str
+    total_records: int = Field(..., description="收到的同步记录数")
+    total_rows: int = Field(0, description="解析后待写入的数据条数(对象类型记录按指标拆分)")
+    processed: int = Field(0, description="已处理的数据条数")
+    inserted: int = Field(0, description="新写入的数据条数")
+    duplicates: int = Field(0, description="因已同步而跳过的数据条数")
+    error_count: int = Field(0, description="解析或写入失败的条数")
+    errors: List[str] = Field(default_factory=list, description="错误信息(最多保留50条)")
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class HealthStreamSyncResponse(BaseModel):
+    """NDJSON流式同步结果"""
+    completed: bool = Field(..., description="上传数据是否完整解析(否则可整体重传)")
+    records: int = Field(..., description="收到的记录行数")
+    rows: int = Field(..., description="解析后的数据条数(对象类型记录按指标拆分)")
+    inserted: int = Field(..., description="新写入的数据条数")
+    duplicates: int = Field(..., description="因已同步而跳过的数据条数")
+    error_count: int = Field(..., description="解析或写入失败的条数")
+    errors: List[str] = Field(default_factory=list, description="错误信息(最多保留50条)")
+
+
+class HealthFeatureStoreStatsResponse(BaseModel):
+    """特征存储统计(所有worker汇总)"""
+    updates: int = Field(..., description="增量更新次数")
+    updated_users: int = Field(..., description="累计更新的用户向量数")
+    updated_samples: int = Field(..., description="参与更新的数据条数")
+    avg_update_ms: float = Field(..., description="平均每次更新耗时(毫秒)")
+    avg_ingest_lag_seconds: float = Field(..., description="数据采集到进入特征向量的平均延迟(秒)")
+    reads: int = Field(..., description="读取次数")
+    read_requested: int = Field(..., description="读取请求的用户数")
+    read_found: int = Field(..., description="读取命中的向量数")
+    read_hit_rate_percent: float = Field(..., description="读取命中率")
+    avg_read_age_seconds: float = Field(..., description="读取时向量最新数据的平均年龄(秒)")
+    stale_means_reads: int = Field(..., description="读取到均值未在当天刷新的向量数")
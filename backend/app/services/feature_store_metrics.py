@@ -0,0 +1,205 @@
+"""
+特征存储统计(跨worker汇总)
+记录健康特征向量的更新成本和新鲜度
+
+Redis结构:
+- feature_store:stats     计数器hash (HINCRBY / HINCRBYFLOAT)
+
+写入路径只累加进程内计数(不在数据库事务中做网络IO), 定期批量写入Redis
+
+指标:
+- 更新成本: 每次增量更新的耗时、涉及的用户数和数据条数
+- 写入延迟: 数据采集时间到进入特征向量的时间(设备同步越晚越大)
+- 读取新鲜度: 读取时向量最新数据的年龄、均值是否已过期(跨天未刷新)
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from app.core.redis_client import get_redis_manager
+
+
+STATS_KEY = "feature_store:stats"
+
+# 进程内计数器写入Redis的最小间隔(秒)
+FLUSH_INTERVAL_SECONDS = 10.0
+
+# 用HINCRBYFLOAT累加的字段, 其余用HINCRBY
+FLOAT_FIELDS = {"update_ms_sum", "ingest_lag_seconds_sum", "read_age_seconds_sum"}
+
+
+class FeatureStoreMetrics:
+    """
+    特征存储统计记录器
+
+    写入失败只记录警告, 不影响健康数据写入和预测
+    """
+
+    def __init__(self, redis_client):
+        """
+        Args:
+            redis_client: redis.asyncio客户端(decode_responses=True)
+        """
+        self.redis = redis_client
+
+    async def add_counters(self, counters: Dict[str, float]) -> None:
+        """
+        把一批计数累加到Redis(一次往返)
+
+        MULTI/EXEC事务执行, 要么全部累加要么都不累加, 失败时整批重新排队不会重复计数
+
+        Args:
+            counters: {字段: 增量}
+        """
+        pipe = self.redis.pipeline(transaction=True)
+        for field, amount in counters.items():
+            if field in FLOAT_FIELDS:
+                pipe.hincrbyfloat(STATS_KEY, field, amount)
+            else:
+                pipe.hincrby(STATS_KEY, field, int(amount))
+        await pipe.execute()
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """获取更新成本和新鲜度统计(所有worker汇总, 本进程未写入的计数先写入)"""
+        await flush_feature_metrics()
+        raw = await self.redis.hgetall(STATS_KEY) or {}
+
+        def num(field: str) -> float:
+            try:
+                return float(raw.get(field, 0))
+            except (TypeError, ValueError):
+                logger.warning(f"Invalid feature store stats field {field}={raw.get(field)}")
+                return 0.0
+
+        updates = int(num("updates"))
+        updated_users = int(num("updated_users"))
+        reads = int(num("reads"))
+        requested = int(num("read_requested"))
+        found = int(num("read_found"))
+
+        def avg(total: float, count: int) -> float:
+            return round(total / count, 2) if count else 0.0
+
+        return {
+            "updates": updates,
+            "updated_users": updated_users,
+            "updated_samples": int(num("updated_samples")),
+            "avg_update_ms": avg(num("update_ms_sum"), updates),
+            "avg_ingest_lag_seconds": avg(num("ingest_lag_seconds_sum"), updated_users),
+            "reads": reads,
+            "read_requested": requested,
+            "read_found": found,
+            "read_hit_rate_percent": round(found / requested * 100, 2) if requested else 0.0,
+            "avg_read_age_seconds": avg(num("read_age_seconds_sum"), found),
+            "stale_means_reads": int(num("read_stale_means"))
+        }
+
+
+# 全局单例
+_feature_store_metrics: Optional[FeatureStoreMetrics] = None
+
+
+async def get_feature_store_metrics() -> FeatureStoreMetrics:
+    """获取全局FeatureStoreMetrics单例"""
+    global _feature_store_metrics
+
+    if _feature_store_metrics is None:
+        redis_manager = await get_redis_manager()
+        _feature_store_metrics = FeatureStoreMetrics(redis_manager.client)
+
+    return _feature_store_metrics
+
+
+# ============ 进程内计数(写入路径不做网络IO) ============
+
+_pending: Dict[str, float] = {}
+_last_flush = time.monotonic()
+_flush_task: Optional[asyncio.Task] = None
+
+
+def record_feature_update(
+    users: int,
+    samples: int,
+    duration_ms: float,
+    ingest_lag_seconds: float
+) -> None:
+    """
+    记录一次增量更新(只累加进程内计数, 由后台任务定期写入Redis)
+
+    Args:
+        users: 更新的用户数
+        samples: 参与更新的数据条数
+        duration_ms: 更新耗时
+        ingest_lag_seconds: 各用户(更新时间 - 最新采集时间)之和
+    """
+    _add_counters(
+        updates=1,
+        updated_users=users,
+        updated_samples=samples,
+        update_ms_sum=duration_ms,
+        ingest_lag_seconds_sum=ingest_lag_seconds
+    )
+
+
+def record_feature_read(
+    requested: int,
+    found: int,
+    age_seconds: float,
+    stale_means: int
+) -> None:
+    """
+    记录一次读取(只累加进程内计数, 由后台任务定期写入Redis)
+
+    Args:
+        requested: 请求的用户数
+        found: 命中的向量数
+        age_seconds: 命中向量(读取时间 - 最新采集时间)之和
+        stale_means: 均值未在今天刷新的向量数
+    """
+    _add_counters(
+        reads=1,
+        read_requested=requested,
+        read_found=found,
+        read_age_seconds_sum=age_seconds,
+        read_stale_means=stale_means
+    )
+
+
+async def flush_feature_metrics() -> None:
+    """把进程内计数写入Redis; 失败时(事务未生效)计数保留到下次(Redis不可用时只记录警告)"""
+    global _pending, _last_flush
+
+    counters, _pending = _pending, {}
+    _last_flush = time.monotonic()
+    if not counters:
+        return
+
+    try:
+        metrics = await get_feature_store_metrics()
+        await metrics.add_counters(counters)
+    except Exception as e:
+        logger.warning(f"Feature store stats update failed: {e}")
+        for field, amount in counters.items():
+            _pending[field] = _pending.get(field, 0) + amount
+
+
+def _add_counters(**counters: float) -> None:
+    """累加计数, 距上次写入超过FLUSH_INTERVAL_SECONDS时在后台写入Redis"""
+    global _flush_task
+
+    for field, amount in counters.items():
+        _pending[field] = _pending.get(field, 0) + amount
+
+    if time.monotonic() - _last_flush < FLUSH_INTERVAL_SECONDS:
+        return
+    if _flush_task is not None and not _flush_task.done():
+        return
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    _flush_task = loop.create_task(flush_feature_metrics())
@@ -21,6 +21,7 @@ async def get_user_health_summary(
     获取用户健康数据摘要
 
     聚合用户最近N天的核心健康指标，用于AI对话上下文
+    (每轮对话都会调用, 只查询一次health_daily_rollup)
 
     Args:
         db: 数据库会话
@@ -32,10 +33,13 @@ async def get_user_health_summary(
     """
     summary: Dict[str, Any] = {}
 
-    # 1. 睡眠数据
-    sleep_avg = await health_crud.get_health_data_average(
-        db, user_id, HealthDataType.SLEEP_DURATION, days
+    # 一次分组查询(日汇总表)拿到所有指标的均值
+    averages = await health_crud.get_health_data_averages(
+        db, user_id, health_crud.SUMMARY_DATA_TYPES, days
     )
+
+    # 1. 睡眠数据
+    sleep_avg = averages.get(HealthDataType.SLEEP_DURATION)
     if sleep_avg is not None:
         summary["sleep_avg"] = round(sleep_avg, 1)
         summary["sleep_status"] = _get_sleep_status(sleep_avg)
@@ -44,9 +48,7 @@ async def get_user_health_summary(
         summary["sleep_status"] = "未知"
 
     # 2. 心率变异性 (HRV)
-    hrv_avg = await health_crud.get_health_data_average(
-        db, user_id, HealthDataType.HRV, days
-    )
+    hrv_avg = averages.get(HealthDataType.HRV)
     if hrv_avg is not None:
         summary["hrv_avg"] = round(hrv_avg, 1)
         summary["hrv_status"] = _get_hrv_status(hrv_avg)
@@ -55,9 +57,7 @@ async def get_user_health_summary(
         summary["hrv_status"] = "未知"
 
     # 3. 步数
-    steps_avg = await health_crud.get_health_data_average(
-        db, user_id, HealthDataType.STEPS, days
-    )
+    steps_avg = averages.get(HealthDataType.STEPS)
     if steps_avg is not None:
         summary["steps_avg"] = round(steps_avg, 0)
         summary["activity_level"] = _get_activity_level(steps_avg)
@@ -66,9 +66,7 @@ async def get_user_health_summary(
         summary["activity_level"] = "未知"
 
     # 4. 压力水平
-    stress_avg = await health_crud.get_health_data_average(
-        db, user_id, HealthDataType.STRESS_LEVEL, days
-    )
+    stress_avg = averages.get(HealthDataType.STRESS_LEVEL)
     if stress_avg is not None:
         summary["stress_level"] = round(stress_avg, 1)
         summary["stress_status"] = _get_stress_status(stress_avg)
@@ -77,9 +75,7 @@ async def get_user_health_summary(
         summary["stress_status"] = "未知"
 
     # 5. 能量水平(主观评估)
-    energy_avg = await health_crud.get_health_data_average(
-        db, user_id, HealthDataType.ENERGY_LEVEL, days
-    )
+    energy_avg = averages.get(HealthDataType.ENERGY_LEVEL)
     if energy_avg is not None:
         summary["energy_level"] = round(energy_avg, 1)
         summary["energy_status"] = _get_energy_status(energy_avg)
@@ -88,9 +84,7 @@ async def get_user_health_summary(
         summary["energy_status"] = "未知"
 
     # 6. 静息心率
-    resting_hr_avg = await health_crud.get_health_data_average(
-        db, user_id, HealthDataType.HEART_RATE_RESTING, days
-    )
+    resting_hr_avg = averages.get(HealthDataType.HEART_RATE_RESTING)
     if resting_hr_avg is not None:
         summary["resting_heart_rate_avg"] = round(resting_hr_avg, 0)
 
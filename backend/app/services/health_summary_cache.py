@@ -0,0 +1,231 @@
+"""
+健康摘要缓存
+缓存get_user_health_summary的结果, 每轮对话不再重复聚合
+
+Redis结构:
+- health_summary:{user_id}        hash, field为统计天数, value为摘要JSON
+- health_summary:gen:{user_id}    该用户的缓存代数(每次失效+1)
+- health_summary:stats            命中/未命中计数(所有worker共同累加)
+
+失效:
+- 写入/同步/修改/删除健康数据后删除该用户的hash(所有窗口一并失效)并递增代数
+- 计算前读取代数, 写入时代数已变化(计算期间发生过失效)则放弃写入, 不会缓存失效前的旧摘要
+- 统计窗口按UTC自然日划分, 缓存最迟在下一个UTC零点过期
+"""
+
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+from uuid import UUID
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.redis_client import get_redis_manager
+
+
+KEY_PREFIX = "health_summary:"
+GENERATION_PREFIX = "health_summary:gen:"
+STATS_KEY = "health_summary:stats"
+
+# 代数未变化时才写入摘要(比较和写入在Redis中原子执行)
+# KEYS: 摘要hash, 代数, 统计; ARGV: 计算前读到的代数('' 表示不存在), field, 摘要JSON, 过期秒数
+_WRITE_IF_UNCHANGED = """
+redis.call('HINCRBY', KEYS[3], 'misses', 1)
+local generation = redis.call('GET', KEYS[2]) or ''
+if generation ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[2], ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+
+
+def _seconds_until_utc_midnight(now: Optional[datetime] = None) -> int:
+    """距离下一个UTC零点的秒数"""
+    now = now or datetime.now(timezone.utc)
+    midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return max(1, int((midnight - now).total_seconds()))
+
+
+class HealthSummaryCache:
+    """
+    用户健康摘要缓存
+
+    Redis不可用时直接计算(不影响对话), 只记录警告
+    """
+
+    def __init__(self, redis_client, ttl: int = 3600):
+        """
+        Args:
+            redis_client: redis.asyncio客户端(decode_responses=True)
+            ttl: 最长有效期(秒)
+        """
+        self.redis = redis_client
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(user_id: UUID) -> str:
+        return f"{KEY_PREFIX}{user_id}"
+
+    @staticmethod
+    def _generation_key(user_id: UUID) -> str:
+        return f"{GENERATION_PREFIX}{user_id}"
+
+    async def get_or_compute(
+        self,
+        user_id: UUID,
+        days: int,
+        compute: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        读取缓存的摘要, 未命中时计算并写入
+
+        Args:
+            user_id: 用户ID
+            days: 统计天数
+            compute: 计算摘要的协程函数
+
+        Returns:
+            健康数据摘要字典
+        """
+        key = self._key(user_id)
+        generation_key = self._generation_key(user_id)
+        field = str(days)
+
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hget(key, field)
+            pipe.get(generation_key)
+            cached, generation = await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Health summary cache read failed: {e}")
+            return await compute()
+
+        if cached is not None:
+            await self._record("hits")
+            return json.loads(cached)
+
+        summary = await compute()
+
+        try:
+            await self.redis.eval(
+                _WRITE_IF_UNCHANGED, 3, key, generation_key, STATS_KEY,
+                generation or "",
+                field,
+                json.dumps(summary, ensure_ascii=False),
+                min(self.ttl, _seconds_until_utc_midnight())
+            )
+        except Exception as e:
+            logger.warning(f"Health summary cache write failed: {e}")
+
+        return summary
+
+    async def invalidate(self, user_ids: Iterable[UUID]) -> int:
+        """
+        使用户的摘要缓存失效
+
+        删除摘要并递增代数, 失效前开始的计算不会再写回旧摘要;
+        代数的有效期不短于摘要, 过期后视为不存在(同样与计算前读到的代数不同)
+
+        Args:
+            user_ids: 用户ID
+
+        Returns:
+            删除的键数量
+        """
+        user_ids = set(user_ids)
+        if not user_ids:
+            return 0
+
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.delete(*(self._key(user_id) for user_id in user_ids))
+            for user_id in user_ids:
+                generation_key = self._generation_key(user_id)
+                pipe.incr(generation_key)
+                pipe.expire(generation_key, self.ttl)
+            pipe.hincrby(STATS_KEY, "invalidations", len(user_ids))
+            results = await pipe.execute()
+            return results[0]
+        except Exception as e:
+            logger.warning(f"Health summary cache invalidation failed: {e}")
+            return 0
+
+    async def _record(self, field: str) -> None:
+        try:
+            await self.redis.hincrby(STATS_KEY, field, 1)
+        except Exception as e:
+            logger.warning(f"Health summary cache stats update failed: {e}")
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """获取命中率统计(所有worker汇总)"""
+        raw = await self.redis.hgetall(STATS_KEY) or {}
+
+        hits = int(raw.get("hits", 0))
+        misses = int(raw.get("misses", 0))
+        total = hits + misses
+
+        return {
+            "total_requests": total,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate_percent": round(hits / total * 100, 2) if total else 0.0,
+            "invalidations": int(raw.get("invalidations", 0)),
+            "ttl_seconds": self.ttl
+        }
+
+
+# 全局单例
+_health_summary_cache: Optional[HealthSummaryCache] = None
+
+
+async def get_health_summary_cache() -> HealthSummaryCache:
+    """获取全局HealthSummaryCache单例"""
+    global _health_summary_cache
+
+    if _health_summary_cache is None:
+        redis_manager = await get_redis_manager()
+        _health_summary_cache = HealthSummaryCache(
+            redis_manager.client,
+            ttl=settings.CACHE_HEALTH_SUMMARY_TTL
+        )
+
+    return _health_summary_cache
+
+
+async def invalidate_health_summary(*user_ids: UUID) -> None:
+    """健康数据变更后调用: 使相关用户的摘要缓存失效(Redis不可用时只记录警告)"""
+    try:
+        cache = await get_health_summary_cache()
+    except Exception as e:
+        logger.warning(f"Health summary cache unavailable, skip invalidation: {e}")
+        return
+
+    await cache.invalidate(user_ids)
+
+
+async def get_cached_user_health_summary(
+    user_id: UUID,
+    days: int,
+    compute: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    """
+    带缓存的健康摘要(Redis不可用时直接计算)
+
+    Args:
+        user_id: 用户ID
+        days: 统计天数
+        compute: 计算摘要的协程函数(仅在未命中时调用)
+
+    Returns:
+        健康数据摘要字典
+    """
+    try:
+        cache = await get_health_summary_cache()
+    except Exception as e:
+        logger.warning(f"Health summary cache unavailable: {e}")
+        return await compute()
+
+    return await cache.get_or_compute(user_id, days, compute)
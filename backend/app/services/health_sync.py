@@ -0,0 +1,500 @@
+"""
+健康数据异步同步
+/health/sync 只接收数据并创建任务, 由Celery worker分批写入
+
+Redis结构:
+- health_sync:payload:{job_id}    同步请求原文(JSON), 任务完成后删除
+- health_sync:job:{job_id}        任务状态hash(状态、各项计数、错误信息)
+"""
+
+import asyncio
+import json
+import uuid
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.core.redis_client import get_redis_manager
+from app.crud import health_data as health_crud
+from app.models.health_data import HealthDataType, HealthDataSource
+from app.schemas.health import HealthSyncRecord, HealthSyncRequest
+
+
+PAYLOAD_KEY_PREFIX = "health_sync:payload:"
+JOB_KEY_PREFIX = "health_sync:job:"
+
+# 任务中保留的错误信息条数(计数不受限制)
+MAX_ERROR_MESSAGES = 50
+
+# NDJSON流式上传: 单行最大字节数, 每次解压输出的最大字节数(防止压缩炸弹一次性展开)
+MAX_NDJSON_LINE_BYTES = 64 * 1024
+INFLATE_STEP_BYTES = 256 * 1024
+
+# 数据类型映射（从前端类型到数据库类型）
+SYNC_TYPE_MAPPING = {
+    "sleep": HealthDataType.SLEEP_DURATION,
+    "steps": HealthDataType.STEPS,
+    "heart_rate": HealthDataType.HEART_RATE,
+    "activity": HealthDataType.ACTIVE_ENERGY,
+    "calories": HealthDataType.ACTIVE_ENERGY,
+    "distance": HealthDataType.DISTANCE,
+}
+
+
+class NDJSONLineTooLong(ValueError):
+    """NDJSON单行超过长度上限"""
+
+
+class SyncJobStatus:
+    """同步任务状态"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+def build_sync_rows(
+    sync_request: HealthSyncRequest,
+    user_id: UUID,
+    now: Optional[datetime] = None
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    把同步记录转换为health_data行
+
+    Args:
+        sync_request: 同步请求
+        user_id: 用户ID
+        now: 同步时间(默认当前时间)
+
+    Returns:
+        (待写入的行, 解析失败的错误信息)
+    """
+    now = now or datetime.utcnow()
+    rows: List[Dict[str, Any]] = []
+    errors: List[str] = []
+
+    for record in sync_request.records:
+        try:
+            rows.extend(build_record_rows(record, sync_request.data_source, user_id, now))
+        except Exception as e:
+            errors.append(f"处理记录 {record.type}@{record.date} 失败: {str(e)}")
+
+    return rows, errors
+
+
+def build_record_rows(
+    record: HealthSyncRecord,
+    data_source: str,
+    user_id: UUID,
+    now: datetime
+) -> List[Dict[str, Any]]:
+    """
+    把单条同步记录转换为health_data行
+
+    对象类型的value(如activity)按指标拆成多行; external_id由来源、类型、日期和用户生成,
+    写入时由(user_id, external_id, recorded_at)唯一索引跳过已同步的数据
+
+    Raises:
+        ValueError: 日期或数值无法解析
+    """
+    # 确定数据来源
+    source = (
+        HealthDataSource.APPLE_HEALTH
+        if data_source == "apple_health"
+        else HealthDataSource.GOOGLE_FIT
+    )
+
+    # 映射数据类型
+    data_type = SYNC_TYPE_MAPPING.get(record.type, record.type)
+
+    # 生成外部ID用于去重
+    external_id = f"{data_source}_{record.type}_{record.date}_{user_id}"
+
+    # 解析日期
+    try:
+        recorded_at = datetime.fromisoformat(record.date)
+    except ValueError:
+        recorded_at = datetime.strptime(record.date, "%Y-%m-%d")
+
+    # 处理value（可能是对象或数值）
+    if isinstance(record.value, dict):
+        # 对于activity类型，value是一个包含多个指标的对象
+        # 为每个指标创建单独的记录
+        values = [
+            (SYNC_TYPE_MAPPING.get(key, key), float(val), f"{external_id}_{key}")
+            for key, val in record.value.items()
+        ]
+    else:
+        # 普通数值类型
+        values = [(data_type, float(record.value), external_id)]
+
+    return [
+        {
+            "user_id": user_id,
+            "data_type": row_type,
+            "value": value,
+            "source": source,
+            "unit": None,
+            "recorded_at": recorded_at,
+            "extra_data": record.metadata or {},
+            "external_id": row_external_id,
+            "synced_at": now
+        }
+        for row_type, value, row_external_id in values
+    ]
+
+
+async def ingest_rows(db, rows: List[Dict[str, Any]]) -> int:
+    """
+    写入一批健康数据, 返回新写入条数
+
+    达到HEALTH_BULK_INGEST_THRESHOLD时走COPY批量导入, 否则INSERT ... ON CONFLICT
+    """
+    if len(rows) >= settings.HEALTH_BULK_INGEST_THRESHOLD:
+        result = await health_crud.bulk_ingest_health_data(db, rows)
+        return result.inserted
+
+    created = await health_crud.insert_health_data_batch(db, rows)
+    return len(created)
+
+
+class HealthSyncJobStore:
+    """同步任务的Redis存储"""
+
+    def __init__(self, redis_client, ttl: int = 86400):
+        """
+        Args:
+            redis_client: redis.asyncio客户端(decode_responses=True)
+            ttl: 任务状态和数据的保留时间(秒)
+        """
+        self.redis = redis_client
+        self.ttl = ttl
+
+    async def create_job(self, user_id: UUID, sync_request: HealthSyncRequest) -> str:
+        """保存同步数据并创建排队中的任务, 返回任务ID"""
+        job_id = uuid.uuid4().hex
+        now = datetime.utcnow().isoformat()
+
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.set(
+            f"{PAYLOAD_KEY_PREFIX}{job_id}",
+            sync_request.model_dump_json(),
+            ex=self.ttl
+        )
+        pipe.hset(f"{JOB_KEY_PREFIX}{job_id}", mapping={
+            "job_id": job_id,
+            "user_id": str(user_id),
+            "status": SyncJobStatus.QUEUED,
+            "data_source": sync_request.data_source,
+            "total_records": len(sync_request.records),
+            "total_rows": 0,
+            "processed": 0,
+            "inserted": 0,
+            "duplicates": 0,
+            "error_count": 0,
+            "errors": "[]",
+            "created_at": now,
+            "updated_at": now
+        })
+        pipe.expire(f"{JOB_KEY_PREFIX}{job_id}", self.ttl)
+        await pipe.execute()
+
+        return job_id
+
+    async def load_payload(self, job_id: str) -> Optional[HealthSyncRequest]:
+        """读取同步数据(已过期或已处理返回None)"""
+        raw = await self.redis.get(f"{PAYLOAD_KEY_PREFIX}{job_id}")
+        if raw is None:
+            return None
+        return HealthSyncRequest.model_validate_json(raw)
+
+    async def delete_payload(self, job_id: str) -> None:
+        await self.redis.delete(f"{PAYLOAD_KEY_PREFIX}{job_id}")
+
+    async def update(self, job_id: str, **fields: Any) -> None:
+        """更新任务字段"""
+        fields["updated_at"] = datetime.utcnow().isoformat()
+        await self.redis.hset(f"{JOB_KEY_PREFIX}{job_id}", mapping=fields)
+
+    async def add_progress(
+        self,
+        job_id: str,
+        processed: int = 0,
+        inserted: int = 0,
+        duplicates: int = 0,
+        errors: Optional[List[str]] = None,
+        error_count: int = 0
+    ) -> None:
+        """累加一批的处理结果"""
+        key = f"{JOB_KEY_PREFIX}{job_id}"
+
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hincrby(key, "processed", processed)
+        pipe.hincrby(key, "inserted", inserted)
+        pipe.hincrby(key, "duplicates", duplicates)
+        pipe.hincrby(key, "error_count", error_count)
+        pipe.hset(key, "updated_at", datetime.utcnow().isoformat())
+        await pipe.execute()
+
+        if errors:
+            current = json.loads(await self.redis.hget(key, "errors") or "[]")
+            current.extend(errors)
+            await self.redis.hset(key, "errors", json.dumps(current[:MAX_ERROR_MESSAGES], ensure_ascii=False))
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """读取任务状态, 不存在返回None"""
+        raw = await self.redis.hgetall(f"{JOB_KEY_PREFIX}{job_id}")
+        if not raw:
+            return None
+
+        job: Dict[str, Any] = dict(raw)
+        for field in ("total_records", "total_rows", "processed", "inserted", "duplicates", "error_count"):
+            job[field] = int(raw.get(field, 0))
+        job["errors"] = json.loads(raw.get("errors") or "[]")
+        return job
+
+
+async def get_health_sync_job_store() -> HealthSyncJobStore:
+    """获取同步任务存储(使用全局Redis连接)"""
+    redis_manager = await get_redis_manager()
+    return HealthSyncJobStore(redis_manager.client, ttl=settings.HEALTH_SYNC_JOB_TTL)
+
+
+async def run_health_sync_job(job_id: str) -> Dict[str, Any]:
+    """
+    执行同步任务: 解析数据并按HEALTH_SYNC_CHUNK_SIZE分批写入
+
+    每批独立事务, 单批失败只计入错误, 不影响其他批次; 写入依赖唯一索引去重,
+    任务重试时已写入的数据计为重复
+
+    Args:
+        job_id: 任务ID
+
+    Returns:
+        任务最终状态
+    """
+    store = await get_health_sync_job_store()
+
+    job = await store.get_job(job_id)
+    if job is None:
+        raise ValueError(f"Health sync job {job_id} not found")
+
+    sync_request = await store.load_payload(job_id)
+    if sync_request is None:
+        await store.update(job_id, status=SyncJobStatus.FAILED, finished_at=datetime.utcnow().isoformat())
+        raise ValueError(f"Payload of health sync job {job_id} expired")
+
+    # 重试时从头开始计数
+    await store.update(
+        job_id,
+        status=SyncJobStatus.RUNNING,
+        started_at=datetime.utcnow().isoformat(),
+        processed=0,
+        inserted=0,
+        duplicates=0,
+        error_count=0,
+        errors="[]"
+    )
+
+    rows, parse_errors = build_sync_rows(sync_request, UUID(job["user_id"]))
+    await store.update(job_id, total_rows=len(rows))
+    if parse_errors:
+        await store.add_progress(job_id, errors=parse_errors, error_count=len(parse_errors))
+
+    chunk_size = settings.HEALTH_SYNC_CHUNK_SIZE
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        try:
+            async with async_session_maker() as db:
+                inserted = await ingest_rows(db, chunk)
+            await store.add_progress(
+                job_id,
+                processed=len(chunk),
+                inserted=inserted,
+                duplicates=len(chunk) - inserted
+            )
+        except Exception as e:
+            logger.error(f"Health sync job {job_id} chunk at {start} failed: {e}")
+            await store.add_progress(
+                job_id,
+                processed=len(chunk),
+                errors=[f"批量写入失败(第{start + 1}-{start + len(chunk)}条): {str(e)}"],
+                error_count=len(chunk)
+            )
+
+    await store.update(
+        job_id,
+        status=SyncJobStatus.COMPLETED,
+        finished_at=datetime.utcnow().isoformat()
+    )
+    await store.delete_payload(job_id)
+
+    result = await store.get_job(job_id)
+    logger.info(
+        f"✅ Health sync job {job_id} completed | "
+        f"rows={result['total_rows']} inserted={result['inserted']} "
+        f"duplicates={result['duplicates']} errors={result['error_count']}"
+    )
+    return result
+
+
+# ============ NDJSON流式上传 ============
+
+def _inflate(decompressor, data: bytes) -> Iterator[bytes]:
+    """分段解压, 每段不超过INFLATE_STEP_BYTES"""
+    while data:
+        piece = decompressor.decompress(data, INFLATE_STEP_BYTES)
+        if piece:
+            yield piece
+        data = decompressor.unconsumed_tail
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterator[bytes],
+    gzipped: bool = False,
+    max_line_bytes: int = MAX_NDJSON_LINE_BYTES
+) -> AsyncIterator[bytes]:
+    """
+    从请求体分块中逐行读取NDJSON(可选gzip), 只缓冲未结束的一行
+
+    Args:
+        chunks: 请求体字节块
+        gzipped: 请求体是否gzip压缩
+        max_line_bytes: 单行最大字节数
+
+    Yields:
+        非空行(不含换行符)
+
+    Raises:
+        NDJSONLineTooLong: 单行超过上限
+        zlib.error: gzip数据损坏
+    """
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16) if gzipped else None
+    buffer = b""
+
+    def split_lines(data: bytes) -> List[bytes]:
+        nonlocal buffer
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        if len(buffer) > max_line_bytes:
+            raise NDJSONLineTooLong(f"NDJSON line exceeds {max_line_bytes} bytes")
+        return [line for line in lines if line.strip()]
+
+    async for chunk in chunks:
+        pieces = _inflate(decompressor, chunk) if decompressor else [chunk]
+        for piece in pieces:
+            for line in split_lines(piece):
+                yield line
+
+    if decompressor:
+        for line in split_lines(decompressor.flush()):
+            yield line
+
+    if buffer.strip():
+        yield buffer
+
+
+async def ingest_ndjson_stream(
+    chunks: AsyncIterator[bytes],
+    user_id: UUID,
+    data_source: str,
+    gzipped: bool = False
+) -> Dict[str, Any]:
+    """
+    边接收边解析边写入的健康数据同步
+
+    每行一条HealthSyncRecord; 攒满HEALTH_SYNC_CHUNK_SIZE行后交给后台写入,
+    同时继续解析下一批(最多一批在写入, 内存上限约为两批数据)
+
+    Args:
+        chunks: 请求体字节块
+        user_id: 用户ID
+        data_source: apple_health | google_fit
+        gzipped: 请求体是否gzip压缩
+
+    Returns:
+        records/rows/inserted/duplicates/error_count/errors/completed
+    """
+    chunk_size = settings.HEALTH_SYNC_CHUNK_SIZE
+    now = datetime.utcnow()
+
+    result: Dict[str, Any] = {
+        "records": 0,
+        "rows": 0,
+        "inserted": 0,
+        "duplicates": 0,
+        "error_count": 0,
+        "errors": [],
+        "completed": True
+    }
+
+    def add_error(message: str, count: int = 1) -> None:
+        result["error_count"] += count
+        if len(result["errors"]) < MAX_ERROR_MESSAGES:
+            result["errors"].append(message)
+
+    async def write(rows: List[Dict[str, Any]]) -> int:
+        async with async_session_maker() as db:
+            return await ingest_rows(db, rows)
+
+    pending: Optional[Tuple[asyncio.Task, int]] = None
+
+    async def wait_pending() -> None:
+        nonlocal pending
+        if pending is None:
+            return
+        task, size = pending
+        pending = None
+        try:
+            inserted = await task
+            result["inserted"] += inserted
+            result["duplicates"] += size - inserted
+        except Exception as e:
+            logger.error(f"Streaming health sync chunk failed: {e}")
+            add_error(f"批量写入失败({size}条): {str(e)}", size)
+
+    async def submit(rows: List[Dict[str, Any]]) -> None:
+        nonlocal pending
+        # 上一批写完再提交下一批, 形成背压
+        await wait_pending()
+        pending = (asyncio.create_task(write(rows)), len(rows))
+
+    rows: List[Dict[str, Any]] = []
+    line_no = 0
+
+    try:
+        try:
+            async for line in iter_ndjson_lines(chunks, gzipped=gzipped):
+                line_no += 1
+                result["records"] += 1
+                try:
+                    record = HealthSyncRecord.model_validate_json(line)
+                    record_rows = build_record_rows(record, data_source, user_id, now)
+                except Exception as e:
+                    add_error(f"第{line_no}行解析失败: {str(e)}")
+                    continue
+
+                rows.extend(record_rows)
+                result["rows"] += len(record_rows)
+
+                if len(rows) >= chunk_size:
+                    await submit(rows)
+                    rows = []
+
+        except (NDJSONLineTooLong, zlib.error) as e:
+            # 已解析的数据照常写入; 客户端可整体重传(写入按external_id去重)
+            result["completed"] = False
+            add_error(f"上传数据无法解析(第{line_no + 1}行附近): {str(e)}")
+
+        if rows:
+            await submit(rows)
+
+    finally:
+        await wait_pending()
+
+    return result
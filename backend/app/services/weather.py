@@ -13,6 +13,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.models.energy import EnvironmentData
 from app.core.config import get_settings
+from app.crud.twin_snapshots import mark_twin_snapshots_stale
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -246,6 +247,7 @@ class WeatherService:
             )
 
             db.add(env_data)
+            await mark_twin_snapshots_stale(db, [user_id])
             await db.commit()
             await db.refresh(env_data)
 
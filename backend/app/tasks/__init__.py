@@ -4,9 +4,22 @@ Celery异步任务模块
 
 from app.tasks.environment import collect_environment_data_for_all_users
 from app.tasks.briefing import send_morning_briefing, send_evening_review
+from app.tasks.cache import sweep_expired_semantic_cache
+from app.tasks.health import (
+    process_health_sync_job,
+    maintain_health_data_partitions,
+    refresh_health_feature_means
+)
+from app.tasks.energy import refresh_digital_twin_snapshot, refresh_energy_profiles
 
 __all__ = [
     "collect_environment_data_for_all_users",
     "send_morning_briefing",
-    "send_evening_review"
+    "send_evening_review",
+    "sweep_expired_semantic_cache",
+    "process_health_sync_job",
+    "maintain_health_data_partitions",
+    "refresh_health_feature_means",
+    "refresh_digital_twin_snapshot",
+    "refresh_energy_profiles"
 ]
@@ -6,7 +6,8 @@
 """
 
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 from app.celery_app import celery_app
 
 logger = logging.getLogger(__name__)
@@ -14,9 +15,13 @@ logger = logging.getLogger(__name__)
 
 @celery_app.task(
     name="app.tasks.briefing.send_morning_briefing",
-    bind=True
+    bind=True,
+    max_retries=3,
+    default_retry_delay=300,  # 5分钟后重试
+    time_limit=3600,  # 全量用户批量预测, 放宽到1小时硬限制
+    soft_time_limit=3540
 )
-def send_morning_briefing(self):
+def send_morning_briefing(self, first_hour: Optional[str] = None):
     """
     发送早间简报
 
@@ -28,22 +33,114 @@ def send_morning_briefing(self):
     - 提供日程安排建议
     - 健康提醒（睡眠、运动等）
 
-    TODO: Phase 2实现
-    当前为占位符，等待Phase 2开发
+    TODO: Phase 2实现推送通知
+    当前只为所有活跃用户批量生成并保存今日精力曲线
+
+    每批用户的预测单独提交; 重试时沿用首次执行的起始整点,
+    已经保存了这条曲线的用户被跳过, 不会重复写入
+
+    Args:
+        first_hour: 曲线起始整点(UTC ISO格式), 首次执行时为空, 重试时由本任务传入
+    """
+    import asyncio
+
+    first_hour = first_hour or datetime.utcnow().replace(
+        minute=0, second=0, microsecond=0
+    ).isoformat()
+
+    try:
+        # 在Celery worker中运行异步任务
+        loop = asyncio.get_event_loop()
+        result = loop.run_until_complete(
+            _generate_morning_predictions(datetime.fromisoformat(first_hour))
+        )
+        return result
+    except Exception as e:
+        logger.error(f"早间简报精力预测失败: {e}")
+        # 重试任务(同一条曲线, 从未完成的用户继续)
+        raise self.retry(exc=e, kwargs={"first_hour": first_hour})
+
+
+async def _generate_morning_predictions(first_hour: datetime) -> dict:
     """
-    logger.info("早间简报任务执行 - Phase 2功能待实现")
+    内部异步函数：分批为活跃用户预测今日精力曲线
 
-    # Phase 2将实现以下功能:
-    # 1. 获取所有活跃用户
-    # 2. 为每个用户生成今日精力预测
-    # 3. 通过推送通知发送简报
-    # 4. 记录简报发送状态
+    Args:
+        first_hour: 曲线起始整点(UTC)
+
+    Returns:
+        预测统计
+    """
+    import time
+    from sqlalchemy import select, any_, bindparam
+    from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+    from app.ai.energy_prediction import get_energy_prediction_model
+    from app.core.config import settings
+    from app.core.database import async_session_maker
+    from app.models.energy import EnergyPrediction
+    from app.models.user import User
+
+    start = time.perf_counter()
+    model = await get_energy_prediction_model()
+
+    # 从起始整点开始的各个小时
+    times = [first_hour + timedelta(hours=h) for h in range(settings.BRIEFING_FORECAST_HOURS)]
+
+    users = 0
+    skipped = 0
+    predictions = 0
+    last_id = None
+
+    async with async_session_maker() as db:
+        while True:
+            # 按ID键集分页读取活跃用户
+            query = select(User.id).where(User.is_active.is_(True))
+            if last_id is not None:
+                query = query.where(User.id > last_id)
+            query = query.order_by(User.id).limit(settings.ENERGY_BATCH_CHUNK_SIZE)
+
+            user_ids = list((await db.execute(query)).scalars().all())
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+
+            # 每批预测整体提交: 已有起始整点预测的用户整条曲线都已保存(之前的执行或重试前)
+            done = set((await db.execute(
+                select(EnergyPrediction.user_id).where(
+                    EnergyPrediction.user_id == any_(
+                        bindparam("user_ids", user_ids, type_=ARRAY(PG_UUID(as_uuid=True)))
+                    ),
+                    EnergyPrediction.target_time == first_hour.replace(tzinfo=timezone.utc),
+                    EnergyPrediction.model_version == model.model_version
+                )
+            )).scalars().all())
+            pending = [user_id for user_id in user_ids if user_id not in done]
+            skipped += len(done)
+            if not pending:
+                continue
+
+            await model.predict_batch(
+                pending, times, db, save_to_db=True, return_predictions=False
+            )
+            users += len(pending)
+            predictions += len(pending) * len(times)
+
+    # TODO: Phase 2 通过推送通知发送简报并记录发送状态
+    duration_ms = round((time.perf_counter() - start) * 1000, 2)
+    logger.info(
+        f"早间简报精力预测完成: {users}个用户, {predictions}条预测, "
+        f"跳过已有曲线的用户{skipped}个, 耗时{duration_ms}ms"
+    )
 
     return {
         "task": "morning_briefing",
-        "status": "placeholder",
+        "status": "predicted",
         "timestamp": datetime.utcnow().isoformat(),
-        "message": "Phase 2功能待实现"
+        "first_hour": first_hour.isoformat(),
+        "users": users,
+        "skipped_users": skipped,
+        "predictions": predictions,
+        "duration_ms": duration_ms
     }
 
 
@@ -0,0 +1,63 @@
+"""
+响应缓存维护任务
+
+定时清理L2语义缓存(Qdrant)中已过期的点
+"""
+
+import logging
+from datetime import datetime
+from app.celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(
+    name="app.tasks.cache.sweep_expired_semantic_cache",
+    bind=True,
+    max_retries=3,
+    default_retry_delay=300  # 5分钟后重试
+)
+def sweep_expired_semantic_cache(self):
+    """
+    清理过期的L2语义缓存
+
+    定时任务：每小时执行一次
+
+    Returns:
+        删除点数、批次数和耗时
+    """
+    import asyncio
+
+    try:
+        # 在Celery worker中运行异步任务
+        loop = asyncio.get_event_loop()
+        result = loop.run_until_complete(_sweep_expired_semantic_cache())
+        return result
+    except Exception as e:
+        logger.error(f"清理L2语义缓存失败: {e}")
+        # 重试任务
+        raise self.retry(exc=e)
+
+
+async def _sweep_expired_semantic_cache() -> dict:
+    """
+    内部异步函数：执行实际的清理
+
+    Returns:
+        清理结果统计
+    """
+    from app.ai.response_cache import get_response_cache_manager
+
+    cache_manager = await get_response_cache_manager()
+    result = await cache_manager.sweep_expired_l2()
+
+    logger.info(
+        f"L2语义缓存清理完成: 删除{result['deleted']}个点, "
+        f"{result['batches']}批, 耗时{result['duration_ms']}ms"
+    )
+
+    return {
+        "task": "sweep_expired_semantic_cache",
+        "timestamp": datetime.utcnow().isoformat(),
+        **result
+    }
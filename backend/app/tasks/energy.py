@@ -0,0 +1,169 @@
+"""
+精力数字孪生任务
+
+- 读取到过期的数字孪生快照时, 由worker在后台重新计算
+- 每晚分批计算所有活跃用户的个性化基线和精力模式, 写入energy_baselines/energy_patterns
+"""
+
+import logging
+from datetime import datetime
+from app.celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(
+    name="app.tasks.energy.refresh_digital_twin_snapshot",
+    bind=True,
+    max_retries=2,
+    default_retry_delay=60  # 1分钟后重试
+)
+def refresh_digital_twin_snapshot(self, user_id: str):
+    """
+    重新计算用户的数字孪生快照
+
+    快照按开始计算的时间保存, 重复执行是安全的
+
+    Args:
+        user_id: 用户ID
+
+    Returns:
+        快照计算时间和耗时
+    """
+    import asyncio
+
+    try:
+        # 在Celery worker中运行异步任务
+        loop = asyncio.get_event_loop()
+        result = loop.run_until_complete(_refresh_digital_twin_snapshot(user_id))
+        return result
+    except Exception as e:
+        logger.error(f"重新计算数字孪生快照失败 user={user_id}: {e}")
+        # 重试任务
+        raise self.retry(exc=e)
+
+
+async def _refresh_digital_twin_snapshot(user_id: str) -> dict:
+    """
+    内部异步函数：执行实际的重算
+
+    Args:
+        user_id: 用户ID
+
+    Returns:
+        重算结果
+    """
+    import time
+    from app.core.database import async_session_maker
+    from app.ai.digital_twin import get_digital_twin_manager
+    from app.crud.twin_snapshots import get_twin_snapshot
+
+    start = time.perf_counter()
+    twin_manager = await get_digital_twin_manager()
+
+    async with async_session_maker() as db:
+        snapshot = await get_twin_snapshot(db, user_id)
+        # 保持快照原有的预测时长
+        prediction_hours = snapshot.prediction_hours if snapshot else 24
+        twin = await twin_manager.refresh_snapshot(user_id, db, prediction_hours=prediction_hours)
+
+    duration_ms = round((time.perf_counter() - start) * 1000, 2)
+    logger.info(f"数字孪生快照已更新 user={user_id}, 耗时{duration_ms}ms")
+
+    return {
+        "task": "refresh_digital_twin_snapshot",
+        "timestamp": datetime.utcnow().isoformat(),
+        "user_id": user_id,
+        "computed_at": twin.computed_at.isoformat(),
+        "duration_ms": duration_ms
+    }
+
+
+@celery_app.task(
+    name="app.tasks.energy.refresh_energy_profiles",
+    bind=True,
+    max_retries=3,
+    default_retry_delay=600,  # 10分钟后重试
+    time_limit=3600,  # 全量用户, 放宽到1小时硬限制
+    soft_time_limit=3540
+)
+def refresh_energy_profiles(self):
+    """
+    计算所有活跃用户的个性化基线和精力模式
+
+    定时任务：每天凌晨执行
+    每批用户单独提交, 重复执行是安全的
+
+    Returns:
+        处理的用户数、写入的基线/模式数和耗时
+    """
+    import asyncio
+
+    try:
+        # 在Celery worker中运行异步任务
+        loop = asyncio.get_event_loop()
+        result = loop.run_until_complete(_refresh_energy_profiles())
+        return result
+    except Exception as e:
+        logger.error(f"计算个性化基线和精力模式失败: {e}")
+        # 重试任务
+        raise self.retry(exc=e)
+
+
+async def _refresh_energy_profiles() -> dict:
+    """
+    内部异步函数：按用户ID键集分页, 每批批量计算并写入
+
+    Returns:
+        计算结果统计
+    """
+    import time
+    from sqlalchemy import select
+    from app.core.config import settings
+    from app.core.database import async_session_maker
+    from app.ai.digital_twin import get_digital_twin_manager
+    from app.models.user import User
+
+    start = time.perf_counter()
+    twin_manager = await get_digital_twin_manager()
+
+    users = 0
+    baselines = 0
+    patterns = 0
+    last_id = None
+
+    async with async_session_maker() as db:
+        while True:
+            # 按ID键集分页读取活跃用户
+            query = select(User.id).where(User.is_active.is_(True))
+            if last_id is not None:
+                query = query.where(User.id > last_id)
+            query = query.order_by(User.id).limit(settings.ENERGY_PROFILE_BATCH_SIZE)
+
+            user_ids = list((await db.execute(query)).scalars().all())
+            if not user_ids:
+                break
+
+            saved_baselines, saved_patterns = await twin_manager.refresh_profiles_batch(user_ids, db)
+            await db.commit()
+
+            baselines += saved_baselines
+            patterns += saved_patterns
+
+            users += len(user_ids)
+            last_id = user_ids[-1]
+
+    duration_ms = round((time.perf_counter() - start) * 1000, 2)
+    logger.info(
+        f"个性化基线和精力模式计算完成: {users}个用户, "
+        f"{baselines}条基线, {patterns}条模式, 耗时{duration_ms}ms"
+    )
+
+    return {
+        "task": "refresh_energy_profiles",
+        "timestamp": datetime.utcnow().isoformat(),
+        "users": users,
+        "baselines": baselines,
+        "patterns": patterns,
+        "duration_ms": duration_ms
+    }
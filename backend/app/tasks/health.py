@@ -0,0 +1,190 @@
+"""
+健康数据任务
+
+- /health/sync 接收的数据由worker分批写入, 客户端通过 /health/sync/{job_id} 轮询进度
+- 每日维护health_data分区: 提前创建未来月份的分区, 把超过保留期的原始数据降采样为小时汇总
+- 每个UTC零点后刷新特征向量中的近N天均值(窗口跨天)
+"""
+
+import logging
+from datetime import datetime
+from app.celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(
+    name="app.tasks.health.process_health_sync_job",
+    bind=True,
+    max_retries=3,
+    default_retry_delay=60,  # 1分钟后重试
+    time_limit=1800,  # 大批量首次同步, 放宽到30分钟硬限制
+    soft_time_limit=1740
+)
+def process_health_sync_job(self, job_id: str):
+    """
+    处理健康数据同步任务
+
+    写入依赖(user_id, external_id, recorded_at)唯一索引去重, 重试是安全的
+
+    Args:
+        job_id: 同步任务ID
+
+    Returns:
+        任务最终状态(各项计数)
+    """
+    import asyncio
+
+    try:
+        # 在Celery worker中运行异步任务
+        loop = asyncio.get_event_loop()
+        result = loop.run_until_complete(_process_health_sync_job(job_id))
+        return result
+    except Exception as e:
+        logger.error(f"健康数据同步任务{job_id}失败: {e}")
+        # 重试任务
+        raise self.retry(exc=e)
+
+
+async def _process_health_sync_job(job_id: str) -> dict:
+    """
+    内部异步函数：执行实际的同步
+
+    Returns:
+        任务状态
+    """
+    from app.services.health_sync import run_health_sync_job
+
+    result = await run_health_sync_job(job_id)
+
+    return {
+        "task": "process_health_sync_job",
+        "job_id": job_id,
+        "status": result["status"],
+        "inserted": result["inserted"],
+        "duplicates": result["duplicates"],
+        "error_count": result["error_count"]
+    }
+
+
+@celery_app.task(
+    name="app.tasks.health.maintain_health_data_partitions",
+    bind=True,
+    max_retries=3,
+    default_retry_delay=600,  # 10分钟后重试
+    time_limit=3600,  # 首次运行可能要降采样较长的历史数据
+    soft_time_limit=3540
+)
+def maintain_health_data_partitions(self):
+    """
+    维护health_data分区
+
+    定时任务：每天执行一次
+    每个降采样窗口单独提交, 中途失败重试时从剩余的最早数据继续
+
+    Returns:
+        新建分区和降采样统计
+    """
+    import asyncio
+
+    try:
+        # 在Celery worker中运行异步任务
+        loop = asyncio.get_event_loop()
+        result = loop.run_until_complete(_maintain_health_data_partitions())
+        return result
+    except Exception as e:
+        logger.error(f"维护health_data分区失败: {e}")
+        # 重试任务
+        raise self.retry(exc=e)
+
+
+async def _maintain_health_data_partitions() -> dict:
+    """
+    内部异步函数：创建分区并降采样
+
+    Returns:
+        维护结果统计
+    """
+    from app.core.database import async_session_maker
+    from app.crud.health_partitions import (
+        create_upcoming_partitions,
+        downsample_health_data,
+        partition_name
+    )
+
+    # 建分区使用独立的短事务
+    created = await create_upcoming_partitions()
+
+    async with async_session_maker() as db:
+        downsampled = await downsample_health_data(db)
+
+    logger.info(
+        f"health_data分区维护完成: 新建分区{len(created)}个, "
+        f"删除过期分区{len(downsampled['dropped_partitions'])}个, "
+        f"降采样{downsampled['moved_rows']}条原始数据为{downsampled['hourly_rows']}个小时汇总, "
+        f"耗时{downsampled['duration_ms']}ms"
+    )
+
+    return {
+        "task": "maintain_health_data_partitions",
+        "timestamp": datetime.utcnow().isoformat(),
+        "created_partitions": [partition_name(month) for month in created],
+        **downsampled
+    }
+
+
+@celery_app.task(
+    name="app.tasks.health.refresh_health_feature_means",
+    bind=True,
+    max_retries=3,
+    default_retry_delay=300  # 5分钟后重试
+)
+def refresh_health_feature_means(self):
+    """
+    刷新所有用户特征向量中的近7/30天均值
+
+    定时任务：每天UTC零点后执行一次
+    均值按UTC自然日计算, 没有新数据的用户跨天后也需要滑动窗口
+
+    Returns:
+        刷新的向量数和耗时
+    """
+    import asyncio
+
+    try:
+        # 在Celery worker中运行异步任务
+        loop = asyncio.get_event_loop()
+        result = loop.run_until_complete(_refresh_health_feature_means())
+        return result
+    except Exception as e:
+        logger.error(f"刷新特征向量均值失败: {e}")
+        # 重试任务
+        raise self.retry(exc=e)
+
+
+async def _refresh_health_feature_means() -> dict:
+    """
+    内部异步函数：执行实际的刷新
+
+    Returns:
+        刷新结果统计
+    """
+    import time
+    from app.core.database import async_session_maker
+    from app.crud.health_features import refresh_feature_means
+
+    start = time.perf_counter()
+
+    async with async_session_maker() as db:
+        refreshed = await refresh_feature_means(db)
+        await db.commit()
+
+    duration_ms = round((time.perf_counter() - start) * 1000, 2)
+    logger.info(f"特征向量均值刷新完成: {refreshed}个用户, 耗时{duration_ms}ms")
+
+    return {
+        "task": "refresh_health_feature_means",
+        "timestamp": datetime.utcnow().isoformat(),
+        "refreshed": refreshed,
+        "duration_ms": duration_ms
+    }
@@ -0,0 +1,32 @@
+"""Add data_changed_at to digital_twin_snapshots
+
+Revision ID: 3a9d6b2e8c41
+Revises: e4a7c2f95b18
+Create Date: 2025-10-26 10:42:17.385913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a9d6b2e8c41'
+down_revision: Union[str, None] = 'e4a7c2f95b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 最近一次数据变更时间: 重算期间的写入(即使快照已过期)不会被保存结果覆盖
+    op.add_column(
+        'digital_twin_snapshots',
+        sa.Column('data_changed_at', sa.DateTime(timezone=True), nullable=True, comment='最近一次数据变更的时间(每次写入都更新)')
+    )
+    # 已过期的快照以过期时间作为最近一次变更
+    op.execute("UPDATE digital_twin_snapshots SET data_changed_at = stale_since WHERE stale_since IS NOT NULL")
+
+
+def downgrade() -> None:
+    op.drop_column('digital_twin_snapshots', 'data_changed_at')
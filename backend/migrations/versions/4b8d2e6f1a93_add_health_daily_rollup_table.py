@@ -0,0 +1,61 @@
+"""Add health_daily_rollup table
+
+Revision ID: 4b8d2e6f1a93
+Revises: 7c3f9a1e5b20
+Create Date: 2025-10-21 09:36:18.502417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b8d2e6f1a93'
+down_revision: Union[str, None] = '7c3f9a1e5b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 健康数据日汇总 (主键(user_id, data_type, day)同时用于近N天均值查询)
+    op.create_table('health_daily_rollup',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False, comment='用户ID'),
+        sa.Column('data_type', sa.String(length=50), nullable=False, comment='数据类型'),
+        sa.Column('day', sa.Date(), nullable=False, comment='数据采集日期(UTC)'),
+        sa.Column('sample_count', sa.Integer(), nullable=False, comment='当日数据条数'),
+        sa.Column('value_sum', sa.Float(), nullable=False, comment='当日数值之和'),
+        sa.Column('value_min', sa.Float(), nullable=False, comment='当日最小值'),
+        sa.Column('value_max', sa.Float(), nullable=False, comment='当日最大值'),
+        sa.Column('last_value', sa.Float(), nullable=False, comment='当日最后一条数据的值'),
+        sa.Column('last_recorded_at', sa.DateTime(timezone=True), nullable=False, comment='当日最后一条数据的采集时间'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False, comment='更新时间'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'data_type', 'day')
+    )
+
+    # 用已有的health_data回填
+    op.execute("""
+        INSERT INTO health_daily_rollup (
+            user_id, data_type, day, sample_count, value_sum,
+            value_min, value_max, last_value, last_recorded_at
+        )
+        SELECT
+            user_id,
+            data_type,
+            (recorded_at AT TIME ZONE 'UTC')::date,
+            COUNT(*),
+            SUM(value),
+            MIN(value),
+            MAX(value),
+            (ARRAY_AGG(value ORDER BY recorded_at DESC))[1],
+            MAX(recorded_at)
+        FROM health_data
+        GROUP BY user_id, data_type, (recorded_at AT TIME ZONE 'UTC')::date
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('health_daily_rollup')
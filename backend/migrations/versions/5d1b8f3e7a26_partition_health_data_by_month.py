@@ -0,0 +1,183 @@
+"""Partition health_data by month and add health_data_hourly for downsampled history
+
+Revision ID: 5d1b8f3e7a26
+Revises: 9e2a7c4d3f18
+Create Date: 2025-10-22 10:41:07.215836
+
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d1b8f3e7a26'
+down_revision: Union[str, None] = '9e2a7c4d3f18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# 与app.crud.health_partitions保持一致
+PARTITION_PREFIX = 'health_data_p'
+PREMAKE_MONTHS = 3
+
+HEALTH_DATA_INDEXES = [
+    ('ix_health_data_id', ['id'], False),
+    ('ix_health_data_user_id', ['user_id'], False),
+    ('ix_health_data_data_type', ['data_type'], False),
+    ('ix_health_data_recorded_at', ['recorded_at'], False),
+    ('ix_health_data_user_type_recorded', ['user_id', 'data_type', 'recorded_at'], False),
+    ('ix_health_data_user_recorded', ['user_id', 'recorded_at'], False),
+]
+
+HEALTH_DATA_COLUMNS = (
+    'id, user_id, data_type, source, value, unit, encrypted_data, extra_data, '
+    'recorded_at, synced_at, external_id, quality_score, is_anomaly, created_at, updated_at'
+)
+
+
+def _next_month(month: date) -> date:
+    if month.month == 12:
+        return date(month.year + 1, 1, 1)
+    return date(month.year, month.month + 1, 1)
+
+
+def _health_data_columns():
+    return [
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False, comment='用户ID'),
+        sa.Column('data_type', sa.String(length=50), nullable=False, comment='数据类型'),
+        sa.Column('source', sa.String(length=50), nullable=False, comment='数据来源'),
+        sa.Column('value', sa.Float(), nullable=False, comment='数据值'),
+        sa.Column('unit', sa.String(length=20), nullable=True, comment='单位(hours/bpm/steps等)'),
+        sa.Column('encrypted_data', sa.Text(), nullable=True, comment='加密的原始数据(Fernet加密)'),
+        sa.Column('extra_data', postgresql.JSONB(astext_type=sa.Text()), nullable=True, comment='额外元数据(JSON格式)'),
+        sa.Column('recorded_at', sa.DateTime(timezone=True), nullable=False, comment='数据采集时间'),
+        sa.Column('synced_at', sa.DateTime(timezone=True), nullable=True, comment='数据同步时间'),
+        sa.Column('external_id', sa.String(length=255), nullable=True, comment='外部系统ID(与user_id、recorded_at唯一, 用于防止重复同步)'),
+        sa.Column('quality_score', sa.Float(), nullable=True, comment='数据质量评分(0-1)'),
+        sa.Column('is_anomaly', sa.Boolean(), nullable=False, comment='是否为异常值'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False, comment='创建时间'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False, comment='更新时间'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    ]
+
+
+def _drop_health_data_indexes(table_name: str) -> None:
+    for name, _, _ in HEALTH_DATA_INDEXES:
+        op.drop_index(name, table_name=table_name)
+    op.drop_index('uq_health_data_user_external_id', table_name=table_name)
+
+
+def upgrade() -> None:
+    # 旧表改名, 释放索引和主键名称
+    op.rename_table('health_data', 'health_data_legacy')
+    _drop_health_data_indexes('health_data_legacy')
+    op.execute('ALTER TABLE health_data_legacy RENAME CONSTRAINT health_data_pkey TO health_data_legacy_pkey')
+
+    # 分区表的主键必须包含分区键recorded_at
+    op.create_table('health_data',
+        *_health_data_columns(),
+        sa.PrimaryKeyConstraint('id', 'recorded_at'),
+        postgresql_partition_by='RANGE (recorded_at)'
+    )
+
+    # 覆盖已有数据的最早月份到未来PREMAKE_MONTHS个月的月度分区
+    now = datetime.now(timezone.utc)
+    current = date(now.year, now.month, 1)
+    oldest = op.get_bind().execute(sa.text(
+        "SELECT MIN(recorded_at AT TIME ZONE 'UTC') FROM health_data_legacy"
+    )).scalar()
+    month = date(oldest.year, oldest.month, 1) if oldest else current
+
+    last = current
+    for _ in range(PREMAKE_MONTHS):
+        last = _next_month(last)
+
+    while month <= last:
+        op.execute(
+            f"CREATE TABLE {PARTITION_PREFIX}{month.year:04d}_{month.month:02d} "
+            f"PARTITION OF health_data FOR VALUES "
+            f"FROM ('{month.isoformat()} 00:00:00+00') "
+            f"TO ('{_next_month(month).isoformat()} 00:00:00+00')"
+        )
+        month = _next_month(month)
+
+    op.execute(f"""
+        INSERT INTO health_data ({HEALTH_DATA_COLUMNS})
+        SELECT {HEALTH_DATA_COLUMNS} FROM health_data_legacy
+    """)
+    op.drop_table('health_data_legacy')
+
+    # 数据写入后再建索引(在父表上创建, 自动级联到每个分区)
+    for name, columns, unique in HEALTH_DATA_INDEXES:
+        op.create_index(name, 'health_data', columns, unique=unique)
+    op.create_index(
+        'uq_health_data_user_external_id',
+        'health_data',
+        ['user_id', 'external_id', 'recorded_at'],
+        unique=True
+    )
+
+    # 降采样后的小时汇总
+    op.create_table('health_data_hourly',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False, comment='用户ID'),
+        sa.Column('data_type', sa.String(length=50), nullable=False, comment='数据类型'),
+        sa.Column('hour', sa.DateTime(timezone=True), nullable=False, comment='汇总小时(UTC整点)'),
+        sa.Column('sample_count', sa.Integer(), nullable=False, comment='该小时原始数据条数'),
+        sa.Column('value_sum', sa.Float(), nullable=False, comment='数值之和'),
+        sa.Column('value_min', sa.Float(), nullable=False, comment='最小值'),
+        sa.Column('value_max', sa.Float(), nullable=False, comment='最大值'),
+        sa.Column('last_value', sa.Float(), nullable=False, comment='该小时最后一条数据的值'),
+        sa.Column('last_recorded_at', sa.DateTime(timezone=True), nullable=False, comment='该小时最后一条数据的采集时间'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'data_type', 'hour')
+    )
+
+
+def downgrade() -> None:
+    # 小时汇总无法还原为原始数据, 降级时丢弃
+    op.drop_table('health_data_hourly')
+
+    op.rename_table('health_data', 'health_data_partitioned')
+    _drop_health_data_indexes('health_data_partitioned')
+    op.execute('ALTER TABLE health_data_partitioned RENAME CONSTRAINT health_data_pkey TO health_data_partitioned_pkey')
+
+    op.create_table('health_data',
+        *_health_data_columns(),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.execute(f"""
+        INSERT INTO health_data ({HEALTH_DATA_COLUMNS})
+        SELECT {HEALTH_DATA_COLUMNS} FROM health_data_partitioned
+    """)
+
+    # 删除父表时一并删除所有分区
+    op.drop_table('health_data_partitioned')
+
+    # 旧唯一索引不含recorded_at, 同一external_id只保留最早的一条
+    op.execute("""
+        DELETE FROM health_data h
+        USING (
+            SELECT id,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY user_id, external_id
+                       ORDER BY created_at, id
+                   ) AS rn
+            FROM health_data
+            WHERE external_id IS NOT NULL
+        ) d
+        WHERE h.id = d.id AND d.rn > 1
+    """)
+
+    for name, columns, unique in HEALTH_DATA_INDEXES:
+        op.create_index(name, 'health_data', columns, unique=unique)
+    op.create_index(
+        'uq_health_data_user_external_id',
+        'health_data',
+        ['user_id', 'external_id'],
+        unique=True
+    )
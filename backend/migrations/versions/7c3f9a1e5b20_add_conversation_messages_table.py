@@ -0,0 +1,89 @@
+"""Move conversation messages from JSONB array to conversation_messages table
+
+Revision ID: 7c3f9a1e5b20
+Revises: add6cd889839
+Create Date: 2025-10-20 10:12:41.318206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3f9a1e5b20'
+down_revision: Union[str, None] = 'add6cd889839'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 创建conversation_messages表 (主键(conversation_id, seq)同时用于读取最近N条)
+    op.create_table('conversation_messages',
+        sa.Column('conversation_id', postgresql.UUID(as_uuid=True), nullable=False, comment='会话ID'),
+        sa.Column('seq', sa.Integer(), nullable=False, comment='会话内消息序号(从1开始递增)'),
+        sa.Column('role', sa.String(length=20), nullable=False, comment='消息角色: user | assistant | system'),
+        sa.Column('content', sa.Text(), nullable=False, comment='消息内容'),
+        sa.Column('metadata', postgresql.JSONB(astext_type=sa.Text()), nullable=True, comment='消息元数据(AI提供商、意图、token等)'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False, comment='消息时间'),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('conversation_id', 'seq')
+    )
+
+    # 迁移JSONB数组中的消息, 数组下标(从1开始)作为seq
+    op.execute("""
+        INSERT INTO conversation_messages (conversation_id, seq, role, content, metadata, created_at)
+        SELECT
+            c.id,
+            m.ordinality,
+            COALESCE(m.elem->>'role', 'user'),
+            COALESCE(m.elem->>'content', ''),
+            m.elem->'metadata',
+            COALESCE((m.elem->>'timestamp')::timestamp AT TIME ZONE 'UTC', c.created_at)
+        FROM conversations c
+        CROSS JOIN LATERAL jsonb_array_elements(
+            CASE WHEN jsonb_typeof(c.messages) = 'array' THEN c.messages ELSE '[]'::jsonb END
+        ) WITH ORDINALITY AS m(elem, ordinality)
+    """)
+
+    # message_count作为seq分配计数器, 必须与已迁移的行数一致
+    op.execute("""
+        UPDATE conversations c
+        SET message_count = COALESCE(
+            (SELECT MAX(seq) FROM conversation_messages cm WHERE cm.conversation_id = c.id),
+            0
+        )
+    """)
+
+    op.drop_column('conversations', 'messages')
+
+
+def downgrade() -> None:
+    op.add_column('conversations',
+        sa.Column('messages', postgresql.JSONB(astext_type=sa.Text()), nullable=False, server_default='[]', comment='对话消息数组')
+    )
+
+    # 把消息行重新聚合回JSONB数组
+    op.execute("""
+        UPDATE conversations c
+        SET messages = COALESCE(
+            (
+                SELECT jsonb_agg(
+                    jsonb_strip_nulls(jsonb_build_object(
+                        'role', cm.role,
+                        'content', cm.content,
+                        'timestamp', to_char(cm.created_at AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.US'),
+                        'metadata', cm.metadata
+                    ))
+                    ORDER BY cm.seq
+                )
+                FROM conversation_messages cm
+                WHERE cm.conversation_id = c.id
+            ),
+            '[]'::jsonb
+        )
+    """)
+
+    op.drop_table('conversation_messages')
@@ -0,0 +1,50 @@
+"""Allow empty energy baselines as insufficient-data markers
+
+Revision ID: 7c5e1f3b9a26
+Revises: 3a9d6b2e8c41
+Create Date: 2025-10-26 15:18:03.527614
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c5e1f3b9a26'
+down_revision: Union[str, None] = '3a9d6b2e8c41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BASELINE_COLUMNS = ('avg_energy', 'high_threshold', 'low_threshold', 'optimal_sleep')
+
+
+def upgrade() -> None:
+    # 数据不足的用户保存阈值为空的基线行, 标记已计算过
+    for column in BASELINE_COLUMNS:
+        op.alter_column('energy_baselines', column, existing_type=sa.Float(), nullable=True)
+
+    op.alter_column(
+        'energy_patterns', 'pattern_type',
+        existing_type=sa.String(length=50),
+        existing_nullable=False,
+        comment='模式类型: daily/weekly/monthly, none表示数据不足',
+        existing_comment='模式类型: daily/weekly/monthly'
+    )
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM energy_patterns WHERE pattern_type = 'none'")
+    op.alter_column(
+        'energy_patterns', 'pattern_type',
+        existing_type=sa.String(length=50),
+        existing_nullable=False,
+        comment='模式类型: daily/weekly/monthly',
+        existing_comment='模式类型: daily/weekly/monthly, none表示数据不足'
+    )
+
+    op.execute("DELETE FROM energy_baselines WHERE avg_energy IS NULL")
+    for column in BASELINE_COLUMNS:
+        op.alter_column('energy_baselines', column, existing_type=sa.Float(), nullable=False)
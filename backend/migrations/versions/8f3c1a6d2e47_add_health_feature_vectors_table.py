@@ -0,0 +1,109 @@
+"""Add health_feature_vectors table
+
+Revision ID: 8f3c1a6d2e47
+Revises: 5d1b8f3e7a26
+Create Date: 2025-10-23 14:12:45.630918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f3c1a6d2e47'
+down_revision: Union[str, None] = '5d1b8f3e7a26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# 与app.crud.health_features保持一致: (数据类型, 特征字段, 注释)
+FEATURES = [
+    ('sleep_duration', 'sleep_duration', '最近一次睡眠时长(小时)'),
+    ('sleep_quality', 'sleep_quality', '最近一次睡眠质量(1-100)'),
+    ('hrv', 'hrv', '最近一次心率变异性(ms)'),
+    ('heart_rate_resting', 'resting_heart_rate', '最近一次静息心率(bpm)'),
+    ('steps', 'steps', '最近一次步数'),
+    ('exercise_minutes', 'exercise_minutes', '最近一次运动时长(分钟)'),
+    ('active_energy', 'active_energy', '最近一次活动能量(kcal)'),
+    ('energy_level', 'subjective_energy', '最近一次主观精力评分(1-10)'),
+    ('stress_level', 'stress_level', '最近一次压力水平(1-100)'),
+    ('mood', 'mood', '最近一次心情(1-10)'),
+]
+
+# 均值列 -> (数据类型, 天数)
+MEANS = [
+    ('avg_energy_7d', 'energy_level', 7, '近7天平均精力'),
+    ('avg_energy_30d', 'energy_level', 30, '近30天平均精力'),
+    ('avg_sleep_7d', 'sleep_duration', 7, '近7天平均睡眠时长'),
+    ('avg_stress_7d', 'stress_level', 7, '近7天平均压力水平'),
+]
+
+
+def upgrade() -> None:
+    feature_columns = []
+    for _, name, comment in FEATURES:
+        feature_columns.append(sa.Column(name, sa.Float(), nullable=True, comment=comment))
+        feature_columns.append(
+            sa.Column(f'{name}_at', sa.DateTime(timezone=True), nullable=True, comment=f'{name}的采集时间')
+        )
+
+    op.create_table('health_feature_vectors',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False, comment='用户ID'),
+        *feature_columns,
+        *[
+            sa.Column(column, sa.Float(), nullable=True, comment=comment)
+            for column, _, _, comment in MEANS
+        ],
+        sa.Column('means_day', sa.Date(), nullable=True, comment='均值的计算日期(UTC), 跨天后由定时任务刷新'),
+        sa.Column('last_recorded_at', sa.DateTime(timezone=True), nullable=True, comment='向量中最新数据的采集时间'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False, comment='更新时间'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # 用已有的health_data回填各特征最新的值
+    type_list = ', '.join(f"'{data_type}'" for data_type, _, _ in FEATURES)
+    pivot = ',\n            '.join(
+        f"MAX(value) FILTER (WHERE data_type = '{data_type}'), "
+        f"MAX(recorded_at) FILTER (WHERE data_type = '{data_type}')"
+        for data_type, _, _ in FEATURES
+    )
+    columns = ', '.join(f'{name}, {name}_at' for _, name, _ in FEATURES)
+    op.execute(f"""
+        INSERT INTO health_feature_vectors (user_id, {columns}, last_recorded_at)
+        SELECT
+            user_id,
+            {pivot},
+            MAX(recorded_at)
+        FROM (
+            SELECT DISTINCT ON (user_id, data_type) user_id, data_type, value, recorded_at
+            FROM health_data
+            WHERE data_type IN ({type_list})
+            ORDER BY user_id, data_type, recorded_at DESC
+        ) latest
+        GROUP BY user_id
+    """)
+
+    # 近N天均值(包含今天在内的最近N个UTC自然日)
+    means = ',\n            '.join(
+        f"""{column} = (
+                SELECT SUM(r.value_sum) / NULLIF(SUM(r.sample_count), 0)
+                FROM health_daily_rollup r
+                WHERE r.user_id = health_feature_vectors.user_id
+                  AND r.data_type = '{data_type}'
+                  AND r.day >= (now() AT TIME ZONE 'UTC')::date - {days - 1}
+            )"""
+        for column, data_type, days, _ in MEANS
+    )
+    op.execute(f"""
+        UPDATE health_feature_vectors SET
+            {means},
+            means_day = (now() AT TIME ZONE 'UTC')::date
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('health_feature_vectors')
@@ -0,0 +1,69 @@
+"""Unique (user_id, external_id) on health_data for set-based sync dedup
+
+Revision ID: 9e2a7c4d3f18
+Revises: 4b8d2e6f1a93
+Create Date: 2025-10-21 16:05:52.774310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e2a7c4d3f18'
+down_revision: Union[str, None] = '4b8d2e6f1a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 清理历史上并发同步产生的重复数据, 每个(user_id, external_id)保留最早的一条
+    op.execute("""
+        DELETE FROM health_data h
+        USING (
+            SELECT id,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY user_id, external_id
+                       ORDER BY created_at, id
+                   ) AS rn
+            FROM health_data
+            WHERE external_id IS NOT NULL
+        ) d
+        WHERE h.id = d.id AND d.rn > 1
+    """)
+
+    op.create_index(
+        'uq_health_data_user_external_id',
+        'health_data',
+        ['user_id', 'external_id'],
+        unique=True
+    )
+    op.drop_index('ix_health_data_external_id', table_name='health_data')
+
+    # 删除重复数据后重建日汇总
+    op.execute("DELETE FROM health_daily_rollup")
+    op.execute("""
+        INSERT INTO health_daily_rollup (
+            user_id, data_type, day, sample_count, value_sum,
+            value_min, value_max, last_value, last_recorded_at
+        )
+        SELECT
+            user_id,
+            data_type,
+            (recorded_at AT TIME ZONE 'UTC')::date,
+            COUNT(*),
+            SUM(value),
+            MIN(value),
+            MAX(value),
+            (ARRAY_AGG(value ORDER BY recorded_at DESC))[1],
+            MAX(recorded_at)
+        FROM health_data
+        GROUP BY user_id, data_type, (recorded_at AT TIME ZONE 'UTC')::date
+    """)
+
+
+def downgrade() -> None:
+    op.create_index('ix_health_data_external_id', 'health_data', ['external_id'], unique=False)
+    op.drop_index('uq_health_data_user_external_id', table_name='health_data')
@@ -0,0 +1,38 @@
+"""Add digital_twin_snapshots table
+
+Revision ID: b6e2d94a1c3f
+Revises: 8f3c1a6d2e47
+Create Date: 2025-10-24 09:18:32.471205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e2d94a1c3f'
+down_revision: Union[str, None] = '8f3c1a6d2e47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 数字孪生快照 (每个用户一行, 首次请求时计算)
+    op.create_table('digital_twin_snapshots',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False, comment='用户ID'),
+        sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False, comment='数字孪生(JSON)'),
+        sa.Column('prediction_hours', sa.Integer(), nullable=False, comment='快照包含的预测小时数'),
+        sa.Column('computed_at', sa.DateTime(timezone=True), nullable=False, comment='计算时间(开始计算的时间)'),
+        sa.Column('stale_since', sa.DateTime(timezone=True), nullable=True, comment='数据变更后首次标记过期的时间(未过期为NULL)'),
+        sa.Column('refresh_requested_at', sa.DateTime(timezone=True), nullable=True, comment='最近一次提交后台重算的时间(用于去重)'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False, comment='更新时间'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('digital_twin_snapshots')
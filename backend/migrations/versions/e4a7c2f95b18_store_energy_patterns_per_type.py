@@ -0,0 +1,56 @@
+"""Align energy_patterns with the model and make (user_id, pattern_type) unique
+
+Revision ID: e4a7c2f95b18
+Revises: b6e2d94a1c3f
+Create Date: 2025-10-25 11:02:54.318764
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a7c2f95b18'
+down_revision: Union[str, None] = 'b6e2d94a1c3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 模型中的字段(建表时的迁移与模型不一致)
+    op.add_column('energy_patterns', sa.Column('peak_hours', postgresql.JSONB(astext_type=sa.Text()), nullable=True, comment='高精力时段(JSON数组)'))
+    op.add_column('energy_patterns', sa.Column('low_hours', postgresql.JSONB(astext_type=sa.Text()), nullable=True, comment='低精力时段(JSON数组)'))
+    op.add_column('energy_patterns', sa.Column('data_points', sa.Integer(), server_default='0', nullable=False, comment='用于识别的数据点数'))
+    op.add_column('energy_patterns', sa.Column('pattern_data', postgresql.JSONB(astext_type=sa.Text()), nullable=True, comment='详细模式数据(JSON)'))
+    op.add_column('energy_patterns', sa.Column('identified_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False, comment='识别时间'))
+
+    # 每个用户每种模式只保留最新的一条
+    op.execute("""
+        DELETE FROM energy_patterns p
+        USING (
+            SELECT id,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY user_id, pattern_type
+                       ORDER BY updated_at DESC, id
+                   ) AS rn
+            FROM energy_patterns
+        ) d
+        WHERE p.id = d.id AND d.rn > 1
+    """)
+
+    op.drop_index('ix_energy_patterns_user_type', table_name='energy_patterns')
+    op.create_index('ix_energy_patterns_user_type', 'energy_patterns', ['user_id', 'pattern_type'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_energy_patterns_user_type', table_name='energy_patterns')
+    op.create_index('ix_energy_patterns_user_type', 'energy_patterns', ['user_id', 'pattern_type'])
+
+    op.drop_column('energy_patterns', 'identified_at')
+    op.drop_column('energy_patterns', 'pattern_data')
+    op.drop_column('energy_patterns', 'data_points')
+    op.drop_column('energy_patterns', 'low_hours')
+    op.drop_column('energy_patterns', 'peak_hours')
@@ -283,7 +283,7 @@ async def generate_knowledge_base():
                 # 插入到knowledge_base_qa collection
                 from qdrant_client.models import PointStruct
 
-                cache_manager.qdrant_client.upsert(
+                await cache_manager.qdrant_client.upsert(
                     collection_name="knowledge_base_qa",
                     points=[
                         PointStruct(
@@ -343,7 +343,8 @@ async def verify_knowledge_base():
     logger.info(f"Testing {len(test_queries)} queries...")
 
     for query in test_queries:
-        result = await cache_manager._check_l3_cache(query)
+        query_vector = await cache_manager._embed(query)
+        result = await cache_manager._check_l3_cache(query_vector)
 
         if result:
             logger.info(f"✅ '{query}' -> Found answer (score>0.88)")
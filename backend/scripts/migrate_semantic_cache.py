@@ -0,0 +1,136 @@
+"""
+语义缓存迁移脚本
+把旧版按用户划分的 cache_user_{user_id} collection 合并到共享的语义缓存collection
+
+用途：
+- 旧版每个用户一个collection，每个都有独立的HNSW图和segment开销
+- 新版所有用户共用一个collection，按payload中的user_id过滤
+- 迁移完成后删除旧collection（可用 --keep-old 保留）
+
+用法：
+    python scripts/migrate_semantic_cache.py [--dry-run] [--keep-old]
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from loguru import logger
+
+
+SCROLL_BATCH_SIZE = 256
+
+
+async def migrate_collection(cache_manager, collection_name: str, dry_run: bool) -> int:
+    """
+    迁移单个用户collection
+
+    Returns:
+        迁移的点数
+    """
+    from qdrant_client.models import PointStruct
+
+    client = cache_manager.qdrant_client
+    user_id = collection_name[len(cache_manager.LEGACY_USER_COLLECTION_PREFIX):]
+
+    migrated = 0
+    offset = None
+
+    while True:
+        points, offset = await client.scroll(
+            collection_name=collection_name,
+            limit=SCROLL_BATCH_SIZE,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
+        )
+
+        if points:
+            batch = []
+            for point in points:
+                payload = dict(point.payload or {})
+                # 旧数据可能缺少user_id, 以collection名为准
+                payload["user_id"] = payload.get("user_id") or user_id
+                batch.append(
+                    PointStruct(id=point.id, vector=point.vector, payload=payload)
+                )
+
+            if not dry_run:
+                await client.upsert(
+                    collection_name=cache_manager.SEMANTIC_CACHE_COLLECTION,
+                    points=batch
+                )
+            migrated += len(batch)
+
+        if offset is None:
+            break
+
+    return migrated
+
+
+async def migrate_semantic_cache(dry_run: bool = False, keep_old: bool = False):
+    """
+    合并所有旧版用户collection
+
+    Args:
+        dry_run: 只统计不写入
+        keep_old: 迁移后保留旧collection
+    """
+    logger.info("🚀 Starting semantic cache migration...")
+
+    from app.ai.response_cache import get_response_cache_manager
+
+    # 初始化缓存管理器(会创建共享collection和payload索引)
+    cache_manager = await get_response_cache_manager()
+    await cache_manager.initialize()
+
+    collections = (await cache_manager.qdrant_client.get_collections()).collections
+    legacy_collections = [
+        c.name for c in collections
+        if c.name.startswith(cache_manager.LEGACY_USER_COLLECTION_PREFIX)
+    ]
+
+    logger.info(f"📚 Found {len(legacy_collections)} per-user collections")
+
+    total_points = 0
+    failed = []
+
+    for idx, collection_name in enumerate(legacy_collections, 1):
+        try:
+            count = await migrate_collection(cache_manager, collection_name, dry_run)
+            total_points += count
+
+            if not dry_run and not keep_old:
+                await cache_manager.qdrant_client.delete_collection(collection_name)
+
+            logger.info(
+                f"[{idx}/{len(legacy_collections)}] {collection_name}: {count} points"
+            )
+
+        except Exception as e:
+            failed.append(collection_name)
+            logger.error(f"Failed to migrate {collection_name}: {e}")
+
+    # 统计结果
+    logger.info("=" * 80)
+    logger.info(f"✅ Migration {'(dry run) ' if dry_run else ''}completed!")
+    logger.info(f"Collections: {len(legacy_collections)}")
+    logger.info(f"Points migrated: {total_points}")
+    logger.info(f"Failed: {len(failed)}")
+    logger.info("=" * 80)
+
+    if failed:
+        logger.warning(f"Failed collections (kept in place): {failed}")
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        migrate_semantic_cache(
+            dry_run="--dry-run" in sys.argv,
+            keep_old="--keep-old" in sys.argv
+        )
+    )
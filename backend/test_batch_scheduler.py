@@ -0,0 +1,144 @@
+"""
+批处理调度器测试
+验证BatchScheduler的攒批、分组、异常分发和停止/重启时对未完成请求的处理
+"""
+
+import asyncio
+
+import pytest
+
+from app.ai.batch_scheduler import BatchScheduler, _PendingItem
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_are_batched():
+    """并发请求合并成一批执行，结果按请求分发"""
+    batches = []
+
+    async def run_batch(payloads):
+        batches.append(list(payloads))
+        return [p * 2 for p in payloads]
+
+    scheduler = BatchScheduler(run_batch, max_batch_size=8, max_wait_ms=20)
+    results = await asyncio.gather(*(scheduler.submit(i) for i in range(5)))
+
+    assert results == [0, 2, 4, 6, 8]
+    assert batches == [[0, 1, 2, 3, 4]]
+    assert scheduler.get_stats()["avg_batch_size"] == 5
+
+    await scheduler.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_max_batch_size_and_grouping():
+    """超过最大批大小时拆批，不同key的请求分开执行"""
+    batches = []
+
+    async def run_batch(payloads):
+        batches.append(list(payloads))
+        return payloads
+
+    scheduler = BatchScheduler(run_batch, max_batch_size=3, max_wait_ms=20)
+    await asyncio.gather(
+        *(scheduler.submit(i, key="a") for i in range(4)),
+        scheduler.submit(100, key="b")
+    )
+
+    assert [0, 1, 2] in batches
+    assert [100] in batches
+    assert sum(len(b) for b in batches) == 5
+    assert all(len(b) <= 3 for b in batches)
+
+    await scheduler.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_batch_failure_propagates_to_all_waiters():
+    """批次失败时每个等待者都收到异常，调度器继续可用"""
+    calls = 0
+
+    async def run_batch(payloads):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise ValueError("boom")
+        return payloads
+
+    scheduler = BatchScheduler(run_batch, max_batch_size=4, max_wait_ms=20)
+    results = await asyncio.gather(
+        scheduler.submit(1), scheduler.submit(2), return_exceptions=True
+    )
+    assert all(isinstance(r, ValueError) for r in results)
+
+    assert await scheduler.submit(3) == 3
+
+    await scheduler.shutdown()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("max_concurrent_batches", [1, 2])
+async def test_shutdown_cancels_collecting_and_running_requests(max_concurrent_batches):
+    """停止时执行中的批次和攒批中已取出的请求都以取消结束, 不会永远等待"""
+    started = asyncio.Event()
+
+    async def run_batch(payloads):
+        if payloads == ["slow"]:
+            started.set()
+            await asyncio.Event().wait()
+        return payloads
+
+    scheduler = BatchScheduler(
+        run_batch, max_batch_size=2, max_wait_ms=10_000,
+        max_concurrent_batches=max_concurrent_batches
+    )
+
+    # 不同key -> 同一批内的两组; 第一组执行时阻塞
+    running = asyncio.create_task(scheduler.submit("slow", key="a"))
+    queued_in_batch = asyncio.create_task(scheduler.submit("other", key="b"))
+    await asyncio.wait_for(started.wait(), 1)
+
+    # 攒批中: 已被worker取出, 正在等待凑满下一批
+    if max_concurrent_batches > 1:
+        collecting = asyncio.create_task(scheduler.submit("collecting", key="c"))
+        await asyncio.sleep(0.01)
+    else:
+        collecting = None
+
+    await asyncio.wait_for(scheduler.shutdown(), 1)
+
+    pending = [running] + ([collecting] if collecting else [])
+    if max_concurrent_batches == 1:
+        pending.append(queued_in_batch)
+    for task in pending:
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(task, 1)
+
+    if max_concurrent_batches > 1:
+        assert await asyncio.wait_for(queued_in_batch, 1) == "other"
+
+
+@pytest.mark.asyncio
+async def test_restarted_worker_keeps_queued_requests():
+    """worker意外退出后重启时接管旧队列中的请求"""
+    async def run_batch(payloads):
+        return [p * 10 for p in payloads]
+
+    scheduler = BatchScheduler(run_batch, max_batch_size=4, max_wait_ms=5)
+    assert await scheduler.submit(1) == 10
+
+    scheduler._worker.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await scheduler._worker
+
+    # worker退出后才入队的请求
+    orphan = asyncio.get_running_loop().create_future()
+    scheduler._queue.put_nowait(_PendingItem(payload=2, key=None, future=orphan))
+
+    assert await asyncio.wait_for(scheduler.submit(3), 1) == 30
+    assert await asyncio.wait_for(orphan, 1) == 20
+
+    await scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
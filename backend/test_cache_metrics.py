@@ -0,0 +1,30 @@
+"""
+缓存统计直方图测试
+验证延迟分桶和分位数估算
+"""
+
+from app.ai.cache_metrics import bucket_label, histogram_percentile, INF_BUCKET
+
+
+def test_bucket_label():
+    """延迟落入上界不小于它的第一个桶"""
+    assert bucket_label(0.3) == "1"
+    assert bucket_label(5) == "5"
+    assert bucket_label(5.1) == "10"
+    assert bucket_label(99999) == INF_BUCKET
+
+
+def test_histogram_percentile():
+    """分位数在目标桶内线性插值, 无数据返回None"""
+    assert histogram_percentile({}, 0.5) is None
+
+    # 100次查询: 90次在(2,5]ms, 10次在(100,150]ms
+    counts = {"5": "90", "150": "10"}
+    p50 = histogram_percentile(counts, 0.50)
+    p99 = histogram_percentile(counts, 0.99)
+
+    assert 2 < p50 <= 5
+    assert 100 < p99 <= 150
+
+    # 全部落在+Inf桶时返回最大有限上界
+    assert histogram_percentile({INF_BUCKET: 3}, 0.5) == 5000
@@ -0,0 +1,49 @@
+"""
+对话预处理并发测试
+验证一个分支失败时其余分支被取消, 异常原样抛出
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes.chat import _gather_or_cancel
+
+
+@pytest.mark.asyncio
+async def test_gather_or_cancel_returns_results_in_order():
+    async def value(v, delay):
+        await asyncio.sleep(delay)
+        return v
+
+    assert await _gather_or_cancel(value(1, 0.02), value(2, 0), value(3, 0.01)) == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_gather_or_cancel_cancels_siblings_on_first_error():
+    """会话不存在(404)时, 仍在执行的上下文/健康数据分支被取消并在返回前结束"""
+    finished = []
+    cancelled = []
+
+    async def missing_conversation():
+        await asyncio.sleep(0)
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+    async def slow_branch(name):
+        try:
+            await asyncio.sleep(10)
+            finished.append(name)
+        except asyncio.CancelledError:
+            cancelled.append(name)
+            raise
+
+    with pytest.raises(HTTPException) as exc_info:
+        await asyncio.wait_for(
+            _gather_or_cancel(missing_conversation(), slow_branch("context"), slow_branch("health")),
+            1
+        )
+
+    assert exc_info.value.status_code == 404
+    assert sorted(cancelled) == ["context", "health"]
+    assert finished == []
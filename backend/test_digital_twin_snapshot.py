@@ -0,0 +1,141 @@
+"""
+数字孪生快照测试
+验证快照序列化往返、过期判断、重算期间写入的处理和预测曲线截取
+"""
+
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import app.models.energy  # noqa: F401  (注册User关系中引用的能量模型)
+from app.ai.digital_twin import (
+    EnergyDigitalTwin,
+    EnergyPattern,
+    PersonalBaseline,
+    _trim_predictions,
+    twin_from_payload,
+    twin_to_payload
+)
+from app.ai.energy_prediction import EnergyLevel, EnergyPrediction
+from sqlalchemy import DateTime, create_engine, literal, select
+from sqlalchemy.dialects import postgresql
+
+from app.crud.twin_snapshots import (
+    mark_twin_snapshots_stale,
+    snapshot_stale_since,
+    stale_since_after_save
+)
+from app.models.energy import DigitalTwinSnapshot
+
+
+def _prediction(timestamp: datetime, score: float) -> EnergyPrediction:
+    return EnergyPrediction(
+        timestamp=timestamp,
+        energy_level=EnergyLevel.MEDIUM,
+        score=score,
+        confidence=0.8,
+        factors={"sleep": 1.2, "time_of_day": 0.5},
+        recommendations=["保持节奏"]
+    )
+
+
+def _twin(hours: int = 24) -> EnergyDigitalTwin:
+    start = datetime(2025, 10, 24, 1, 0)
+    hourly = [_prediction(start + timedelta(hours=h), 5.0 + h / 10) for h in range(hours)]
+    return EnergyDigitalTwin(
+        user_id=str(uuid.uuid4()),
+        current_energy=_prediction(start, 6.1),
+        real_time_score=6.1,
+        hourly_predictions=hourly,
+        daily_predictions=[hourly[1], hourly[23]],
+        patterns=[EnergyPattern("daily", "你的精力高峰通常在 9:00-11:00", [9, 10, 11], [14], 0.75)],
+        baseline=PersonalBaseline(
+            user_id="u",
+            avg_energy=6.2,
+            high_threshold=7.4,
+            low_threshold=5.0,
+            optimal_sleep=7.5,
+            last_updated=start
+        ),
+        stats={"avg_energy_7d": 6.0, "energy_stability": 0.7},
+        recommendations=["上午处理重要任务"],
+        last_updated=start,
+        data_completeness=0.8
+    )
+
+
+def test_payload_round_trip():
+    """快照JSON可以完整还原数字孪生"""
+    twin = _twin()
+
+    payload = json.loads(json.dumps(twin_to_payload(twin)))
+    restored = twin_from_payload(payload)
+
+    assert restored == twin
+
+
+def test_snapshot_stale_since():
+    """数据变更标记和超过有效期两者取较早的一个"""
+    computed_at = datetime(2025, 10, 24, 8, 0, tzinfo=timezone.utc)
+    snapshot = DigitalTwinSnapshot(computed_at=computed_at, stale_since=None)
+    max_age = timedelta(minutes=60)
+
+    assert snapshot_stale_since(snapshot, computed_at + timedelta(minutes=30), max_age) is None
+    assert snapshot_stale_since(
+        snapshot, computed_at + timedelta(minutes=90), max_age
+    ) == computed_at + max_age
+
+    snapshot.stale_since = computed_at + timedelta(minutes=10)
+    assert snapshot_stale_since(
+        snapshot, computed_at + timedelta(minutes=30), max_age
+    ) == computed_at + timedelta(minutes=10)
+
+
+def test_trim_predictions_to_requested_hours():
+    """请求的预测时长短于快照时截取, 每日预测只保留范围内的"""
+    twin = _twin()
+    _trim_predictions(twin, include_predictions=True, prediction_hours=12)
+
+    assert len(twin.hourly_predictions) == 12
+    assert [p.timestamp.hour for p in twin.daily_predictions] == [2]
+
+    _trim_predictions(twin, include_predictions=False, prediction_hours=12)
+    assert twin.hourly_predictions == [] and twin.daily_predictions == []
+
+
+def test_write_during_recompute_of_stale_snapshot_keeps_it_stale():
+    """
+    快照已过期(T1)时开始重算(T3), 重算期间又写入数据(T4):
+    写入不受已过期的影响照样记录变更时间, 保存结果后快照仍然过期
+    """
+    t1 = datetime(2025, 10, 24, 8, 0, tzinfo=timezone.utc)
+    t3 = t1 + timedelta(minutes=5)
+    t4 = t3 + timedelta(seconds=30)
+
+    # 1. 写入时无条件更新data_changed_at, stale_since保留最早的标记
+    class _Session:
+        statements = []
+
+        async def execute(self, stmt):
+            self.statements.append(stmt)
+
+    session = _Session()
+    asyncio.run(mark_twin_snapshots_stale(session, [uuid.uuid4()]))
+    sql = str(session.statements[0].compile(dialect=postgresql.dialect()))
+    assert "data_changed_at=" in sql
+    assert "coalesce(digital_twin_snapshots.stale_since" in sql
+    assert "IS NULL" not in sql
+
+    # 2. 保存时按最近一次变更判断(表达式在数据库中求值)
+    def after_save(data_changed_at):
+        expr = stale_since_after_save(
+            literal(data_changed_at, DateTime(timezone=True)),
+            literal(t3, DateTime(timezone=True))
+        )
+        with create_engine("sqlite://").connect() as conn:
+            return conn.execute(select(expr)).scalar()
+
+    assert after_save(t4).replace(tzinfo=timezone.utc) == t4   # T4的数据不在新快照中
+    assert after_save(t1) is None                              # 只有重算开始前的变更
+    assert after_save(None) is None                            # 从未有数据变更
@@ -0,0 +1,57 @@
+"""
+嵌入共享缓存测试
+验证EmbeddingCache的归一化命中、并发合并和LRU淘汰
+"""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.ai.embedding_cache import EmbeddingCache
+
+
+@pytest.mark.asyncio
+async def test_same_text_is_encoded_once():
+    """归一化后相同的文本只编码一次, 并发请求共享同一次编码"""
+    calls = []
+
+    async def compute(text):
+        calls.append(text)
+        await asyncio.sleep(0.01)
+        return np.ones(4)
+
+    cache = EmbeddingCache(max_size=8)
+    vectors = await asyncio.gather(
+        cache.get_or_compute("我最近睡得怎么样", compute),
+        cache.get_or_compute("  我最近睡得怎么样 ", compute),
+    )
+    await cache.get_or_compute("我最近睡得怎么样", compute)
+
+    assert calls == ["我最近睡得怎么样"]
+    assert vectors[0] is vectors[1]
+    assert cache.get_stats()["hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_and_failure():
+    """超出容量淘汰最久未用的条目, 编码失败不写入缓存"""
+    async def compute(text):
+        if text == "bad":
+            raise ValueError("encode failed")
+        return np.zeros(2)
+
+    cache = EmbeddingCache(max_size=2)
+    for text in ("a", "b", "c"):
+        await cache.get_or_compute(text, compute)
+
+    assert cache.get("a") is None
+    assert cache.get("c") is not None
+
+    with pytest.raises(ValueError):
+        await cache.get_or_compute("bad", compute)
+    assert cache.get("bad") is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
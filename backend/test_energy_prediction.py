@@ -0,0 +1,193 @@
+"""
+精力预测评分测试
+验证向量化评分在规则边界上的得分, 以及批量预测与逐个时间点评分一致
+"""
+
+import asyncio
+import json
+import uuid
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+import pytest
+
+import app.models.energy  # noqa: F401  (注册User关系中引用的能量模型)
+import numpy as np
+
+from app.ai.energy_prediction import (
+    EnergyPredictionModel, HealthFeatures, PREDICTION_COPY_COLUMNS, prediction_copy_records
+)
+
+
+def test_rule_score_for_known_features():
+    """典型的良好状态: 睡眠7.5小时/质量80, 上午9点, 晴天22°C"""
+    model = EnergyPredictionModel()
+    features = HealthFeatures(
+        sleep_duration=7.5,
+        sleep_quality=80,
+        steps=10000,
+        exercise_minutes=30,
+        hour_of_day=9,
+        temperature=22,
+        weather="晴"
+    )
+
+    score, factors = model._calculate_energy_score(features)
+
+    assert factors["sleep"] == pytest.approx(2.6)
+    assert factors["activity"] == pytest.approx(1.0)
+    assert factors["time_of_day"] == pytest.approx(1.5)
+    assert factors["environment"] == pytest.approx(0.5)
+    assert score == 10  # 超出上限后截断
+
+
+# 边界值的期望因素得分(按原逐项if/elif评分规则手工计算)
+EDGE_CASES = [
+    # 睡眠: 7-9小时+2, 6-7或9-10小时+1, <6小时递减, >10小时-1
+    (dict(sleep_duration=6), "sleep", 1.0),
+    (dict(sleep_duration=7), "sleep", 2.0),
+    (dict(sleep_duration=9), "sleep", 2.0),
+    (dict(sleep_duration=10), "sleep", 1.0),
+    (dict(sleep_duration=10.5), "sleep", -1.0),
+    (dict(sleep_duration=5), "sleep", -2.5),
+    # 运动: 20-60分钟+0.5, 超过60分钟递减
+    (dict(exercise_minutes=20), "activity", 0.5),
+    (dict(exercise_minutes=60), "activity", 0.5),
+    (dict(exercise_minutes=19), "activity", 0.0),
+    (dict(exercise_minutes=90), "activity", 0.25),
+    # 步数: 8000-12000 +0.5, 不足8000按比例
+    (dict(steps=8000), "activity", 0.5),
+    (dict(steps=12000), "activity", 0.5),
+    (dict(steps=12001), "activity", 0.0),
+    (dict(steps=4000), "activity", 0.15),
+    # 空气质量: <50 +0.3, >100 -0.2, >150 -0.4
+    (dict(air_quality=49), "environment", 0.3),
+    (dict(air_quality=50), "environment", 0.0),
+    (dict(air_quality=100), "environment", 0.0),
+    (dict(air_quality=150), "environment", -0.2),
+    (dict(air_quality=151), "environment", -0.4),
+    # 温度: 18-25°C +0.3, <10或>32 -0.3, 其余-0.1
+    (dict(temperature=9), "environment", -0.3),
+    (dict(temperature=10), "environment", -0.1),
+    (dict(temperature=18), "environment", 0.3),
+    (dict(temperature=25), "environment", 0.3),
+    (dict(temperature=32), "environment", -0.1),
+    (dict(temperature=33), "environment", -0.3),
+]
+
+
+def test_vectorized_factors_at_rule_boundaries():
+    """一次向量化评分所有边界值, 因素得分与原评分规则的期望值相同"""
+    model = EnergyPredictionModel()
+    features_list = [HealthFeatures(hour_of_day=9, **values) for values, _, _ in EDGE_CASES]
+
+    _, factors = model._calculate_energy_scores(features_list)
+
+    for i, (values, factor, expected) in enumerate(EDGE_CASES):
+        assert factors[factor][i] == pytest.approx(expected), (values, factor)
+
+
+def test_batch_scores_for_24_hours():
+    """一次评分一个周末的24个时间点: 时间因素按时段变化, 其余因素各时间点相同"""
+    model = EnergyPredictionModel()
+    snapshot = HealthFeatures(
+        sleep_duration=5.5,
+        hrv=45,
+        resting_heart_rate=68,
+        stress_level=70,
+        avg_energy_7d=6.2,
+        humidity=85,
+        air_quality=120,
+        weather="Rain"
+    )
+    features_list = [
+        replace(snapshot, hour_of_day=hour, day_of_week=5, is_weekend=True)
+        for hour in range(24)
+    ]
+
+    scores, factors = model._calculate_energy_scores(features_list, is_future=True)
+
+    # 周末+0.5: 6-11点2.0, 12-14点1.0, 15-18点1.5, 19-22点0.0, 深夜-1.5
+    expected_time = [-1.5] * 6 + [2.0] * 6 + [1.0] * 3 + [1.5] * 4 + [0.0] * 4 + [-1.5]
+    assert list(factors["time_of_day"]) == pytest.approx(expected_time)
+
+    fixed = {
+        "sleep": -2.25,           # 5.5小时: -2 - 0.5 * 0.5
+        "physiology": -0.0475,    # HRV 45: -0.1875, 静息心率68: +0.14
+        "activity": 0.0,
+        "subjective": -0.2,       # 压力70
+        "trend": 0.12,            # 7日均值6.2
+        "environment": -0.5,      # 湿度85: -0.2, AQI 120: -0.2, 雨: -0.1
+    }
+    for name, value in fixed.items():
+        assert list(factors[name]) == pytest.approx([value] * 24), name
+
+    # 总分限制在1-10
+    expected_scores = [max(1.0, 5.0 + sum(fixed.values()) + t) for t in expected_time]
+    assert list(scores) == pytest.approx(expected_scores)
+
+
+def test_predict_batch_matrix_matches_single_scores(monkeypatch):
+    """批量预测的(用户 × 时间点)矩阵与按用户逐个评分一致"""
+    model = EnergyPredictionModel()
+    user_ids = [uuid.uuid4(), uuid.uuid4()]
+    snapshots = [
+        HealthFeatures(sleep_duration=8, subjective_energy=7, avg_energy_7d=6, avg_energy_30d=6),
+        HealthFeatures(sleep_duration=4.5, stress_level=90, temperature=35, weather="storm")
+    ]
+
+    async def fake_extract(ids, db, as_of):
+        assert ids == user_ids
+        return snapshots
+
+    monkeypatch.setattr(model, "_extract_features_batch", fake_extract)
+
+    first_hour = datetime(2025, 1, 4, 6, 0)  # 周六
+    times = [first_hour + timedelta(hours=h) for h in range(20)]
+    result = asyncio.run(model.predict_batch(user_ids, times, db=None, save_to_db=False))
+
+    assert list(result) == [str(user_id) for user_id in user_ids]
+    for user_id, snapshot in zip(user_ids, snapshots):
+        curve = result[str(user_id)]
+        assert [p.timestamp for p in curve] == times
+        for prediction, target_time in zip(curve, times):
+            features = replace(
+                snapshot,
+                hour_of_day=target_time.hour,
+                day_of_week=target_time.weekday(),
+                is_weekend=target_time.weekday() >= 5
+            )
+            score, factors = model._calculate_energy_score(features)
+            assert prediction.score == pytest.approx(score)
+            assert prediction.factors == pytest.approx(factors)
+            assert prediction.energy_level == model._classify_energy_level(score)
+
+        # 建议只为第一个时间点生成一次
+        assert curve[0].recommendations
+        assert all(p.recommendations == [] for p in curve[1:])
+
+
+def test_prediction_copy_records_from_matrices():
+    """COPY记录直接由矩阵生成: 按用户逐行展开, 等级与单个分类一致, 只有第一个时间点带建议"""
+    user_ids = [uuid.uuid4(), uuid.uuid4()]
+    times = [datetime(2025, 1, 4, 6, 0), datetime(2025, 1, 4, 7, 0)]
+    scores = np.array([[7.0, 3.99], [4.0, 9.5]])
+    factor_matrix = {
+        "sleep": np.array([[2.0, 2.0], [-1.0, -1.0]]),
+        "time_of_day": np.array([[0.5, 1.5], [0.0, 1.0]])
+    }
+    confidence = np.array([[0.7, 0.56], [0.6, 0.48]])
+
+    records = prediction_copy_records(
+        user_ids, times, scores, factor_matrix, confidence,
+        [["💤 早点休息"], []], datetime(2025, 1, 4, 5, 30), "v1"
+    )
+
+    assert len(records) == 4
+    assert all(len(record) == len(PREDICTION_COPY_COLUMNS) for record in records)
+    assert [record[1] for record in records] == [user_ids[0]] * 2 + [user_ids[1]] * 2
+    assert [record[4] for record in records] == ["high", "low", "medium", "high"]
+    assert [record[5] for record in records] == [7.0, 3.99, 4.0, 9.5]
+    assert json.loads(records[1][7]) == {"sleep": 2.0, "time_of_day": 1.5}
+    assert [json.loads(record[8]) for record in records] == [["💤 早点休息"], [], [], []]
+    assert records[3][3].tzinfo is not None and records[3][9] == "v1"
@@ -0,0 +1,140 @@
+"""
+个性化基线与精力模式测试
+验证批量计算和逐个用户计算共用的规则
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+import app.models.energy  # noqa: F401  (注册User关系中引用的能量模型)
+from app.ai import digital_twin
+from app.ai.digital_twin import (
+    DigitalTwinManager,
+    _baseline_from_row,
+    _baseline_row,
+    _build_baseline,
+    _daily_pattern,
+    _optimal_sleep,
+    _pattern_from_row,
+    _pattern_row,
+    _weekly_pattern
+)
+from app.models.energy import EnergyBaseline, EnergyPattern
+from app.models.health_data import HealthDataType
+
+
+def test_patterns_from_grouped_averages():
+    """日周期取高于均值+0.5σ的小时, 周周期比较工作日和周末"""
+    hourly = {8: 6.0, 9: 8.0, 10: 8.5, 13: 5.0, 14: 3.0, 15: 3.5, 20: 5.5}
+    daily = _daily_pattern(hourly, data_points=42)
+
+    assert daily.peak_hours == [9, 10]
+    assert daily.low_hours == [14, 15]
+    assert daily.description == "你的精力高峰通常在 9:00-10:00"
+    assert daily.confidence == pytest.approx(7 / 24)
+    assert daily.data_points == 42
+    assert _daily_pattern({9: 8.0}, data_points=3) is None
+
+    weekly = _weekly_pattern({0: 8.0, 1: 6.0, 2: 6.2, 3: 5.8, 6: 7.6}, data_points=20)
+    assert weekly.peak_hours == [0, 6]
+    assert weekly.description == "周末精力明显高于工作日 (7.8 vs 6.0)"
+
+
+def test_baseline_and_optimal_sleep():
+    """阈值为均值±0.5σ并截断到1-10; 最佳睡眠取次日精力最高的3晚平均"""
+    values = [9.5, 9.8, 10.0, 9.9, 9.7, 9.6, 9.9, 10.0, 9.8, 9.7]
+    baseline = _build_baseline("u", np.mean(values), np.std(values), len(values), 7.5)
+
+    assert baseline.avg_energy == pytest.approx(9.79)
+    assert baseline.high_threshold == pytest.approx(9.79 + 0.5 * np.std(values))
+    assert baseline.data_points == 10
+
+    start = datetime(2025, 10, 1, 23, 0, tzinfo=timezone.utc)
+    rows = []
+    for day, (sleep, energy) in enumerate([(6.0, 5), (7.0, 6), (8.0, 9), (7.5, 8), (8.5, 7), (9.0, 6)]):
+        night = start + timedelta(days=day)
+        rows.append((night, HealthDataType.SLEEP_DURATION, sleep))
+        rows.append((night + timedelta(hours=10), HealthDataType.ENERGY_LEVEL, energy))
+
+    assert _optimal_sleep(rows) == pytest.approx((8.0 + 7.5 + 8.5) / 3)
+    assert _optimal_sleep(rows[:4]) == 8.0  # 配对不足5组时默认8小时
+
+
+def test_stored_rows_round_trip():
+    """写入energy_baselines/energy_patterns的字段可以还原为基线和模式"""
+    user_id = "3f2b8a1e-5c4d-4e6f-9a7b-1c2d3e4f5a6b"
+    baseline = _build_baseline(user_id, 6.4, 1.2, 25, 7.5)
+    pattern = _daily_pattern({8: 6.0, 9: 8.0, 10: 8.5, 13: 5.0, 14: 3.0, 15: 3.5}, data_points=30)
+
+    computed_at = datetime(2025, 10, 25, 20, 0, tzinfo=timezone.utc)
+    restored_baseline = _baseline_from_row(
+        EnergyBaseline(**_baseline_row(baseline), calculated_at=computed_at)
+    )
+    restored_pattern = _pattern_from_row(EnergyPattern(**_pattern_row(user_id, pattern)))
+
+    assert restored_baseline.user_id == user_id
+    assert restored_baseline.high_threshold == baseline.high_threshold
+    assert restored_baseline.last_updated == computed_at
+    assert restored_pattern == pattern
+
+
+def test_insufficient_data_is_stored_and_not_recomputed(monkeypatch):
+    """数据不足时保存标记行; 之后的请求读到标记行直接返回空结果, 不再扫描原始数据"""
+    user_id = "3f2b8a1e-5c4d-4e6f-9a7b-1c2d3e4f5a6b"
+    stored = {"baseline": None, "patterns": []}
+    scans = []
+
+    class _Session:
+        async def commit(self):
+            pass
+
+    async def get_baseline(db, uid):
+        return stored["baseline"]
+
+    async def get_patterns(db, uid):
+        return stored["patterns"]
+
+    async def upsert_baselines(db, user_ids, rows, computed_at=None):
+        [row] = rows
+        stored["baseline"] = EnergyBaseline(**row, calculated_at=datetime.now(timezone.utc))
+        return 1
+
+    async def upsert_patterns(db, user_ids, rows, computed_at=None):
+        stored["patterns"] = [EnergyPattern(**row) for row in rows]
+        return len(rows)
+
+    async def calculate_baseline(self, uid, db):
+        scans.append("baseline")
+        return None
+
+    async def identify_patterns(self, uid, db):
+        scans.append("patterns")
+        return []
+
+    monkeypatch.setattr(digital_twin, "get_energy_baseline", get_baseline)
+    monkeypatch.setattr(digital_twin, "get_energy_patterns", get_patterns)
+    monkeypatch.setattr(digital_twin, "upsert_energy_baselines", upsert_baselines)
+    monkeypatch.setattr(digital_twin, "upsert_energy_patterns", upsert_patterns)
+    monkeypatch.setattr(DigitalTwinManager, "_calculate_baseline", calculate_baseline)
+    monkeypatch.setattr(DigitalTwinManager, "_identify_patterns", identify_patterns)
+
+    manager = DigitalTwinManager()
+
+    async def scenario():
+        results = []
+        for _ in range(2):
+            results.append((
+                await manager.get_baseline(user_id, _Session()),
+                await manager.get_patterns(user_id, _Session())
+            ))
+        return results
+
+    assert asyncio.run(scenario()) == [(None, []), (None, [])]
+    assert scans == ["baseline", "patterns"]
+
+    assert stored["baseline"].avg_energy is None
+    assert stored["baseline"].data_points < digital_twin.MIN_BASELINE_POINTS
+    assert [p.pattern_type for p in stored["patterns"]] == [digital_twin.NO_PATTERN_TYPE]
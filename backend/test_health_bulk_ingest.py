@@ -0,0 +1,106 @@
+"""
+健康数据批量导入测试
+验证同批去重、COPY记录转换, 以及按条数选择COPY/INSERT写入路径
+"""
+
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import app.models.energy  # noqa: F401  (注册User关系中引用的能量模型)
+from app.core.config import settings
+from app.crud import health_data as health_crud
+from app.crud.health_data import BULK_COPY_COLUMNS, _copy_record, _prepare_insert_rows
+from app.services import health_sync
+
+
+def _row(user_id, external_id, recorded_at, value=1.0, **extra):
+    return {
+        "user_id": user_id,
+        "data_type": "steps",
+        "value": value,
+        "source": "apple_health",
+        "recorded_at": recorded_at,
+        "external_id": external_id,
+        **extra
+    }
+
+
+def test_prepare_insert_rows_drops_in_batch_duplicates():
+    """同一批内(user_id, external_id, recorded_at)重复的只保留第一条; 时区不同的同一时刻视为重复"""
+    user_id = uuid.uuid4()
+    other_user = uuid.uuid4()
+    at = datetime(2025, 1, 1, 8, 0)
+
+    rows = _prepare_insert_rows([
+        _row(user_id, "a", at, value=1),
+        _row(user_id, "a", at.replace(tzinfo=timezone.utc), value=2),
+        _row(user_id, "a", datetime(2025, 1, 1, 16, 0, tzinfo=timezone(timedelta(hours=8))), value=3),
+        _row(user_id, "a", at + timedelta(minutes=1), value=4),
+        _row(other_user, "a", at, value=5),
+        _row(user_id, None, at, value=6),
+        _row(user_id, None, at, value=7),
+    ])
+
+    assert [row["value"] for row in rows] == [1, 4, 5, 6, 7]
+    assert len({row["id"] for row in rows}) == len(rows)
+    assert all(row["is_anomaly"] is False for row in rows)
+
+    # 调用方给出的id/is_anomaly保留
+    data_id = uuid.uuid4()
+    [row] = _prepare_insert_rows([_row(user_id, "b", at, id=data_id, is_anomaly=True)])
+    assert row["id"] == data_id and row["is_anomaly"] is True
+
+
+def test_copy_record_converts_times_and_jsonb():
+    """COPY记录按BULK_COPY_COLUMNS排列, 时间统一为UTC, JSONB以文本传入"""
+    user_id = uuid.uuid4()
+    [row] = _prepare_insert_rows([_row(
+        user_id, "x",
+        datetime(2025, 1, 1, 16, 0, tzinfo=timezone(timedelta(hours=8))),
+        value=8000,
+        extra_data={"设备": "Watch", "steps": [1, 2]},
+        synced_at=datetime(2025, 1, 2, 0, 0)
+    )])
+
+    record = dict(zip(BULK_COPY_COLUMNS, _copy_record(row)))
+
+    assert record["id"] == row["id"] and record["user_id"] == user_id
+    assert record["value"] == 8000.0 and isinstance(record["value"], float)
+    assert record["recorded_at"] == datetime(2025, 1, 1, 8, 0, tzinfo=timezone.utc)
+    assert record["recorded_at"].utcoffset() == timedelta(0)
+    assert record["synced_at"] == datetime(2025, 1, 2, 0, 0, tzinfo=timezone.utc)
+    assert json.loads(record["extra_data"]) == {"设备": "Watch", "steps": [1, 2]}
+    assert "设备" in record["extra_data"]  # ensure_ascii=False
+    assert record["unit"] is None and record["external_id"] == "x"
+    assert record["is_anomaly"] is False
+
+    # 可选字段为空
+    [bare] = _prepare_insert_rows([_row(user_id, None, datetime(2025, 1, 1))])
+    bare_record = dict(zip(BULK_COPY_COLUMNS, _copy_record(bare)))
+    assert bare_record["extra_data"] is None and bare_record["synced_at"] is None
+
+
+def test_ingest_rows_switches_to_copy_at_threshold(monkeypatch):
+    """达到HEALTH_BULK_INGEST_THRESHOLD条时走COPY, 不足时走INSERT ... ON CONFLICT"""
+    calls = []
+
+    async def bulk_ingest(db, rows):
+        calls.append(("copy", len(rows)))
+        return health_crud.BulkIngestResult(inserted=len(rows) - 1, skipped=1)
+
+    async def insert_batch(db, rows):
+        calls.append(("insert", len(rows)))
+        return rows[:-1]
+
+    monkeypatch.setattr(health_crud, "bulk_ingest_health_data", bulk_ingest)
+    monkeypatch.setattr(health_crud, "insert_health_data_batch", insert_batch)
+    monkeypatch.setattr(settings, "HEALTH_BULK_INGEST_THRESHOLD", 3)
+
+    user_id = uuid.uuid4()
+    rows = [_row(user_id, str(i), datetime(2025, 1, 1)) for i in range(3)]
+
+    assert asyncio.run(health_sync.ingest_rows(None, rows[:2])) == 1
+    assert asyncio.run(health_sync.ingest_rows(None, rows)) == 2
+    assert calls == [("insert", 2), ("copy", 3)]
@@ -0,0 +1,134 @@
+"""
+健康特征向量测试
+验证增量更新取最新值、预测只使用新鲜的特征、统计在进程内累加后批量写入
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import app.models.energy  # noqa: F401  (注册User关系中引用的能量模型)
+from app.ai.energy_prediction import HealthFeatures, _apply_feature_vector
+from app.crud.health_features import latest_feature_values
+from app.models.health_data import HealthDataType, HealthFeatureVector
+from app.services import feature_store_metrics
+
+
+def test_latest_feature_values_keeps_newest_sample():
+    """同一特征取采集时间最新的一条, 迟到的旧数据和非特征类型被忽略"""
+    user_id = uuid.uuid4()
+    now = datetime(2025, 10, 23, 8, 0, tzinfo=timezone.utc)
+
+    latest = latest_feature_values([
+        (user_id, HealthDataType.HRV, 55.0, now),
+        (user_id, HealthDataType.HRV, 40.0, now - timedelta(hours=3)),
+        (user_id, HealthDataType.STEPS, 1200, now.replace(tzinfo=None)),
+        (user_id, HealthDataType.BLOOD_OXYGEN, 98.0, now),
+    ])
+
+    assert latest == {
+        user_id: {
+            "hrv": (55.0, now),
+            "steps": (1200.0, now),
+        }
+    }
+
+
+def test_apply_feature_vector_uses_only_fresh_values():
+    """超过1天或晚于预测时间的值不使用, 没有均值时按5.0处理"""
+    as_of = datetime(2025, 10, 23, 9, 0, tzinfo=timezone.utc)
+    vector = HealthFeatureVector(
+        user_id=uuid.uuid4(),
+        sleep_duration=6.5,
+        sleep_duration_at=as_of - timedelta(hours=2),
+        hrv=60.0,
+        hrv_at=as_of - timedelta(days=2),
+        steps=4321.0,
+        steps_at=as_of - timedelta(hours=1),
+        mood=8.0,
+        mood_at=as_of + timedelta(hours=1),
+        avg_energy_7d=6.2,
+    )
+
+    features = HealthFeatures()
+    _apply_feature_vector(features, vector, as_of.replace(tzinfo=None))
+
+    assert features.sleep_duration == 6.5
+    assert features.sleep_debt == 1.5
+    assert features.hrv == 0.0
+    assert features.steps == 4321 and isinstance(features.steps, int)
+    assert features.mood == 0.0
+    assert features.avg_energy_7d == 6.2
+    assert features.avg_energy_30d == 5.0
+
+
+class _FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def hincrby(self, key, field, amount):
+        self.calls.append(("hincrby", field, amount))
+
+    def hincrbyfloat(self, key, field, amount):
+        self.calls.append(("hincrbyfloat", field, amount))
+
+    async def execute(self):
+        if self.redis.down:
+            raise ConnectionError("redis down")
+        self.redis.executed.append(self.calls)
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.down = False
+        self.executed = []
+        self.transactions = []
+
+    def pipeline(self, transaction=True):
+        self.transactions.append(transaction)
+        return _FakePipeline(self)
+
+
+def test_feature_metrics_accumulate_in_process_and_flush_once(monkeypatch):
+    """记录只累加进程内计数, 一次写入合并多次记录; 写入是事务, Redis失败时整批计数保留到下次"""
+    redis = _FakeRedis()
+    monkeypatch.setattr(feature_store_metrics, "_pending", {})
+    monkeypatch.setattr(
+        feature_store_metrics, "_feature_store_metrics",
+        feature_store_metrics.FeatureStoreMetrics(redis)
+    )
+    monkeypatch.setattr(feature_store_metrics, "FLUSH_INTERVAL_SECONDS", 3600.0)
+
+    feature_store_metrics.record_feature_update(
+        users=2, samples=5, duration_ms=1.5, ingest_lag_seconds=30.0
+    )
+    feature_store_metrics.record_feature_update(
+        users=1, samples=1, duration_ms=0.5, ingest_lag_seconds=10.0
+    )
+    feature_store_metrics.record_feature_read(
+        requested=3, found=2, age_seconds=60.0, stale_means=1
+    )
+    assert redis.executed == []
+
+    redis.down = True
+    asyncio.run(feature_store_metrics.flush_feature_metrics())
+    assert feature_store_metrics._pending["updates"] == 2
+
+    redis.down = False
+    asyncio.run(feature_store_metrics.flush_feature_metrics())
+    assert feature_store_metrics._pending == {}
+    assert len(redis.executed) == 1
+    assert redis.transactions == [True, True]
+    assert sorted(redis.executed[0]) == sorted([
+        ("hincrby", "updates", 2),
+        ("hincrby", "updated_users", 3),
+        ("hincrby", "updated_samples", 6),
+        ("hincrbyfloat", "update_ms_sum", 2.0),
+        ("hincrbyfloat", "ingest_lag_seconds_sum", 40.0),
+        ("hincrby", "reads", 1),
+        ("hincrby", "read_requested", 3),
+        ("hincrby", "read_found", 2),
+        ("hincrbyfloat", "read_age_seconds_sum", 60.0),
+        ("hincrby", "read_stale_means", 1),
+    ])
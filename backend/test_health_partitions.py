@@ -0,0 +1,177 @@
+"""
+health_data分区测试
+验证月度分区命名/边界、原始数据保留期的计算和按需建分区的事务边界
+"""
+
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from app.crud import health_partitions
+from app.crud.health_partitions import (
+    downsample_health_data,
+    ensure_health_data_partitions,
+    expired_partition_months,
+    month_start,
+    next_month,
+    parse_partition_name,
+    partition_ddl,
+    partition_name,
+    raw_retention_cutoff
+)
+
+
+def test_partition_name_round_trip():
+    """分区名与月份互相转换, 非月度分区返回None"""
+    assert partition_name(date(2025, 1, 1)) == "health_data_p2025_01"
+    assert parse_partition_name("health_data_p2025_12") == date(2025, 12, 1)
+    assert parse_partition_name("health_data_legacy") is None
+    assert parse_partition_name("health_daily_rollup") is None
+
+
+def test_partition_bounds_use_utc_months():
+    """数据按UTC月份归属分区, 12月的上界是次年1月"""
+    beijing = timezone(timedelta(hours=8))
+    assert month_start(datetime(2025, 2, 1, 6, 0, tzinfo=beijing)) == date(2025, 1, 1)
+    assert next_month(date(2025, 12, 1)) == date(2026, 1, 1)
+
+    ddl = partition_ddl(date(2025, 12, 1))
+    assert "FROM ('2025-12-01 00:00:00+00') TO ('2026-01-01 00:00:00+00')" in ddl
+
+
+def test_raw_retention_cutoff_aligned_to_midnight():
+    """保留期起点对齐到UTC零点"""
+    now = datetime(2025, 3, 31, 15, 30, tzinfo=timezone.utc)
+    assert raw_retention_cutoff(now, retention_days=90) == datetime(2024, 12, 31, tzinfo=timezone.utc)
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+    def one(self):
+        return self.rows[0]
+
+
+class _RecordingSession:
+    """记录执行的语句和提交; 建分区的DDL可以设置为失败"""
+
+    def __init__(self, existing=(), fail_ddl=False, oldest=()):
+        self.existing = list(existing)
+        self.fail_ddl = fail_ddl
+        self.oldest = list(oldest)
+        self.log = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt, params=None):
+        sql = str(stmt)
+        self.log.append(sql)
+        if "pg_inherits" in sql:
+            return _Result(self.existing)
+        if sql.startswith("CREATE TABLE") and self.fail_ddl:
+            raise RuntimeError("canceling statement due to lock timeout")
+        if "health_data_hourly" in sql:
+            self.log[-1] = ("ROLLUP", params)
+            return _Result([(10, 4)])
+        return _Result([])
+
+    async def scalar(self, stmt):
+        self.log.append("SELECT MIN")
+        return self.oldest.pop(0) if self.oldest else None
+
+    async def commit(self):
+        self.log.append("COMMIT")
+
+
+def test_ensure_partitions_caches_only_committed_months(monkeypatch):
+    """建分区在独立会话中提交后才进入缓存, 失败时不缓存(下次写入会重新检查)"""
+    monkeypatch.setattr(health_partitions, "_known_partitions", set())
+    recorded_at = datetime.now(timezone.utc)
+    month = month_start(recorded_at)
+    previous = month_start(datetime.combine(month, datetime.min.time()) - timedelta(days=1))
+
+    failing = _RecordingSession(fail_ddl=True)
+    monkeypatch.setattr(health_partitions, "async_session_maker", lambda: failing)
+    with pytest.raises(RuntimeError):
+        asyncio.run(ensure_health_data_partitions([recorded_at]))
+    assert month not in health_partitions._known_partitions
+
+    session = _RecordingSession(existing=[partition_name(previous)])
+    monkeypatch.setattr(health_partitions, "async_session_maker", lambda: session)
+    created = asyncio.run(ensure_health_data_partitions([recorded_at]))
+
+    assert created == [month]
+    assert health_partitions._known_partitions == {previous, month}
+    # 每个分区一个短事务: 先设置锁等待上限, 建表后立即提交
+    assert session.log[-3].startswith("SET LOCAL lock_timeout")
+    assert session.log[-2] == partition_ddl(month)
+    assert session.log[-1] == "COMMIT"
+
+    # 命中缓存时不再访问数据库
+    assert asyncio.run(ensure_health_data_partitions([recorded_at])) == []
+    assert session.log[-1] == "COMMIT" and len(session.log) == 5
+
+
+def test_expired_partition_months_only_whole_months():
+    cutoff = datetime(2019, 5, 16, tzinfo=timezone.utc)
+    months = [date(2019, 6, 1), date(2019, 3, 1), date(2019, 5, 1), date(2019, 4, 1)]
+    assert expired_partition_months(months, cutoff) == [date(2019, 3, 1), date(2019, 4, 1)]
+
+    # 保留期起点恰好是月初时, 上个月整月过期
+    first = datetime(2019, 5, 1, tzinfo=timezone.utc)
+    assert expired_partition_months(months, first) == [date(2019, 3, 1), date(2019, 4, 1)]
+
+
+def test_downsample_drops_expired_partitions_and_deletes_boundary_days(monkeypatch):
+    """整月过期的分区汇总后DETACH/DROP, 只有边界月份按天DELETE"""
+    monkeypatch.setattr(
+        health_partitions, "_known_partitions",
+        {date(2019, 3, 1), date(2019, 4, 1), date(2019, 5, 1)}
+    )
+    session = _RecordingSession(
+        existing=[partition_name(date(2019, m, 1)) for m in (3, 4, 5, 6)],
+        oldest=[datetime(2019, 5, 2, 7, 30, tzinfo=timezone.utc)]
+    )
+
+    result = asyncio.run(downsample_health_data(
+        session,
+        retention_days=30,
+        now=datetime(2019, 6, 15, 12, tzinfo=timezone.utc)
+    ))
+
+    assert result["cutoff"] == "2019-05-16T00:00:00+00:00"
+    assert result["dropped_partitions"] == ["health_data_p2019_03", "health_data_p2019_04"]
+    assert result["windows"] == 3
+    assert (result["moved_rows"], result["hourly_rows"]) == (30, 12)
+    assert health_partitions._known_partitions == {date(2019, 5, 1)}
+
+    log = [entry if isinstance(entry, str) else entry[0] for entry in session.log]
+    for name in result["dropped_partitions"]:
+        i = log.index(f"LOCK TABLE {name} IN SHARE MODE")
+        assert log[i - 1].startswith("SET LOCAL lock_timeout")
+        assert log[i + 1:i + 5] == [
+            "ROLLUP",
+            f"ALTER TABLE health_data DETACH PARTITION {name}",
+            f"DROP TABLE {name}",
+            "COMMIT",
+        ]
+
+    # 边界月份: 从最早的一天开始按天删除并汇总
+    day_windows = [entry[1] for entry in session.log if isinstance(entry, tuple) and entry[1]]
+    assert day_windows == [{
+        "window_start": datetime(2019, 5, 2, tzinfo=timezone.utc),
+        "window_end": datetime(2019, 5, 3, tzinfo=timezone.utc),
+    }]
+    assert log[-3:] == ["ROLLUP", "COMMIT", "SELECT MIN"]
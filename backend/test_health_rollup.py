@@ -0,0 +1,52 @@
+"""
+健康数据日汇总测试
+验证按(用户, 类型, UTC日期)的内存聚合
+"""
+
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+import app.models.energy  # noqa: F401  (注册User关系中引用的能量模型)
+from app.crud.health_data import aggregate_daily_rollups, rollup_day
+from app.models.health_data import HealthData, HealthDataType
+
+
+def _record(user_id, data_type, value, recorded_at):
+    return HealthData(
+        user_id=user_id,
+        data_type=data_type,
+        value=value,
+        source="manual",
+        recorded_at=recorded_at
+    )
+
+
+def test_rollup_day_uses_utc():
+    """带时区的时间先换算到UTC再取日期, 不带时区按UTC处理"""
+    beijing = timezone(timedelta(hours=8))
+    assert rollup_day(datetime(2025, 1, 2, 6, 0, tzinfo=beijing)) == date(2025, 1, 1)
+    assert rollup_day(datetime(2025, 1, 2, 6, 0)) == date(2025, 1, 2)
+
+
+def test_aggregate_daily_rollups():
+    """同一天同类型的数据合并为一行, last取采集时间最晚的值"""
+    user_id = uuid.uuid4()
+    records = [
+        _record(user_id, HealthDataType.HRV, 50, datetime(2025, 1, 1, 8)),
+        _record(user_id, HealthDataType.HRV, 40, datetime(2025, 1, 1, 22)),
+        _record(user_id, HealthDataType.HRV, 60, datetime(2025, 1, 1, 3)),
+        _record(user_id, HealthDataType.HRV, 55, datetime(2025, 1, 2, 8)),
+        _record(user_id, HealthDataType.STEPS, 8000, datetime(2025, 1, 1, 23)),
+    ]
+
+    rollups = aggregate_daily_rollups(records)
+
+    assert len(rollups) == 3
+
+    hrv = rollups[(user_id, HealthDataType.HRV, date(2025, 1, 1))]
+    assert hrv["sample_count"] == 3
+    assert hrv["value_sum"] == 150
+    assert hrv["value_min"] == 40
+    assert hrv["value_max"] == 60
+    assert hrv["last_value"] == 40
+    assert hrv["last_recorded_at"] == datetime(2025, 1, 1, 22)
@@ -0,0 +1,93 @@
+"""
+健康摘要缓存测试
+验证计算期间发生失效时不会写回旧摘要
+"""
+
+import asyncio
+import uuid
+
+from app.services.health_summary_cache import HealthSummaryCache
+
+
+class _FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.calls.append((name, args))
+        return queue
+
+    async def execute(self):
+        return [getattr(self.redis, name)(*args) for name, args in self.calls]
+
+
+class _FakeRedis:
+    """内存中的Redis(只实现摘要缓存用到的命令; eval按_WRITE_IF_UNCHANGED的语义执行)"""
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    def hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def delete(self, *keys):
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+    def expire(self, key, seconds):
+        return True
+
+    def hincrby(self, key, field, amount):
+        values = self.data.setdefault(key, {})
+        values[field] = str(int(values.get(field, 0)) + amount)
+
+    async def eval(self, script, numkeys, key, generation_key, stats_key, expected, field, value, ttl):
+        self.hincrby(stats_key, "misses", 1)
+        if (self.data.get(generation_key) or "") != expected:
+            return 0
+        self.data.setdefault(key, {})[field] = value
+        return 1
+
+
+def test_summary_computed_across_invalidation_is_not_cached():
+    """计算期间数据变更(失效)时, 本次结果返回给调用方但不写入缓存; 之后的计算正常缓存"""
+    redis = _FakeRedis()
+    cache = HealthSummaryCache(redis)
+    user_id = uuid.uuid4()
+    computed = []
+
+    async def compute_with_concurrent_write():
+        computed.append("stale")
+        # 计算读取数据之后, 另一个请求写入了新数据并使缓存失效
+        await cache.invalidate([user_id])
+        return {"version": "stale"}
+
+    async def compute():
+        computed.append("fresh")
+        return {"version": "fresh"}
+
+    async def scenario():
+        first = await cache.get_or_compute(user_id, 7, compute_with_concurrent_write)
+        second = await cache.get_or_compute(user_id, 7, compute)
+        third = await cache.get_or_compute(user_id, 7, compute)
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+
+    assert first == {"version": "stale"}
+    assert second == third == {"version": "fresh"}
+    assert computed == ["stale", "fresh"]
+    assert redis.data["health_summary:stats"] == {
+        "invalidations": "1", "misses": "2", "hits": "1"
+    }
@@ -0,0 +1,72 @@
+"""
+健康数据同步解析测试
+验证同步记录到health_data行的转换和NDJSON流式读取
+"""
+
+import asyncio
+import gzip
+import json
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app.models.health_data import HealthDataType, HealthDataSource
+from app.schemas.health import HealthSyncRequest
+from app.services.health_sync import NDJSONLineTooLong, build_sync_rows, iter_ndjson_lines
+
+
+def test_build_sync_rows():
+    """数值记录生成一行, 对象记录按指标拆分, 无法解析的记录计入错误"""
+    user_id = uuid.uuid4()
+    request = HealthSyncRequest(
+        data_source="apple_health",
+        data_type="batch",
+        records=[
+            {"type": "steps", "date": "2025-01-01", "value": 8000},
+            {"type": "activity", "date": "2025-01-01", "value": {"calories": 320, "distance": 5.2}},
+            {"type": "sleep", "date": "not-a-date", "value": 7.5},
+        ]
+    )
+
+    rows, errors = build_sync_rows(request, user_id, now=datetime(2025, 1, 2))
+
+    assert len(rows) == 3
+    assert len(errors) == 1
+
+    steps = rows[0]
+    assert steps["data_type"] == HealthDataType.STEPS
+    assert steps["value"] == 8000.0
+    assert steps["source"] == HealthDataSource.APPLE_HEALTH
+    assert steps["recorded_at"] == datetime(2025, 1, 1)
+    assert steps["external_id"] == f"apple_health_steps_2025-01-01_{user_id}"
+
+    assert [row["data_type"] for row in rows[1:]] == [
+        HealthDataType.ACTIVE_ENERGY,
+        HealthDataType.DISTANCE
+    ]
+    assert rows[1]["external_id"].endswith("_calories")
+
+
+async def _chunks(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def _collect(chunks, **kwargs):
+    return [line async for line in iter_ndjson_lines(chunks, **kwargs)]
+
+
+def test_iter_ndjson_lines_gzip():
+    """gzip请求体按任意边界分块时逐行还原, 跳过空行; 超长行报错"""
+    lines = [json.dumps({"type": "steps", "date": f"2025-01-{day:02d}", "value": day}) for day in range(1, 31)]
+    body = ("\n".join(lines) + "\n\n").encode()
+
+    assert asyncio.run(_collect(_chunks(gzip.compress(body), 7), gzipped=True)) == [
+        line.encode() for line in lines
+    ]
+    # 末行没有换行符
+    assert asyncio.run(_collect(_chunks(body.rstrip(), 5))) == [line.encode() for line in lines]
+
+    with pytest.raises(NDJSONLineTooLong):
+        asyncio.run(_collect(_chunks(b"x" * 100, 10), max_line_bytes=50))
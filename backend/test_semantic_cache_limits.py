@@ -0,0 +1,153 @@
+"""
+L2语义缓存容量测试
+用内存中的Qdrant客户端替身验证每用户上限(LFU淘汰、按估计值跳过计数)和过期清理
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+from app.ai.response_cache import ResponseCacheManager
+from app.core.config import settings
+
+
+def _matches(point, flt):
+    """只支持缓存用到的条件: user_id精确匹配, expires_at <= lte"""
+    def check(condition):
+        value = point["payload"].get(condition.key)
+        if condition.match is not None:
+            return value == condition.match.value
+        return value is not None and value <= condition.range.lte
+
+    if flt is None:
+        return True
+    return all(check(c) for c in flt.must or []) and not any(check(c) for c in flt.must_not or [])
+
+
+class FakeQdrant:
+    """AsyncQdrantClient的内存替身(count/scroll/delete)"""
+
+    def __init__(self):
+        self.points = {}
+        self.calls = []
+
+    def add(self, point_id, user_id, hit_count=0, expires_at=None):
+        self.points[point_id] = {
+            "id": point_id,
+            "payload": {"user_id": user_id, "hit_count": hit_count, "expires_at": expires_at}
+        }
+
+    async def count(self, collection_name, count_filter=None, exact=True):
+        self.calls.append("count")
+        return SimpleNamespace(
+            count=sum(1 for p in self.points.values() if _matches(p, count_filter))
+        )
+
+    async def scroll(self, collection_name, scroll_filter=None, limit=10, order_by=None, **kwargs):
+        self.calls.append("scroll")
+        points = [p for p in self.points.values() if _matches(p, scroll_filter)]
+        if order_by is not None:
+            points.sort(key=lambda p: p["payload"][order_by.key])
+        return [SimpleNamespace(id=p["id"]) for p in points[:limit]], None
+
+    async def delete(self, collection_name, points_selector, wait=False):
+        self.calls.append("delete")
+        for point_id in points_selector.points:
+            self.points.pop(point_id, None)
+
+
+class FakeRedisPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def hincrby(self, key, field, amount):
+        self.ops.append((field, amount))
+
+    async def execute(self):
+        results = []
+        for field, amount in self.ops:
+            self.redis.hash[field] = self.redis.hash.get(field, 0) + amount
+            results.append(self.redis.hash[field])
+        return results
+
+
+class FakeRedis:
+    def __init__(self):
+        self.hash = {}
+
+    def pipeline(self, transaction=True):
+        return FakeRedisPipeline(self)
+
+    async def hset(self, key, field, value):
+        self.hash[field] = value
+
+    async def hdel(self, key, field):
+        self.hash.pop(field, None)
+
+
+def _manager(monkeypatch, limit=3):
+    monkeypatch.setattr(settings, "CACHE_L2_MAX_ENTRIES_PER_USER", limit)
+    manager = ResponseCacheManager()
+    manager.qdrant_client = FakeQdrant()
+    manager.redis_manager = SimpleNamespace(client=FakeRedis())
+    return manager
+
+
+def test_enforce_user_limit_evicts_least_used(monkeypatch):
+    """超出上限的条目按hit_count从低到高淘汰, 只影响该用户"""
+    manager = _manager(monkeypatch, limit=3)
+    qdrant = manager.qdrant_client
+    for i, hits in enumerate([5, 0, 9, 1, 7]):
+        qdrant.add(f"a{i}", "alice", hit_count=hits)
+    qdrant.add("b0", "bob", hit_count=0)
+
+    evicted = asyncio.run(manager._enforce_user_limit("alice"))
+
+    assert evicted == 2
+    assert sorted(qdrant.points) == ["a0", "a2", "a4", "b0"]
+    assert manager.redis_manager.client.hash["alice"] == 3
+
+
+def test_user_limit_counts_only_when_estimate_may_exceed(monkeypatch):
+    """估计值不超过上限时不精确计数; 首次写入和可能超限时才count"""
+    manager = _manager(monkeypatch, limit=3)
+    qdrant = manager.qdrant_client
+
+    def write(*point_ids):
+        for point_id in point_ids:
+            qdrant.add(point_id, "alice", hit_count=int(point_id[1:]))
+        return asyncio.run(manager._enforce_user_limits({"alice": len(point_ids)}))
+
+    # 首次写入: 没有估计值, 精确计数一次
+    assert write("a1") == 0
+    assert qdrant.calls == ["count"]
+
+    # 估计值2, 3: 不超过上限, 不计数
+    assert write("a2") == 0
+    assert write("a3") == 0
+    assert qdrant.calls == ["count"]
+
+    # 估计值5 > 3: 精确计数并淘汰hit_count最低的两条, 估计值回到上限
+    assert write("a4", "a5") == 2
+    assert qdrant.calls == ["count", "count", "scroll", "delete"]
+    assert sorted(qdrant.points) == ["a3", "a4", "a5"]
+    assert manager.redis_manager.client.hash["alice"] == 3
+
+
+def test_sweep_expired_l2_deletes_in_batches(monkeypatch):
+    """按批删除已过期的点, 未过期和没有过期时间的点保留"""
+    manager = _manager(monkeypatch)
+    qdrant = manager.qdrant_client
+    now = time.time()
+    for i in range(5):
+        qdrant.add(f"old{i}", "alice", expires_at=now - 10)
+    qdrant.add("new", "alice", expires_at=now + 3600)
+    qdrant.add("forever", "bob")
+
+    result = asyncio.run(manager.sweep_expired_l2(batch_size=2))
+
+    assert result["deleted"] == 5
+    assert result["batches"] == 3
+    assert sorted(qdrant.points) == ["forever", "new"]
+    assert qdrant.calls == ["scroll", "delete"] * 3
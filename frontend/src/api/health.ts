@@ -97,9 +97,48 @@ export interface SyncHealthDataRequest {
   }>;
 }
 
+export type SyncJobStatus = 'queued' | 'running' | 'completed' | 'failed';
+
+export interface SyncHealthDataJob {
+  job_id: string;
+  status: SyncJobStatus;
+  total_records: number;
+  status_url: string;
+}
+
+export interface SyncHealthDataJobStatus {
+  job_id: string;
+  status: SyncJobStatus;
+  data_source: string;
+  total_records: number;
+  total_rows: number;
+  processed: number;
+  inserted: number;
+  duplicates: number;
+  error_count: number;
+  errors: string[];
+  created_at: string;
+  started_at?: string | null;
+  finished_at?: string | null;
+  updated_at?: string | null;
+}
+
+/**
+ * 提交后由服务端后台分批写入，返回任务ID
+ */
 export const syncHealthData = async (
   request: SyncHealthDataRequest
-): Promise<{ success: boolean; synced: number; errors: string[] }> => {
-  const response = await apiClient.post('/health/sync', request);
+): Promise<SyncHealthDataJob> => {
+  const response = await apiClient.post<SyncHealthDataJob>('/health/sync', request);
+  return response.data;
+};
+
+/**
+ * 查询同步任务进度
+ */
+export const getHealthSyncJob = async (
+  jobId: string
+): Promise<SyncHealthDataJobStatus> => {
+  const response = await apiClient.get<SyncHealthDataJobStatus>(`/health/sync/${jobId}`);
   return response.data;
 };
@@ -36,6 +36,7 @@ export {
   getHealthSummary,
   deleteHealthData,
   syncHealthData,
+  getHealthSyncJob,
 } from "./health";
 
 // 天气和环境数据接口
@@ -67,7 +68,11 @@ export type {
   HealthSummaryResponse,
 } from "./types";
 
-export type { SyncHealthDataRequest } from "./health";
+export type {
+  SyncHealthDataRequest,
+  SyncHealthDataJob,
+  SyncHealthDataJobStatus,
+} from "./health";
 
 export { HealthDataType, HealthDataSource } from "./types";
 
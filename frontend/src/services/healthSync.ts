@@ -317,12 +317,13 @@ class HealthSyncService {
       // 上传到后端
       if (allRecords.length > 0) {
         try {
-          await apiSyncHealthData({
+          const job = await apiSyncHealthData({
             data_source: this.platform === 'ios' ? 'apple_health' : 'google_fit',
             data_type: 'batch', // 批量上传
             records: allRecords,
           });
-          console.log(`成功上传 ${allRecords.length} 条健康数据记录`);
+          // 服务端后台写入，进度可通过 getHealthSyncJob(job.job_id) 查询
+          console.log(`已提交 ${allRecords.length} 条健康数据记录，同步任务: ${job.job_id}`);
         } catch (error) {
           result.success = false;
           result.errors.push(`上传到服务器失败: ${error}`);